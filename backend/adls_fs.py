@@ -0,0 +1,616 @@
+"""
+Read-only pyarrow filesystem over a DataLake service client.
+
+Paths are ``<container>/<path>``. Files are opened as seekable streams that
+fetch only the byte ranges pyarrow asks for, so Parquet readers can read a
+footer or a few column chunks without downloading the whole object. Writes go
+through ADLSAppendFile, which streams into a file with parallel chunked appends
+and a final flush, optionally into a hidden staging path that is renamed over
+the target once complete.
+"""
+
+import os
+import io
+import uuid
+import struct
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait as futures_wait
+from typing import Any, Callable, Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from azure.core.exceptions import ResourceNotFoundError
+
+from block_cache import DiskBlockCache, shared_disk_cache
+from metrics import RequestMetrics, bind, carry, current_request
+
+logger = logging.getLogger(__name__)
+
+# Granularity of ranged reads and of the block cache
+READ_BLOCK_SIZE = int(os.environ.get("ADLS_READ_BLOCK_SIZE", str(64 * 1024)))
+# Blocks cached per filesystem (shared by the files it opens)
+READ_CACHE_BLOCKS = int(os.environ.get("ADLS_READ_CACHE_BLOCKS", "256"))
+# Extra blocks fetched when a file is read sequentially
+READ_AHEAD_BLOCKS = int(os.environ.get("ADLS_READ_AHEAD_BLOCKS", "8"))
+# Bytes buffered before each append request of a streamed upload
+WRITE_CHUNK_SIZE = int(os.environ.get("ADLS_WRITE_CHUNK_SIZE", str(8 * 1024 * 1024)))
+# Append requests of one streamed upload that may be in flight at once
+WRITE_CONCURRENCY = int(os.environ.get("ADLS_WRITE_CONCURRENCY", "4"))
+# Bytes fetched from the end of a Parquet file to get its footer in one request
+FOOTER_READ_SIZE = 64 * 1024
+PARQUET_MAGIC = b"PAR1"
+
+
+class _ReadStats:
+    """Process-wide counters of ranged reads and streamed writes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.bytes_read = 0
+        self.append_requests = 0
+        self.bytes_written = 0
+
+    def record(self, size: int):
+        with self._lock:
+            self.requests += 1
+            self.bytes_read += size
+
+    def record_append(self, size: int):
+        with self._lock:
+            self.append_requests += 1
+            self.bytes_written += size
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "bytesRead": self.bytes_read,
+            "appendRequests": self.append_requests,
+            "bytesWritten": self.bytes_written,
+            "blockSize": READ_BLOCK_SIZE,
+            "cacheBlocks": READ_CACHE_BLOCKS,
+            "readAheadBlocks": READ_AHEAD_BLOCKS,
+            "writeChunkSize": WRITE_CHUNK_SIZE,
+        }
+
+
+READ_STATS = _ReadStats()
+
+
+def split_path(path: str):
+    """Split ``container/path/to/file`` into (container, path/to/file)."""
+    path = path.strip('/')
+    container, _, rest = path.partition('/')
+    return container, rest
+
+
+def staging_path(path: str, prefix: str = "_upload") -> str:
+    """Hidden sibling of ``path`` to write before renaming it into place.
+
+    The underscore prefix keeps half-written files out of listings and dataset reads.
+    """
+    directory, _, name = path.strip('/').rpartition('/')
+    staged = f"{prefix}-{uuid.uuid4().hex}-{name}"
+    return f"{directory}/{staged}" if directory else staged
+
+
+def discard_file(file_client) -> None:
+    """Delete an uncommitted file, logging failures so the error that caused it surfaces instead."""
+    try:
+        file_client.delete_file()
+    except ResourceNotFoundError:
+        pass
+    except Exception as e:
+        logger.error(f"Error removing uncommitted file: {str(e)}")
+
+
+def download_range(file_client, offset: int, length: int) -> bytes:
+    """One ranged GET, counted in READ_STATS."""
+    data = file_client.download_file(offset=offset, length=length).readall()
+    READ_STATS.record(len(data))
+    return data
+
+
+def read_parquet_tail(file_client, size: int):
+    """Fetch the end of a Parquet file up to and including its footer.
+
+    One speculative tail read covers almost every footer; a second request
+    fetches the rest of unusually large ones. Returns the tail bytes and the
+    footer length (metadata, its length and the magic) at their end.
+    """
+    tail_length = min(size, FOOTER_READ_SIZE)
+    tail = download_range(file_client, size - tail_length, tail_length)
+    if len(tail) < 8 or tail[-4:] != PARQUET_MAGIC:
+        raise ValueError("Not a Parquet file")
+    footer_length = struct.unpack("<I", tail[-8:-4])[0] + 8
+    if footer_length > size:
+        raise ValueError("Corrupt Parquet footer")
+    if footer_length > len(tail):
+        tail = download_range(file_client, size - footer_length, footer_length - len(tail)) + tail
+    return tail, footer_length
+
+
+def read_parquet_footer(file_client, size: int) -> bytes:
+    """Fetch only the footer of a Parquet file."""
+    tail, footer_length = read_parquet_tail(file_client, size)
+    return tail[-footer_length:]
+
+
+def footer_metadata(footer: bytes) -> pq.FileMetaData:
+    """Parse footer bytes from ``read_parquet_footer``."""
+    return pq.read_metadata(pa.BufferReader(footer))
+
+
+class BlockCache:
+    """Thread-safe LRU of file blocks keyed by (file key, block index).
+
+    One cache is shared by every file a filesystem opens, so re-opening a file
+    (dataset discovery, then the scan) does not download its footer again.
+    """
+
+    def __init__(self, max_blocks: int = READ_CACHE_BLOCKS):
+        self.max_blocks = max(1, max_blocks)
+        self._blocks: "OrderedDict[Any, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is None:
+                self.misses += 1
+                return None
+            self._blocks.move_to_end(key)
+            self.hits += 1
+            return block
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._blocks
+
+    def put(self, key, block: bytes):
+        with self._lock:
+            self._blocks[key] = block
+            self._blocks.move_to_end(key)
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._blocks.clear()
+
+
+class ADLSRangeFile(io.RawIOBase):
+    """Seekable read-only file over ranged ``download_file(offset, length)`` calls.
+
+    Reads are served from fixed-size blocks. Missing blocks that are adjacent are
+    fetched with a single request, sequential reads pull a few blocks ahead, and
+    blocks stay in a BlockCache so the footer and neighbouring column chunks are
+    not downloaded twice. Reads larger than the cache bypass it. With a
+    ``disk_cache`` and the file's ``etag``, downloads go through the local disk
+    cache first. Downloads count for ``request_metrics`` (by default the request
+    opening the file), as pyarrow may read on its own threads.
+    """
+
+    def __init__(
+        self,
+        file_client,
+        size: int,
+        block_size: int = READ_BLOCK_SIZE,
+        cache: Optional[BlockCache] = None,
+        cache_key: Any = None,
+        read_ahead_blocks: int = READ_AHEAD_BLOCKS,
+        tail: Optional[bytes] = None,
+        disk_cache: Optional[DiskBlockCache] = None,
+        etag: Optional[str] = None,
+        request_metrics: Optional[RequestMetrics] = None,
+    ):
+        self._file_client = file_client
+        self._size = size
+        # Known bytes at the end of the file (a cached footer), served without a request
+        self._tail = tail or b""
+        self._tail_start = size - len(self._tail)
+        self._pos = 0
+        self._block_size = max(1, block_size)
+        self._cache = cache if cache is not None else BlockCache()
+        self._cache_key = cache_key if cache_key is not None else id(self)
+        self._read_ahead_blocks = read_ahead_blocks
+        # Files without a known etag could change under the key, so they skip the disk cache
+        self._disk_cache = disk_cache if etag else None
+        self._disk_key = f"{file_client.url}#{etag}" if self._disk_cache is not None else None
+        self._last_end = None
+        self._lock = threading.Lock()
+        self._request_metrics = request_metrics if request_metrics is not None else current_request()
+        self.bytes_read = 0
+        self.requests = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        return self._pos
+
+    def read(self, size=-1):
+        with self._lock:
+            if size is None or size < 0:
+                size = self._size - self._pos
+            size = max(0, min(size, self._size - self._pos))
+            if size == 0:
+                return b""
+            data = self._read(self._pos, size)
+            self._pos += len(data)
+            return data
+
+    def readall(self):
+        return self.read(-1)
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def _read(self, offset: int, length: int) -> bytes:
+        sequential = self._last_end == offset
+        self._last_end = offset + length
+
+        if self._tail and offset >= self._tail_start:
+            start = offset - self._tail_start
+            return self._tail[start:start + length]
+
+        block_size = self._block_size
+        if length >= block_size * self._cache.max_blocks:
+            # Too large to cache (a whole column chunk of a big file), read it directly
+            return self._download(offset, length)
+
+        first = offset // block_size
+        last = (offset + length - 1) // block_size
+        fetch_last = last
+        if sequential and self._read_ahead_blocks:
+            fetch_last = min(last + self._read_ahead_blocks, (self._size - 1) // block_size)
+
+        blocks = {}
+        for index in range(first, last + 1):
+            block = self._cache.get((self._cache_key, index))
+            if block is not None:
+                blocks[index] = block
+
+        # Coalesce runs of missing blocks into single ranged requests
+        run_start = None
+        for index in range(first, fetch_last + 2):
+            missing = index <= fetch_last and index not in blocks and (
+                index <= last or (self._cache_key, index) not in self._cache
+            )
+            if missing and run_start is None:
+                run_start = index
+            elif not missing and run_start is not None:
+                blocks.update(self._fetch_blocks(run_start, index - 1))
+                run_start = None
+
+        data = b"".join(blocks[index] for index in range(first, last + 1))
+        start = offset - first * block_size
+        return data[start:start + length]
+
+    def _fetch_blocks(self, first: int, last: int) -> Dict[int, bytes]:
+        block_size = self._block_size
+        offset = first * block_size
+        data = self._download(offset, min(self._size, (last + 1) * block_size) - offset)
+        blocks = {}
+        for i, index in enumerate(range(first, last + 1)):
+            blocks[index] = data[i * block_size:(i + 1) * block_size]
+            self._cache.put((self._cache_key, index), blocks[index])
+        return blocks
+
+    def _download(self, offset: int, length: int) -> bytes:
+        if self._disk_cache is not None:
+            return self._disk_cache.read(self._disk_key, offset, length, self._size, self._request)
+        return self._request(offset, length)
+
+    def _request(self, offset: int, length: int) -> bytes:
+        self.requests += 1
+        with bind(self._request_metrics):
+            data = download_range(self._file_client, offset, length)
+        self.bytes_read += len(data)
+        return data
+
+    @property
+    def size(self):
+        return self._size
+
+
+def open_range_file(file_client, size: Optional[int] = None, **kwargs) -> pa.PythonFile:
+    """Open a DataLake file client as a seekable pyarrow file.
+
+    ``size`` saves a properties call when it is already known from a listing.
+    """
+    if size is None:
+        size = file_client.get_file_properties().size
+    return pa.PythonFile(ADLSRangeFile(file_client, size, **kwargs), mode="r")
+
+
+class ADLSAppendFile(io.RawIOBase):
+    """Write-only stream into a new DataLake file.
+
+    Bytes are buffered and sent in ``chunk_size`` ``append_data`` requests at
+    explicit offsets, up to ``concurrency`` of them in flight, and the file is
+    committed with one ``flush_data`` on close. Writers block while all slots
+    are busy, so an upload never holds more than ``concurrency + 1`` chunks in
+    memory. The last ``keep_tail`` bytes written are kept, so a Parquet footer
+    can be parsed without reading the file back. ``progress`` is called with
+    the number of bytes sent after each append.
+
+    ``file_client`` is created (or truncated) up front. To replace a file only
+    once the new content is complete, pass a ``staging_path`` client and the
+    target as ``commit_to`` (``"<container>/<path>"``): the staged file is
+    renamed over the target after the flush, and deleted if the write is
+    aborted or fails.
+    """
+
+    def __init__(
+        self,
+        file_client,
+        chunk_size: int = WRITE_CHUNK_SIZE,
+        keep_tail: int = FOOTER_READ_SIZE,
+        concurrency: int = WRITE_CONCURRENCY,
+        progress: Optional[Callable[[int], None]] = None,
+        commit_to: Optional[str] = None,
+    ):
+        self._file_client = file_client
+        self._commit_to = commit_to
+        self._chunk_size = max(1, chunk_size)
+        self._keep_tail = keep_tail
+        self._buffer = bytearray()
+        self._position = 0  # bytes handed to append requests so far
+        self._sent = 0
+        self._progress = progress
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+        self._slots = threading.Semaphore(max(1, concurrency))
+        self._pending: List[Future] = []
+        self._error: Optional[BaseException] = None
+        self.tail = b""
+        self.etag: Optional[str] = None
+        self.last_modified = None
+        self._aborted = False
+        file_client.create_file()
+
+    def writable(self):
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._buffer += data
+        while len(self._buffer) >= self._chunk_size:
+            self._append(bytes(self._buffer[:self._chunk_size]))
+            del self._buffer[:self._chunk_size]
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position + len(self._buffer)
+
+    def _append(self, chunk: bytes):
+        offset = self._position
+        self._position += len(chunk)
+        if self._keep_tail:
+            self.tail = (self.tail + chunk)[-self._keep_tail:]
+        if self._executor is None:
+            self._send(chunk, offset)
+            return
+        self._slots.acquire()
+        if self._error is not None:
+            # Fail fast instead of queueing more work behind a failed append
+            self._slots.release()
+            raise self._error
+        self._pending = [f for f in self._pending if not f.done()]
+        future = self._executor.submit(carry(self._send), chunk, offset)
+        future.add_done_callback(self._sent_callback)
+        self._pending.append(future)
+
+    def _sent_callback(self, future: Future):
+        if not future.cancelled() and future.exception() is not None and self._error is None:
+            self._error = future.exception()
+        self._slots.release()
+
+    def _send(self, chunk: bytes, offset: int):
+        self._file_client.append_data(chunk, offset=offset, length=len(chunk))
+        READ_STATS.record_append(len(chunk))
+        with self._lock:
+            self._sent += len(chunk)
+            sent = self._sent
+        if self._progress is not None:
+            self._progress(sent)
+
+    def _wait(self):
+        pending, self._pending = self._pending, []
+        futures_wait(pending)
+        if self._error is not None:
+            raise self._error
+
+    def abort(self):
+        """Close without committing: appended data is never flushed, and a staged file is deleted."""
+        self._aborted = True
+        self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._aborted:
+                for future in self._pending:
+                    future.cancel()
+            else:
+                if self._buffer:
+                    self._append(bytes(self._buffer))
+                    self._buffer.clear()
+                self._wait()
+                response = self._file_client.flush_data(self._position)
+                if isinstance(response, dict):
+                    self.etag = response.get("etag")
+                    self.last_modified = response.get("last_modified")
+                if self._commit_to is not None:
+                    self._file_client.rename_file(self._commit_to)
+        except BaseException:
+            self._aborted = True
+            raise
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+            if self._aborted and self._commit_to is not None:
+                discard_file(self._file_client)
+            super().close()
+
+    @property
+    def size(self) -> int:
+        return self._position
+
+
+def open_append_file(file_client, **kwargs) -> pa.PythonFile:
+    """Create (or truncate) a DataLake file and open it as a pyarrow output stream."""
+    return pa.PythonFile(ADLSAppendFile(file_client, **kwargs), mode="w")
+
+
+class ADLSFileSystemHandler(pafs.FileSystemHandler):
+    """pyarrow FileSystemHandler backed by a (sync) DataLakeServiceClient."""
+
+    def __init__(
+        self,
+        service_client,
+        cache: Optional[BlockCache] = None,
+        disk_cache: Optional[DiskBlockCache] = None,
+    ):
+        self._service_client = service_client
+        self.cache = cache if cache is not None else BlockCache()
+        self.disk_cache = disk_cache if disk_cache is not None else shared_disk_cache()
+        # Sizes already known from listings, so opening a file needs no extra HEAD call
+        self._sizes: Dict[str, int] = {}
+        # Etags of files whose blocks may be kept in the disk cache
+        self._etags: Dict[str, str] = {}
+        self._tails: Dict[str, bytes] = {}
+        self._tail_loader: Optional[Callable[[str], bytes]] = None
+        # pyarrow calls back on its own threads, so calls count for the request that made the handler
+        self.request_metrics = current_request()
+
+    def register_size(self, path: str, size: Optional[int], etag: Optional[str] = None):
+        if size is not None:
+            self._sizes[path.strip('/')] = size
+        if etag:
+            self._etags[path.strip('/')] = etag
+
+    def register_tail(self, path: str, tail: bytes):
+        """Known end-of-file bytes (a cached footer) for a path."""
+        self._tails[path.strip('/')] = tail
+
+    def set_tail_loader(self, loader: Callable[[str], bytes]):
+        """Called with a path the first time a file without a registered tail is opened."""
+        self._tail_loader = loader
+
+    def _file_client(self, path: str):
+        container, rest = split_path(path)
+        return self._service_client.get_file_system_client(container).get_file_client(rest)
+
+    def _size(self, path: str) -> int:
+        path = path.strip('/')
+        if path not in self._sizes:
+            with bind(self.request_metrics):
+                self._sizes[path] = self._file_client(path).get_file_properties().size
+        return self._sizes[path]
+
+    def get_type_name(self):
+        return "adls"
+
+    def normalize_path(self, path):
+        return path.strip('/')
+
+    def get_file_info(self, paths):
+        infos = []
+        for path in paths:
+            path = path.strip('/')
+            try:
+                infos.append(pafs.FileInfo(path, pafs.FileType.File, size=self._size(path)))
+            except ResourceNotFoundError:
+                infos.append(pafs.FileInfo(path, pafs.FileType.NotFound))
+        return infos
+
+    def get_file_info_selector(self, selector):
+        container, rest = split_path(selector.base_dir)
+        container_client = self._service_client.get_file_system_client(container)
+        infos = []
+        with bind(self.request_metrics):
+            items = list(container_client.get_paths(path=rest or None, recursive=selector.recursive))
+        for item in items:
+            path = f"{container}/{item.name}"
+            if item.is_directory:
+                infos.append(pafs.FileInfo(path, pafs.FileType.Directory))
+            else:
+                self._sizes[path] = item.content_length
+                infos.append(pafs.FileInfo(path, pafs.FileType.File, size=item.content_length))
+        return infos
+
+    def open_input_file(self, path):
+        path = path.strip('/')
+        if path not in self._tails and self._tail_loader is not None:
+            with bind(self.request_metrics):
+                self._tails[path] = self._tail_loader(path)
+        return open_range_file(
+            self._file_client(path),
+            self._size(path),
+            cache=self.cache,
+            cache_key=path,
+            tail=self._tails.get(path),
+            disk_cache=self.disk_cache,
+            etag=self._etags.get(path),
+            request_metrics=self.request_metrics,
+        )
+
+    def open_input_stream(self, path):
+        return self.open_input_file(path)
+
+    # The dataset readers never write through this filesystem
+    def create_dir(self, path, recursive):
+        raise NotImplementedError("ADLS filesystem is read-only")
+
+    def delete_dir(self, path):
+        raise NotImplementedError("ADLS filesystem is read-only")
+
+    def delete_dir_contents(self, path, missing_dir_ok=False):
+        raise NotImplementedError("ADLS filesystem is read-only")
+
+    def delete_root_dir_contents(self):
+        raise NotImplementedError("ADLS filesystem is read-only")
+
+    def delete_file(self, path):
+        raise NotImplementedError("ADLS filesystem is read-only")
+
+    def move(self, src, dest):
+        raise NotImplementedError("ADLS filesystem is read-only")
+
+    def copy_file(self, src, dest):
+        raise NotImplementedError("ADLS filesystem is read-only")
+
+    def open_output_stream(self, path, metadata):
+        raise NotImplementedError("ADLS filesystem is read-only")
+
+    def open_append_stream(self, path, metadata):
+        raise NotImplementedError("ADLS filesystem is read-only")
+
+
+def adls_filesystem(service_client) -> pafs.PyFileSystem:
+    """Wrap a service client as a pyarrow filesystem."""
+    return pafs.PyFileSystem(ADLSFileSystemHandler(service_client))
@@ -0,0 +1,4 @@
+"""
+Offline benchmarks: a fake Data Lake service, a synthetic lake generator and
+a runner that times the API against them (``python -m benchmarks.run``).
+"""
@@ -0,0 +1,536 @@
+"""
+In-memory Data Lake service for benchmarks.
+
+``FakeLake`` holds containers of files (with implicit directories, as in a
+hierarchical namespace) and hands out sync and async stand-ins for
+``DataLakeServiceClient`` that follow the SDK's listing semantics:
+``list_file_systems`` and ``get_paths`` return lazily paged results with
+continuation tokens (``by_page``), ``get_paths`` lists in path order with
+directories as their own entries, defaults to ``recursive=True`` and raises
+``ResourceNotFoundError`` for a missing directory when the first page is
+fetched.
+
+Every page, download and write is one call: it is counted per operation (named
+like the ``/metrics`` operations) and delayed by a ``Latency`` model, so call
+counts and wall time match what a request would cost against a real account
+with that latency.
+"""
+
+import time
+import asyncio
+import bisect
+import hashlib
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+
+# Items per page when the caller does not ask for fewer (the service maximum)
+LIST_PAGE_SIZE = 5000
+
+
+class Latency:
+    """Delay of each call: ``per_call`` seconds (or ``per_operation[op]``) plus ``per_mb`` per MiB moved."""
+
+    def __init__(self, per_call: float = 0.0, per_operation: Optional[Dict[str, float]] = None, per_mb: float = 0.0):
+        self.per_call = per_call
+        self.per_operation = per_operation or {}
+        self.per_mb = per_mb
+
+    def delay(self, operation: str, size: int = 0) -> float:
+        return self.per_operation.get(operation, self.per_call) + self.per_mb * size / (1024 * 1024)
+
+
+class PathItem(NamedTuple):
+    """The fields of ``PathProperties`` the backend reads."""
+    name: str
+    is_directory: bool
+    last_modified: datetime
+    etag: str
+    content_length: int
+
+
+class FileSystemItem(NamedTuple):
+    name: str
+    last_modified: datetime
+    metadata: Dict[str, str]
+
+
+class FileProperties(NamedTuple):
+    name: str
+    size: int
+    etag: str
+    last_modified: datetime
+
+
+class _File:
+    __slots__ = ("data", "etag", "last_modified")
+
+    def __init__(self, data: bytes, etag: str, last_modified: datetime):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class _Container:
+    def __init__(self, name: str, last_modified: datetime):
+        self.name = name
+        self.last_modified = last_modified
+        self.files: Dict[str, _File] = {}
+        self.directories: Dict[str, datetime] = {}
+        # Direct children of each directory ("" is the root)
+        self._children: Dict[str, set] = {"": set()}
+        # Sorted listings, dropped on every write
+        self._sorted: Dict[Optional[str], List[str]] = {}
+
+    def names(self, parent: Optional[str] = None) -> List[str]:
+        """Sorted paths of a directory's direct children, or of every entry for None."""
+        names = self._sorted.get(parent)
+        if names is None:
+            if parent is None:
+                names = sorted(list(self.files) + list(self.directories))
+            else:
+                names = sorted(self._children.get(parent, ()))
+            self._sorted[parent] = names
+        return names
+
+    def add_file(self, path: str, data_file: _File):
+        created = path not in self.files
+        self.files[path] = data_file
+        parts = path.split('/')
+        for i in range(1, len(parts)):
+            directory = '/'.join(parts[:i])
+            if directory not in self.directories:
+                self.directories[directory] = data_file.last_modified
+                self._touch('/'.join(parts[:i - 1]), data_file.last_modified)
+                self._children.setdefault('/'.join(parts[:i - 1]), set()).add(directory)
+                self._children[directory] = set()
+        if created:
+            self._touch('/'.join(parts[:-1]), data_file.last_modified)
+        self._children['/'.join(parts[:-1])].add(path)
+        self._sorted.clear()
+
+    def remove_file(self, path: str) -> Optional[_File]:
+        data_file = self.files.pop(path, None)
+        if data_file is not None:
+            self._touch(path.rpartition('/')[0], _now())
+            self._children[path.rpartition('/')[0]].discard(path)
+            self._sorted.clear()
+        return data_file
+
+    def _touch(self, directory: str, when: datetime):
+        """Creating or deleting a child updates a directory's last-modified time, as in a hierarchical namespace."""
+        if directory in self.directories:
+            self.directories[directory] = max(self.directories[directory], when)
+
+
+class FakeLake:
+    """Containers and files of one fake storage account, with call counters."""
+
+    def __init__(self, account: str = "benchlake", latency: Optional[Latency] = None):
+        self.account = account
+        self.url = f"https://{account}.dfs.core.windows.net"
+        self.latency = latency or Latency()
+        self.calls: Counter = Counter()
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._containers: Dict[str, _Container] = {}
+        self._staged: Dict[Tuple[str, str], Dict[int, bytes]] = {}
+        self._lock = threading.Lock()
+        self._version = 0
+
+    # Building the lake
+    def create_container(self, name: str, last_modified: Optional[datetime] = None):
+        self._containers.setdefault(name, _Container(name, last_modified or _now()))
+
+    def put(self, container: str, path: str, data: bytes, last_modified: Optional[datetime] = None):
+        """Write a file (and its parent directories) without counting a call."""
+        self.create_container(container)
+        when = last_modified or _now()
+        with self._lock:
+            self._version += 1
+            etag = f'"0x{hashlib.sha1(f"{container}/{path}#{self._version}".encode()).hexdigest()[:16]}"'
+            self._containers[container].add_file(path, _File(data, etag, when))
+
+    def file_count(self) -> int:
+        return sum(len(c.files) for c in self._containers.values())
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls = Counter()
+            self.bytes_read = 0
+            self.bytes_written = 0
+
+    # Clients
+    def service_client(self) -> "FakeServiceClient":
+        return FakeServiceClient(self)
+
+    def async_service_client(self) -> "AsyncFakeServiceClient":
+        return AsyncFakeServiceClient(self)
+
+    # Calls, shared by the sync and async clients
+    def _count(self, operation: str, read: int = 0, written: int = 0) -> float:
+        with self._lock:
+            self.calls[operation] += 1
+            self.bytes_read += read
+            self.bytes_written += written
+        return self.latency.delay(operation, read + written)
+
+    def _container(self, name: str) -> _Container:
+        store = self._containers.get(name)
+        if store is None:
+            raise ResourceNotFoundError(f"The specified filesystem does not exist: {name}")
+        return store
+
+    def _list_file_systems_page(self, prefix: Optional[str], token: Optional[str], size: int):
+        names = sorted(name for name in self._containers if not prefix or name.startswith(prefix))
+        start = bisect.bisect_left(names, token) if token else 0
+        page = [
+            FileSystemItem(name, self._containers[name].last_modified, {}) for name in names[start:start + size]
+        ]
+        next_token = names[start + size] if start + size < len(names) else None
+        return page, next_token, self._count("list_file_systems")
+
+    def _get_paths_page(self, container: str, path: Optional[str], recursive: bool, token: Optional[str], size: int):
+        store = self._container(container)
+        prefix = path.strip('/') if path else ""
+        if prefix and prefix not in store.directories:
+            self._count("get_paths")
+            if prefix in store.files:
+                raise ResourceNotFoundError(f"The specified path is not a directory: {prefix}")
+            raise ResourceNotFoundError(f"The specified path does not exist: {prefix}")
+        base = f"{prefix}/" if prefix else ""
+        if recursive:
+            names = store.names()
+            start = bisect.bisect_left(names, token or base)
+            end = bisect.bisect_left(names, base[:-1] + '0') if base else len(names)  # '0' sorts right after '/'
+        else:
+            names = store.names(prefix)
+            start = bisect.bisect_left(names, token) if token else 0
+            end = len(names)
+        stop = min(end, start + size)
+        page = [self._path_item(store, name) for name in names[start:stop]]
+        next_token = names[stop] if stop < end else None
+        return page, next_token, self._count("get_paths")
+
+    @staticmethod
+    def _path_item(store: _Container, name: str) -> PathItem:
+        data_file = store.files.get(name)
+        if data_file is None:
+            return PathItem(name, True, store.directories[name], f'"dir-{name}"', 0)
+        return PathItem(name, False, data_file.last_modified, data_file.etag, len(data_file.data))
+
+    def _file(self, container: str, path: str) -> _File:
+        data_file = self._container(container).files.get(path)
+        if data_file is None:
+            raise ResourceNotFoundError(f"The specified path does not exist: {container}/{path}")
+        return data_file
+
+    def _properties(self, container: str, path: str):
+        delay = self._count("get_properties")
+        data_file = self._file(container, path)
+        return FileProperties(path, len(data_file.data), data_file.etag, data_file.last_modified), delay
+
+    def _download(self, container: str, path: str, offset: Optional[int], length: Optional[int]):
+        data_file = self._file(container, path)
+        start = offset or 0
+        end = len(data_file.data) if length is None else min(len(data_file.data), start + length)
+        data = data_file.data[start:end]
+        return data, self._count("download", read=len(data))
+
+    def _append(self, container: str, path: str, data: bytes, offset: int) -> float:
+        with self._lock:
+            self._staged.setdefault((container, path), {})[offset] = bytes(data)
+        return self._count("append_data", written=len(data))
+
+    def _flush(self, container: str, path: str, offset: int) -> Tuple[Dict[str, Any], float]:
+        delay = self._count("flush_data")
+        staged = self._staged.pop((container, path), {})
+        data = b"".join(staged[key] for key in sorted(staged))
+        if len(data) != offset:
+            raise ValueError(f"Flush position {offset} does not match the {len(data)} bytes appended")
+        self.put(container, path, data)
+        data_file = self._file(container, path)
+        return {"etag": data_file.etag, "last_modified": data_file.last_modified}, delay
+
+    def _create(self, container: str, path: str) -> float:
+        self.put(container, path, b"")
+        return self._count("create_file")
+
+    def _upload(self, container: str, path: str, data: bytes, overwrite: bool) -> float:
+        if not overwrite and path in self._container(container).files:
+            raise ResourceExistsError(f"The specified path already exists: {container}/{path}")
+        self.put(container, path, bytes(data))
+        return self._count("upload", written=len(data))
+
+    def _rename(self, container: str, path: str, new_name: str, etag: Optional[str]) -> Tuple[str, str, float]:
+        delay = self._count("rename")
+        target_container, _, target = new_name.strip('/').partition('/')
+        target_store = self._container(target_container)
+        existing = target_store.files.get(target)
+        if etag is not None and (existing is None or existing.etag != etag):
+            raise ResourceModifiedError("The condition specified using HTTP conditional header(s) is not met.")
+        data_file = self._container(container).remove_file(path)
+        if data_file is None:
+            raise ResourceNotFoundError(f"The specified path does not exist: {container}/{path}")
+        self.put(target_container, target, data_file.data)
+        return target_container, target, delay
+
+    def _delete(self, container: str, path: str) -> float:
+        delay = self._count("delete")
+        if self._container(container).remove_file(path) is None:
+            raise ResourceNotFoundError(f"The specified path does not exist: {container}/{path}")
+        return delay
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(microsecond=0)
+
+
+# Sync clients
+class _Pages:
+    """``by_page()`` result: an iterator of pages with the token of the next one."""
+
+    def __init__(self, fetch, continuation_token: Optional[str]):
+        self._fetch = fetch
+        self.continuation_token = continuation_token
+        self._done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Iterator[Any]:
+        if self._done:
+            raise StopIteration
+        page, self.continuation_token, delay = self._fetch(self.continuation_token)
+        time.sleep(delay)
+        self._done = self.continuation_token is None
+        return iter(page)
+
+
+class _Paged:
+    """``ItemPaged``: iterate items across pages, or walk the pages with ``by_page``."""
+
+    def __init__(self, fetch):
+        self._fetch = fetch
+
+    def by_page(self, continuation_token: Optional[str] = None) -> _Pages:
+        return _Pages(self._fetch, continuation_token)
+
+    def __iter__(self):
+        for page in self.by_page():
+            yield from page
+
+
+class _Download:
+    def __init__(self, data: bytes):
+        self._data = data
+        self.size = len(data)
+
+    def readall(self) -> bytes:
+        return self._data
+
+    def readinto(self, stream) -> int:
+        stream.write(self._data)
+        return len(self._data)
+
+    def chunks(self):
+        yield self._data
+
+
+class FakeFileClient:
+    def __init__(self, lake: FakeLake, file_system_name: str, path: str):
+        self._lake = lake
+        self.file_system_name = file_system_name
+        self.path_name = path
+        self.url = f"{lake.url}/{file_system_name}/{path}"
+
+    def get_file_properties(self, **kwargs) -> FileProperties:
+        properties, delay = self._lake._properties(self.file_system_name, self.path_name)
+        time.sleep(delay)
+        return properties
+
+    def download_file(self, offset: Optional[int] = None, length: Optional[int] = None, **kwargs) -> _Download:
+        data, delay = self._lake._download(self.file_system_name, self.path_name, offset, length)
+        time.sleep(delay)
+        return _Download(data)
+
+    def create_file(self, **kwargs):
+        time.sleep(self._lake._create(self.file_system_name, self.path_name))
+
+    def append_data(self, data, offset: int, length: Optional[int] = None, **kwargs):
+        time.sleep(self._lake._append(self.file_system_name, self.path_name, data, offset))
+
+    def flush_data(self, offset: int, **kwargs) -> Dict[str, Any]:
+        result, delay = self._lake._flush(self.file_system_name, self.path_name, offset)
+        time.sleep(delay)
+        return result
+
+    def upload_data(self, data, overwrite: bool = False, **kwargs):
+        time.sleep(self._lake._upload(self.file_system_name, self.path_name, data, overwrite))
+
+    def rename_file(self, new_name: str, etag: Optional[str] = None, **kwargs) -> "FakeFileClient":
+        container, path, delay = self._lake._rename(self.file_system_name, self.path_name, new_name, etag)
+        time.sleep(delay)
+        return FakeFileClient(self._lake, container, path)
+
+    def delete_file(self, **kwargs):
+        time.sleep(self._lake._delete(self.file_system_name, self.path_name))
+
+    def close(self):
+        pass
+
+
+class FakeFileSystemClient:
+    def __init__(self, lake: FakeLake, name: str):
+        self._lake = lake
+        self.file_system_name = name
+        self.url = f"{lake.url}/{name}"
+
+    def get_paths(self, path: Optional[str] = None, recursive: bool = True, max_results: Optional[int] = None, **kwargs):
+        size = min(max_results or LIST_PAGE_SIZE, LIST_PAGE_SIZE)
+        return _Paged(lambda token: self._lake._get_paths_page(self.file_system_name, path, recursive, token, size))
+
+    def get_file_client(self, path) -> FakeFileClient:
+        return FakeFileClient(self._lake, self.file_system_name, getattr(path, "name", path).strip('/'))
+
+    def close(self):
+        pass
+
+
+class FakeServiceClient:
+    """Stand-in for ``DataLakeServiceClient``."""
+
+    def __init__(self, lake: FakeLake):
+        self._lake = lake
+        self.account_name = lake.account
+        self.url = lake.url
+
+    def list_file_systems(self, name_starts_with: Optional[str] = None, results_per_page: Optional[int] = None, **kwargs):
+        size = min(results_per_page or LIST_PAGE_SIZE, LIST_PAGE_SIZE)
+        return _Paged(lambda token: self._lake._list_file_systems_page(name_starts_with, token, size))
+
+    def get_file_system_client(self, file_system) -> FakeFileSystemClient:
+        return FakeFileSystemClient(self._lake, getattr(file_system, "name", file_system))
+
+    def close(self):
+        pass
+
+
+# Async clients
+class _AsyncPage:
+    def __init__(self, items: List[Any]):
+        self._items = iter(items)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._items)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _AsyncPages:
+    def __init__(self, fetch, continuation_token: Optional[str]):
+        self._fetch = fetch
+        self.continuation_token = continuation_token
+        self._done = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> _AsyncPage:
+        if self._done:
+            raise StopAsyncIteration
+        page, self.continuation_token, delay = self._fetch(self.continuation_token)
+        await asyncio.sleep(delay)
+        self._done = self.continuation_token is None
+        return _AsyncPage(page)
+
+
+class _AsyncPaged:
+    """``AsyncItemPaged``: ``async for`` over items, or ``by_page`` over pages."""
+
+    def __init__(self, fetch):
+        self._fetch = fetch
+
+    def by_page(self, continuation_token: Optional[str] = None) -> _AsyncPages:
+        return _AsyncPages(self._fetch, continuation_token)
+
+    async def _items(self):
+        async for page in self.by_page():
+            async for item in page:
+                yield item
+
+    def __aiter__(self):
+        return self._items()
+
+
+class _AsyncDownload(_Download):
+    async def readall(self) -> bytes:
+        return self._data
+
+    async def readinto(self, stream) -> int:
+        stream.write(self._data)
+        return len(self._data)
+
+
+class AsyncFakeFileClient:
+    def __init__(self, lake: FakeLake, file_system_name: str, path: str):
+        self._lake = lake
+        self.file_system_name = file_system_name
+        self.path_name = path
+        self.url = f"{lake.url}/{file_system_name}/{path}"
+
+    async def get_file_properties(self, **kwargs) -> FileProperties:
+        properties, delay = self._lake._properties(self.file_system_name, self.path_name)
+        await asyncio.sleep(delay)
+        return properties
+
+    async def download_file(self, offset: Optional[int] = None, length: Optional[int] = None, **kwargs):
+        data, delay = self._lake._download(self.file_system_name, self.path_name, offset, length)
+        await asyncio.sleep(delay)
+        return _AsyncDownload(data)
+
+    async def close(self):
+        pass
+
+
+class AsyncFakeFileSystemClient:
+    def __init__(self, lake: FakeLake, name: str):
+        self._lake = lake
+        self.file_system_name = name
+        self.url = f"{lake.url}/{name}"
+
+    def get_paths(self, path: Optional[str] = None, recursive: bool = True, max_results: Optional[int] = None, **kwargs):
+        size = min(max_results or LIST_PAGE_SIZE, LIST_PAGE_SIZE)
+        return _AsyncPaged(lambda token: self._lake._get_paths_page(self.file_system_name, path, recursive, token, size))
+
+    def get_file_client(self, path) -> AsyncFakeFileClient:
+        return AsyncFakeFileClient(self._lake, self.file_system_name, getattr(path, "name", path).strip('/'))
+
+    async def close(self):
+        pass
+
+
+class AsyncFakeServiceClient:
+    """Stand-in for the async ``DataLakeServiceClient``."""
+
+    def __init__(self, lake: FakeLake):
+        self._lake = lake
+        self.account_name = lake.account
+        self.url = lake.url
+
+    def list_file_systems(self, name_starts_with: Optional[str] = None, results_per_page: Optional[int] = None, **kwargs):
+        size = min(results_per_page or LIST_PAGE_SIZE, LIST_PAGE_SIZE)
+        return _AsyncPaged(lambda token: self._lake._list_file_systems_page(name_starts_with, token, size))
+
+    def get_file_system_client(self, file_system) -> AsyncFakeFileSystemClient:
+        return AsyncFakeFileSystemClient(self._lake, getattr(file_system, "name", file_system))
+
+    async def close(self):
+        pass
@@ -0,0 +1,189 @@
+"""
+Synthetic lakes for benchmarks.
+
+``generate_lake`` fills a ``FakeLake`` with a folder hierarchy of configurable
+depth and fan-out. Each leaf folder holds datasets of every kind the backend
+reads, in proportions set by ``LakeShape``: Parquet folders, Hive-partitioned
+Parquet folders, Delta tables (several commits each), loose ``.parquet``
+files and non-dataset files. File contents are real Parquet and Delta logs,
+so previews and schema reads work, but a few Parquet payloads are shared
+between files to keep large lakes cheap to build.
+"""
+
+import io
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from benchmarks.fake_lake import FakeLake
+
+CONTAINER_NAMES = ["bronze", "silver", "gold", "ingress"]
+# Distinct Parquet payloads per lake; files reuse them round-robin
+PAYLOAD_VARIANTS = 4
+CATEGORIES = ["alpha", "beta", "gamma", "delta", "epsilon"]
+PARTITION_KEYS = ["year", "month", "day", "hour"]
+
+
+class LakeShape(NamedTuple):
+    containers: int = 2
+    # Folder levels above the datasets, and subfolders per folder
+    depth: int = 2
+    fanout: int = 3
+    # Datasets per leaf folder, split between the kinds below
+    datasets_per_folder: int = 4
+    delta_ratio: float = 0.25
+    partitioned_ratio: float = 0.25
+    files_per_dataset: int = 4
+    # Partition keys of partitioned datasets, and values per key
+    partition_levels: int = 2
+    partitions_per_level: int = 3
+    delta_commits: int = 3
+    loose_files_per_folder: int = 1
+    other_files_per_folder: int = 1
+    rows_per_file: int = 10000
+    row_group_size: int = 5000
+    seed: int = 7
+
+
+class LakeManifest(NamedTuple):
+    """What was generated, as ``container/path`` strings, for picking benchmark targets."""
+    containers: List[str]
+    folders: List[str]
+    datasets: Dict[str, List[str]]
+    files: int
+    bytes: int
+
+
+def _payloads(shape: LakeShape) -> List[bytes]:
+    payloads = []
+    rows = shape.rows_per_file
+    start = datetime(2024, 1, 1)
+    for variant in range(PAYLOAD_VARIANTS):
+        rng = np.random.default_rng(shape.seed + variant)
+        table = pa.table({
+            "id": pa.array(np.arange(variant * rows, (variant + 1) * rows), pa.int64()),
+            "category": pa.array([CATEGORIES[i] for i in rng.integers(0, len(CATEGORIES), rows)]),
+            "amount": pa.array(rng.normal(100, 25, rows).round(2)),
+            "ts": pa.array([start + timedelta(minutes=int(m)) for m in rng.integers(0, 525600, rows)], pa.timestamp("us")),
+            "flag": pa.array(rng.random(rows) < 0.1),
+        })
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer, row_group_size=shape.row_group_size)
+        payloads.append(buffer.getvalue())
+    return payloads
+
+
+DELTA_SCHEMA = {
+    "type": "struct",
+    "fields": [
+        {"name": "id", "type": "long", "nullable": True, "metadata": {}},
+        {"name": "category", "type": "string", "nullable": True, "metadata": {}},
+        {"name": "amount", "type": "double", "nullable": True, "metadata": {}},
+        {"name": "ts", "type": "timestamp", "nullable": True, "metadata": {}},
+        {"name": "flag", "type": "boolean", "nullable": True, "metadata": {}},
+    ],
+}
+
+
+def _delta_commit(version: int, file_name: str, payload: bytes, rows: int, first_id: int) -> bytes:
+    millis = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp() * 1000) + version * 60000
+    actions = []
+    if version == 0:
+        actions.append({"protocol": {"minReaderVersion": 1, "minWriterVersion": 2}})
+        actions.append({"metaData": {
+            "id": f"bench-{file_name}",
+            "format": {"provider": "parquet", "options": {}},
+            "schemaString": json.dumps(DELTA_SCHEMA),
+            "partitionColumns": [],
+            "configuration": {},
+            "createdTime": millis,
+        }})
+    stats = {"numRecords": rows, "minValues": {"id": first_id}, "maxValues": {"id": first_id + rows - 1}, "nullCount": {"id": 0}}
+    actions.append({"add": {
+        "path": file_name,
+        "partitionValues": {},
+        "size": len(payload),
+        "modificationTime": millis,
+        "dataChange": True,
+        "stats": json.dumps(stats),
+    }})
+    actions.append({"commitInfo": {"timestamp": millis, "operation": "WRITE"}})
+    return "\n".join(json.dumps(action) for action in actions).encode()
+
+
+def generate_lake(lake: FakeLake, shape: LakeShape = LakeShape()) -> LakeManifest:
+    """Fill ``lake`` with a lake of the given shape."""
+    rng = random.Random(shape.seed)
+    payloads = _payloads(shape)
+    counter = iter(range(1 << 62))
+    datasets: Dict[str, List[str]] = {"parquet": [], "partitioned": [], "delta": [], "file": []}
+    containers, folders = [], []
+    total_bytes = 0
+
+    def put(container: str, path: str, data: bytes):
+        nonlocal total_bytes
+        lake.put(container, path, data)
+        total_bytes += len(data)
+
+    def payload() -> bytes:
+        return payloads[next(counter) % len(payloads)]
+
+    def fill_leaf(container: str, folder: str):
+        prefix = f"{folder}/" if folder else ""
+        for d in range(shape.datasets_per_folder):
+            roll = rng.random()
+            name = f"{prefix}dataset_{d:03d}"
+            if roll < shape.delta_ratio:
+                for version in range(shape.delta_commits):
+                    file_name = f"part-{version:05d}.snappy.parquet"
+                    data = payload()
+                    put(container, f"{name}/{file_name}", data)
+                    commit = _delta_commit(version, file_name, data, shape.rows_per_file, version * shape.rows_per_file)
+                    put(container, f"{name}/_delta_log/{version:020d}.json", commit)
+                datasets["delta"].append(f"{container}/{name}")
+            elif roll < shape.delta_ratio + shape.partitioned_ratio:
+                partitions = [""]
+                for level in range(shape.partition_levels):
+                    key = PARTITION_KEYS[level] if level < len(PARTITION_KEYS) else f"key{level}"
+                    partitions = [
+                        f"{partition}{key}={2020 + v if level == 0 else v + 1}/"
+                        for partition in partitions for v in range(shape.partitions_per_level)
+                    ]
+                files_per_partition = max(1, shape.files_per_dataset // len(partitions))
+                for partition in partitions:
+                    for f in range(files_per_partition):
+                        put(container, f"{name}/{partition}part-{f:05d}.parquet", payload())
+                datasets["partitioned"].append(f"{container}/{name}")
+            else:
+                for f in range(shape.files_per_dataset):
+                    put(container, f"{name}/part-{f:05d}.parquet", payload())
+                datasets["parquet"].append(f"{container}/{name}")
+        for f in range(shape.loose_files_per_folder):
+            path = f"{prefix}extract_{f:03d}.parquet"
+            put(container, path, payload())
+            datasets["file"].append(f"{container}/{path}")
+        for f in range(shape.other_files_per_folder):
+            put(container, f"{prefix}notes_{f:03d}.csv", b"id,note\n1,generated\n")
+
+    def fill(container: str, folder: str, level: int):
+        if level == shape.depth:
+            fill_leaf(container, folder)
+            return
+        for i in range(shape.fanout):
+            child = f"{folder}/folder_{level}_{i:02d}" if folder else f"folder_{level}_{i:02d}"
+            folders.append(f"{container}/{child}")
+            fill(container, child, level + 1)
+
+    for c in range(shape.containers):
+        base = CONTAINER_NAMES[c % len(CONTAINER_NAMES)]
+        container = base if c < len(CONTAINER_NAMES) else f"{base}{c // len(CONTAINER_NAMES)}"
+        lake.create_container(container)
+        containers.append(container)
+        fill(container, "", 0)
+
+    return LakeManifest(containers, folders, datasets, lake.file_count(), total_bytes)
@@ -0,0 +1,265 @@
+"""
+Offline benchmarks of the API's listing and preview paths.
+
+Generates a synthetic lake in a ``FakeLake``, points the API's client pools at
+it and calls each endpoint through the ASGI app. Every scenario is run cold
+(new connection, caches emptied) and then ``--repeat`` times warm, and reports
+wall time, ADLS calls per operation and bytes read, plus the peak of Python
+allocations of a second cold run. Run from ``backend/``::
+
+    python -m benchmarks.run --depth 3 --fanout 4 --latency-ms 20
+    python -m benchmarks.run --json current.json --baseline baseline.json
+
+With ``--baseline`` the exit status is 1 if any scenario makes more ADLS calls
+than in the baseline, or is slower cold than the baseline by more than
+``--tolerance``.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import statistics
+import tracemalloc
+from typing import Any, Dict, List, NamedTuple, Optional
+
+# Jobs must run in-process to reach the fake lake, and nothing may persist between runs
+os.environ["ADLS_WORKER_PROCESSES"] = "0"
+for _name in ("ADLS_DISK_CACHE_DIR", "ADLS_FOOTER_CACHE_DB", "ADLS_INDEX_DB", "ADLS_METADATA_CACHE_DB"):
+    os.environ.pop(_name, None)
+
+from fastapi.testclient import TestClient
+
+import main
+from client_pool import ClientPool
+from benchmarks.fake_lake import FakeLake, Latency
+from benchmarks.lake_generator import LakeManifest, LakeShape, generate_lake
+
+# Cold slowdowns below this many milliseconds are noise, whatever the tolerance
+MIN_REGRESSION_MS = 5.0
+
+
+class Scenario(NamedTuple):
+    name: str
+    # Request path, with ``{cid}`` for the connection id
+    path: str
+    params: Dict[str, Any]
+
+
+class Result(NamedTuple):
+    name: str
+    status: int
+    cold_ms: float
+    warm_ms: Optional[float]
+    cold_calls: Dict[str, int]
+    warm_calls: Dict[str, int]
+    bytes_read: int
+    peak_mb: Optional[float]
+
+
+def scenarios(manifest: LakeManifest) -> List[Scenario]:
+    """One scenario per endpoint and dataset kind present in the lake."""
+    container = manifest.containers[0]
+    folder = next((f for f in manifest.folders if f.startswith(f"{container}/")), None)
+    rest = folder.split('/', 1)[1] if folder else ""
+    result = [
+        Scenario("containers", "/containers/{cid}", {}),
+        Scenario("folder_tree", "/folder-tree/{cid}", {}),
+        Scenario("tree_children_root", "/folder-tree/{cid}/children", {}),
+        Scenario("tree_children_container", "/folder-tree/{cid}/children", {"container_name": container}),
+        Scenario("folders", f"/folders/{{cid}}/{container}", {"container_name": container}),
+        Scenario("check_dataset_files", "/check-dataset-files/{cid}", {"container_name": container, "folder_path": rest}),
+        Scenario("datasets", "/datasets/{cid}", {}),
+    ]
+    if folder:
+        result.insert(4, Scenario(
+            "tree_children_folder", "/folder-tree/{cid}/children", {"container_name": container, "path": rest}
+        ))
+    previews = {
+        "file": {},
+        "parquet": {},
+        "delta": {},
+        "partitioned": {"filters": json.dumps([{"column": "year", "operator": "equals", "value": 2020}])},
+    }
+    for kind, params in previews.items():
+        if manifest.datasets.get(kind):
+            path = manifest.datasets[kind][0]
+            result.append(Scenario(f"dataset_{kind}", "/dataset/{cid}/bench", {"path": path}))
+            result.append(Scenario(f"preview_{kind}", "/preview/{cid}/bench", {"path": path, **params}))
+    if manifest.datasets.get("parquet"):
+        result.append(Scenario("preview_sorted", "/preview/{cid}/bench", {
+            "path": manifest.datasets["parquet"][0], "sort_column": "amount", "sort_direction": "desc", "page": 3,
+        }))
+        result.append(Scenario("preview_sorted_deep", "/preview/{cid}/bench", {
+            "path": manifest.datasets["parquet"][0], "sort_column": "amount", "page": 300, "page_size": 100,
+        }))
+    return result
+
+
+class Bench:
+    """The API app wired to a fake lake."""
+
+    def __init__(self, lake: FakeLake):
+        self.lake = lake
+        main.client_pool = ClientPool(lambda credentials, transport: lake.service_client(), transport_factory=None)
+        main.async_client_pool = ClientPool(
+            lambda credentials, transport: lake.async_service_client(), transport_factory=None
+        )
+        self.client = TestClient(main.app)
+        self._connections = 0
+
+    def connect(self) -> str:
+        """A new connection, so nothing cached per connection (listings, lake index) is reused."""
+        self._connections += 1
+        response = self.client.post("/connect", json={
+            "name": "bench",
+            "credentials": {"accountName": self.lake.account, "accountKey": f"bench-{self._connections}"},
+        })
+        response.raise_for_status()
+        return response.json()["id"]
+
+    @staticmethod
+    def clear_caches():
+        """Drop the caches keyed by file or dataset URL, which new connections would share, and sort indexes."""
+        main.footer_cache.invalidate()
+        main.delta_log.invalidate()
+        main.partition_catalog.invalidate()
+        main.column_stats_engine.invalidate()
+        main.sort_index.invalidate()
+
+    def request(self, scenario: Scenario, connection_id: str):
+        self.lake.reset_counters()
+        started = time.perf_counter()
+        response = self.client.get(scenario.path.format(cid=connection_id), params=scenario.params)
+        response.content
+        elapsed = (time.perf_counter() - started) * 1000
+        return response.status_code, elapsed, dict(self.lake.calls), self.lake.bytes_read
+
+    def run(self, scenario: Scenario, repeat: int, memory: bool) -> Result:
+        self.clear_caches()
+        connection_id = self.connect()
+        status, cold_ms, cold_calls, bytes_read = self.request(scenario, connection_id)
+        warm_times, warm_calls = [], {}
+        for _ in range(repeat):
+            _, elapsed, warm_calls, _ = self.request(scenario, connection_id)
+            warm_times.append(elapsed)
+
+        peak_mb = None
+        if memory:
+            self.clear_caches()
+            connection_id = self.connect()
+            tracemalloc.start()
+            try:
+                self.request(scenario, connection_id)
+                peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            finally:
+                tracemalloc.stop()
+        return Result(
+            scenario.name, status, cold_ms, statistics.median(warm_times) if warm_times else None,
+            cold_calls, warm_calls, bytes_read, peak_mb,
+        )
+
+
+def _calls(calls: Dict[str, int]) -> str:
+    return " ".join(f"{operation}={count}" for operation, count in sorted(calls.items())) or "-"
+
+
+def report(results: List[Result], out=sys.stdout):
+    header = f"{'scenario':<26} {'status':>6} {'cold ms':>9} {'warm ms':>9} {'peak MB':>8} {'MB read':>8}  calls (cold / warm)"
+    print(header, file=out)
+    print("-" * len(header), file=out)
+    for r in results:
+        warm = f"{r.warm_ms:9.1f}" if r.warm_ms is not None else f"{'-':>9}"
+        peak = f"{r.peak_mb:8.1f}" if r.peak_mb is not None else f"{'-':>8}"
+        print(
+            f"{r.name:<26} {r.status:>6} {r.cold_ms:9.1f} {warm} {peak} {r.bytes_read / (1024 * 1024):8.2f}"
+            f"  {_calls(r.cold_calls)} / {_calls(r.warm_calls)}",
+            file=out,
+        )
+
+
+def regressions(results: List[Result], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Scenarios that make more ADLS calls than the baseline, or got slower cold beyond ``tolerance``."""
+    found = []
+    previous = {r["name"]: r for r in baseline.get("results", [])}
+    for r in results:
+        base = previous.get(r.name)
+        if base is None:
+            continue
+        calls, base_calls = sum(r.cold_calls.values()), sum(base["cold_calls"].values())
+        if calls > base_calls:
+            found.append(f"{r.name}: {calls} ADLS calls cold, baseline {base_calls} ({_calls(base['cold_calls'])})")
+        if r.cold_ms > base["cold_ms"] * (1 + tolerance) and r.cold_ms - base["cold_ms"] > MIN_REGRESSION_MS:
+            found.append(f"{r.name}: {r.cold_ms:.1f} ms cold, baseline {base['cold_ms']:.1f} ms")
+    return found
+
+
+def parse_args(argv=None):
+    defaults = LakeShape()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    shape = parser.add_argument_group("lake shape")
+    for field in LakeShape._fields:
+        value = getattr(defaults, field)
+        shape.add_argument(f"--{field.replace('_', '-')}", type=type(value), default=value)
+    latency = parser.add_argument_group("latency")
+    latency.add_argument("--latency-ms", type=float, default=0.0, help="Delay of every ADLS call")
+    latency.add_argument("--list-latency-ms", type=float, default=None, help="Delay of listing calls (get_paths, list_file_systems)")
+    latency.add_argument("--download-latency-ms", type=float, default=None, help="Delay of each download before transfer time")
+    latency.add_argument("--ms-per-mb", type=float, default=0.0, help="Transfer time per MiB read or written")
+    parser.add_argument("--repeat", type=int, default=3, help="Warm runs per scenario")
+    parser.add_argument("--scenarios", default=None, help="Comma-separated scenario names (default: all)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced run that measures peak memory")
+    parser.add_argument("--json", default=None, help="Write the results to this file")
+    parser.add_argument("--baseline", default=None, help="Results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed cold slowdown against the baseline")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None) -> int:
+    args = parse_args(argv)
+    logging.disable(logging.WARNING)
+    shape = LakeShape(**{field: getattr(args, field) for field in LakeShape._fields})
+    per_operation = {}
+    if args.list_latency_ms is not None:
+        per_operation.update(get_paths=args.list_latency_ms / 1000, list_file_systems=args.list_latency_ms / 1000)
+    if args.download_latency_ms is not None:
+        per_operation["download"] = args.download_latency_ms / 1000
+    lake = FakeLake(latency=Latency(args.latency_ms / 1000, per_operation, args.ms_per_mb / 1000))
+
+    started = time.perf_counter()
+    manifest = generate_lake(lake, shape)
+    print(
+        f"Lake: {len(manifest.containers)} containers, {len(manifest.folders)} folders, {manifest.files} files "
+        f"({manifest.bytes / (1024 * 1024):.1f} MB), "
+        + ", ".join(f"{len(paths)} {kind}" for kind, paths in manifest.datasets.items())
+        + f" datasets; generated in {time.perf_counter() - started:.1f} s"
+    )
+
+    selected = scenarios(manifest)
+    if args.scenarios:
+        wanted = {name.strip() for name in args.scenarios.split(',')}
+        selected = [s for s in selected if s.name in wanted]
+    bench = Bench(lake)
+    results = [bench.run(scenario, args.repeat, not args.no_memory) for scenario in selected]
+    report(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"shape": shape._asdict(), "latency_ms": args.latency_ms, "results": [r._asdict() for r in results]}, f, indent=2)
+    failed = [r.name for r in results if r.status >= 400]
+    if failed:
+        print(f"\nFailed: {', '.join(failed)}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
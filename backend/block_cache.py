@@ -0,0 +1,305 @@
+"""
+Local disk cache of ADLS file ranges.
+
+Files are cached in fixed-size blocks keyed by (file URL, etag, block index),
+so a rewritten file (new etag) is never served from stale blocks. Each block is
+a file under ``ADLS_DISK_CACHE_DIR`` that is memory-mapped to serve just the
+requested bytes. An SQLite index in the same directory records every block's
+size and last access and keeps the total under ``ADLS_DISK_CACHE_BYTES`` by
+evicting the least recently used blocks. Block files are written to a temporary
+name and renamed into place, and the index is only changed in SQLite
+transactions, so several processes (uvicorn workers, worker pool processes)
+can share one cache directory. A block whose file has disappeared is
+treated as a miss.
+"""
+
+import os
+import mmap
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Cache directory; the disk cache is off when unset
+DISK_CACHE_DIR = os.environ.get("ADLS_DISK_CACHE_DIR")
+DISK_CACHE_BYTES = int(os.environ.get("ADLS_DISK_CACHE_BYTES", str(10 * 1024 ** 3)))
+DISK_CACHE_BLOCK_SIZE = int(os.environ.get("ADLS_DISK_CACHE_BLOCK_SIZE", str(1024 * 1024)))
+# Last-access times are only rewritten when older than this, to keep hits read-only
+ACCESS_RESOLUTION = 60
+# Evictions free space down to this fraction of the budget
+EVICT_TARGET = 0.9
+INDEX_FILE = "index.db"
+
+
+class DiskBlockCache:
+    """Size-bounded LRU of file blocks on local disk, shared between processes."""
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = DISK_CACHE_BYTES,
+        block_size: int = DISK_CACHE_BLOCK_SIZE,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.block_size = max(1, block_size)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+        self.bytes_fetched = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(
+            os.path.join(directory, INDEX_FILE), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS blocks ("
+            "key TEXT, block INTEGER, size INTEGER, last_access REAL, PRIMARY KEY (key, block))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS blocks_last_access ON blocks (last_access)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS totals (name TEXT PRIMARY KEY, value INTEGER)")
+        self._db.execute("INSERT OR IGNORE INTO totals VALUES ('bytes', 0)")
+
+    def _path(self, key: str, block: int) -> str:
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}-{block}")
+
+    def read(self, key: str, offset: int, length: int, size: int, fetch: Callable[[int, int], bytes]) -> bytes:
+        """Bytes ``offset`` to ``offset + length`` of a file of ``size`` bytes.
+
+        Cached blocks are read from disk; runs of missing blocks are fetched with
+        one ``fetch(offset, length)`` call each and cached.
+        """
+        if length <= 0:
+            return b""
+        if length > self.max_bytes // 4:
+            # Would flush most of the cache
+            return fetch(offset, length)
+
+        block_size = self.block_size
+        first = offset // block_size
+        last = (offset + length - 1) // block_size
+        parts: Dict[int, bytes] = {}
+        for index in range(first, last + 1):
+            block_start = index * block_size
+            start = max(offset, block_start) - block_start
+            end = min(offset + length, block_start + block_size) - block_start
+            data = self._get(key, index, start, end)
+            if data is not None:
+                parts[index] = data
+
+        # Coalesce runs of missing blocks into single fetches
+        run_start = None
+        for index in range(first, last + 2):
+            missing = index <= last and index not in parts
+            if missing and run_start is None:
+                run_start = index
+            elif not missing and run_start is not None:
+                parts.update(self._fetch(key, run_start, index - 1, offset, length, size, fetch))
+                run_start = None
+        return b"".join(parts[index] for index in range(first, last + 1))
+
+    def _fetch(
+        self, key: str, first: int, last: int, offset: int, length: int, size: int, fetch: Callable[[int, int], bytes]
+    ) -> Dict[int, bytes]:
+        block_size = self.block_size
+        run_offset = first * block_size
+        data = fetch(run_offset, min(size, (last + 1) * block_size) - run_offset)
+        with self._lock:
+            self.misses += last - first + 1
+            self.bytes_fetched += len(data)
+        parts = {}
+        for i, index in enumerate(range(first, last + 1)):
+            block = data[i * block_size:(i + 1) * block_size]
+            self._put(key, index, block)
+            block_start = index * block_size
+            start = max(offset, block_start) - block_start
+            end = min(offset + length, block_start + block_size) - block_start
+            parts[index] = block[start:end]
+        return parts
+
+    def _get(self, key: str, block: int, start: int, end: int) -> Optional[bytes]:
+        with self._lock:
+            try:
+                row = self._db.execute(
+                    "SELECT size, last_access FROM blocks WHERE key = ? AND block = ?", (key, block)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.error(f"Error reading disk cache index: {str(e)}")
+                return None
+        if row is None:
+            return None
+        size, last_access = row
+        if end > size:
+            return None
+        try:
+            with open(self._path(key, block), "rb") as f:
+                if os.fstat(f.fileno()).st_size != size:
+                    raise FileNotFoundError
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    data = mapped[start:end]
+        except (FileNotFoundError, ValueError):
+            # Evicted (or replaced) by another process in between
+            self._forget(key, block)
+            return None
+
+        now = time.time()
+        with self._lock:
+            self.hits += 1
+            self.bytes_served += len(data)
+            if now - last_access > ACCESS_RESOLUTION:
+                try:
+                    self._db.execute(
+                        "UPDATE blocks SET last_access = ? WHERE key = ? AND block = ?", (now, key, block)
+                    )
+                except sqlite3.Error as e:
+                    logger.error(f"Error updating disk cache index: {str(e)}")
+        return data
+
+    def _put(self, key: str, block: int, data: bytes):
+        path = self._path(key, block)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.error(f"Error writing disk cache block: {str(e)}")
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            return
+
+        evicted: List[Tuple[str, int]] = []
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                row = self._db.execute("SELECT size FROM blocks WHERE key = ? AND block = ?", (key, block)).fetchone()
+                previous = row[0] if row else 0
+                self._db.execute(
+                    "INSERT OR REPLACE INTO blocks VALUES (?, ?, ?, ?)", (key, block, len(data), time.time())
+                )
+                total = self._add_bytes(len(data) - previous)
+                if total > self.max_bytes:
+                    evicted = self._evict(total)
+                self._db.execute("COMMIT")
+            except sqlite3.Error as e:
+                logger.error(f"Error updating disk cache index: {str(e)}")
+                self._rollback()
+                return
+            self.evictions += len(evicted)
+        for evicted_key, evicted_block in evicted:
+            try:
+                os.unlink(self._path(evicted_key, evicted_block))
+            except OSError:
+                pass
+
+    def _add_bytes(self, delta: int) -> int:
+        self._db.execute("UPDATE totals SET value = value + ? WHERE name = 'bytes'", (delta,))
+        return self._db.execute("SELECT value FROM totals WHERE name = 'bytes'").fetchone()[0]
+
+    def _evict(self, total: int) -> List[Tuple[str, int]]:
+        """Drop least recently used blocks from the index (inside the caller's transaction)."""
+        target = int(self.max_bytes * EVICT_TARGET)
+        evicted = []
+        freed = 0
+        for key, block, size in self._db.execute(
+            "SELECT key, block, size FROM blocks ORDER BY last_access"
+        ).fetchall():
+            if total - freed <= target:
+                break
+            evicted.append((key, block))
+            freed += size
+        self._db.executemany("DELETE FROM blocks WHERE key = ? AND block = ?", evicted)
+        self._add_bytes(-freed)
+        return evicted
+
+    def _forget(self, key: str, block: int):
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                row = self._db.execute("SELECT size FROM blocks WHERE key = ? AND block = ?", (key, block)).fetchone()
+                if row is not None:
+                    self._db.execute("DELETE FROM blocks WHERE key = ? AND block = ?", (key, block))
+                    self._add_bytes(-row[0])
+                self._db.execute("COMMIT")
+            except sqlite3.Error as e:
+                logger.error(f"Error updating disk cache index: {str(e)}")
+                self._rollback()
+
+    def _rollback(self):
+        try:
+            self._db.execute("ROLLBACK")
+        except sqlite3.Error:
+            pass
+
+    def clear(self):
+        """Drop every cached block (of every process sharing the directory)."""
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                rows = self._db.execute("SELECT key, block FROM blocks").fetchall()
+                self._db.execute("DELETE FROM blocks")
+                self._db.execute("UPDATE totals SET value = 0 WHERE name = 'bytes'")
+                self._db.execute("COMMIT")
+            except sqlite3.Error as e:
+                logger.error(f"Error clearing disk cache: {str(e)}")
+                self._rollback()
+                return
+        for key, block in rows:
+            try:
+                os.unlink(self._path(key, block))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            try:
+                blocks, = self._db.execute("SELECT COUNT(*) FROM blocks").fetchone()
+                total, = self._db.execute("SELECT value FROM totals WHERE name = 'bytes'").fetchone()
+            except sqlite3.Error:
+                blocks, total = None, None
+            lookups = self.hits + self.misses
+            return {
+                "enabled": True,
+                "directory": self.directory,
+                "blocks": blocks,
+                "bytes": total,
+                "maxBytes": self.max_bytes,
+                "blockSize": self.block_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRatio": self.hits / lookups if lookups else 0.0,
+                "bytesServed": self.bytes_served,
+                "bytesFetched": self.bytes_fetched,
+                "evictions": self.evictions,
+            }
+
+
+_shared_cache: Optional[DiskBlockCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_disk_cache() -> Optional[DiskBlockCache]:
+    """The process's disk cache over ``ADLS_DISK_CACHE_DIR``, or None when it is not configured."""
+    global _shared_cache
+    if not DISK_CACHE_DIR:
+        return None
+    with _shared_lock:
+        if _shared_cache is None:
+            try:
+                _shared_cache = DiskBlockCache(DISK_CACHE_DIR)
+            except (OSError, sqlite3.Error) as e:
+                logger.error(f"Error opening disk cache in {DISK_CACHE_DIR}: {str(e)}")
+                return None
+        return _shared_cache
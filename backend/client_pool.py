@@ -0,0 +1,311 @@
+"""
+Connection-scoped pool of DataLake service clients.
+
+Clients are built once per connection and reused across requests so that
+credentials, cached tokens and HTTP connection pools survive between calls.
+Clients taken within a ``client_leases()`` scope (every API request, through
+``ClientLeaseMiddleware``) count as in use until the scope exits and are never
+closed as idle meanwhile.
+"""
+
+import os
+import time
+import asyncio
+import inspect
+import threading
+import contextvars
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from azure.core.pipeline.transport import RequestsTransport
+
+logger = logging.getLogger(__name__)
+
+# Seconds a client may sit unused before it is closed and dropped from the pool
+DEFAULT_IDLE_TIMEOUT = int(os.environ.get("ADLS_CLIENT_IDLE_TIMEOUT", "1800"))
+# Refresh AAD tokens this many seconds before they expire
+DEFAULT_TOKEN_REFRESH_MARGIN = int(os.environ.get("ADLS_TOKEN_REFRESH_MARGIN", "300"))
+# Size of the per-connection HTTP connection pool
+DEFAULT_HTTP_POOL_SIZE = int(os.environ.get("ADLS_HTTP_POOL_SIZE", "32"))
+
+
+class PooledTokenCredential:
+    """Token credential wrapper that caches tokens and refreshes them before they expire."""
+
+    def __init__(self, credential, refresh_margin: int = DEFAULT_TOKEN_REFRESH_MARGIN):
+        self._credential = credential
+        self._refresh_margin = refresh_margin
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self.refresh_count = 0
+
+    def get_token(self, *scopes, **kwargs):
+        # Claims challenges must always go to the identity provider
+        if kwargs.get("claims"):
+            return self._credential.get_token(*scopes, **kwargs)
+
+        key = (scopes, kwargs.get("tenant_id"))
+        with self._lock:
+            token = self._tokens.get(key)
+            if token is None or token.expires_on - self._refresh_margin <= time.time():
+                token = self._credential.get_token(*scopes, **kwargs)
+                self._tokens[key] = token
+                self.refresh_count += 1
+            return token
+
+    def close(self):
+        close = getattr(self._credential, "close", None)
+        if close:
+            close()
+
+
+class AsyncPooledTokenCredential:
+    """Async counterpart of PooledTokenCredential for the aio clients."""
+
+    def __init__(self, credential, refresh_margin: int = DEFAULT_TOKEN_REFRESH_MARGIN):
+        self._credential = credential
+        self._refresh_margin = refresh_margin
+        self._tokens = {}
+        self._lock = None
+        self.refresh_count = 0
+
+    async def get_token(self, *scopes, **kwargs):
+        if kwargs.get("claims"):
+            return await self._credential.get_token(*scopes, **kwargs)
+
+        # Created lazily so the lock binds to the serving event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        key = (scopes, kwargs.get("tenant_id"))
+        async with self._lock:
+            token = self._tokens.get(key)
+            if token is None or token.expires_on - self._refresh_margin <= time.time():
+                token = await self._credential.get_token(*scopes, **kwargs)
+                self._tokens[key] = token
+                self.refresh_count += 1
+            return token
+
+    async def close(self):
+        await self._credential.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+
+def create_transport(pool_size: int = DEFAULT_HTTP_POOL_SIZE) -> RequestsTransport:
+    """Create an HTTP transport backed by a keep-alive session sized for concurrent calls."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return RequestsTransport(session=session, session_owner=False)
+
+
+async def _aclose_client(client):
+    await client.close()
+    credential = getattr(client, "credential", None)
+    if isinstance(credential, AsyncPooledTokenCredential):
+        await credential.close()
+
+
+class _PoolEntry:
+    def __init__(self, client, transport):
+        self.client = client
+        self.transport = transport
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        # Open leases on the client; idle eviction skips it while any is held
+        self.in_use = 0
+
+
+class _Leases:
+    """Clients taken from pools within one lease scope."""
+
+    def __init__(self):
+        self.held: List[Tuple['ClientPool', str, Any]] = []
+        self.closed = False
+        self.lock = threading.Lock()
+
+
+_leases: contextvars.ContextVar[Optional[_Leases]] = contextvars.ContextVar("adls_client_leases", default=None)
+
+
+@contextmanager
+def client_leases():
+    """Keep every client taken from a pool inside the block from idle eviction until it exits."""
+    leases = _Leases()
+    token = _leases.set(leases)
+    try:
+        yield
+    finally:
+        _leases.reset(token)
+        with leases.lock:
+            # Threads that copied this context may still call get(); they no longer lease
+            leases.closed = True
+            held, leases.held = leases.held, []
+        for pool, connection_id, client in held:
+            pool._release(connection_id, client)
+
+
+class ClientLeaseMiddleware:
+    """ASGI middleware that leases the clients a request uses until its response is sent."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with client_leases():
+            await self.app(scope, receive, send)
+
+
+class ClientPool:
+    """Pool of service clients keyed by connection id."""
+
+    def __init__(
+        self,
+        factory: Callable[[Any, Optional[Any]], Any],
+        idle_timeout: int = DEFAULT_IDLE_TIMEOUT,
+        transport_factory: Optional[Callable[[], Any]] = create_transport,
+    ):
+        self._factory = factory
+        self._transport_factory = transport_factory
+        self._idle_timeout = idle_timeout
+        self._entries: Dict[str, _PoolEntry] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, connection_id: str, credentials):
+        """Return the pooled client for a connection, creating it on first use."""
+        self.evict_idle()
+
+        with self._lock:
+            entry = self._entries.get(connection_id)
+            if entry is not None:
+                entry.last_used = time.time()
+                self.hits += 1
+                self._lease(connection_id, entry)
+                return entry.client
+            self.misses += 1
+
+        # Build outside the lock so a slow credential does not block other connections
+        transport = self._transport_factory() if self._transport_factory else None
+        client = self._factory(credentials, transport)
+
+        with self._lock:
+            existing = self._entries.get(connection_id)
+            if existing is not None:
+                # Another request won the race, keep its client
+                existing.last_used = time.time()
+                self._lease(connection_id, existing)
+                self._close(_PoolEntry(client, transport))
+                return existing.client
+            entry = self._entries[connection_id] = _PoolEntry(client, transport)
+            self._lease(connection_id, entry)
+            return client
+
+    def _lease(self, connection_id: str, entry: _PoolEntry):
+        """Mark a client in use until the current lease scope exits; called under the pool lock."""
+        leases = _leases.get()
+        if leases is None:
+            return
+        with leases.lock:
+            if leases.closed:
+                return
+            leases.held.append((self, connection_id, entry.client))
+        entry.in_use += 1
+
+    def _release(self, connection_id: str, client):
+        with self._lock:
+            entry = self._entries.get(connection_id)
+            # An evicted or replaced client is no longer tracked
+            if entry is not None and entry.client is client:
+                entry.in_use -= 1
+                entry.last_used = time.time()
+
+    def evict(self, connection_id: str) -> bool:
+        """Close and drop the client for a connection."""
+        with self._lock:
+            entry = self._entries.pop(connection_id, None)
+        if entry is None:
+            return False
+        self.evictions += 1
+        self._close(entry)
+        return True
+
+    def evict_idle(self) -> int:
+        """Close clients that are not in use and have not been used within the idle timeout."""
+        cutoff = time.time() - self._idle_timeout
+        with self._lock:
+            idle = [
+                cid for cid, entry in self._entries.items()
+                if entry.in_use == 0 and entry.last_used < cutoff
+            ]
+            entries = [self._entries.pop(cid) for cid in idle]
+        for entry in entries:
+            self.evictions += 1
+            self._close(entry)
+        return len(entries)
+
+    def clear(self):
+        """Close every pooled client."""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            self._close(entry)
+
+    async def aclear(self):
+        """Close every pooled client, awaiting async clients."""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            if not inspect.iscoroutinefunction(entry.client.close):
+                self._close(entry)
+                continue
+            try:
+                await _aclose_client(entry.client)
+            except Exception as e:
+                logger.error(f"Error closing pooled client: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "inUse": sum(1 for entry in self._entries.values() if entry.in_use),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRatio": self.hits / total if total else 0.0,
+            "idleTimeout": self._idle_timeout,
+        }
+
+    def _close(self, entry: _PoolEntry):
+        try:
+            if inspect.iscoroutinefunction(entry.client.close):
+                # Async clients are closed on the running loop
+                try:
+                    asyncio.get_running_loop().create_task(_aclose_client(entry.client))
+                except RuntimeError:
+                    logger.warning("No running event loop, async client left to be garbage collected")
+                return
+            entry.client.close()
+            credential = getattr(entry.client, "credential", None)
+            if isinstance(credential, PooledTokenCredential):
+                credential.close()
+            if entry.transport is not None:
+                entry.transport.session.close()
+        except Exception as e:
+            logger.error(f"Error closing pooled client: {str(e)}")
@@ -0,0 +1,252 @@
+"""
+Column statistics for datasets.
+
+``min``, ``max``, ``count`` and ``nullCount`` come from the row-group statistics
+in Parquet footers, so they cost nothing beyond the (cached) footer. Distinct
+counts are estimated with a HyperLogLog sketch built from streamed Arrow
+batches: each batch is reduced with ``pc.unique`` and hashed in one vectorized
+call. Sketches are kept per file version and merged, so a dataset with one
+rewritten file only rescans that file.
+"""
+
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from adls_fs import open_range_file
+from footer_cache import merge_schemas
+
+logger = logging.getLogger(__name__)
+
+# Sketches (16 KiB each at the default precision) kept in memory
+DEFAULT_MAX_SKETCHES = int(os.environ.get("ADLS_COLUMN_STATS_CACHE_SIZE", "2048"))
+# log2 of the number of HyperLogLog registers; 14 gives ~0.8% standard error
+HLL_PRECISION = 14
+SCAN_BATCH_SIZE = 65536
+
+
+def hash_values(array: pa.Array) -> np.ndarray:
+    """64-bit hashes of the non-null values of an Arrow array."""
+    array = pc.drop_null(array)
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    if len(array) == 0:
+        return np.empty(0, dtype=np.uint64)
+
+    array_type = array.type
+    if pa.types.is_dictionary(array_type):
+        array = array.dictionary_decode()
+        array_type = array.type
+    if pa.types.is_temporal(array_type):
+        array = array.cast(pa.int64()) if array_type.bit_width == 64 else array.cast(pa.int32())
+        array_type = array.type
+    if pa.types.is_integer(array_type) or pa.types.is_floating(array_type) or pa.types.is_boolean(array_type):
+        values = array.to_numpy(zero_copy_only=False)
+    else:
+        values = array.cast(pa.string()).to_numpy(zero_copy_only=False)
+    return pd.util.hash_array(values, categorize=False)
+
+
+class HyperLogLog:
+    """HyperLogLog distinct-count sketch with vectorized updates."""
+
+    def __init__(self, precision: int = HLL_PRECISION, registers: Optional[np.ndarray] = None):
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, array: pa.Array) -> 'HyperLogLog':
+        # Duplicates within a batch are dropped before hashing
+        self.update_hashes(hash_values(pc.unique(array)))
+        return self
+
+    def update_hashes(self, hashes: np.ndarray) -> None:
+        if len(hashes) == 0:
+            return
+        value_bits = 64 - self.precision
+        index = (hashes >> np.uint64(value_bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << value_bits) - 1)
+        # Position of the leftmost 1-bit in the remaining bits (bit_length via frexp, exact below 2**53)
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        rank = (value_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        m = float(len(self.registers))
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+    def copy(self) -> 'HyperLogLog':
+        return HyperLogLog(self.precision, self.registers.copy())
+
+
+def _merge_bound(current, value, pick):
+    if value is None:
+        return current
+    if current is None:
+        return value
+    try:
+        return pick(current, value)
+    except TypeError:
+        return current
+
+
+def footer_column_stats(footers: Sequence[Any], columns: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """min/max/count/nullCount per column, aggregated from row-group statistics.
+
+    A bound is ``None`` when any row group lacks it, since it could then be wrong.
+    """
+    if not footers:
+        return {}
+    names = columns or footers[0].schema.names
+    stats = {name: {"min": None, "max": None, "count": 0, "nullCount": 0} for name in names}
+    incomplete = {name: {"min": False, "nullCount": False} for name in names}
+
+    for footer in footers:
+        for row_group in footer.row_groups:
+            for name in names:
+                entry = stats[name]
+                entry["count"] += row_group["numRows"]
+                column = row_group["columns"].get(name)
+                if column is None:
+                    # Column missing from this file (schema evolution): all nulls
+                    entry["nullCount"] += row_group["numRows"]
+                    continue
+                if column.get("nullCount") is None:
+                    incomplete[name]["nullCount"] = True
+                else:
+                    entry["nullCount"] += column["nullCount"]
+                if "min" not in column:
+                    if column.get("nullCount") != row_group["numRows"]:
+                        incomplete[name]["min"] = True
+                    continue
+                entry["min"] = _merge_bound(entry["min"], column["min"], min)
+                entry["max"] = _merge_bound(entry["max"], column["max"], max)
+
+    for name in names:
+        if incomplete[name]["min"]:
+            stats[name]["min"] = stats[name]["max"] = None
+        if incomplete[name]["nullCount"]:
+            stats[name]["nullCount"] = None
+    return stats
+
+
+class ColumnStatsEngine:
+    """Column statistics for sets of files, with distinct-count sketches cached per file version."""
+
+    def __init__(self, footer_cache, max_sketches: int = DEFAULT_MAX_SKETCHES):
+        self._footer_cache = footer_cache
+        self.max_sketches = max_sketches
+        self._sketches: "OrderedDict[Any, HyperLogLog]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def column_stats(
+        self,
+        file_clients: Sequence[Any],
+        files: Sequence[Any],
+        columns: Optional[List[str]] = None,
+        distinct: bool = True,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Stats of the given columns (all by default) across files.
+
+        ``files`` are DataFile entries and ``file_clients`` their DataLake file clients.
+        """
+        footers = self._footer_cache.get_many([
+            (file_client, file_client.url, data_file.size, data_file.etag)
+            for file_client, data_file in zip(file_clients, files)
+        ])
+        if not footers:
+            return {}
+        schema = merge_schemas([footer.schema for footer in footers])
+        columns = columns or schema.names
+        unknown = [c for c in columns if c not in schema.names]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+
+        stats = footer_column_stats(footers, columns)
+        if distinct:
+            sketches = {name: HyperLogLog() for name in columns}
+            for file_client, footer in zip(file_clients, footers):
+                for name, sketch in self._file_sketches(file_client, footer, columns).items():
+                    sketches[name].merge(sketch)
+            for name in columns:
+                # The estimate can exceed the number of values it was drawn from
+                values = stats[name]["count"] - (stats[name]["nullCount"] or 0)
+                stats[name]["distinctCount"] = min(sketches[name].count(), values)
+        return stats
+
+    def _file_sketches(self, file_client, footer, columns: List[str]) -> Dict[str, HyperLogLog]:
+        """Sketches of one file version, scanning only the columns not cached yet."""
+        sketches = {}
+        missing = []
+        with self._lock:
+            for name in columns:
+                sketch = self._sketches.get((footer.path, footer.etag, name))
+                if sketch is None:
+                    missing.append(name)
+                else:
+                    self._sketches.move_to_end((footer.path, footer.etag, name))
+                    sketches[name] = sketch
+        self.hits += len(columns) - len(missing)
+        self.misses += len(missing)
+
+        present = [name for name in missing if name in footer.schema.names]
+        scanned = {name: HyperLogLog() for name in missing}
+        if present:
+            scanned.update(self._scan(file_client, footer, present))
+
+        with self._lock:
+            for name, sketch in scanned.items():
+                # Without an etag the file version is unknown, so nothing is cached
+                if footer.etag is not None:
+                    self._sketches[(footer.path, footer.etag, name)] = sketch
+            while len(self._sketches) > self.max_sketches:
+                self._sketches.popitem(last=False)
+        sketches.update(scanned)
+        return sketches
+
+    def _scan(self, file_client, footer, columns: List[str]) -> Dict[str, HyperLogLog]:
+        sketches = {name: HyperLogLog() for name in columns}
+        source = open_range_file(file_client, footer.size, tail=footer.tail)
+        try:
+            parquet_file = pq.ParquetFile(source, metadata=footer.metadata)
+            for batch in parquet_file.iter_batches(batch_size=SCAN_BATCH_SIZE, columns=columns):
+                for name in columns:
+                    sketches[name].update(batch.column(name))
+        finally:
+            source.close()
+        return sketches
+
+    def invalidate(self, path_prefix: Optional[str] = None) -> int:
+        with self._lock:
+            keys = [k for k in self._sketches if not path_prefix or k[0].startswith(path_prefix)]
+            for key in keys:
+                self._sketches.pop(key)
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._sketches),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,303 @@
+"""
+Bulk exports of datasets as CSV, NDJSON or Parquet.
+
+Exports take the same filters, sort and column projection as previews and are
+streamed batch by batch, so memory stays at about one batch. Without a sort
+each batch is one row group that may match: it is read, edits are merged, the
+filter is applied and the projected columns are encoded. With a sort, only the
+filter/sort key columns of every candidate row group are scanned and sorted,
+and the projected rows are then read in sorted batches of positions.
+
+CSV and NDJSON can be compressed with gzip or zstd; Parquet uses the codec for
+its column chunks instead. An export is identified by a strong ETag over the
+dataset version, the request and any unsaved edits, and the encoding is
+deterministic, so an interrupted download can be resumed with a Range
+request. The size of every completed export is remembered, together with the
+byte offset at which each batch ends for uncompressed CSV and NDJSON, so a
+resumed download starts reading at the batch that holds the requested offset.
+A range request for an export that never completed first encodes it once,
+without sending it, to learn that layout.
+"""
+
+import os
+import json
+import bisect
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from dataset_reader import (
+    POSITION_COLUMN, DatasetPlan, build_filter_expression, candidate_refs, filter_columns, project_schema
+)
+from response_formats import ChunkSink, json_literals, json_row_chunks
+
+logger = logging.getLogger(__name__)
+
+# Media type and file extension per format
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+# Media type and file suffix of compressed CSV/NDJSON exports
+EXPORT_COMPRESSIONS = {
+    "gzip": ("application/gzip", ".gz"),
+    "zstd": ("application/zstd", ".zst"),
+}
+# Rows per batch of a sorted export
+EXPORT_BATCH_ROWS = int(os.environ.get("ADLS_EXPORT_BATCH_ROWS", "65536"))
+# Completed exports whose size (and batch offsets) are remembered for range requests
+EXPORT_LAYOUT_CACHE_SIZE = int(os.environ.get("ADLS_EXPORT_LAYOUT_CACHE_SIZE", "256"))
+
+
+class ExportLayout(NamedTuple):
+    size: int
+    # Byte offset just past each batch, when batches can be encoded independently
+    batch_ends: Optional[List[int]]
+
+
+class ExportLayouts:
+    """LRU of the layouts of completed exports, by ETag."""
+
+    def __init__(self, max_entries: int = EXPORT_LAYOUT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, ExportLayout]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag: str) -> Optional[ExportLayout]:
+        with self._lock:
+            layout = self._entries.get(etag)
+            if layout is not None:
+                self._entries.move_to_end(etag)
+            return layout
+
+    def put(self, etag: str, layout: ExportLayout) -> None:
+        with self._lock:
+            self._entries[etag] = layout
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"layouts": len(self._entries)}
+
+
+def export_schema(
+    plan: DatasetPlan,
+    columns: Optional[List[str]],
+    sort_column: Optional[str],
+    filters: Optional[List[Dict[str, Any]]],
+) -> pa.Schema:
+    """Validate an export request up front and return the schema of its rows."""
+    schema = project_schema(plan.schema, columns)
+    if sort_column and sort_column not in plan.schema.names:
+        raise ValueError(f"Unknown sort column: {sort_column}")
+    build_filter_expression(filters, plan.schema)
+    return schema
+
+
+def export_etag(plan: DatasetPlan, request: Dict[str, Any], overlay=None) -> str:
+    """Strong ETag of an export: the same value means byte-identical output."""
+    identity = {
+        "version": plan.version_tag,
+        "request": request,
+        "edits": overlay.fingerprint() if overlay is not None else None,
+        "batchRows": EXPORT_BATCH_ROWS,
+    }
+    digest = hashlib.sha1(json.dumps(identity, sort_keys=True, default=str).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def export_batches(
+    plan: DatasetPlan,
+    schema: pa.Schema,
+    filters: Optional[List[Dict[str, Any]]] = None,
+    sort_column: Optional[str] = None,
+    sort_direction: Optional[str] = "asc",
+    overlay=None,
+    start_batch: int = 0,
+    batch_rows: int = EXPORT_BATCH_ROWS,
+) -> Iterator[pa.Table]:
+    """Matching rows in the requested order, as tables of ``schema``'s columns.
+
+    Batches are numbered the same way on every run, so ``start_batch`` skips
+    the batches before it without reading them.
+    """
+    expression = build_filter_expression(filters, plan.schema)
+    names = schema.names
+    key_columns = filter_columns(filters)
+
+    if not sort_column:
+        refs = candidate_refs(plan, expression, key_columns, overlay)
+        read_columns = names + [c for c in key_columns if c not in names]
+        for ref in refs[start_batch:]:
+            table = plan.read([ref], read_columns)
+            if overlay is not None:
+                table = overlay.apply(table, plan.positions([ref]))
+            if expression is not None:
+                table = table.filter(expression)
+            yield table.select(names)
+        return
+
+    if sort_column not in key_columns:
+        key_columns.append(sort_column)
+    refs = candidate_refs(plan, expression, key_columns, overlay)
+    matches = plan.match(refs, key_columns, expression, overlay)
+    order = "descending" if sort_direction == "desc" else "ascending"
+    indices = pc.sort_indices(matches, sort_keys=[(sort_column, order)], null_placement="at_end")
+    positions = matches.column(POSITION_COLUMN).take(indices).to_numpy()
+    del matches, indices
+    for offset in range(start_batch * batch_rows, len(positions), batch_rows):
+        chunk = positions[offset:offset + batch_rows]
+        table = plan.take(chunk, names)
+        if overlay is not None:
+            table = overlay.apply(table, chunk)
+        yield table
+
+
+def _csv_ready(table: pa.Table) -> pa.Table:
+    """Nested columns become JSON text, which the CSV writer cannot otherwise encode."""
+    for index, field in enumerate(table.schema):
+        column = table.column(index)
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(index, pa.field(field.name, field.type.value_type), column.cast(field.type.value_type))
+        elif pa.types.is_nested(field.type):
+            table = table.set_column(index, pa.field(field.name, pa.string()), json_literals(column))
+    return table
+
+
+def _csv_bytes(table: pa.Table, header: bool) -> bytes:
+    buffer = pa.BufferOutputStream()
+    pacsv.write_csv(_csv_ready(table), buffer, pacsv.WriteOptions(include_header=header))
+    return buffer.getvalue().to_pybytes()
+
+
+def _ndjson_bytes(table: pa.Table) -> bytes:
+    if table.num_rows == 0:
+        return b""
+    return b"".join(json_row_chunks(table, batch_rows=max(table.num_rows, 1), separator="\n")) + b"\n"
+
+
+def encode_batches(
+    batches: Iterator[pa.Table],
+    schema: pa.Schema,
+    export_format: str,
+    compression: Optional[str] = None,
+    start_batch: int = 0,
+) -> Iterator[Tuple[Optional[int], bytes]]:
+    """Encoded export as ``(batch number, bytes)`` pairs; trailing bytes have no batch number."""
+    if export_format == "parquet":
+        if start_batch:
+            raise ValueError("Parquet exports cannot start mid-file")
+        sink = ChunkSink()
+        writer = pq.ParquetWriter(sink, schema, compression=compression or "snappy")
+        for batch_number, table in enumerate(batches):
+            if table.num_rows:
+                writer.write_table(table.cast(schema))
+            yield batch_number, sink.drain()
+        writer.close()
+        yield None, sink.drain()
+        return
+
+    sink = ChunkSink()
+    stream = pa.CompressedOutputStream(sink, compression) if compression else None
+    batch_number = start_batch - 1
+    for batch_number, table in enumerate(batches, start_batch):
+        if export_format == "csv":
+            data = _csv_bytes(table, header=batch_number == 0)
+        else:
+            data = _ndjson_bytes(table)
+        if stream is None:
+            yield batch_number, data
+        else:
+            stream.write(data)
+            yield batch_number, sink.drain()
+    if export_format == "csv" and batch_number < 0:
+        # Nothing matched: the export is just the header
+        data = _csv_bytes(schema.empty_table(), header=True)
+        if stream is None:
+            yield None, data
+        else:
+            stream.write(data)
+    if stream is not None:
+        stream.close()
+        yield None, sink.drain()
+
+
+def _layout(export_format: str, compression: Optional[str], size: int, batch_ends: List[int]) -> ExportLayout:
+    independent = export_format != "parquet" and not compression
+    return ExportLayout(size, batch_ends if independent else None)
+
+
+def export_layout(
+    open_batches: Callable[[int], Iterator[pa.Table]],
+    schema: pa.Schema,
+    export_format: str,
+    compression: Optional[str] = None,
+    etag: Optional[str] = None,
+    layouts: Optional[ExportLayouts] = None,
+) -> ExportLayout:
+    """Layout of an export, encoding the whole export (and dropping the bytes) when it is not recorded yet."""
+    layout = layouts.get(etag) if layouts is not None and etag else None
+    if layout is not None:
+        return layout
+    position = 0
+    batch_ends: List[int] = []
+    for batch_number, data in encode_batches(open_batches(0), schema, export_format, compression):
+        position += len(data)
+        if batch_number is not None:
+            batch_ends.append(position)
+    layout = _layout(export_format, compression, position, batch_ends)
+    if layouts is not None and etag:
+        layouts.put(etag, layout)
+    return layout
+
+
+def stream_export(
+    open_batches: Callable[[int], Iterator[pa.Table]],
+    schema: pa.Schema,
+    export_format: str,
+    compression: Optional[str] = None,
+    etag: Optional[str] = None,
+    layouts: Optional[ExportLayouts] = None,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> Iterator[bytes]:
+    """Bytes ``start`` to ``end`` (inclusive) of an export.
+
+    ``open_batches(start_batch)`` returns the export's batches from that batch
+    on. A complete run records the export's layout under its ETag.
+    """
+    layout = layouts.get(etag) if layouts is not None and etag else None
+    start_batch, position = 0, 0
+    if start and layout is not None and layout.batch_ends is not None:
+        # Skip every batch that ends before the requested offset
+        start_batch = bisect.bisect_right(layout.batch_ends, start)
+        position = layout.batch_ends[start_batch - 1] if start_batch else 0
+
+    batch_ends: List[int] = []
+    complete = False
+    for batch_number, data in encode_batches(open_batches(start_batch), schema, export_format, compression, start_batch):
+        chunk_start = position
+        position += len(data)
+        if batch_number is not None:
+            batch_ends.append(position)
+        if end is not None and chunk_start > end:
+            break
+        if position > start and data:
+            low = max(start - chunk_start, 0)
+            high = len(data) if end is None else min(len(data), end + 1 - chunk_start)
+            yield data[low:high]
+    else:
+        complete = True
+
+    if complete and not start_batch and layouts is not None and etag:
+        layouts.put(etag, _layout(export_format, compression, position, batch_ends))
@@ -0,0 +1,120 @@
+"""
+Dataset jobs run by the worker pool.
+
+Each job opens the dataset itself, so only the connection's credentials, the
+request and any unsaved edits cross the process boundary. A worker process
+keeps its own service clients, footer cache and Delta snapshot cache across
+jobs, and its own partition catalog (set ``ADLS_FOOTER_CACHE_DB`` to share
+footers between processes); when jobs run in the API process they use the
+API's own. Sort indexes are shared through ``ADLS_SORT_INDEX_DIR``.
+"""
+
+import logging
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from client_pool import ClientPool
+from dataset_reader import PreviewResult, filter_columns, open_plan, read_preview
+from delta_log import DeltaLog
+from footer_cache import FooterCache
+from partition_catalog import PartitionCatalog
+from sort_index import SortIndex
+from validation import ValidationReport, compile_rules, validate_dataset
+
+logger = logging.getLogger(__name__)
+
+
+class JobConnection(NamedTuple):
+    connection_id: str
+    credentials: Any
+    # Builds a service client from (credentials, transport), like ClientPool factories
+    client_factory: Callable[[Any, Optional[Any]], Any]
+
+
+class JobContext:
+    """Clients and caches a process's jobs share."""
+
+    def __init__(
+        self,
+        footer_cache: Optional[FooterCache] = None,
+        delta_log: Optional[DeltaLog] = None,
+        get_client: Optional[Callable[[JobConnection], Any]] = None,
+        partition_catalog: Optional[PartitionCatalog] = None,
+        sort_index: Optional[SortIndex] = None,
+    ):
+        self.footer_cache = footer_cache if footer_cache is not None else FooterCache()
+        self.delta_log = delta_log if delta_log is not None else DeltaLog()
+        self.partition_catalog = partition_catalog if partition_catalog is not None else PartitionCatalog()
+        self.sort_index = sort_index if sort_index is not None else SortIndex()
+        self._get_client = get_client
+        self._pools: Dict[Any, ClientPool] = {}
+
+    def service_client(self, connection: JobConnection):
+        if self._get_client is not None:
+            return self._get_client(connection)
+        pool = self._pools.get(connection.client_factory)
+        if pool is None:
+            pool = self._pools[connection.client_factory] = ClientPool(connection.client_factory)
+        return pool.get(connection.connection_id, connection.credentials)
+
+
+def _open(context: JobContext, connection: JobConnection, path: str, filters, version: Optional[int], overlay):
+    """Open a dataset plan and drop edits made against another version."""
+    # Edits can make rows in pruned files match, so files are only pruned when no filter column was edited
+    prune_filters = filters
+    if overlay is not None and overlay.touches(filter_columns(filters)):
+        prune_filters = None
+    plan = open_plan(
+        context.service_client(connection),
+        path,
+        context.footer_cache,
+        context.delta_log,
+        prune_filters,
+        version,
+        context.partition_catalog,
+        overlay.base_version if overlay is not None else None,
+    )
+    if overlay is not None and overlay.base_version != plan.version_tag:
+        overlay = None
+    return plan, overlay
+
+
+def preview_job(
+    context: JobContext,
+    connection: JobConnection,
+    path: str,
+    page: int,
+    page_size: int,
+    sort_column: Optional[str] = None,
+    sort_direction: Optional[str] = "asc",
+    filters: Optional[List[Dict[str, Any]]] = None,
+    columns: Optional[List[str]] = None,
+    version: Optional[int] = None,
+    overlay=None,
+) -> PreviewResult:
+    """One page of a dataset, as ``read_preview`` returns it."""
+    plan, overlay = _open(context, connection, path, filters, version, overlay)
+    return read_preview(
+        plan,
+        page=page,
+        page_size=page_size,
+        sort_column=sort_column,
+        sort_direction=sort_direction,
+        filters=filters,
+        columns=columns,
+        overlay=overlay,
+        sort_index=context.sort_index,
+    )
+
+
+def validate_job(
+    context: JobContext,
+    connection: JobConnection,
+    path: str,
+    rules: List[Dict[str, Any]],
+    version: Optional[int] = None,
+    overlay=None,
+) -> ValidationReport:
+    """Validate every row of a dataset against column rules, with unsaved edits merged in."""
+    plan, overlay = _open(context, connection, path, None, version, overlay)
+    compiled, skipped = compile_rules(rules, plan.schema)
+    return validate_dataset(plan, compiled, skipped, overlay)
@@ -0,0 +1,1001 @@
+"""
+Arrow-native dataset reads for previews.
+
+Datasets are opened as pyarrow datasets over the ADLS filesystem. Filters are
+compiled to dataset expressions so row groups whose statistics cannot match are
+skipped, only the filter/sort key columns are scanned to find matching rows, and
+projected columns are read only from the row groups that hold the requested page.
+Footers of multi-file folders are fetched concurrently, or taken from the
+folder's ``_metadata`` summary when it is current (see parquet_summary).
+"""
+
+import json
+import math
+import uuid
+import hashlib
+import bisect
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+from adls_fs import ADLSFileSystemHandler, split_path
+from column_stats import footer_column_stats
+from delta_log import DELTA_LOG_DIR, DeltaFile, DeltaSnapshot, prune_files
+from footer_cache import merge_schemas
+from metrics import carry
+from partition_catalog import (
+    PARTITION_LIST_CONCURRENCY, CatalogEntry, HivePartitioning, PartitionCatalog, catalog_key,
+    parse_partition_segment, path_partition_values, summarize_partitions,
+)
+from parquet_summary import (
+    COMMON_METADATA_FILE, SUMMARY_FILE, SUMMARY_MIN_FILES, WRITE_SUMMARY_METADATA, summary_footers, write_summary,
+)
+from sort_index import SORT_TOP_ROWS, SortIndex, filtered_page, top_k_positions
+
+logger = logging.getLogger(__name__)
+
+# Name of the synthetic row-position column used while scanning key columns
+POSITION_COLUMN = "__position"
+
+
+class DataFile(NamedTuple):
+    path: str  # includes the container
+    size: int
+    etag: Optional[str] = None
+    last_modified: Any = None
+
+
+class DatasetFiles(NamedTuple):
+    format: str
+    root: str
+    files: List[DataFile]
+    partitioning: Optional[HivePartitioning] = None
+    # Catalog entry of a partitioned dataset; ``pruned`` when ``files`` only holds the partitions filters can match
+    catalog: Optional[CatalogEntry] = None
+    pruned: bool = False
+    # ``_metadata`` and ``_common_metadata`` summary files at the root of a folder
+    summary: Optional[DataFile] = None
+    common_metadata: Optional[DataFile] = None
+
+
+def is_hidden_path(rel_path: str) -> bool:
+    """Files under ``_``/``.`` prefixed names (``_delta_log``, ``_SUCCESS``, ...) are not data."""
+    return any(part.startswith(('_', '.')) for part in rel_path.split('/') if part)
+
+
+def file_client_for(service_client, path: str):
+    container, rest = split_path(path)
+    return service_client.get_file_system_client(container).get_file_client(rest)
+
+
+def resolve_dataset_files(
+    service_client,
+    path: str,
+    partition_catalog: Optional[PartitionCatalog] = None,
+    filters: Optional[List[Dict[str, Any]]] = None,
+) -> DatasetFiles:
+    """Resolve a dataset path (a parquet file, a folder or a Delta table) to its data files.
+
+    Delta tables are detected from their top-level listing and returned without
+    files; their active files come from the transaction log. A folder of
+    ``key=value`` partition directories that is in the partition catalog is
+    listed only where ``filters`` on partition keys can match; any other folder
+    is listed in full (and partitioned ones are added to the catalog).
+    """
+    container, rest = split_path(path)
+    if not container:
+        raise ValueError("Dataset path must start with the container name")
+    container_client = service_client.get_file_system_client(container)
+    root = f"{container}/{rest}".rstrip('/')
+
+    if rest.endswith('.parquet'):
+        properties = container_client.get_file_client(rest).get_file_properties()
+        data_file = DataFile(root, properties.size, properties.etag, properties.last_modified)
+        return DatasetFiles("parquet", root, [data_file])
+
+    top_level = list(container_client.get_paths(path=rest or None, recursive=False))
+    if any(item.is_directory and item.name.rstrip('/').split('/')[-1] == DELTA_LOG_DIR for item in top_level):
+        return DatasetFiles("delta", root, [])
+
+    partitioned = any(
+        item.is_directory and parse_partition_segment(item.name.rstrip('/').split('/')[-1]) for item in top_level
+    )
+    key = catalog_key(container_client, rest) if partitioned and partition_catalog is not None else None
+    if key is not None and filters:
+        entry = partition_catalog.get(key)
+        if entry is not None and entry.row_counts is not None:
+            files = _list_partition_files(container_client, container, rest, entry.partitioning, filters, top_level)
+            if files is not None:
+                return DatasetFiles("parquet", root, files, entry.partitioning, entry, pruned=True)
+
+    items = list(container_client.get_paths(path=rest or None, recursive=True))
+    files = _data_files(container, rest, items)
+    partitioning = HivePartitioning.from_paths(root, [f.path for f in files]) if partitioned else None
+    entry = None
+    if key is not None and partitioning is not None:
+        entry = CatalogEntry(root, files, partitioning)
+        partition_catalog.put(key, entry)
+    summaries = _summary_files(container, rest, top_level)
+    return DatasetFiles(
+        "parquet", root, files, partitioning, entry,
+        summary=summaries.get(SUMMARY_FILE), common_metadata=summaries.get(COMMON_METADATA_FILE),
+    )
+
+
+def _data_files(container: str, rest: str, items) -> List[DataFile]:
+    """Parquet data files among listed paths, sorted by path."""
+    files = []
+    for item in items:
+        rel_path = item.name[len(rest):].lstrip('/') if rest else item.name
+        if item.is_directory or is_hidden_path(rel_path) or not item.name.endswith('.parquet'):
+            continue
+        files.append(DataFile(
+            f"{container}/{item.name}", item.content_length, getattr(item, 'etag', None), item.last_modified
+        ))
+    files.sort()
+    return files
+
+
+def _summary_files(container: str, rest: str, top_level) -> Dict[str, DataFile]:
+    """Summary metadata files among a folder's top-level paths, by name."""
+    summaries = {}
+    for item in top_level:
+        name = item.name.rstrip('/').split('/')[-1]
+        if not item.is_directory and name in (SUMMARY_FILE, COMMON_METADATA_FILE):
+            summaries[name] = DataFile(
+                f"{container}/{item.name}", item.content_length, getattr(item, 'etag', None), item.last_modified
+            )
+    return summaries
+
+
+def _list_partition_files(
+    container_client,
+    container: str,
+    rest: str,
+    partitioning: HivePartitioning,
+    filters: List[Dict[str, Any]],
+    top_level: List[Any],
+) -> Optional[List[DataFile]]:
+    """Data files of the partitions that ``filters`` can match, listing no other partition directory.
+
+    Partition levels down to the deepest filtered key are listed one level at a
+    time (starting from the root's ``top_level`` listing) and pruned as they
+    are listed; the surviving directories are then listed recursively. Returns
+    None when no filter is on a partition key.
+    """
+    keys = partitioning.keys
+    partition_filters = [f for f in filters if f.get("column") in keys]
+    if not partition_filters:
+        return None
+    depth = max(keys.index(f["column"]) for f in partition_filters) + 1
+
+    @carry
+    def list_directory(directory: str, recursive: bool):
+        return list(container_client.get_paths(path=directory or None, recursive=recursive))
+
+    directories = [(rest, {})]
+    items = []
+    with ThreadPoolExecutor(max_workers=max(1, PARTITION_LIST_CONCURRENCY)) as pool:
+        for level in range(depth):
+            children = []
+            listings = [top_level] if level == 0 else pool.map(lambda d: list_directory(d[0], False), directories)
+            for (_, values), listing in zip(directories, listings):
+                for item in listing:
+                    parsed = parse_partition_segment(item.name.rstrip('/').split('/')[-1]) if item.is_directory else None
+                    if parsed is not None and parsed[0] == keys[level]:
+                        children.append((item.name.rstrip('/'), {**values, parsed[0]: parsed[1]}))
+                    elif not item.is_directory:
+                        # Files outside the partition directories
+                        items.append(item)
+            level_filters = [f for f in partition_filters if f["column"] in keys[:level + 1]]
+            expression = build_filter_expression(level_filters, partitioning.schema)
+            if expression is not None:
+                mask = partitioning.matches([values for _, values in children], expression)
+                children = [child for child, keep in zip(children, mask) if keep]
+            directories = children
+        for listing in pool.map(lambda d: list_directory(d[0], True), directories):
+            items.extend(listing)
+
+    files = _data_files(container, rest, items)
+    root = f"{container}/{rest}".rstrip('/')
+    mask = partitioning.matches(
+        [path_partition_values(f.path[len(root):]) for f in files],
+        build_filter_expression(partition_filters, partitioning.schema),
+    )
+    return [f for f, keep in zip(files, mask) if keep]
+
+
+def load_footers(service_client, files: Sequence[DataFile], footer_cache) -> List[Any]:
+    """FooterInfo of every file, from the footer cache where possible and otherwise fetched concurrently."""
+    requests = []
+    for data_file in files:
+        file_client = file_client_for(service_client, data_file.path)
+        requests.append((file_client, file_client.url, data_file.size, data_file.etag))
+    return footer_cache.get_many(requests)
+
+
+def dataset_footers(service_client, dataset_files: DatasetFiles, footer_cache) -> List[Any]:
+    """Footers of a dataset's files: from its summary file if that is current, else from each file.
+
+    Footers taken from a summary have no tail bytes. Folders opened footer by
+    footer get a summary written when ``ADLS_WRITE_SUMMARY_METADATA`` is set.
+    """
+    files = dataset_files.files
+    summary_file = dataset_files.summary
+    if summary_file is not None and files:
+        file_client = file_client_for(service_client, summary_file.path)
+        try:
+            summary = footer_cache.get(file_client, file_client.url, summary_file.size, summary_file.etag)
+            footers = summary_footers(summary, dataset_files.root, files, summary_file.last_modified)
+            if footers is not None:
+                return footers
+        except ValueError as e:
+            logger.error(f"Error reading summary metadata {summary_file.path}: {str(e)}")
+
+    footers = load_footers(service_client, files, footer_cache)
+    if WRITE_SUMMARY_METADATA and len(files) >= SUMMARY_MIN_FILES and not dataset_files.pruned:
+        container, rest = split_path(dataset_files.root)
+        write_summary(
+            service_client.get_file_system_client(container), rest, dataset_files.root, files, footers
+        )
+    return footers
+
+
+def open_parquet_dataset(
+    service_client,
+    files: Sequence[DataFile],
+    footer_cache=None,
+    schema: Optional[pa.Schema] = None,
+    partitioning: Optional[HivePartitioning] = None,
+    footers: Optional[Sequence[Any]] = None,
+) -> ds.Dataset:
+    """Open parquet files on ADLS as one pyarrow dataset.
+
+    With a footer cache, footers of unchanged files are served from memory and
+    opening the dataset needs no storage requests at all. ``footers`` may be
+    given instead of loading them; files whose footer has no tail bytes (taken
+    from a summary) fetch their own on first open. The schema is merged from
+    all footers. With a partitioning, the partition columns are added from
+    each file's directory names.
+    """
+    if not files and schema is None:
+        raise ValueError("Dataset has no parquet files")
+    handler = ADLSFileSystemHandler(service_client)
+    for data_file in files:
+        handler.register_size(data_file.path, data_file.size, data_file.etag)
+    if footer_cache is not None:
+        if footers is None:
+            footers = load_footers(service_client, files, footer_cache)
+        for data_file, footer in zip(files, footers):
+            if footer.tail is not None:
+                handler.register_tail(data_file.path, footer.tail)
+        if any(footer.tail is None for footer in footers):
+            by_path = {data_file.path: data_file for data_file in files}
+
+            def load_tail(path):
+                data_file = by_path[path]
+                file_client = file_client_for(service_client, path)
+                return footer_cache.get(file_client, file_client.url, data_file.size, data_file.etag).tail
+
+            handler.set_tail_loader(load_tail)
+        if schema is None:
+            schema = merge_schemas([footer.schema for footer in footers])
+            if partitioning is not None:
+                schema = partitioning.with_data_schema(schema)
+    filesystem = pafs.PyFileSystem(handler)
+    paths = [f.path for f in files]
+    if partitioning is None:
+        return ds.dataset(paths, schema=schema, filesystem=filesystem, format="parquet")
+    if schema is None:
+        schema = partitioning.with_data_schema(ds.dataset(paths[:1], filesystem=filesystem, format="parquet").schema)
+    return ds.FileSystemDataset.from_paths(
+        paths,
+        schema=schema,
+        format=ds.ParquetFileFormat(),
+        filesystem=filesystem,
+        partitions=[partitioning.expression(p) for p in paths],
+    )
+
+
+def delta_data_files(snapshot: DeltaSnapshot, files: Sequence[DeltaFile]) -> List[DataFile]:
+    """DataFile entries for Delta files; immutable files use their size and mtime as version tag."""
+    return [
+        DataFile(f"{snapshot.table_path}/{f.path}", f.size, f.version_tag, f.modification_time)
+        for f in files
+    ]
+
+
+def _delta_arrow_schema(snapshot: DeltaSnapshot, file_schema: Optional[pa.Schema]) -> pa.Schema:
+    """Table schema from the log, with column types as physically written where a data file is known.
+
+    Writers differ in how they store e.g. timestamps, so the types of one data
+    file are preferred to avoid casts pyarrow cannot do.
+    """
+    partition_columns = set(snapshot.partition_columns)
+    fields = []
+    for field in snapshot.schema:
+        if file_schema is not None and field.name not in partition_columns and field.name in file_schema.names:
+            field = field.with_type(file_schema.field(field.name).type)
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def _partition_expression(delta_file: DeltaFile, schema: pa.Schema, partition_columns: Sequence[str]) -> ds.Expression:
+    expression = ds.scalar(True)
+    for column in partition_columns:
+        value = delta_file.partition_values.get(column)
+        if value is None:
+            condition = ds.field(column).is_null()
+        else:
+            condition = ds.field(column) == pa.array([value]).cast(schema.field(column).type)[0]
+        expression = expression & condition
+    return expression
+
+
+def open_delta_plan(
+    service_client,
+    snapshot: DeltaSnapshot,
+    footer_cache,
+    filters: Optional[List[Dict[str, Any]]] = None,
+) -> 'DatasetPlan':
+    """Plan over a Delta snapshot, skipping files that partition values and file stats rule out.
+
+    Row positions are assigned over all active files from their ``numRecords``
+    stats, so ``__id`` does not depend on the filters. When a file lacks stats,
+    no files are pruned and footers are used for the row counts.
+    """
+    all_files = snapshot.active_files()
+    row_counts = [f.parsed_stats().get("numRecords") for f in all_files]
+    counts_known = all(count is not None for count in row_counts)
+
+    files = prune_files(snapshot, filters) if counts_known else all_files
+    data_files = delta_data_files(snapshot, files)
+
+    handler = ADLSFileSystemHandler(service_client)
+    for data_file in data_files:
+        handler.register_size(data_file.path, data_file.size, data_file.etag)
+
+    # Footers are only fetched for files a request actually opens
+    by_path = {data_file.path: data_file for data_file in data_files}
+
+    def load_tail(path):
+        data_file = by_path[path]
+        file_client = file_client_for(service_client, path)
+        return footer_cache.get(file_client, file_client.url, data_file.size, data_file.etag).tail
+
+    handler.set_tail_loader(load_tail)
+
+    file_schema = None
+    if data_files:
+        first = data_files[0]
+        file_client = file_client_for(service_client, first.path)
+        file_schema = footer_cache.get(file_client, file_client.url, first.size, first.etag).schema
+    schema = _delta_arrow_schema(snapshot, file_schema)
+
+    partition_columns = snapshot.partition_columns
+    dataset = ds.FileSystemDataset.from_paths(
+        [data_file.path for data_file in data_files],
+        schema=schema,
+        format=ds.ParquetFileFormat(),
+        filesystem=pafs.PyFileSystem(handler),
+        partitions=[_partition_expression(f, schema, partition_columns) for f in files],
+    )
+
+    if not counts_known:
+        plan = DatasetPlan(dataset)
+    else:
+        starts = dict(zip((f.path for f in all_files), np.cumsum([0] + row_counts)[:-1]))
+        plan = DatasetPlan(
+            dataset,
+            row_counts=[f.parsed_stats()["numRecords"] for f in files],
+            file_starts=[starts[f.path] for f in files],
+            total_rows=int(sum(row_counts)),
+        )
+    plan.data_files = data_files
+    return plan
+
+
+def open_plan(
+    service_client,
+    path: str,
+    footer_cache,
+    delta_log,
+    filters: Optional[List[Dict[str, Any]]] = None,
+    version: Optional[int] = None,
+    partition_catalog: Optional[PartitionCatalog] = None,
+    base_version: Optional[str] = None,
+) -> 'DatasetPlan':
+    """Plan over any dataset path: a parquet file or folder, or a Delta table (optionally at a version).
+
+    Partitioned folders in the partition catalog are opened with only the
+    partitions ``filters`` can match. If that plan's version differs from
+    ``base_version`` (the version unsaved edits were made against), the catalog
+    may be stale and the folder is listed in full instead.
+    """
+    dataset_files = resolve_dataset_files(service_client, path, partition_catalog, filters)
+    account_url = getattr(service_client, 'url', None)
+    source = f"{account_url.rstrip('/')}/{dataset_files.root}" if account_url else None
+    if dataset_files.format == "delta":
+        snapshot = delta_log.snapshot(service_client, dataset_files.root, version)
+        plan = open_delta_plan(service_client, snapshot, footer_cache, filters)
+        plan.source = source
+        plan.version_tag = f"delta:{snapshot.version}"
+        plan.snapshot = snapshot
+        return plan
+    if version is not None:
+        raise ValueError("Versions are only supported for Delta tables")
+    if dataset_files.pruned:
+        plan = _open_pruned_plan(service_client, dataset_files, footer_cache)
+        if plan is not None and (base_version is None or plan.version_tag == base_version):
+            partition_catalog.record_pruned(len(dataset_files.catalog.files) - len(dataset_files.files))
+            plan.source = source
+            return plan
+        partition_catalog.record_fallback()
+        dataset_files = resolve_dataset_files(service_client, path, partition_catalog)
+
+    footers = dataset_footers(service_client, dataset_files, footer_cache) if dataset_files.files else None
+    plan = DatasetPlan(
+        open_parquet_dataset(
+            service_client, dataset_files.files, footer_cache, partitioning=dataset_files.partitioning, footers=footers
+        ),
+        row_counts=[footer.num_rows for footer in footers] if footers else None,
+    )
+    plan.source = source
+    plan.version_tag = files_version_tag(dataset_files.files)
+    plan.data_files = list(dataset_files.files)
+    if dataset_files.catalog is not None:
+        dataset_files.catalog.row_counts = list(plan._row_counts)
+        dataset_files.catalog.schema = plan.schema
+    return plan
+
+
+def _open_pruned_plan(service_client, dataset_files: DatasetFiles, footer_cache) -> Optional['DatasetPlan']:
+    """Plan over the files of some partitions, with row positions from the catalog's full file list.
+
+    Returns None if a listed file is not in the catalog as it is now (the
+    catalog is stale).
+    """
+    entry = dataset_files.catalog
+    indexes = [entry.index(f) for f in dataset_files.files]
+    if any(i is None for i in indexes):
+        return None
+    starts = np.cumsum([0] + entry.row_counts)[:-1]
+    dataset = open_parquet_dataset(
+        service_client, dataset_files.files, footer_cache, schema=entry.schema, partitioning=entry.partitioning
+    )
+    plan = DatasetPlan(
+        dataset,
+        row_counts=[entry.row_counts[i] for i in indexes],
+        file_starts=[starts[i] for i in indexes],
+        total_rows=int(sum(entry.row_counts)),
+    )
+    plan.version_tag = files_version_tag(entry.files)
+    plan.data_files = list(dataset_files.files)
+    return plan
+
+
+def files_version_tag(files: Sequence[DataFile]) -> str:
+    """Identifies one version of a set of files; changes when any file is added, removed or rewritten."""
+    digest = hashlib.sha1()
+    for data_file in sorted(files, key=lambda f: f.path):
+        digest.update(f"{data_file.path}\0{data_file.etag}\0{data_file.size}\n".encode())
+    return "files:" + digest.hexdigest()
+
+
+def list_partitions(
+    service_client,
+    path: str,
+    partition_catalog: Optional[PartitionCatalog] = None,
+    filters: Optional[List[Dict[str, Any]]] = None,
+) -> Tuple[HivePartitioning, List[Dict[str, Any]]]:
+    """Partitions of a partitioned Parquet folder that ``filters`` on partition columns can match."""
+    dataset_files = resolve_dataset_files(service_client, path, partition_catalog, filters)
+    partitioning = dataset_files.partitioning
+    if dataset_files.format != "parquet" or partitioning is None:
+        raise ValueError(f"{path} is not a partitioned Parquet folder")
+    unknown = [column for column in filter_columns(filters) if column not in partitioning.keys]
+    if unknown:
+        raise ValueError(f"Partitions can only be filtered by partition columns, not {', '.join(unknown)}")
+    partitions = summarize_partitions(dataset_files.root, dataset_files.files)
+    expression = build_filter_expression(filters, partitioning.schema)
+    if expression is not None and not dataset_files.pruned:
+        mask = partitioning.matches([partition["values"] for partition in partitions], expression)
+        partitions = [partition for partition, keep in zip(partitions, mask) if keep]
+    return partitioning, partitions
+
+
+def dataset_schema(
+    service_client,
+    path: str,
+    footer_cache,
+    delta_log,
+    version: Optional[int] = None,
+    partition_catalog: Optional[PartitionCatalog] = None,
+) -> pa.Schema:
+    """Arrow schema of a dataset from its first Parquet footer (plus partition columns) or its Delta log."""
+    dataset_files = resolve_dataset_files(service_client, path, partition_catalog)
+    if dataset_files.format == "delta":
+        return delta_log.snapshot(service_client, dataset_files.root, version).schema
+    if not dataset_files.files:
+        raise FileNotFoundError(f"No parquet files found under {path}")
+    schema = None
+    common_metadata = dataset_files.common_metadata or dataset_files.summary
+    newest = max((f.last_modified for f in dataset_files.files if f.last_modified), default=None)
+    if common_metadata is not None and newest is not None and common_metadata.last_modified is not None and (
+        common_metadata.last_modified >= newest
+    ):
+        # Schema of the whole folder in one small read
+        file_client = file_client_for(service_client, common_metadata.path)
+        try:
+            schema = footer_cache.get(
+                file_client, file_client.url, common_metadata.size, common_metadata.etag
+            ).schema
+        except ValueError as e:
+            logger.error(f"Error reading summary metadata {common_metadata.path}: {str(e)}")
+    if schema is None:
+        schema = load_footers(service_client, dataset_files.files[:1], footer_cache)[0].schema
+    return dataset_files.partitioning.with_data_schema(schema) if dataset_files.partitioning else schema
+
+
+def describe_dataset(
+    service_client,
+    path: str,
+    footer_cache,
+    delta_log,
+    version: Optional[int] = None,
+    partition_catalog: Optional[PartitionCatalog] = None,
+) -> Dict[str, Any]:
+    """Dataset metadata (columns with stats, row count, size, partitions) from footers or the Delta log only."""
+    dataset_files = resolve_dataset_files(service_client, path, partition_catalog)
+    name = dataset_files.root.rstrip('/').split('/')[-1]
+    info = {
+        "id": str(uuid.uuid5(uuid.NAMESPACE_URL, dataset_files.root)),
+        "name": name[:-len('.parquet')] if name.endswith('.parquet') else name,
+        "path": dataset_files.root,
+        "format": dataset_files.format,
+    }
+
+    if dataset_files.format == "delta":
+        snapshot = delta_log.snapshot(service_client, dataset_files.root, version)
+        files = snapshot.active_files()
+        row_counts = [f.parsed_stats().get("numRecords") for f in files]
+        last_modified = max((f.modification_time for f in files if f.modification_time), default=None)
+        info.update({
+            "columns": schema_to_columns(snapshot.schema),
+            "rowCount": sum(row_counts) if all(c is not None for c in row_counts) else None,
+            "lastModified": (
+                datetime.fromtimestamp(last_modified / 1000, tz=timezone.utc).isoformat() if last_modified else None
+            ),
+            "size": sum(f.size for f in files),
+            "partitionColumns": snapshot.partition_columns,
+        })
+        return info
+
+    if version is not None:
+        raise ValueError("Versions are only supported for Delta tables")
+    if not dataset_files.files:
+        raise ValueError(f"No parquet files found under {path}")
+
+    footers = dataset_footers(service_client, dataset_files, footer_cache)
+    data_schema = merge_schemas([f.schema for f in footers])
+    partitioning = dataset_files.partitioning
+    schema = partitioning.with_data_schema(data_schema) if partitioning is not None else data_schema
+    if dataset_files.catalog is not None:
+        dataset_files.catalog.row_counts = [f.num_rows for f in footers]
+        dataset_files.catalog.schema = schema
+    last_modified = max((f.last_modified for f in dataset_files.files if f.last_modified), default=None)
+    info.update({
+        "columns": schema_to_columns(schema, footer_column_stats(footers, data_schema.names)),
+        "rowCount": sum(f.num_rows for f in footers),
+        "lastModified": last_modified.isoformat() if hasattr(last_modified, 'isoformat') else last_modified,
+        "size": sum(f.size for f in dataset_files.files),
+        "partitionColumns": partitioning.keys if partitioning is not None else [],
+    })
+    return info
+
+
+# Filters
+def _filter_value(value, field_type: pa.DataType):
+    """Cast a filter value (usually a string from the UI) to the column type."""
+    if value is None:
+        return None
+    try:
+        return pa.scalar(value).cast(field_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, TypeError):
+        raise ValueError(f"Filter value {value!r} is not valid for a column of type {field_type}")
+
+
+def _as_text(field: ds.Expression, field_type: pa.DataType) -> ds.Expression:
+    return field if pa.types.is_string(field_type) or pa.types.is_large_string(field_type) else field.cast(pa.string())
+
+
+def build_filter_expression(filters: Optional[List[Dict[str, Any]]], schema: pa.Schema) -> Optional[ds.Expression]:
+    """Compile FilterOptions dicts into one dataset expression (AND of all filters)."""
+    expression = None
+    for f in filters or []:
+        column = f.get("column")
+        operator = f.get("operator") or f.get("operation") or "equals"
+        value = f.get("value")
+        if column not in schema.names:
+            raise ValueError(f"Unknown filter column: {column}")
+
+        field = ds.field(column)
+        field_type = schema.field(column).type
+
+        if operator in ("equals", "eq", "="):
+            condition = field == _filter_value(value, field_type)
+        elif operator in ("notEquals", "ne", "!="):
+            condition = field != _filter_value(value, field_type)
+        elif operator in ("greaterThan", "gt", ">"):
+            condition = field > _filter_value(value, field_type)
+        elif operator in ("greaterThanOrEqual", "gte", ">="):
+            condition = field >= _filter_value(value, field_type)
+        elif operator in ("lessThan", "lt", "<"):
+            condition = field < _filter_value(value, field_type)
+        elif operator in ("lessThanOrEqual", "lte", "<="):
+            condition = field <= _filter_value(value, field_type)
+        elif operator == "in":
+            values = value if isinstance(value, list) else str(value).split(',')
+            scalars = [_filter_value(v, field_type) for v in values]
+            condition = field.isin(pa.array([v.as_py() if v is not None else None for v in scalars], type=field_type))
+        elif operator == "contains":
+            condition = pc.match_substring(_as_text(field, field_type), str(value))
+        elif operator == "startsWith":
+            condition = pc.starts_with(_as_text(field, field_type), str(value))
+        elif operator == "endsWith":
+            condition = pc.ends_with(_as_text(field, field_type), str(value))
+        elif operator == "isNull":
+            condition = field.is_null()
+        elif operator == "isNotNull":
+            condition = field.is_valid()
+        else:
+            raise ValueError(f"Unsupported filter operator: {operator}")
+
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def parse_filters(filters: Optional[str]) -> List[Dict[str, Any]]:
+    """Parse the JSON ``filters`` query parameter."""
+    if not filters:
+        return []
+    try:
+        parsed = json.loads(filters)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid filters: {str(e)}")
+    return parsed if isinstance(parsed, list) else [parsed]
+
+
+def filter_columns(filters: Optional[List[Dict[str, Any]]]) -> List[str]:
+    return list(dict.fromkeys(f["column"] for f in filters or [] if f.get("column")))
+
+
+# Row-group planning
+class RowGroupRef(NamedTuple):
+    fragment_index: int
+    row_group: int
+    start: int  # global position of the row group's first row
+    num_rows: int
+
+
+class DatasetPlan:
+    """Row-group layout of a parquet dataset, with global row positions.
+
+    A row's position (file order, then row order) is its stable ``__id``.
+    When per-file row counts are known up front (Delta file stats), footers are
+    only loaded for the files a request actually touches, and ``file_starts``
+    keeps positions stable when some files were pruned away.
+    """
+
+    def __init__(
+        self,
+        dataset: ds.Dataset,
+        row_counts: Optional[Sequence[int]] = None,
+        file_starts: Optional[Sequence[int]] = None,
+        total_rows: Optional[int] = None,
+    ):
+        self.dataset = dataset
+        self.schema = dataset.schema
+        self.fragments = list(dataset.get_fragments())
+        self._fragment_refs: Dict[int, List[RowGroupRef]] = {}
+
+        if row_counts is None:
+            # Reads the footers only
+            row_counts = []
+            for fragment in self.fragments:
+                fragment.ensure_complete_metadata()
+                row_counts.append(sum(row_group.num_rows for row_group in fragment.row_groups))
+        if file_starts is None:
+            file_starts = list(np.cumsum([0] + list(row_counts))[:-1])
+        self._file_starts = [int(start) for start in file_starts]
+        self._row_counts = list(row_counts)
+        self.total_rows = total_rows if total_rows is not None else int(sum(row_counts))
+        # Set by open_plan: the dataset's URL and the version the positions
+        # refer to, the DataFile of each fragment and, for Delta tables, the snapshot
+        self.source: Optional[str] = None
+        self.version_tag: Optional[str] = None
+        self.data_files: List[DataFile] = []
+        self.snapshot: Optional[DeltaSnapshot] = None
+
+    def fragment_refs(self, fragment_index: int) -> List[RowGroupRef]:
+        """Row groups of one file, loading its footer on first use."""
+        refs = self._fragment_refs.get(fragment_index)
+        if refs is None:
+            fragment = self.fragments[fragment_index]
+            fragment.ensure_complete_metadata()
+            refs = []
+            start = self._file_starts[fragment_index]
+            for row_group in fragment.row_groups:
+                refs.append(RowGroupRef(fragment_index, row_group.id, start, row_group.num_rows))
+                start += row_group.num_rows
+            self._fragment_refs[fragment_index] = refs
+        return refs
+
+    @property
+    def complete(self) -> bool:
+        """Whether the plan holds every row of the dataset (no files were pruned)."""
+        return sum(self._row_counts) == self.total_rows
+
+    @property
+    def refs(self) -> List[RowGroupRef]:
+        return [ref for i in range(len(self.fragments)) for ref in self.fragment_refs(i)]
+
+    def prune(self, expression: Optional[ds.Expression]) -> List[RowGroupRef]:
+        """Row groups whose statistics may satisfy the expression."""
+        if expression is None:
+            return list(self.refs)
+        refs = []
+        for fragment_index, fragment in enumerate(self.fragments):
+            by_id = {ref.row_group: ref for ref in self.fragment_refs(fragment_index)}
+            for piece in fragment.split_by_row_group(expression, schema=self.schema):
+                refs.append(by_id[piece.row_groups[0].id])
+        return refs
+
+    def read(self, refs: Sequence[RowGroupRef], columns: Optional[List[str]]) -> pa.Table:
+        """Read columns of the given row groups (in ref order) as one table."""
+        tables = []
+        i = 0
+        while i < len(refs):
+            # Consecutive row groups of one file are read in a single call
+            j = i
+            while j + 1 < len(refs) and refs[j + 1].fragment_index == refs[i].fragment_index:
+                j += 1
+            fragment = self.fragments[refs[i].fragment_index]
+            subset = fragment.subset(row_group_ids=[ref.row_group for ref in refs[i:j + 1]])
+            tables.append(subset.to_table(columns=columns, schema=self.schema))
+            i = j + 1
+        if not tables:
+            return self.schema.empty_table() if columns is None else pa.schema(
+                [self.schema.field(c) for c in columns]
+            ).empty_table()
+        return pa.concat_tables(tables)
+
+    def positions(self, refs: Sequence[RowGroupRef]) -> np.ndarray:
+        if not refs:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(ref.start, ref.start + ref.num_rows, dtype=np.int64) for ref in refs])
+
+    def file_ranges(self) -> List[Tuple[int, int, int]]:
+        """(fragment index, first position, row count) of every file."""
+        return [(i, self._file_starts[i], self._row_counts[i]) for i in range(len(self.fragments))]
+
+    def covers(self, position: int) -> bool:
+        """Whether a position lies in one of the plan's files (pruned files are not)."""
+        fragment_index = bisect.bisect_right(self._file_starts, position) - 1
+        return fragment_index >= 0 and position < self._file_starts[fragment_index] + self._row_counts[fragment_index]
+
+    def ref_for(self, position: int) -> RowGroupRef:
+        fragment_index = bisect.bisect_right(self._file_starts, position) - 1
+        refs = self.fragment_refs(fragment_index)
+        return refs[bisect.bisect_right([ref.start for ref in refs], position) - 1]
+
+    def take(self, positions: Sequence[int], columns: Optional[List[str]]) -> pa.Table:
+        """Read the rows at the given global positions, in that order.
+
+        Only the row groups that hold those rows are read.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(positions) == 0:
+            return self.read([], columns)
+
+        position_refs = [self.ref_for(int(p)) for p in positions]
+        refs = sorted(set(position_refs), key=lambda r: r.start)
+        table = self.read(refs, columns)
+
+        # Map each global position to its row in the concatenated table
+        offsets = {}
+        row = 0
+        for ref in refs:
+            offsets[ref.start] = row
+            row += ref.num_rows
+        indices = [offsets[ref.start] + int(p) - ref.start for p, ref in zip(positions, position_refs)]
+        return table.take(pa.array(indices, type=pa.int64()))
+
+    def match(
+        self,
+        refs: Sequence[RowGroupRef],
+        key_columns: List[str],
+        expression: Optional[ds.Expression],
+        overlay=None,
+    ) -> pa.Table:
+        """Scan key columns of the given row groups and keep rows matching the expression.
+
+        Returns the key columns plus the rows' global positions. Edits in the
+        overlay are applied before filtering.
+        """
+        table = self.read(refs, key_columns)
+        positions = self.positions(refs)
+        if overlay is not None:
+            table = overlay.apply(table, positions)
+        table = table.append_column(POSITION_COLUMN, pa.array(positions))
+        if expression is not None:
+            table = table.filter(expression)
+        return table
+
+
+def candidate_refs(
+    plan: DatasetPlan,
+    expression: Optional[ds.Expression],
+    key_columns: Sequence[str],
+    overlay=None,
+) -> List[RowGroupRef]:
+    """Row groups that may hold matching rows, in dataset order.
+
+    Row groups holding edits to the key columns are kept even where the file
+    statistics rule them out, since the edited values may match.
+    """
+    refs = plan.prune(expression)
+    if overlay is not None and overlay.touches(key_columns):
+        edited = {plan.ref_for(int(p)) for p in overlay.edited_positions(key_columns) if plan.covers(int(p))}
+        refs = sorted(set(refs) | edited, key=lambda ref: ref.start)
+    return refs
+
+
+def project_schema(schema: pa.Schema, columns: Optional[Sequence[str]]) -> pa.Schema:
+    """The schema of the requested columns, rejecting unknown ones."""
+    if not columns:
+        return schema
+    unknown = [c for c in columns if c not in schema.names]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    return pa.schema([schema.field(c) for c in columns])
+
+
+class PreviewResult(NamedTuple):
+    schema: pa.Schema
+    table: pa.Table
+    row_ids: List[int]
+    total_rows: int
+    modified: List[int] = []
+
+
+def read_preview(
+    plan: DatasetPlan,
+    page: int,
+    page_size: int,
+    sort_column: Optional[str] = None,
+    sort_direction: Optional[str] = "asc",
+    filters: Optional[List[Dict[str, Any]]] = None,
+    columns: Optional[List[str]] = None,
+    overlay=None,
+    sort_index: Optional[SortIndex] = None,
+) -> PreviewResult:
+    """Read one page of a dataset with filtering and sorting pushed as far down as possible.
+
+    Unsaved edits in ``overlay`` (an edit_overlay.DatasetOverlay) are merged
+    into the rows, and into the key columns before filtering and sorting.
+    Sorted pages come from ``sort_index`` or a top-k scan where possible (see
+    ``sorted_positions``).
+    """
+    schema = project_schema(plan.schema, columns)
+    if sort_column and sort_column not in plan.schema.names:
+        raise ValueError(f"Unknown sort column: {sort_column}")
+
+    expression = build_filter_expression(filters, plan.schema)
+    start = (page - 1) * page_size
+
+    sorted_page = None
+    if sort_column:
+        sorted_page = sorted_positions(
+            plan, sort_column, sort_direction == "desc", start, page_size, filters, expression, overlay, sort_index
+        )
+
+    if sorted_page is not None:
+        positions, total_rows = sorted_page
+    elif expression is None and not sort_column:
+        # Plain paging: positions map straight onto row groups
+        total_rows = plan.total_rows
+        positions = np.arange(start, min(start + page_size, total_rows), dtype=np.int64)
+    else:
+        key_columns = filter_columns(filters)
+        if sort_column and sort_column not in key_columns:
+            key_columns.append(sort_column)
+        refs = candidate_refs(plan, expression, key_columns, overlay)
+        matches = plan.match(refs, key_columns, expression, overlay)
+        total_rows = matches.num_rows
+        if sort_column:
+            order = "descending" if sort_direction == "desc" else "ascending"
+            indices = pc.sort_indices(matches, sort_keys=[(sort_column, order)], null_placement="at_end")
+            matches = matches.take(indices.slice(start, page_size))
+        else:
+            matches = matches.slice(start, page_size)
+        positions = matches.column(POSITION_COLUMN).to_numpy()
+
+    table = plan.take(positions, [f.name for f in schema])
+    modified = []
+    if overlay is not None:
+        table = overlay.apply(table, positions)
+        modified = [int(p) for p in np.asarray(positions)[overlay.is_modified(positions)]]
+    return PreviewResult(schema, table, [int(p) for p in positions], total_rows, modified)
+
+
+def sorted_positions(
+    plan: DatasetPlan,
+    sort_column: str,
+    descending: bool,
+    start: int,
+    page_size: int,
+    filters: Optional[List[Dict[str, Any]]],
+    expression: Optional[ds.Expression],
+    overlay=None,
+    sort_index: Optional[SortIndex] = None,
+) -> Optional[Tuple[np.ndarray, int]]:
+    """Positions of a sorted page and the matching row count, without sorting every row.
+
+    An existing index is used for any page. Unfiltered pages near the top are
+    taken from a top-k scan; other pages build the index first, which needs
+    every file of the dataset. Returns None when neither applies (the plan was
+    pruned, or unsaved edits change the sort column) and the matches must be
+    sorted in full.
+    """
+    if overlay is not None and overlay.touches([sort_column]):
+        return None
+    order = sort_index.get(plan, sort_column, descending) if sort_index is not None else None
+    if order is None:
+        if expression is None and start + page_size <= SORT_TOP_ROWS:
+            positions = top_k_positions(plan, sort_column, descending, start + page_size, sort_index)
+            return positions[start:], plan.total_rows
+        if sort_index is None or not sort_index.enabled or not plan.complete or SortIndex.key(plan, sort_column) is None:
+            return None
+        order = sort_index.build(plan, sort_column, descending)
+
+    if expression is None:
+        return np.asarray(order[start:start + page_size], dtype=np.int64), plan.total_rows
+    key_columns = filter_columns(filters)
+    refs = candidate_refs(plan, expression, key_columns, overlay)
+    matches = plan.match(refs, key_columns, expression, overlay)
+    matching = matches.column(POSITION_COLUMN).to_numpy()
+    return filtered_page(order, matching, plan.total_rows, start, page_size), matches.num_rows
+
+
+def schema_to_columns(schema: pa.Schema, stats: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """DatasetColumn dicts for an Arrow schema, with ColumnStats when given."""
+    columns = []
+    for field in schema:
+        column = {"name": field.name, "type": str(field.type), "nullable": field.nullable}
+        if stats and field.name in stats:
+            column["stats"] = stats[field.name]
+        columns.append(column)
+    return columns
+
+
+def table_to_rows(table: pa.Table, row_ids: Sequence[Any], modified: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+    """Row dicts (with ``__id``, and ``__modified`` for edited rows) for the JSON preview response."""
+    rows = table.to_pylist()
+    modified = set(modified)
+    for row, row_id in zip(rows, row_ids):
+        for key, value in row.items():
+            # NaN is not valid JSON
+            if isinstance(value, float) and math.isnan(value):
+                row[key] = None
+        row["__id"] = str(row_id)
+        if row_id in modified:
+            row["__modified"] = True
+    return rows
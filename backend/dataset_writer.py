@@ -0,0 +1,286 @@
+"""
+Commits of saved edits back to ADLS.
+
+Only files that hold edited rows are rewritten. Each one is streamed row group
+by row group: the source is read with ranged requests, the edit overlay is
+applied to the row groups that contain edits, and the result goes through a
+ParquetWriter straight into a chunked append/flush upload, so memory stays at
+about one row group. Row-group sizes and compression of the original are kept.
+
+Plain Parquet files are written to a hidden temporary name and renamed over
+the original only if it still has the etag the edits were made against; a
+folder of files has no transaction log, so each file is replaced atomically on
+its own. Delta tables get new data files and a single commit that removes the
+old ones. The commit file is created only if that version does not exist yet,
+so of two concurrent writers exactly one wins.
+"""
+
+import json
+import time
+import uuid
+import struct
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError
+
+from adls_fs import ADLSAppendFile, discard_file, open_range_file, split_path, staging_path
+from column_stats import footer_column_stats
+from dataset_reader import DatasetPlan, DataFile, file_client_for, open_plan
+from delta_log import DELTA_LOG_DIR, DeltaSnapshot
+from footer_cache import FooterInfo
+
+logger = logging.getLogger(__name__)
+
+# Highest Delta writer protocol version whose requirements commits honour
+MAX_DELTA_WRITER_VERSION = 2
+
+
+class CommitConflictError(Exception):
+    """The dataset changed, or another writer committed, after the edits were saved."""
+
+
+def edited_file_ranges(plan: DatasetPlan, overlay) -> List[Tuple[int, int, int]]:
+    """(fragment index, first position, row count) of the files holding edited rows."""
+    positions = overlay.positions
+    ranges = []
+    for fragment_index, start, num_rows in plan.file_ranges():
+        low, high = np.searchsorted(positions, [start, start + num_rows])
+        if high > low:
+            ranges.append((fragment_index, start, num_rows))
+    return ranges
+
+
+def _edited_columns(overlay, start: int, num_rows: int) -> List[str]:
+    low, high = np.searchsorted(overlay.positions, [start, start + num_rows])
+    return [name for name, mask in overlay.masks.items() if mask[low:high].any()]
+
+
+def _changes_value(overlay, name: str, start: int, num_rows: int, value: Any) -> bool:
+    """Whether an edited cell of column ``name`` in the rows of one file holds something other than ``value``."""
+    low, high = np.searchsorted(overlay.positions, [start, start + num_rows])
+    edited = overlay.values[name].slice(low, high - low).filter(pa.array(overlay.masks[name][low:high]))
+    if value is None:
+        return edited.null_count < len(edited)
+    return edited.null_count > 0 or not pc.all(pc.equal(edited, pa.scalar(value, edited.type))).as_py()
+
+
+def _partition_values(plan: DatasetPlan, fragment_index: int) -> Dict[str, Any]:
+    return ds.get_partition_keys(plan.fragments[fragment_index].partition_expression)
+
+
+def _compression(metadata: pq.FileMetaData) -> str:
+    if metadata.num_row_groups and metadata.row_group(0).num_columns:
+        return metadata.row_group(0).column(0).compression.lower()
+    return "snappy"
+
+
+def rewrite_file(
+    service_client,
+    data_file: DataFile,
+    footer_cache,
+    target_client,
+    start: int,
+    overlay,
+    partition_values: Optional[Dict[str, Any]] = None,
+) -> ADLSAppendFile:
+    """Stream one file into ``target_client`` with the overlay's edits applied.
+
+    ``start`` is the global position of the file's first row and
+    ``partition_values`` the values of the partition columns its path (or Delta
+    log entry) gives it. Posted rows may carry those columns unchanged; editing
+    them is rejected. Returns the closed sink, which knows the written size,
+    etag and footer bytes.
+    """
+    source_client = file_client_for(service_client, data_file.path)
+    footer = footer_cache.get(source_client, source_client.url, data_file.size, data_file.etag)
+    partition_values = partition_values or {}
+    changed = [
+        c for c in _edited_columns(overlay, start, footer.num_rows)
+        if c not in footer.schema.names
+        and (c not in partition_values or _changes_value(overlay, c, start, footer.num_rows, partition_values[c]))
+    ]
+    if changed:
+        raise ValueError(f"Partition columns cannot be edited: {', '.join(changed)}")
+
+    source = open_range_file(source_client, data_file.size, tail=footer.tail)
+    sink = ADLSAppendFile(target_client)
+    try:
+        parquet_file = pq.ParquetFile(source, metadata=footer.metadata)
+        writer = pq.ParquetWriter(
+            pa.PythonFile(sink, mode="w"), parquet_file.schema_arrow, compression=_compression(footer.metadata)
+        )
+        position = start
+        for row_group in range(footer.num_row_groups):
+            table = parquet_file.read_row_group(row_group)
+            table = overlay.apply(table, np.arange(position, position + table.num_rows, dtype=np.int64))
+            # One row group in, one row group out: the layout (and row positions) stay the same
+            writer.write_table(table, row_group_size=max(table.num_rows, 1))
+            position += table.num_rows
+        writer.close()
+        sink.close()
+    except Exception:
+        sink.abort()
+        raise
+    finally:
+        source.close()
+    return sink
+
+
+def _written_footer(sink: ADLSAppendFile, path: str, etag: str, file_client, footer_cache) -> FooterInfo:
+    """Footer of a file just written, parsed from the bytes kept by the sink when they suffice."""
+    tail = sink.tail
+    if len(tail) >= 8:
+        # Metadata plus its length and the magic, as returned by read_parquet_tail
+        footer_length = struct.unpack("<I", tail[-8:-4])[0] + 8
+        if footer_length <= len(tail):
+            footer = FooterInfo(path, etag, sink.size, tail, footer_length)
+            footer_cache.put(footer)
+            return footer
+    return footer_cache.get(file_client, path, sink.size, etag)
+
+
+def _commit_parquet(service_client, plan: DatasetPlan, overlay, footer_cache, ranges) -> int:
+    bytes_written = 0
+    for fragment_index, start, _ in ranges:
+        data_file = plan.data_files[fragment_index]
+        container, rest = split_path(data_file.path)
+        container_client = service_client.get_file_system_client(container)
+        temp_client = container_client.get_file_client(staging_path(rest, "_commit"))
+        conditions = {}
+        if data_file.etag:
+            conditions = {"etag": data_file.etag, "match_condition": MatchConditions.IfNotModified}
+        try:
+            sink = rewrite_file(
+                service_client, data_file, footer_cache, temp_client, start, overlay,
+                _partition_values(plan, fragment_index),
+            )
+            temp_client.rename_file(f"{container}/{rest}", **conditions)
+        except ResourceModifiedError:
+            discard_file(temp_client)
+            raise CommitConflictError(f"{data_file.path} changed after the edits were saved")
+        except BaseException:
+            discard_file(temp_client)
+            raise
+        bytes_written += sink.size
+    return bytes_written
+
+
+def _check_delta_writable(snapshot: DeltaSnapshot) -> None:
+    writer_version = int(snapshot.protocol.get("minWriterVersion") or 1)
+    if writer_version > MAX_DELTA_WRITER_VERSION:
+        raise NotImplementedError(f"Delta writer version {writer_version} is not supported")
+    configuration = snapshot.metadata.get("configuration") or {}
+    if str(configuration.get("delta.appendOnly", "false")).lower() == "true":
+        raise ValueError("Delta table is append-only")
+
+
+def _delta_stats(footer: FooterInfo) -> str:
+    stats = footer_column_stats([footer])
+    return json.dumps({
+        "numRecords": footer.num_rows,
+        "minValues": {name: s["min"] for name, s in stats.items() if s["min"] is not None},
+        "maxValues": {name: s["max"] for name, s in stats.items() if s["max"] is not None},
+        "nullCount": {name: s["nullCount"] for name, s in stats.items() if s["nullCount"] is not None},
+    }, default=str)
+
+
+def _commit_delta(service_client, plan: DatasetPlan, overlay, footer_cache, ranges) -> Tuple[int, int]:
+    snapshot = plan.snapshot
+    _check_delta_writable(snapshot)
+    container, table_rest = split_path(snapshot.table_path)
+    container_client = service_client.get_file_system_client(container)
+    now = int(time.time() * 1000)
+
+    actions: List[Dict[str, Any]] = [{
+        "commitInfo": {
+            "timestamp": now,
+            "operation": "UPDATE",
+            "operationParameters": {"predicate": "[]"},
+            "readVersion": snapshot.version,
+            "isBlindAppend": False,
+        }
+    }]
+    written = []
+    bytes_written = 0
+    try:
+        for fragment_index, start, _ in ranges:
+            data_file = plan.data_files[fragment_index]
+            rel_path = data_file.path[len(snapshot.table_path) + 1:]
+            delta_file = snapshot.files[rel_path]
+            directory = rel_path.rpartition('/')[0]
+            source_client = file_client_for(service_client, data_file.path)
+            footer = footer_cache.get(source_client, source_client.url, data_file.size, data_file.etag)
+            new_name = f"part-00000-{uuid.uuid4()}-c000.{_compression(footer.metadata)}.parquet"
+            new_rel_path = f"{directory}/{new_name}" if directory else new_name
+            target_client = container_client.get_file_client(
+                f"{table_rest}/{new_rel_path}" if table_rest else new_rel_path
+            )
+            written.append(target_client)
+
+            sink = rewrite_file(
+                service_client, data_file, footer_cache, target_client, start, overlay,
+                _partition_values(plan, fragment_index),
+            )
+            bytes_written += sink.size
+            # Same stand-in etag as DeltaFile.version_tag, so the next read finds the footer cached
+            new_footer = _written_footer(sink, target_client.url, f'"{now}-{sink.size}"', target_client, footer_cache)
+
+            actions.append({"remove": {
+                "path": quote(delta_file.path, safe="/="),
+                "deletionTimestamp": now,
+                "dataChange": True,
+                "extendedFileMetadata": True,
+                "partitionValues": delta_file.partition_values,
+                "size": delta_file.size,
+            }})
+            actions.append({"add": {
+                "path": quote(new_rel_path, safe="/="),
+                "partitionValues": delta_file.partition_values,
+                "size": sink.size,
+                "modificationTime": now,
+                "dataChange": True,
+                "stats": _delta_stats(new_footer),
+            }})
+
+        version = snapshot.version + 1
+        log_dir = f"{table_rest}/{DELTA_LOG_DIR}" if table_rest else DELTA_LOG_DIR
+        log_client = container_client.get_file_client(f"{log_dir}/{version:020d}.json")
+        payload = "\n".join(json.dumps(action) for action in actions) + "\n"
+        try:
+            # Fails if another writer already committed this version
+            log_client.upload_data(payload.encode("utf-8"), overwrite=False)
+        except ResourceExistsError:
+            raise CommitConflictError(f"Version {version} was committed by another writer; reload and save again")
+    except Exception:
+        for target_client in written:
+            discard_file(target_client)
+        raise
+    return version, bytes_written
+
+
+def commit_changes(service_client, path: str, overlay, footer_cache, delta_log) -> Dict[str, Any]:
+    """Write an overlay's edits into the dataset at ``path``, rewriting only the files they touch."""
+    plan = open_plan(service_client, path, footer_cache, delta_log)
+    if plan.version_tag != overlay.base_version:
+        raise CommitConflictError("The dataset changed after the edits were saved")
+
+    ranges = edited_file_ranges(plan, overlay)
+    version: Optional[int] = None
+    if plan.snapshot is not None:
+        version, bytes_written = _commit_delta(service_client, plan, overlay, footer_cache, ranges)
+    else:
+        bytes_written = _commit_parquet(service_client, plan, overlay, footer_cache, ranges)
+    return {
+        "filesRewritten": len(ranges),
+        "rowsChanged": overlay.row_count,
+        "bytesWritten": bytes_written,
+        "version": version,
+    }
@@ -0,0 +1,418 @@
+"""
+Delta Lake transaction log reader.
+
+A table snapshot is resolved from the newest checkpoint at or below the wanted
+version plus the JSON commits after it, never by replaying the whole log.
+Snapshots are cached per (table, version); a newer version is built from the
+newest cached snapshot below it by applying only the commits in between, and
+older versions (time travel) start from the matching checkpoint.
+
+Only what previews need is modelled: the active files with their partition
+values and statistics, the table metadata and the protocol.
+"""
+
+import os
+import re
+import json
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from adls_fs import open_range_file, split_path
+from fanout import MAX_CONCURRENCY
+from metrics import carry
+
+logger = logging.getLogger(__name__)
+
+DELTA_LOG_DIR = "_delta_log"
+DEFAULT_MAX_SNAPSHOTS = int(os.environ.get("ADLS_DELTA_SNAPSHOT_CACHE_SIZE", "64"))
+
+_COMMIT_RE = re.compile(r"^(\d{20})\.json$")
+_CHECKPOINT_RE = re.compile(r"^(\d{20})\.checkpoint(?:\.(\d{10})\.(\d{10}))?\.parquet$")
+
+# Reader features this reader does not implement
+_UNSUPPORTED_FEATURES = {"deletionVectors", "columnMapping"}
+
+
+class DeltaFile(NamedTuple):
+    path: str  # relative to the table root, URL-decoded
+    size: int
+    partition_values: Dict[str, Optional[str]]
+    modification_time: Optional[int]
+    stats: Optional[str]  # raw JSON stats string, parsed on demand
+
+    def parsed_stats(self) -> Dict[str, Any]:
+        if not self.stats:
+            return {}
+        try:
+            return json.loads(self.stats)
+        except ValueError:
+            return {}
+
+    @property
+    def version_tag(self) -> str:
+        """Stand-in etag: data files are immutable, so path, size and mtime identify a version."""
+        return f'"{self.modification_time}-{self.size}"'
+
+
+class DeltaSnapshot:
+    """State of a Delta table at one version."""
+
+    def __init__(self, table_path: str, version: int = -1):
+        self.table_path = table_path
+        self.version = version
+        self.metadata: Dict[str, Any] = {}
+        self.protocol: Dict[str, Any] = {}
+        self.files: Dict[str, DeltaFile] = {}
+
+    def copy(self) -> 'DeltaSnapshot':
+        snapshot = DeltaSnapshot(self.table_path, self.version)
+        snapshot.metadata = self.metadata
+        snapshot.protocol = self.protocol
+        snapshot.files = dict(self.files)
+        return snapshot
+
+    def apply(self, action: Dict[str, Any]) -> None:
+        if action.get("add"):
+            add = action["add"]
+            path = _relative_path(add["path"])
+            partition_values = add.get("partitionValues") or {}
+            if isinstance(partition_values, list):
+                # Checkpoints store maps as key/value pairs
+                partition_values = dict(partition_values)
+            self.files[path] = DeltaFile(
+                path, add.get("size") or 0, partition_values, add.get("modificationTime"), add.get("stats")
+            )
+        elif action.get("remove"):
+            self.files.pop(_relative_path(action["remove"]["path"]), None)
+        elif action.get("metaData"):
+            metadata = dict(action["metaData"])
+            if isinstance(metadata.get("configuration"), list):
+                metadata["configuration"] = dict(metadata["configuration"])
+            self.metadata = metadata
+        elif action.get("protocol"):
+            self.protocol = action["protocol"]
+
+    @property
+    def partition_columns(self) -> List[str]:
+        return list(self.metadata.get("partitionColumns") or [])
+
+    @property
+    def schema(self) -> pa.Schema:
+        schema_string = self.metadata.get("schemaString")
+        if not schema_string:
+            raise ValueError(f"Delta table {self.table_path} has no schema")
+        return delta_schema_to_arrow(json.loads(schema_string))
+
+    def active_files(self) -> List[DeltaFile]:
+        """Active data files in a stable (path) order."""
+        return [self.files[path] for path in sorted(self.files)]
+
+    def check_supported(self) -> None:
+        features = set(self.protocol.get("readerFeatures") or [])
+        unsupported = features & _UNSUPPORTED_FEATURES
+        mapping_mode = (self.metadata.get("configuration") or {}).get("delta.columnMapping.mode", "none")
+        if mapping_mode != "none":
+            unsupported.add("columnMapping")
+        if unsupported:
+            raise NotImplementedError(
+                f"Delta reader features not supported: {', '.join(sorted(unsupported))}"
+            )
+
+
+def _relative_path(path: str) -> str:
+    """Add/remove paths are URL-encoded and relative, or absolute URIs for shallow clones."""
+    if "://" in path:
+        return urlparse(path).path.lstrip('/')
+    return unquote(path)
+
+
+_PRIMITIVE_TYPES = {
+    "string": pa.string(),
+    "long": pa.int64(),
+    "integer": pa.int32(),
+    "short": pa.int16(),
+    "byte": pa.int8(),
+    "float": pa.float32(),
+    "double": pa.float64(),
+    "boolean": pa.bool_(),
+    "binary": pa.binary(),
+    "date": pa.date32(),
+    "timestamp": pa.timestamp("us", tz="UTC"),
+    "timestamp_ntz": pa.timestamp("us"),
+}
+
+
+def _delta_type_to_arrow(delta_type) -> pa.DataType:
+    if isinstance(delta_type, str):
+        if delta_type in _PRIMITIVE_TYPES:
+            return _PRIMITIVE_TYPES[delta_type]
+        match = re.match(r"decimal\((\d+),\s*(\d+)\)", delta_type)
+        if match:
+            return pa.decimal128(int(match.group(1)), int(match.group(2)))
+        raise ValueError(f"Unsupported Delta type: {delta_type}")
+    kind = delta_type.get("type")
+    if kind == "struct":
+        return pa.struct([_delta_field_to_arrow(f) for f in delta_type["fields"]])
+    if kind == "array":
+        return pa.list_(_delta_type_to_arrow(delta_type["elementType"]))
+    if kind == "map":
+        return pa.map_(_delta_type_to_arrow(delta_type["keyType"]), _delta_type_to_arrow(delta_type["valueType"]))
+    raise ValueError(f"Unsupported Delta type: {kind}")
+
+
+def _delta_field_to_arrow(field: Dict[str, Any]) -> pa.Field:
+    return pa.field(field["name"], _delta_type_to_arrow(field["type"]), field.get("nullable", True))
+
+
+def delta_schema_to_arrow(schema: Dict[str, Any]) -> pa.Schema:
+    """Arrow schema for a Delta ``schemaString``."""
+    return pa.schema([_delta_field_to_arrow(f) for f in schema.get("fields", [])])
+
+
+def cast_value(value, field_type: pa.DataType):
+    """Cast a partition value or statistic (strings and JSON scalars) to a Python value of the column type."""
+    if value is None:
+        return None
+    return pa.array([value]).cast(field_type)[0].as_py()
+
+
+# File pruning
+def _file_may_match(delta_file: DeltaFile, filters: List[Dict[str, Any]], schema: pa.Schema, partition_columns) -> bool:
+    stats = None
+    for f in filters:
+        column = f.get("column")
+        if column not in schema.names:
+            continue
+        operator = f.get("operator") or f.get("operation") or "equals"
+        field_type = schema.field(column).type
+        try:
+            if column in partition_columns:
+                value = delta_file.partition_values.get(column)
+                typed = cast_value(value, field_type)
+                if not _value_may_match(typed, typed, 0 if typed is not None else 1, 1, operator, f.get("value"), field_type):
+                    return False
+                continue
+
+            if stats is None:
+                stats = delta_file.parsed_stats()
+            num_records = stats.get("numRecords")
+            null_count = (stats.get("nullCount") or {}).get(column)
+            minimum = cast_value((stats.get("minValues") or {}).get(column), field_type)
+            maximum = cast_value((stats.get("maxValues") or {}).get(column), field_type)
+            if not _value_may_match(minimum, maximum, null_count, num_records, operator, f.get("value"), field_type):
+                return False
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError, TypeError, ValueError):
+            # Anything that cannot be compared keeps the file
+            continue
+    return True
+
+
+def _value_may_match(minimum, maximum, null_count, num_records, operator, value, field_type) -> bool:
+    """Whether a file with these bounds can contain a row matching one filter."""
+    if operator == "isNull":
+        return null_count is None or null_count > 0
+    if operator == "isNotNull":
+        return null_count is None or num_records is None or null_count < num_records
+
+    if num_records is not None and null_count is not None and num_records == null_count:
+        # Only nulls, which match no comparison
+        return False
+    if operator in ("contains", "startsWith", "endsWith"):
+        if minimum is None or minimum != maximum:
+            return True
+        text = str(minimum)
+        return {
+            "contains": lambda: str(value) in text,
+            "startsWith": lambda: text.startswith(str(value)),
+            "endsWith": lambda: text.endswith(str(value)),
+        }[operator]()
+    if minimum is None or maximum is None:
+        return True
+
+    if operator == "in":
+        values = value if isinstance(value, list) else str(value).split(',')
+        return any(minimum <= cast_value(v, field_type) <= maximum for v in values)
+    target = cast_value(value, field_type)
+    if operator in ("equals", "eq", "="):
+        return minimum <= target <= maximum
+    if operator in ("notEquals", "ne", "!="):
+        return not (minimum == maximum == target)
+    if operator in ("greaterThan", "gt", ">"):
+        return maximum > target
+    if operator in ("greaterThanOrEqual", "gte", ">="):
+        return maximum >= target
+    if operator in ("lessThan", "lt", "<"):
+        return minimum < target
+    if operator in ("lessThanOrEqual", "lte", "<="):
+        return minimum <= target
+    return True
+
+
+def prune_files(snapshot: DeltaSnapshot, filters: Optional[List[Dict[str, Any]]]) -> List[DeltaFile]:
+    """Active files that may hold rows matching the filters, using partition values and file stats."""
+    files = snapshot.active_files()
+    if not filters:
+        return files
+    schema = snapshot.schema
+    partition_columns = set(snapshot.partition_columns)
+    return [f for f in files if _file_may_match(f, filters, schema, partition_columns)]
+
+
+class DeltaLog:
+    """Resolves Delta table snapshots through a DataLake service client, with a snapshot cache."""
+
+    def __init__(self, max_snapshots: int = DEFAULT_MAX_SNAPSHOTS):
+        self.max_snapshots = max_snapshots
+        self._snapshots: "OrderedDict[Tuple[str, int], DeltaSnapshot]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.commits_read = 0
+        self.checkpoints_read = 0
+
+    def snapshot(self, service_client, table_path: str, version: Optional[int] = None) -> DeltaSnapshot:
+        """Snapshot of a table (``container/path``) at a version, the latest by default."""
+        table_path = table_path.strip('/')
+        container, rest = split_path(table_path)
+        container_client = service_client.get_file_system_client(container)
+        log_dir = f"{rest}/{DELTA_LOG_DIR}" if rest else DELTA_LOG_DIR
+        table_key = f"{getattr(container_client, 'url', container).rstrip('/')}/{rest}"
+
+        if version is not None:
+            # A past version never changes, so it is served without listing the log
+            with self._lock:
+                cached = self._snapshots.get((table_key, version))
+                if cached is not None:
+                    self._snapshots.move_to_end((table_key, version))
+                    self.hits += 1
+                    return cached
+
+        commits, checkpoints = self._list_log(container_client, log_dir)
+        if not commits and not checkpoints:
+            raise ValueError(f"{table_path} is not a Delta table")
+        latest = max(list(commits) + list(checkpoints))
+        target = latest if version is None else version
+        if target > latest or target < 0:
+            raise ValueError(f"Version {target} does not exist (latest is {latest})")
+
+        with self._lock:
+            cached = self._snapshots.get((table_key, target))
+            if cached is not None:
+                self._snapshots.move_to_end((table_key, target))
+                self.hits += 1
+                return cached
+            self.misses += 1
+            checkpoint = max((v for v in checkpoints if v <= target), default=None)
+            # The newest cached snapshot below the target is a better base than an older checkpoint
+            bases = [v for (key, v) in self._snapshots if key == table_key and v < target]
+            base_version = max(bases, default=None)
+            base = None
+            if base_version is not None and (checkpoint is None or base_version >= checkpoint):
+                base = self._snapshots[(table_key, base_version)].copy()
+
+        if base is None:
+            if checkpoint is not None:
+                base = self._read_checkpoint(container_client, log_dir, table_path, checkpoint, checkpoints[checkpoint])
+            else:
+                base = DeltaSnapshot(table_path)
+
+        missing = [v for v in range(base.version + 1, target + 1) if v not in commits]
+        if missing:
+            raise ValueError(f"Delta log of {table_path} is missing commits {missing[:5]}")
+        for commit_version, actions in self._read_commits(container_client, log_dir, range(base.version + 1, target + 1)):
+            for action in actions:
+                base.apply(action)
+            base.version = commit_version
+        base.check_supported()
+
+        with self._lock:
+            self._snapshots[(table_key, target)] = base
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return base
+
+    def _list_log(self, container_client, log_dir: str):
+        """Commit versions and complete checkpoints (version -> part file names) in the log."""
+        commits = set()
+        parts: Dict[int, Dict[Optional[int], List[str]]] = {}
+        for item in container_client.get_paths(path=log_dir, recursive=False):
+            name = item.name.rsplit('/', 1)[-1]
+            match = _COMMIT_RE.match(name)
+            if match:
+                commits.add(int(match.group(1)))
+                continue
+            match = _CHECKPOINT_RE.match(name)
+            if match:
+                total = int(match.group(3)) if match.group(3) else None
+                parts.setdefault(int(match.group(1)), {}).setdefault(total, []).append(item.name)
+
+        checkpoints = {}
+        for checkpoint_version, by_total in parts.items():
+            for total, names in by_total.items():
+                # Multi-part checkpoints only count once every part is there
+                if total is None or len(names) == total:
+                    checkpoints[checkpoint_version] = sorted(names)
+                    break
+        return commits, checkpoints
+
+    def _read_checkpoint(self, container_client, log_dir, table_path, checkpoint_version, names) -> DeltaSnapshot:
+        self.checkpoints_read += 1
+        snapshot = DeltaSnapshot(table_path, checkpoint_version)
+        for name in names:
+            source = open_range_file(container_client.get_file_client(name))
+            try:
+                parquet_file = pq.ParquetFile(source)
+                columns = [c for c in ("protocol", "metaData", "add", "remove") if c in parquet_file.schema_arrow.names]
+                table = parquet_file.read(columns=columns)
+            finally:
+                source.close()
+            # Removes in a checkpoint are tombstones, not needed to know the active files
+            for column in ("protocol", "metaData", "add"):
+                if column not in table.column_names:
+                    continue
+                for value in table.column(column).to_pylist():
+                    if value is not None:
+                        snapshot.apply({column: value})
+        return snapshot
+
+    def _read_commits(self, container_client, log_dir, versions):
+        """Download commit files concurrently, yielding their actions in version order."""
+        versions = list(versions)
+        if not versions:
+            return []
+
+        def read(commit_version):
+            name = f"{log_dir}/{commit_version:020d}.json"
+            data = container_client.get_file_client(name).download_file().readall()
+            return commit_version, [json.loads(line) for line in data.decode("utf-8").splitlines() if line.strip()]
+
+        self.commits_read += len(versions)
+        if len(versions) == 1:
+            return [read(versions[0])]
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENCY, len(versions))) as executor:
+            return list(executor.map(carry(read), versions))
+
+    def invalidate(self, table_path: Optional[str] = None) -> int:
+        with self._lock:
+            keys = [k for k in self._snapshots if table_path is None or k[0].endswith(table_path.strip('/'))]
+            for key in keys:
+                self._snapshots.pop(key)
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._snapshots),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": self.hits / total if total else 0.0,
+            "commitsRead": self.commits_read,
+            "checkpointsRead": self.checkpoints_read,
+        }
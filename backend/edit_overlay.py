@@ -0,0 +1,334 @@
+"""
+Server-side store of unsaved edits.
+
+Edits are kept per dataset as a columnar delta: a sorted array of row
+positions (the rows' ``__id``), one typed Arrow array per edited column and a
+mask of which cells were actually edited. Previews merge the delta into the
+rows they read with vectorized lookups, so edited rows show without rewriting
+the base files. Each delta records the version of the dataset it was made
+against. The store has a memory budget: the least recently used deltas are
+spilled to Arrow IPC files on local disk and read back on access.
+"""
+
+import os
+import hashlib
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = int(os.environ.get("ADLS_EDIT_OVERLAY_MEMORY", str(64 * 1024 * 1024)))
+DEFAULT_SPILL_DIR = os.environ.get("ADLS_EDIT_OVERLAY_DIR") or os.path.join(tempfile.gettempdir(), "adls-edit-overlay")
+
+ROW_ID_FIELD = "__id"
+POSITION_FIELD = "__position"
+MASK_PREFIX = "__edited:"
+
+
+class StaleOverlayError(Exception):
+    """The dataset changed after the edits were saved."""
+
+
+def _typed_array(name: str, values: List[Any], field_type: pa.DataType) -> pa.Array:
+    """Posted JSON values as an Arrow array of the column's type."""
+    try:
+        return pa.array(values, type=field_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError):
+        pass
+    try:
+        if pa.types.is_decimal(field_type):
+            return pa.array([None if v is None else Decimal(str(v)) for v in values], type=field_type)
+        # Dates, timestamps and numbers sent as strings
+        return pa.array(values).cast(field_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, InvalidOperation, TypeError, ValueError):
+        raise ValueError(f"Invalid value for column {name} of type {field_type}")
+
+
+def _align(source: np.ndarray, positions: np.ndarray):
+    """Index of each position in the sorted ``source`` array, and whether it is present."""
+    index = np.searchsorted(source, positions)
+    clipped = np.minimum(index, max(len(source) - 1, 0))
+    found = (index < len(source)) & (source[clipped] == positions) if len(source) else np.zeros(len(positions), bool)
+    return clipped, found
+
+
+class DatasetOverlay:
+    """Edited cells of one dataset, indexed by row position."""
+
+    def __init__(
+        self,
+        key: str,
+        base_version: Optional[str],
+        positions: Optional[np.ndarray] = None,
+        values: Optional[Dict[str, pa.Array]] = None,
+        masks: Optional[Dict[str, np.ndarray]] = None,
+    ):
+        self.key = key
+        self.base_version = base_version
+        self.positions = positions if positions is not None else np.empty(0, dtype=np.int64)
+        self.values: Dict[str, pa.Array] = values or {}
+        self.masks: Dict[str, np.ndarray] = masks or {}
+
+    @property
+    def row_count(self) -> int:
+        return len(self.positions)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.positions.nbytes + sum(v.nbytes for v in self.values.values())
+                   + sum(m.nbytes for m in self.masks.values()))
+
+    def touches(self, columns: Iterable[str]) -> bool:
+        return any(c in self.values for c in columns)
+
+    def edited_positions(self, columns: Optional[Iterable[str]] = None) -> np.ndarray:
+        """Positions of rows with at least one edited cell in the given columns."""
+        names = [c for c in columns if c in self.masks] if columns is not None else list(self.masks)
+        if not names:
+            return np.empty(0, dtype=np.int64)
+        return self.positions[np.logical_or.reduce([self.masks[c] for c in names])]
+
+    def update(self, rows: Sequence[Dict[str, Any]], schema: pa.Schema, total_rows: int) -> int:
+        """Merge posted rows into the overlay; later values win. Returns the number of rows posted."""
+        by_position: Dict[int, Dict[str, Any]] = {}
+        for row in rows:
+            try:
+                position = int(row[ROW_ID_FIELD])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"Every row needs a numeric {ROW_ID_FIELD}")
+            if not 0 <= position < total_rows:
+                raise ValueError(f"Row {position} does not exist")
+            by_position.setdefault(position, {}).update(row)
+        if not by_position:
+            return 0
+
+        new_positions = np.array(sorted(by_position), dtype=np.int64)
+        new_rows = [by_position[int(p)] for p in new_positions]
+        names = sorted({k for row in new_rows for k in row if not k.startswith("__")})
+        unknown = [name for name in names if name not in schema.names]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+
+        new_values = {}
+        new_masks = {}
+        for name in names:
+            field_type = schema.field(name).type
+            new_values[name] = _typed_array(name, [row.get(name) for row in new_rows], field_type)
+            new_masks[name] = np.array([name in row for row in new_rows], dtype=bool)
+        self._merge(new_positions, new_values, new_masks)
+        return len(new_positions)
+
+    def _merge(self, new_positions: np.ndarray, new_values: Dict[str, pa.Array], new_masks: Dict[str, np.ndarray]):
+        positions = np.union1d(self.positions, new_positions)
+        old_index, old_found = _align(self.positions, positions)
+        new_index, new_found = _align(new_positions, positions)
+
+        values = {}
+        masks = {}
+        for name in sorted(set(self.values) | set(new_values)):
+            column_type = new_values[name].type if name in new_values else self.values[name].type
+            old_value, old_mask = self._aligned(self.values.get(name), self.masks.get(name),
+                                                old_index, old_found, column_type)
+            new_value, new_mask = self._aligned(new_values.get(name), new_masks.get(name),
+                                                new_index, new_found, column_type)
+            values[name] = pc.if_else(pa.array(new_mask), new_value, old_value)
+            masks[name] = new_mask | old_mask
+
+        self.positions = positions
+        self.values = values
+        self.masks = masks
+
+    @staticmethod
+    def _aligned(array, mask, index, found, column_type):
+        if array is None or len(array) == 0:
+            return pa.nulls(len(index), type=column_type), np.zeros(len(index), dtype=bool)
+        return array.take(pa.array(index)), found & mask[index]
+
+    def apply(self, table: pa.Table, positions: Sequence[int]) -> pa.Table:
+        """Replace the edited cells of rows read at the given positions."""
+        if not self.values or table.num_rows == 0:
+            return table
+        positions = np.asarray(positions, dtype=np.int64)
+        index, found = _align(self.positions, positions)
+        if not found.any():
+            return table
+        for name in self.values:
+            column_index = table.schema.get_field_index(name)
+            if column_index < 0:
+                continue
+            mask = found & self.masks[name][index]
+            if not mask.any():
+                continue
+            field = table.schema.field(column_index)
+            edited = self.values[name].take(pa.array(index))
+            if edited.type != field.type:
+                edited = edited.cast(field.type)
+            merged = pc.if_else(pa.array(mask), edited, table.column(column_index).combine_chunks())
+            table = table.set_column(column_index, field, merged)
+        return table
+
+    def is_modified(self, positions: Sequence[int]) -> np.ndarray:
+        """Whether each position has an edited cell."""
+        _, found = _align(self.positions, np.asarray(positions, dtype=np.int64))
+        return found
+
+    def fingerprint(self) -> str:
+        """Digest of the edits; changes whenever a cell is edited."""
+        table = self.to_table()
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return hashlib.sha1(sink.getvalue()).hexdigest()
+
+    def to_table(self) -> pa.Table:
+        arrays = [pa.array(self.positions)]
+        names = [POSITION_FIELD]
+        for name in self.values:
+            arrays += [self.values[name], pa.array(self.masks[name])]
+            names += [name, MASK_PREFIX + name]
+        metadata = {"key": self.key, "base_version": self.base_version or ""}
+        return pa.Table.from_arrays(arrays, names=names).replace_schema_metadata(metadata)
+
+    @classmethod
+    def from_table(cls, table: pa.Table) -> 'DatasetOverlay':
+        metadata = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()}
+        values = {}
+        masks = {}
+        for name in table.column_names:
+            if name == POSITION_FIELD or name.startswith(MASK_PREFIX):
+                continue
+            values[name] = table.column(name).combine_chunks()
+            masks[name] = table.column(MASK_PREFIX + name).to_numpy().astype(bool)
+        return cls(
+            metadata.get("key", ""),
+            metadata.get("base_version") or None,
+            table.column(POSITION_FIELD).to_numpy().astype(np.int64),
+            values,
+            masks,
+        )
+
+
+class EditOverlayStore:
+    """Overlays of all datasets, held in memory up to a byte budget and spilled to disk beyond it."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, spill_dir: str = DEFAULT_SPILL_DIR):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self._overlays: "OrderedDict[str, DatasetOverlay]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.spills = 0
+        self.loads = 0
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, hashlib.sha1(key.encode()).hexdigest() + ".arrow")
+
+    def get(self, key: str) -> Optional[DatasetOverlay]:
+        """The overlay of a dataset, reloading it from disk if it was spilled."""
+        with self._lock:
+            overlay = self._overlays.get(key)
+            if overlay is not None:
+                self._overlays.move_to_end(key)
+                return overlay
+            overlay = self._load(key)
+            if overlay is not None:
+                self._overlays[key] = overlay
+                self._enforce_budget()
+            return overlay
+
+    def save(
+        self,
+        key: str,
+        base_version: Optional[str],
+        rows: Sequence[Dict[str, Any]],
+        schema: pa.Schema,
+        total_rows: int,
+    ) -> DatasetOverlay:
+        """Merge posted rows into a dataset's overlay.
+
+        Raises StaleOverlayError when earlier edits were made against another
+        version of the dataset, since their row positions no longer apply.
+        """
+        with self._lock:
+            overlay = self.get(key)
+            if overlay is not None and overlay.row_count and overlay.base_version != base_version:
+                raise StaleOverlayError(
+                    "The dataset changed after earlier edits were saved; discard them before saving new ones"
+                )
+            if overlay is None or not overlay.row_count:
+                overlay = DatasetOverlay(key, base_version)
+            overlay.update(rows, schema, total_rows)
+            self._overlays[key] = overlay
+            self._overlays.move_to_end(key)
+            self._enforce_budget()
+            return overlay
+
+    def discard(self, key: str) -> bool:
+        with self._lock:
+            found = self._overlays.pop(key, None) is not None
+            path = self._spill_path(key)
+            if os.path.exists(path):
+                os.remove(path)
+                found = True
+            return found
+
+    def _enforce_budget(self):
+        # The most recently used overlay always stays in memory
+        while len(self._overlays) > 1 and sum(o.nbytes for o in self._overlays.values()) > self.max_bytes:
+            _, overlay = self._overlays.popitem(last=False)
+            if not self._spill(overlay):
+                break
+
+    def _spill(self, overlay: DatasetOverlay) -> bool:
+        path = self._spill_path(overlay.key)
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            table = overlay.to_table()
+            with pa.OSFile(path + ".tmp", "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(path + ".tmp", path)
+            self.spills += 1
+            return True
+        except OSError as e:
+            # Keep the edits in memory rather than lose them
+            logger.error(f"Error spilling edit overlay: {str(e)}")
+            self._overlays[overlay.key] = overlay
+            self._overlays.move_to_end(overlay.key, last=False)
+            return False
+
+    def _load(self, key: str) -> Optional[DatasetOverlay]:
+        path = self._spill_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with pa.OSFile(path, "rb") as source:
+                table = pa.ipc.open_file(source).read_all()
+        except (OSError, pa.ArrowInvalid) as e:
+            logger.error(f"Error reading spilled edit overlay: {str(e)}")
+            return None
+        os.remove(path)
+        self.loads += 1
+        return DatasetOverlay.from_table(table)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            spilled = 0
+            if os.path.isdir(self.spill_dir):
+                spilled = sum(1 for name in os.listdir(self.spill_dir) if name.endswith(".arrow"))
+            return {
+                "inMemory": len(self._overlays),
+                "spilled": spilled,
+                "bytes": sum(o.nbytes for o in self._overlays.values()),
+                "maxBytes": self.max_bytes,
+                "rows": sum(o.row_count for o in self._overlays.values()),
+                "spills": self.spills,
+                "loads": self.loads,
+            }
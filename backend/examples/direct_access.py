@@ -11,9 +11,18 @@ This is useful for:
 """
 
 import os
+import sys
+import tempfile
 from azure.storage.filedatalake import DataLakeServiceClient
 from azure.identity import DefaultAzureCredential
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Reuse the backend's ranged ADLS reader and parallel transfers
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from adls_fs import open_range_file, staging_path
+from transfer import download_to, open_upload, upload_from
 
 def connect_to_adls(connection_string=None, account_name=None, account_key=None, use_managed_identity=False):
     """
@@ -83,30 +92,59 @@ def list_folders(service_client, container_name, path=""):
     
     return list(folders)
 
-def read_parquet_file(service_client, container_name, file_path):
+def print_progress(name):
+    """
+    Progress callback that prints each whole percent of a transfer.
+    """
+    last = [-1]
+    
+    def report(done, total):
+        percent = 100 * done // total if total else 0
+        if percent != last[0]:
+            last[0] = percent
+            print(f"\r{name}: {done}/{total or '?'} bytes ({percent}%)", end="" if done != total else "\n")
+    
+    return report
+
+def download_file(service_client, container_name, file_path, local_path, progress=None):
+    """
+    Download a file from ADLS with parallel ranged requests.
+    """
+    file_client = service_client.get_file_system_client(container_name).get_file_client(file_path)
+    return download_to(file_client, local_path, progress=progress)
+
+def upload_file(service_client, container_name, local_path, file_path, progress=None):
+    """
+    Upload a local file to ADLS with parallel appends.
+    
+    The data goes to a hidden staging file that replaces the target only once
+    the upload is complete.
+    """
+    staging_client = service_client.get_file_system_client(container_name).get_file_client(staging_path(file_path))
+    return upload_from(staging_client, local_path, progress=progress, commit_to=f"{container_name}/{file_path}")
+
+def read_parquet_file(service_client, container_name, file_path, columns=None):
     """
     Read a Parquet file from ADLS.
+    
+    With ``columns``, the file is read with ranged requests, so only the footer
+    and the column chunks of those columns are downloaded. A whole file is
+    downloaded in parallel chunks into a private temporary file first.
     """
     try:
         container_client = service_client.get_file_system_client(container_name)
         file_client = container_client.get_file_client(file_path)
         
-        # Download to a temporary file
-        download = file_client.download_file()
-        downloaded_bytes = download.readall()
-        
-        # Save to a temporary file
-        temp_file = "temp.parquet"
-        with open(temp_file, "wb") as file:
-            file.write(downloaded_bytes)
-        
-        # Read with pandas
-        df = pd.read_parquet(temp_file)
-        
-        # Clean up
-        os.remove(temp_file)
+        if columns:
+            with open_range_file(file_client) as source:
+                table = pq.read_table(source, columns=columns)
+        else:
+            with tempfile.TemporaryFile() as local_file:
+                download_to(file_client, local_file)
+                local_file.seek(0)
+                table = pq.read_table(local_file)
         
-        return df
+        return table.to_pandas()
     except Exception as e:
         print(f"Error reading Parquet file: {str(e)}")
         raise
@@ -114,23 +152,25 @@ def read_parquet_file(service_client, container_name, file_path):
 def write_parquet_file(service_client, container_name, file_path, dataframe):
     """
     Write a Parquet file to ADLS.
+    
+    The Parquet writer streams straight into parallel append requests, so no
+    local temporary file or whole encoded file is needed. The appends go to a
+    hidden staging file that is renamed over the target once the file is
+    complete, so a failed write leaves any existing file untouched.
     """
     try:
-        # Save to a temporary file
-        temp_file = "temp.parquet"
-        dataframe.to_parquet(temp_file, index=False)
-        
-        # Read the file content
-        with open(temp_file, "rb") as file:
-            file_content = file.read()
-        
-        # Upload to ADLS
         container_client = service_client.get_file_system_client(container_name)
-        file_client = container_client.create_file(file_path)
-        file_client.upload_data(file_content, overwrite=True)
+        staging_client = container_client.get_file_client(staging_path(file_path))
         
-        # Clean up
-        os.remove(temp_file)
+        table = pa.Table.from_pandas(dataframe, preserve_index=False)
+        sink = open_upload(staging_client, commit_to=f"{container_name}/{file_path}")
+        try:
+            pq.write_table(table, pa.PythonFile(sink, mode="w"))
+            sink.close()
+        except Exception:
+            # Deletes the staging file; the target is only replaced by a successful close
+            sink.abort()
+            raise
         
         print(f"File uploaded successfully to {container_name}/{file_path}")
     except Exception as e:
@@ -0,0 +1,39 @@
+"""
+Bounded-concurrency helpers for fanning ADLS calls out on the event loop.
+
+Every connection gets one semaphore that caps its in-flight storage calls, so
+nested fan-out (containers, then folders) cannot multiply the limit.
+"""
+
+import os
+import asyncio
+from typing import Any, Dict, List
+
+# Maximum concurrent ADLS calls per connection
+MAX_CONCURRENCY = int(os.environ.get("ADLS_MAX_CONCURRENCY", "16"))
+
+_limiters: Dict[str, asyncio.Semaphore] = {}
+
+
+def get_limiter(key: str) -> asyncio.Semaphore:
+    """Semaphore limiting concurrent storage calls for one connection.
+
+    Callers hold it only around the storage call itself, so tasks that fan out
+    again never deadlock waiting on their parent's permit.
+    """
+    limiter = _limiters.get(key)
+    if limiter is None:
+        limiter = _limiters[key] = asyncio.Semaphore(MAX_CONCURRENCY)
+    return limiter
+
+
+def drop_limiter(key: str) -> None:
+    _limiters.pop(key, None)
+
+
+async def collect(async_iterable, limiter: asyncio.Semaphore = None) -> List[Any]:
+    """Drain an async iterator (such as ``get_paths``) while holding a limiter permit."""
+    if limiter is None:
+        return [item async for item in async_iterable]
+    async with limiter:
+        return [item async for item in async_iterable]
@@ -0,0 +1,378 @@
+"""
+In-memory folder tree engine.
+
+The tree for a container is built from a single recursive listing: every path
+returned by ``get_paths(recursive=True)`` is added once, and dataset detection
+(``hasDatasetFiles`` / ``formats``) is rolled up from the leaves in the same
+pass instead of re-listing each subtree. Folders holding a ``_delta_log`` are
+rendered as Delta dataset nodes, and folders of ``key=value`` partition
+directories over Parquet files as one partitioned Parquet dataset node.
+"""
+
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from partition_catalog import parse_partition_segment
+
+# Matches the depth limit of the original per-level listing
+MAX_TREE_DEPTH = 10
+DELTA_LOG_DIR = '_delta_log'
+
+
+def detect_dataset_format(path_name: str) -> Optional[str]:
+    """Detect the dataset format a path belongs to, if any."""
+    path_name = path_name.lower()
+    if path_name.endswith('.parquet'):
+        return 'parquet'
+    if '_delta_log' in path_name or (
+        path_name.endswith('.json') and any(p in path_name for p in ['_commit', '_metadata'])
+    ):
+        return 'delta'
+    return None
+
+
+def stable_node_id(path: str) -> str:
+    """Deterministic node id, so lazily loaded nodes keep their id across requests."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, path))
+
+
+def partition_key(names: Iterable[str]) -> Optional[str]:
+    """The key when every (non-hidden) folder name is a ``key=value`` directory of one key."""
+    keys = set()
+    for name in names:
+        if name.startswith(('_', '.')):
+            continue
+        parsed = parse_partition_segment(name)
+        if parsed is None:
+            return None
+        keys.add(parsed[0])
+    return keys.pop() if len(keys) == 1 else None
+
+
+def listing_hints(paths: Iterable[Any]) -> Dict[str, Any]:
+    """Item count and dataset-format hints for a folder from its direct children only."""
+    item_count = 0
+    formats = set()
+    is_delta_table = False
+    folder_names = []
+    for path in paths:
+        item_count += 1
+        name = path.name.rstrip('/').split('/')[-1]
+        dataset_format = detect_dataset_format(path.name)
+        if dataset_format:
+            formats.add(dataset_format)
+        if name == DELTA_LOG_DIR:
+            is_delta_table = True
+        if getattr(path, 'is_directory', False):
+            folder_names.append(name)
+    hints = {'itemCount': item_count}
+    if formats:
+        hints['hasDatasetFiles'] = True
+        hints['formats'] = sorted(formats)
+    if is_delta_table:
+        hints['isDeltaTable'] = True
+    key = partition_key(folder_names) if not is_delta_table else None
+    if key is not None:
+        # Only the first partition level is listed here
+        hints['partitionColumns'] = [key]
+    return hints
+
+
+def _isoformat(value) -> Optional[str]:
+    return value.isoformat() if value is not None and hasattr(value, 'isoformat') else None
+
+
+class _DirEntry:
+    __slots__ = ('name', 'rel_path', 'folders', 'files', 'formats', 'entry_count', 'last_modified')
+
+    def __init__(self, name: str, rel_path: str):
+        self.name = name
+        self.rel_path = rel_path
+        self.folders: Dict[str, '_DirEntry'] = {}
+        self.files: List[Any] = []
+        self.formats = set()
+        self.entry_count = 0
+        self.last_modified = None
+
+
+class FolderTreeBuilder:
+    """Builds the folder tree of one container from a flat recursive listing."""
+
+    def __init__(self, container_name: str, prefix: str = '', max_depth: int = MAX_TREE_DEPTH):
+        self.container_name = container_name
+        self.prefix = prefix.strip('/')
+        self.max_depth = max_depth
+        self.root = _DirEntry(container_name, self.prefix)
+        self.path_count = 0
+        self._rolled_up = False
+
+    def add_paths(self, paths: Iterable[Any]) -> 'FolderTreeBuilder':
+        for path in paths:
+            self.add_path(path)
+        return self
+
+    def add_path(self, path) -> None:
+        """Add one listed path (anything with ``name`` and ``is_directory``)."""
+        path_name = path.name.strip('/')
+        if self.prefix:
+            if path_name == self.prefix or not path_name.startswith(self.prefix + '/'):
+                return
+            path_name = path_name[len(self.prefix) + 1:]
+        if not path_name:
+            return
+
+        self.path_count += 1
+        self._rolled_up = False
+        parts = path_name.split('/')
+        is_directory = bool(getattr(path, 'is_directory', False))
+
+        # Walk (and create) the materialized ancestors of this path
+        parent = self.root
+        depth = min(len(parts) - 1, self.max_depth)
+        for i in range(depth):
+            parent = self._child_folder(parent, parts[i])
+
+        if len(parts) <= self.max_depth:
+            parent.entry_count += 1
+            if is_directory:
+                folder = self._child_folder(parent, parts[-1])
+                folder.last_modified = getattr(path, 'last_modified', None)
+            else:
+                parent.files.append(path)
+
+        dataset_format = detect_dataset_format(path_name)
+        if dataset_format:
+            parent.formats.add(dataset_format)
+
+    def _child_folder(self, parent: _DirEntry, name: str) -> _DirEntry:
+        folder = parent.folders.get(name)
+        if folder is None:
+            rel_path = f"{parent.rel_path}/{name}" if parent.rel_path else name
+            folder = _DirEntry(name, rel_path)
+            parent.folders[name] = folder
+        return folder
+
+    def _roll_up(self) -> None:
+        """Propagate dataset formats from each folder to all of its ancestors."""
+        if self._rolled_up:
+            return
+        # Iterative post-order walk so very deep lakes cannot hit the recursion limit
+        stack = [(self.root, False)]
+        while stack:
+            entry, visited = stack.pop()
+            if visited:
+                for child in entry.folders.values():
+                    entry.formats |= child.formats
+                continue
+            stack.append((entry, True))
+            stack.extend((child, False) for child in entry.folders.values())
+        self._rolled_up = True
+
+    def find(self, rel_path: str = '') -> Optional[_DirEntry]:
+        entry = self.root
+        for part in [p for p in rel_path.strip('/').split('/') if p]:
+            entry = entry.folders.get(part)
+            if entry is None:
+                return None
+        return entry
+
+    def summary(self, rel_path: str = '') -> Dict[str, Any]:
+        """Counts and dataset detection for one folder of the tree."""
+        self._roll_up()
+        entry = self.find(rel_path)
+        if entry is None:
+            return {'folderCount': 0, 'blobCount': 0, 'hasDatasetFiles': False, 'formats': [], 'lastModified': None}
+        return {
+            'folderCount': len(entry.folders),
+            'blobCount': entry.entry_count,
+            'hasDatasetFiles': bool(entry.formats),
+            'formats': sorted(entry.formats),
+            'lastModified': _isoformat(entry.last_modified),
+        }
+
+    def folder_names(self, rel_path: str = '') -> List[str]:
+        entry = self.find(rel_path)
+        return list(entry.folders) if entry else []
+
+    def child_nodes(self, rel_path: str = '') -> List[Dict[str, Any]]:
+        """Direct children of one folder as tree nodes, without their own children."""
+        self._roll_up()
+        entry = self.find(rel_path)
+        if entry is None:
+            return []
+
+        nodes = []
+        for file_path in entry.files:
+            dataset_node = self._dataset_node(entry, file_path)
+            if dataset_node:
+                dataset_node['id'] = stable_node_id(dataset_node['path'])
+                nodes.append(dataset_node)
+
+        for child in entry.folders.values():
+            if self._is_delta_table(child):
+                nodes.append(self._delta_table_node(child, stable_node_id(f"{self.container_name}/{child.rel_path}")))
+                continue
+            if self._partition_keys(child):
+                nodes.append(self._partitioned_node(child, stable_node_id(f"{self.container_name}/{child.rel_path}")))
+                continue
+            path = f"{self.container_name}/{child.rel_path}"
+            metadata = {'itemCount': child.entry_count}
+            if child.last_modified is not None:
+                metadata['lastModified'] = _isoformat(child.last_modified)
+            if child.formats:
+                metadata['hasDatasetFiles'] = True
+                metadata['formats'] = sorted(child.formats)
+            nodes.append({
+                'id': stable_node_id(path),
+                'name': child.name,
+                'type': 'folder',
+                'path': path,
+                'children': [],
+                'metadata': metadata
+            })
+        return nodes
+
+    def build(self, node_id: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Render the tree as nested node dicts in the /folder-tree response shape."""
+        self._roll_up()
+        root_node = {
+            'id': node_id or str(uuid.uuid4()),
+            'name': self.container_name,
+            'type': 'container',
+            'path': f"{self.container_name}/{self.prefix}".rstrip('/'),
+            'children': [],
+            'metadata': dict(metadata or {})
+        }
+        if self.root.formats:
+            root_node['metadata']['hasDatasetFiles'] = True
+            root_node['metadata']['formats'] = sorted(self.root.formats)
+
+        stack = [(self.root, root_node)]
+        while stack:
+            entry, node = stack.pop()
+
+            # Dataset files at this level come first, then sub-folders
+            for file_path in entry.files:
+                dataset_node = self._dataset_node(entry, file_path)
+                if dataset_node:
+                    node['metadata'] = node.get('metadata') or {}
+                    node['metadata']['hasDatasetFiles'] = True
+                    node['children'].append(dataset_node)
+
+            for child in entry.folders.values():
+                if self._is_delta_table(child):
+                    # A Delta table is one dataset; its data files are not browsed
+                    node['children'].append(self._delta_table_node(child))
+                    continue
+                if self._partition_keys(child):
+                    # So is a partitioned folder, however many partitions it has
+                    node['children'].append(self._partitioned_node(child))
+                    continue
+                child_node = {
+                    'id': str(uuid.uuid4()),
+                    'name': child.name,
+                    'type': 'folder',
+                    'path': f"{self.container_name}/{child.rel_path}",
+                    'children': []
+                }
+                if child.formats:
+                    child_node['metadata'] = {
+                        'hasDatasetFiles': True,
+                        'formats': sorted(child.formats)
+                    }
+                node['children'].append(child_node)
+                stack.append((child, child_node))
+
+        return root_node
+
+    @staticmethod
+    def _is_delta_table(entry: _DirEntry) -> bool:
+        return DELTA_LOG_DIR in entry.folders
+
+    def _delta_table_node(self, entry: _DirEntry, node_id: Optional[str] = None) -> Dict[str, Any]:
+        metadata = {'hasDatasetFiles': True, 'formats': sorted(entry.formats | {'delta'})}
+        if entry.last_modified is not None:
+            metadata['lastModified'] = _isoformat(entry.last_modified)
+        return {
+            'id': node_id or str(uuid.uuid4()),
+            'name': entry.name,
+            'type': 'dataset',
+            'format': 'delta',
+            'path': f"{self.container_name}/{entry.rel_path}",
+            'children': [],
+            'metadata': metadata
+        }
+
+    @staticmethod
+    def _partition_keys(entry: _DirEntry) -> List[str]:
+        """Partition keys of a folder of ``key=value`` directories over Parquet files, else empty."""
+        if 'parquet' not in entry.formats:
+            return []
+        keys = []
+        level = [entry]
+        while True:
+            children = [child for folder in level for child in folder.folders.values()]
+            key = partition_key(child.name for child in children) if children else None
+            if key is None:
+                return keys
+            keys.append(key)
+            level = [child for child in children if not child.name.startswith(('_', '.'))]
+
+    def _partitioned_node(self, entry: _DirEntry, node_id: Optional[str] = None) -> Dict[str, Any]:
+        keys = self._partition_keys(entry)
+        partition_count = 0
+        file_count = 0
+        size = 0
+        stack = [(entry, 0)]
+        while stack:
+            folder, depth = stack.pop()
+            if depth == len(keys):
+                partition_count += 1
+            for file_path in folder.files:
+                if file_path.name.endswith('.parquet'):
+                    file_count += 1
+                    size += getattr(file_path, 'content_length', None) or 0
+            stack.extend(
+                (child, depth + 1) for child in folder.folders.values() if not child.name.startswith(('_', '.'))
+            )
+        metadata = {
+            'hasDatasetFiles': True,
+            'formats': sorted(entry.formats),
+            'partitionColumns': keys,
+            'partitionCount': partition_count,
+            'fileCount': file_count,
+            'size': size,
+        }
+        if entry.last_modified is not None:
+            metadata['lastModified'] = _isoformat(entry.last_modified)
+        return {
+            'id': node_id or str(uuid.uuid4()),
+            'name': entry.name,
+            'type': 'dataset',
+            'format': 'parquet',
+            'path': f"{self.container_name}/{entry.rel_path}",
+            'children': [],
+            'metadata': metadata
+        }
+
+    def _dataset_node(self, entry: _DirEntry, path) -> Optional[Dict[str, Any]]:
+        file_name = path.name.rstrip('/').split('/')[-1]
+        if file_name.endswith('.parquet'):
+            file_type = 'parquet'
+            dataset_name = file_name[:-len('.parquet')]
+        elif '_delta_log' in file_name:
+            file_type = 'delta'
+            dataset_name = file_name
+        else:
+            return None
+
+        rel_path = f"{entry.rel_path}/{file_name}" if entry.rel_path else file_name
+        return {
+            'id': str(uuid.uuid4()),
+            'name': dataset_name,
+            'type': 'dataset',
+            'format': file_type,
+            'path': f"{self.container_name}/{rel_path}",
+            'children': []
+        }
+
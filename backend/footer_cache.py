@@ -0,0 +1,341 @@
+"""
+Cache of Parquet footers keyed by (path, etag).
+
+A footer holds everything needed to open a file: schema, row count and the
+row-group layout with per-column statistics. Entries keep the raw tail bytes
+that were downloaded for the footer, so a cached file can be opened by pyarrow
+without another request, and are evicted LRU by count and byte size. They can
+optionally be spilled to SQLite so they survive a restart. A file that is
+rewritten gets a new etag, so stale footers are never served.
+
+``get_many`` fetches the footers of many files with up to
+``ADLS_FOOTER_FETCH_CONCURRENCY`` downloads at a time, and ``merge_schemas``
+reconciles the schemas of files written at different times into one.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from adls_fs import read_parquet_tail
+from metrics import carry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get("ADLS_FOOTER_CACHE_SIZE", "2048"))
+DEFAULT_MAX_BYTES = int(os.environ.get("ADLS_FOOTER_CACHE_BYTES", str(256 * 1024 * 1024)))
+DEFAULT_DB_PATH = os.environ.get("ADLS_FOOTER_CACHE_DB")
+# Footers downloaded at the same time when opening a multi-file dataset
+FOOTER_FETCH_CONCURRENCY = int(os.environ.get("ADLS_FOOTER_FETCH_CONCURRENCY", "16"))
+
+
+def _stat_value(value):
+    """Statistics values as JSON-friendly Python values."""
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def row_group_stats(metadata: pq.FileMetaData, top_level, indexes: Sequence[int]) -> List[Dict[str, Any]]:
+    """Row count and per-column statistics of some row groups of a footer (see ``FooterInfo.row_groups``)."""
+    row_groups = []
+    for i in indexes:
+        row_group = metadata.row_group(i)
+        columns = {}
+        for j in range(row_group.num_columns):
+            column = row_group.column(j)
+            name = column.path_in_schema
+            if name not in top_level:
+                continue
+            statistics = column.statistics
+            entry = {"numValues": column.num_values, "nullCount": None}
+            if statistics is not None:
+                if statistics.has_null_count:
+                    entry["nullCount"] = statistics.null_count
+                if statistics.has_min_max:
+                    entry["min"] = _stat_value(statistics.min)
+                    entry["max"] = _stat_value(statistics.max)
+            columns[name] = entry
+        row_groups.append({"numRows": row_group.num_rows, "columns": columns})
+    return row_groups
+
+
+def _promote(name: str, a: pa.DataType, b: pa.DataType) -> pa.DataType:
+    """A type both ``a`` and ``b`` cast to without loss, for files that disagree on a column."""
+    if a == b:
+        return a
+    if pa.types.is_null(a):
+        return b
+    if pa.types.is_null(b):
+        return a
+    if pa.types.is_integer(a) and pa.types.is_integer(b):
+        if pa.types.is_signed_integer(a) == pa.types.is_signed_integer(b):
+            return a if a.bit_width >= b.bit_width else b
+        return pa.int64()
+    if (pa.types.is_integer(a) or pa.types.is_floating(a)) and (pa.types.is_integer(b) or pa.types.is_floating(b)):
+        return pa.float64()
+    if pa.types.is_timestamp(a) and pa.types.is_timestamp(b) and a.tz == b.tz:
+        units = ["s", "ms", "us", "ns"]
+        return a if units.index(a.unit) >= units.index(b.unit) else b
+    if {a, b} <= {pa.string(), pa.large_string()}:
+        return pa.large_string()
+    if {a, b} <= {pa.binary(), pa.large_binary()}:
+        return pa.large_binary()
+    raise ValueError(f"Column {name} has incompatible types across files: {a} and {b}")
+
+
+def merge_schemas(schemas: Sequence[pa.Schema]) -> pa.Schema:
+    """One schema for files with different schemas.
+
+    Columns are taken in order of first appearance, and a column whose type
+    differs between files gets a type every file's values cast to (wider
+    integers, float64, finer timestamps, large strings). Raises ValueError
+    when there is none.
+    """
+    distinct = []
+    for schema in schemas:
+        if not any(schema.equals(seen) for seen in distinct):
+            distinct.append(schema)
+    if not distinct:
+        raise ValueError("No schemas to merge")
+    try:
+        return pa.unify_schemas(distinct)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    fields: "OrderedDict[str, pa.Field]" = OrderedDict()
+    for schema in distinct:
+        for field in schema:
+            previous = fields.get(field.name)
+            if previous is None:
+                fields[field.name] = field
+            else:
+                fields[field.name] = previous.with_type(_promote(field.name, previous.type, field.type)).with_nullable(
+                    previous.nullable or field.nullable
+                )
+    return pa.schema(list(fields.values()), metadata=distinct[0].metadata)
+
+
+class FooterInfo:
+    """Parsed footer of one file version."""
+
+    def __init__(self, path: str, etag: Optional[str], size: int, tail: bytes, footer_length: int):
+        self.path = path
+        self.etag = etag
+        self.size = size
+        # The bytes at the end of the file that contain the footer
+        self.tail = tail
+        self.footer_length = footer_length
+        self.metadata: pq.FileMetaData = pq.read_metadata(pa.BufferReader(tail[-footer_length:]))
+        self._schema = None
+        self._row_groups = None
+
+    @property
+    def schema(self) -> pa.Schema:
+        if self._schema is None:
+            self._schema = self.metadata.schema.to_arrow_schema()
+        return self._schema
+
+    @property
+    def num_rows(self) -> int:
+        return self.metadata.num_rows
+
+    @property
+    def num_row_groups(self) -> int:
+        return self.metadata.num_row_groups
+
+    @property
+    def row_groups(self) -> List[Dict[str, Any]]:
+        """Row count and per-column statistics of every row group.
+
+        Only top-level (non-nested) columns are included; a column's entry has
+        ``min``/``max`` only when the writer recorded them.
+        """
+        if self._row_groups is None:
+            self._row_groups = row_group_stats(
+                self.metadata, set(self.schema.names), range(self.metadata.num_row_groups)
+            )
+        return self._row_groups
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.tail)
+
+
+class FooterCache:
+    """LRU cache of FooterInfo with an optional SQLite spill."""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        db_path: Optional[str] = DEFAULT_DB_PATH,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, Optional[str]], FooterInfo]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        if db_path:
+            try:
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS footers ("
+                    "path TEXT, etag TEXT, size INTEGER, footer_length INTEGER, "
+                    "tail BLOB, created_at REAL, PRIMARY KEY (path, etag))"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error opening footer cache database: {str(e)}")
+                self._db = None
+
+    def get(self, file_client, path: str, size: int, etag: Optional[str]) -> FooterInfo:
+        """Footer of one file version, downloaded only on a cache miss."""
+        info = self.peek(path, etag)
+        if info is not None and info.size == size:
+            return info
+
+        with self._lock:
+            self.misses += 1
+        tail, footer_length = read_parquet_tail(file_client, size)
+        info = FooterInfo(path, etag, size, tail, footer_length)
+        self.put(info)
+        return info
+
+    def get_many(
+        self, requests: Sequence[Tuple[Any, str, int, Optional[str]]], concurrency: int = FOOTER_FETCH_CONCURRENCY
+    ) -> List[FooterInfo]:
+        """Footers of many files, as ``get(file_client, path, size, etag)`` would return them, in order.
+
+        Cached footers are served first; the others are downloaded
+        ``concurrency`` at a time.
+        """
+        footers: List[Optional[FooterInfo]] = []
+        missing = []
+        for i, (_, path, size, etag) in enumerate(requests):
+            info = self.peek(path, etag)
+            if info is None or info.size != size:
+                info = None
+                missing.append(i)
+            footers.append(info)
+        if len(missing) <= 1 or concurrency <= 1:
+            for i in missing:
+                footers[i] = self.get(*requests[i])
+            return footers
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(missing))) as executor:
+            for i, info in zip(missing, executor.map(carry(lambda i: self.get(*requests[i])), missing)):
+                footers[i] = info
+        return footers
+
+    def peek(self, path: str, etag: Optional[str]) -> Optional[FooterInfo]:
+        """Cached footer of one file version, without touching storage."""
+        # Without an etag the version is unknown and nothing can be served
+        if etag is None:
+            return None
+        key = (path, etag)
+        with self._lock:
+            info = self._entries.get(key)
+            if info is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return info
+            info = self._load(key)
+            if info is not None:
+                self._store_memory(key, info)
+                self.hits += 1
+                self.disk_hits += 1
+            return info
+
+    def put(self, info: FooterInfo):
+        if info.etag is None:
+            return
+        key = (info.path, info.etag)
+        with self._lock:
+            # A new version replaces every older footer of the same file
+            for stale in [k for k in self._entries if k[0] == info.path and k != key]:
+                self._bytes -= self._entries.pop(stale).nbytes
+            self._store_memory(key, info)
+            self._save(info)
+
+    def _store_memory(self, key, info: FooterInfo):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+        self._entries[key] = info
+        self._bytes += info.nbytes
+        # Evicted entries stay in the database when one is configured
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def _load(self, key) -> Optional[FooterInfo]:
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT size, footer_length, tail FROM footers WHERE path = ? AND etag = ?", key
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading footer cache: {str(e)}")
+            return None
+        if row is None:
+            return None
+        size, footer_length, tail = row
+        return FooterInfo(key[0], key[1], size, bytes(tail), footer_length)
+
+    def _save(self, info: FooterInfo):
+        if self._db is None:
+            return
+        try:
+            self._db.execute("DELETE FROM footers WHERE path = ? AND etag != ?", (info.path, info.etag))
+            self._db.execute(
+                "INSERT OR REPLACE INTO footers VALUES (?, ?, ?, ?, ?, ?)",
+                (info.path, info.etag, info.size, info.footer_length, info.tail, time.time())
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing footer cache: {str(e)}")
+
+    def invalidate(self, prefix: Optional[str] = None) -> int:
+        """Drop cached footers, optionally only those under a path prefix."""
+        prefix = prefix.strip('/') if prefix else None
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if not prefix or key[0] == prefix or key[0].startswith(prefix + '/')
+            ]
+            for key in keys:
+                self._bytes -= self._entries.pop(key).nbytes
+            if self._db is not None:
+                if prefix:
+                    self._db.execute("DELETE FROM footers WHERE path = ? OR path LIKE ?", (prefix, prefix + '/%'))
+                else:
+                    self._db.execute("DELETE FROM footers")
+                self._db.commit()
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "diskHits": self.disk_hits,
+            "hitRatio": self.hits / total if total else 0.0,
+            "persistent": self._db is not None,
+        }
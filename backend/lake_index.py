@@ -0,0 +1,466 @@
+"""
+Background lake indexer.
+
+Every connection's containers are crawled on a schedule into a SQLite path
+index of folders and files (size and last-modified time), from which the
+datasets under any container or folder are answered without touching ADLS.
+
+ADLS does not carry last-modified times up the tree, so a crawl still lists
+each container (fanned out over its top-level directories); the listing is
+then diffed against the stored last-modified times and sizes, and only paths
+and datasets that changed are written. Datasets are Delta tables (folders
+holding a ``_delta_log``), folders of Parquet files, with trailing
+``key=value`` partition folders folded into their table, and Parquet files
+at the root of a container.
+"""
+
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from client_pool import client_leases
+from dataset_reader import is_hidden_path
+from folder_tree import DELTA_LOG_DIR, stable_node_id
+from metadata_cache import list_paths_recursive
+
+logger = logging.getLogger(__name__)
+
+# Seconds between background crawls; 0 crawls only on demand
+INDEX_INTERVAL = int(os.environ.get("ADLS_INDEX_INTERVAL", "300"))
+INDEX_DB_PATH = os.environ.get("ADLS_INDEX_DB") or ":memory:"
+# Containers of one connection crawled at the same time
+INDEX_CONTAINER_CONCURRENCY = int(os.environ.get("ADLS_INDEX_CONTAINER_CONCURRENCY", "4"))
+
+_DATASET_FIELDS = ("name", "format", "size", "file_count", "last_modified", "partition_columns", "folder")
+
+
+def _isoformat(value) -> Optional[str]:
+    return value.isoformat() if value is not None and hasattr(value, 'isoformat') else value
+
+
+def _partition_key(segment: str) -> Optional[str]:
+    key, sep, _ = segment.partition('=')
+    return key if sep and key else None
+
+
+def _delta_root(segments: List[str], delta_roots) -> Optional[str]:
+    for depth in range(len(segments)):
+        root = '/'.join(segments[:depth])
+        if root in delta_roots:
+            return root
+    return None
+
+
+def detect_datasets(paths: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+    """Datasets found in a container listing, keyed by their path within the container."""
+    paths = list(paths)
+    delta_roots = {
+        path.name.rpartition('/')[0]
+        for path in paths
+        if path.is_directory and path.name.rpartition('/')[2] == DELTA_LOG_DIR
+    }
+    datasets: Dict[str, Dict[str, Any]] = {}
+
+    def add(root: str, dataset_format: str, path, partitions=(), name: Optional[str] = None):
+        dataset = datasets.get(root)
+        if dataset is None:
+            dataset = datasets[root] = {
+                "name": name or root.rpartition('/')[2],
+                "format": dataset_format,
+                "size": 0,
+                "file_count": 0,
+                "last_modified": None,
+                "partition_columns": [],
+                "folder": root.rpartition('/')[0],
+            }
+        if not path.is_directory:
+            dataset["size"] += path.content_length or 0
+            dataset["file_count"] += 1
+        last_modified = _isoformat(path.last_modified)
+        if last_modified and (dataset["last_modified"] is None or last_modified > dataset["last_modified"]):
+            dataset["last_modified"] = last_modified
+        for key in partitions:
+            if key not in dataset["partition_columns"]:
+                dataset["partition_columns"].append(key)
+
+    for path in paths:
+        segments = path.name.split('/')
+        root = _delta_root(segments, delta_roots)
+        if root is not None:
+            add(root, "delta", path)
+            continue
+        if path.is_directory or not path.name.endswith('.parquet') or is_hidden_path(path.name):
+            continue
+        folders = segments[:-1]
+        partitions = []
+        while folders and _partition_key(folders[-1]):
+            partitions.insert(0, _partition_key(folders.pop()))
+        if folders or partitions:
+            add('/'.join(folders), "parquet", path, partitions)
+        else:
+            # A lone file at the container root is a dataset of its own
+            add(path.name, "parquet", path, name=path.name[:-len('.parquet')])
+    return datasets
+
+
+def _dataset_dict(row) -> Dict[str, Any]:
+    """Dataset model dict for a row of the datasets table."""
+    container, path, name, dataset_format, size, file_count, last_modified, partitions, parent = row
+    full_path = f"{container}/{path}" if path else container
+    return {
+        "id": stable_node_id(full_path),
+        "name": name or container,
+        "path": full_path,
+        "format": dataset_format,
+        "columns": [],
+        "size": size,
+        "lastModified": last_modified,
+        "partitionColumns": json.loads(partitions) or None,
+        "folderPath": parent,
+        "containerName": container,
+    }
+
+
+class LakeIndex:
+    """SQLite index of paths and datasets per (connection, container)."""
+
+    def __init__(self, db_path: str = INDEX_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS paths ("
+            "connection TEXT, container TEXT, path TEXT, is_directory INTEGER, "
+            "size INTEGER, last_modified TEXT, "
+            "PRIMARY KEY (connection, container, path));"
+            "CREATE TABLE IF NOT EXISTS datasets ("
+            "connection TEXT, container TEXT, path TEXT, name TEXT, format TEXT, "
+            "size INTEGER, file_count INTEGER, last_modified TEXT, partition_columns TEXT, folder TEXT, "
+            "PRIMARY KEY (connection, container, path));"
+            "CREATE TABLE IF NOT EXISTS crawls ("
+            "connection TEXT, container TEXT, crawled_at REAL, duration REAL, "
+            "paths INTEGER, changed INTEGER, "
+            "PRIMARY KEY (connection, container));"
+        )
+        self._db.commit()
+        # Objects with apply_changes(...) and drop_container(...), told about every change
+        self.listeners: List[Any] = []
+        self.crawls = 0
+        self.paths_changed = 0
+        self.datasets_changed = 0
+
+    def apply_listing(self, connection: str, container: str, paths: List[Any], duration: float = 0.0) -> Tuple[int, int]:
+        """Bring one container's index in line with a fresh listing.
+
+        Returns the number of paths and datasets written or removed.
+        """
+        listed = {
+            path.name: (int(bool(path.is_directory)), path.content_length, _isoformat(path.last_modified))
+            for path in paths
+        }
+        found = detect_datasets(paths)
+        with self._lock:
+            stored = {
+                row[0]: tuple(row[1:])
+                for row in self._db.execute(
+                    "SELECT path, is_directory, size, last_modified FROM paths "
+                    "WHERE connection = ? AND container = ?", (connection, container)
+                )
+            }
+            stored_datasets = {
+                row[0]: tuple(row[1:])
+                for row in self._db.execute(
+                    f"SELECT path, {', '.join(_DATASET_FIELDS)} FROM datasets "
+                    "WHERE connection = ? AND container = ?", (connection, container)
+                )
+            }
+            changed = [(name, *value) for name, value in listed.items() if stored.get(name) != value]
+            removed = [(name,) for name in stored.keys() - listed.keys()]
+            dataset_rows = {
+                path: tuple(
+                    json.dumps(d[f]) if f == "partition_columns" else d[f] for f in _DATASET_FIELDS
+                )
+                for path, d in found.items()
+            }
+            changed_datasets = [
+                (path, *row) for path, row in dataset_rows.items() if stored_datasets.get(path) != row
+            ]
+            removed_datasets = [(path,) for path in stored_datasets.keys() - dataset_rows.keys()]
+
+            params = (connection, container)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO paths VALUES (?, ?, ?, ?, ?, ?)", [params + row for row in changed]
+            )
+            self._db.executemany(
+                "DELETE FROM paths WHERE connection = ? AND container = ? AND path = ?",
+                [params + row for row in removed]
+            )
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO datasets VALUES ({', '.join('?' * (len(_DATASET_FIELDS) + 3))})",
+                [params + row for row in changed_datasets]
+            )
+            self._db.executemany(
+                "DELETE FROM datasets WHERE connection = ? AND container = ? AND path = ?",
+                [params + row for row in removed_datasets]
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO crawls VALUES (?, ?, ?, ?, ?, ?)",
+                (connection, container, time.time(), duration, len(listed), len(changed) + len(removed))
+            )
+            self._db.commit()
+            self.crawls += 1
+            self.paths_changed += len(changed) + len(removed)
+            self.datasets_changed += len(changed_datasets) + len(removed_datasets)
+        for listener in self.listeners:
+            listener.apply_changes(
+                connection, container,
+                [(row[0], bool(row[1])) for row in changed], [row[0] for row in removed],
+                {row[0]: found[row[0]] for row in changed_datasets}, [row[0] for row in removed_datasets],
+            )
+        return len(changed) + len(removed), len(changed_datasets) + len(removed_datasets)
+
+    def drop_container(self, connection: str, container: str) -> None:
+        with self._lock:
+            for table in ("paths", "datasets", "crawls"):
+                self._db.execute(
+                    f"DELETE FROM {table} WHERE connection = ? AND container = ?", (connection, container)
+                )
+            self._db.commit()
+        for listener in self.listeners:
+            listener.drop_container(connection, container)
+
+    def replay(self, listener) -> None:
+        """Feed everything already indexed (e.g. loaded from ``ADLS_INDEX_DB``) to a new listener."""
+        with self._lock:
+            crawled = self._db.execute("SELECT connection, container FROM crawls").fetchall()
+        for connection, container in crawled:
+            with self._lock:
+                paths = self._db.execute(
+                    "SELECT path, is_directory FROM paths WHERE connection = ? AND container = ?",
+                    (connection, container)
+                ).fetchall()
+                datasets = self._db.execute(
+                    "SELECT path, name, format FROM datasets WHERE connection = ? AND container = ?",
+                    (connection, container)
+                ).fetchall()
+            listener.apply_changes(
+                connection, container,
+                [(path, bool(is_directory)) for path, is_directory in paths], [],
+                {path: {"name": name, "format": dataset_format} for path, name, dataset_format in datasets}, [],
+            )
+
+    def containers(self, connection: str) -> List[str]:
+        """Containers of a connection that have been crawled at least once."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT container FROM crawls WHERE connection = ? ORDER BY container", (connection,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def last_crawled(self, connection: str, container: Optional[str] = None) -> Optional[float]:
+        """Time of the oldest crawl among the connection's (or one container's) crawls."""
+        query = "SELECT MIN(crawled_at) FROM crawls WHERE connection = ?"
+        params: Tuple = (connection,)
+        if container is not None:
+            query += " AND container = ?"
+            params += (container,)
+        with self._lock:
+            return self._db.execute(query, params).fetchone()[0]
+
+    def datasets(
+        self,
+        connection: str,
+        containers: Optional[List[str]] = None,
+        folder_path: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Indexed datasets of a connection, optionally within some containers or one folder (recursively)."""
+        query = f"SELECT container, path, {', '.join(_DATASET_FIELDS)} FROM datasets WHERE connection = ?"
+        params: List[Any] = [connection]
+        if containers is not None:
+            query += f" AND container IN ({', '.join('?' * len(containers))})"
+            params.extend(containers)
+        folder = (folder_path or '').strip('/')
+        if folder:
+            # Range scan rather than LIKE, which would treat '_' in folder names as a wildcard
+            query += " AND (path = ? OR (path >= ? AND path < ?))"
+            params.extend([folder, folder + '/', folder + '0'])
+        query += " ORDER BY container, path"
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+
+        return [_dataset_dict(row) for row in rows]
+
+    def dataset(self, connection: str, container: str, path: str) -> Optional[Dict[str, Any]]:
+        """One indexed dataset by its path within the container."""
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT container, path, {', '.join(_DATASET_FIELDS)} FROM datasets "
+                "WHERE connection = ? AND container = ? AND path = ?", (connection, container, path)
+            ).fetchone()
+        return _dataset_dict(row) if row is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            paths = self._db.execute("SELECT COUNT(*) FROM paths").fetchone()[0]
+            datasets = self._db.execute("SELECT COUNT(*) FROM datasets").fetchone()[0]
+            containers, last_crawl, crawl_seconds = self._db.execute(
+                "SELECT COUNT(*), MAX(crawled_at), SUM(duration) FROM crawls"
+            ).fetchone()
+        return {
+            "paths": paths,
+            "datasets": datasets,
+            "containers": containers,
+            "crawls": self.crawls,
+            "pathsChanged": self.paths_changed,
+            "datasetsChanged": self.datasets_changed,
+            "lastCrawl": last_crawl,
+            "crawlSeconds": round(crawl_seconds or 0.0, 3),
+        }
+
+
+# (service client, container names or None for all, limiter) of one connection to crawl
+CrawlTarget = Tuple[Any, Optional[List[str]], Optional[asyncio.Semaphore]]
+
+
+class LakeIndexer:
+    """Crawls connections into a LakeIndex, on a schedule and on demand.
+
+    Concurrent requests for the same connection share one crawl.
+    """
+
+    def __init__(self, index: LakeIndex, interval: int = INDEX_INTERVAL):
+        self.index = index
+        self.interval = interval
+        self._inflight: Dict[Tuple[str, Optional[Tuple[str, ...]]], asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Connections crawled across all their containers since start-up
+        self._complete: set = set()
+        self.errors = 0
+
+    def is_indexed(self, connection: str, containers: Optional[List[str]] = None) -> bool:
+        """Whether the index already covers all of a connection's containers, or the named ones."""
+        if containers is None:
+            return connection in self._complete
+        indexed = {name.lower() for name in self.index.containers(connection)}
+        return connection in self._complete or all(c.lower() in indexed for c in containers)
+
+    async def crawl(self, connection: str, service_client, containers: Optional[List[str]] = None, limiter=None) -> Dict[str, int]:
+        """Crawl all of a connection's containers, or only the named ones."""
+        key = (connection, tuple(sorted(c.lower() for c in containers)) if containers is not None else None)
+        task = self._inflight.get(key)
+        if task is None:
+            # A task of its own, so a cancelled caller does not cancel the crawl for the others
+            task = asyncio.ensure_future(self._crawl(connection, service_client, containers, limiter))
+            # Mark a failure retrieved even if every caller stopped waiting
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            task.add_done_callback(lambda t: self._inflight.pop(key, None))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _crawl(self, connection: str, service_client, containers: Optional[List[str]], limiter) -> Dict[str, int]:
+        listed = [fs.name async for fs in service_client.list_file_systems()]
+        if containers is None:
+            selected = listed
+            vanished = set(self.index.containers(connection)) - set(listed)
+        else:
+            wanted = {c.lower() for c in containers}
+            selected = [name for name in listed if name.lower() in wanted]
+            vanished = {name for name in self.index.containers(connection) if name.lower() in wanted} - set(listed)
+        for name in vanished:
+            self.index.drop_container(connection, name)
+
+        loop = asyncio.get_running_loop()
+        gate = asyncio.Semaphore(max(1, INDEX_CONTAINER_CONCURRENCY))
+        totals = {"containers": len(selected), "paths": 0, "pathsChanged": 0, "datasetsChanged": 0}
+
+        async def crawl_container(name: str):
+            async with gate:
+                started = time.perf_counter()
+                paths = await list_paths_recursive(service_client.get_file_system_client(name), "", limiter)
+                # The diff touches SQLite and walks every path, so keep it off the event loop
+                changed, datasets_changed = await loop.run_in_executor(
+                    None, self.index.apply_listing, connection, name, paths, time.perf_counter() - started
+                )
+                totals["paths"] += len(paths)
+                totals["pathsChanged"] += changed
+                totals["datasetsChanged"] += datasets_changed
+
+        await asyncio.gather(*(crawl_container(name) for name in selected))
+        if containers is None:
+            self._complete.add(connection)
+        return totals
+
+    def start(
+        self,
+        targets: Callable[[], Dict[str, CrawlTarget]],
+        on_round: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> None:
+        """Crawl every target connection now and then every ``interval`` seconds.
+
+        ``targets`` is called before each round, so connections added later are
+        picked up; ``on_round`` is awaited after each round.
+        """
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = self._loop.create_task(self._run(targets, on_round))
+
+    def schedule(self) -> None:
+        """Start the next background round now; safe to call from any thread."""
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def stop(self) -> None:
+        for task in list(self._inflight.values()):
+            task.cancel()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, targets: Callable[[], Dict[str, CrawlTarget]], on_round) -> None:
+        while True:
+            self._wake.clear()
+            # The round's clients stay in use, and pooled, until it ends
+            with client_leases():
+                try:
+                    round_targets = targets()
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"Error collecting connections to index: {str(e)}")
+                    round_targets = {}
+                for connection, (service_client, containers, limiter) in round_targets.items():
+                    try:
+                        await self.crawl(connection, service_client, containers, limiter)
+                    except Exception as e:
+                        self.errors += 1
+                        logger.error(f"Error indexing connection: {str(e)}")
+            if on_round is not None:
+                try:
+                    await on_round()
+                except Exception as e:
+                    logger.error(f"Error after indexing round: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.index.stats(),
+            "interval": self.interval,
+            "running": self._task is not None and not self._task.done(),
+            "crawlsInFlight": len(self._inflight),
+            "errors": self.errors,
+        }
@@ -4,17 +4,52 @@ import json
 import uuid
 import base64
 from typing import List, Optional, Dict, Any, Union
-from fastapi import FastAPI, HTTPException, Depends, Body, Query
+from fastapi import FastAPI, HTTPException, Depends, Body, Query, Header, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from azure.storage.filedatalake import DataLakeServiceClient
-from azure.identity import DefaultAzureCredential, ManagedIdentityCredential, ClientSecretCredential, ChainedTokenCredential
+from azure.storage.filedatalake.aio import DataLakeServiceClient as AsyncDataLakeServiceClient
+import azure.identity
+import azure.identity.aio
 from azure.core.exceptions import ResourceNotFoundError, ClientAuthenticationError
 import pandas as pd
 import pyarrow.parquet as pq
 import logging
 import os
 import platform
+import asyncio
+from client_pool import ClientLeaseMiddleware, ClientPool, PooledTokenCredential, AsyncPooledTokenCredential
+from fanout import collect, drop_limiter, get_limiter
+from folder_tree import FolderTreeBuilder, listing_hints, stable_node_id
+from metadata_cache import MetadataCache, connection_cache_key
+from footer_cache import FooterCache, merge_schemas
+from partition_catalog import PartitionCatalog, catalog_key
+from column_stats import ColumnStatsEngine
+from delta_log import DeltaLog
+from edit_overlay import EditOverlayStore, StaleOverlayError
+from lake_index import LakeIndex, LakeIndexer
+from search_index import ENTRY_TYPES, SearchIndex, entry_node
+from sort_index import SortIndex
+from response_formats import (
+    ARROW_STREAM_MEDIA_TYPE, JSON_MEDIA_TYPE, arrow_stream_chunks, json_row_chunks, negotiate, with_row_ids
+)
+from dataset_writer import CommitConflictError, commit_changes
+from worker_pool import JobCancelledError, WorkerPool
+from dataset_jobs import JobConnection, JobContext, preview_job, validate_job
+from validation import ValidationReports, compile_rules, report_key, validate_edits
+from dataset_export import (
+    EXPORT_COMPRESSIONS, EXPORT_FORMATS, ExportLayouts, export_batches, export_etag, export_layout,
+    export_schema, stream_export
+)
+from adls_fs import READ_STATS
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, MetricsMiddleware, cache_families, pipeline_policies
+from block_cache import shared_disk_cache
+from dataset_reader import (
+    dataset_schema, delta_data_files, describe_dataset, file_client_for, filter_columns, list_partitions, open_plan,
+    parse_filters, resolve_dataset_files, schema_to_columns
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -31,6 +66,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Route latency and the ADLS calls each request makes, served at /metrics
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ClientLeaseMiddleware)
+
 # Models
 class ADLSCredentials(BaseModel):
     useManagedIdentity: bool = False
@@ -83,12 +122,20 @@ class FolderTreeNode(BaseModel):
     children: List['FolderTreeNode'] = []
     metadata: Optional[Dict[str, Any]] = None
 
+FolderTreeNode.update_forward_refs()
+
+class FolderChildrenResponse(BaseModel):
+    path: str
+    children: List[FolderTreeNode]
+    continuationToken: Optional[str] = None
+
 class DatasetColumn(BaseModel):
     name: str
     type: str
     nullable: bool
     stats: Optional[Dict] = None
     validation: Optional[Dict] = None
+    validationRules: Optional[List[Dict]] = None
 
 class Dataset(BaseModel):
     id: str
@@ -101,6 +148,8 @@ class Dataset(BaseModel):
     lastModified: Optional[str] = None
     size: Optional[int] = None
     partitionColumns: Optional[List[str]] = None
+    folderPath: Optional[str] = None
+    containerName: Optional[str] = None
 
 class DataRow(BaseModel):
     __id: str
@@ -115,6 +164,72 @@ class DatasetPreview(BaseModel):
     pageSize: int
     totalPages: int
 
+class SearchHit(BaseModel):
+    type: str
+    score: float
+    matchedField: str
+    column: Optional[str] = None
+    node: FolderTreeNode
+    dataset: Optional[Dataset] = None
+
+class SearchResponse(BaseModel):
+    query: str
+    results: List[SearchHit]
+    totalResults: int
+    page: int
+    pageSize: int
+    totalPages: int
+    # Datasets whose columns were not indexed yet, so column matches may be missing
+    pendingSchemas: int = 0
+
+class ColumnRules(BaseModel):
+    name: str
+    validation: Optional[Dict] = None
+    validationRules: Optional[List[Dict]] = None
+
+class ValidationError(BaseModel):
+    rowId: str
+    columnName: str
+    rule: str
+    message: str
+    severity: str = "error"
+
+class RuleViolations(BaseModel):
+    column: str
+    rule: str
+    message: str
+    count: int
+
+class ValidationReportResponse(BaseModel):
+    isValid: bool
+    totalRows: int
+    violationCount: int
+    rules: List[RuleViolations]
+    skippedRules: List[Dict]
+    errors: List[ValidationError]
+    truncated: bool
+    page: int
+    pageSize: int
+    totalPages: int
+
+class DatasetPartition(BaseModel):
+    path: str
+    values: Dict[str, Optional[str]]
+    fileCount: int
+    size: int
+    lastModified: Optional[str] = None
+
+class PartitionsResponse(BaseModel):
+    path: str
+    partitionColumns: List[str]
+    partitions: List[DatasetPartition]
+    totalPartitions: int
+    fileCount: int
+    size: int
+    page: int
+    pageSize: int
+    totalPages: int
+
 class FileTypeResponse(BaseModel):
     hasDatasetFiles: bool
     formats: List[str]
@@ -126,50 +241,74 @@ class AuthMethodsResponse(BaseModel):
     recommendedMethod: Optional[str] = None
     environmentInfo: Dict[str, bool]
 
+# Lazy folder tree paging
+DEFAULT_CHILDREN_PAGE_SIZE = int(os.environ.get("ADLS_TREE_PAGE_SIZE", "200"))
+# Maximum entries listed per child folder to compute its item count and format hints
+TREE_PROBE_LIMIT = int(os.environ.get("ADLS_TREE_PROBE_LIMIT", "1000"))
+# Dataset preview paging
+DEFAULT_PREVIEW_PAGE_SIZE = int(os.environ.get("PREVIEW_PAGE_SIZE", "100"))
+MAX_PREVIEW_PAGE_SIZE = int(os.environ.get("PREVIEW_MAX_PAGE_SIZE", "10000"))
+# Search result paging
+DEFAULT_SEARCH_PAGE_SIZE = int(os.environ.get("ADLS_SEARCH_PAGE_SIZE", "50"))
+# Seconds a search waits for the columns of new datasets before answering without them
+SEARCH_SCHEMA_WAIT = float(os.environ.get("ADLS_SEARCH_SCHEMA_WAIT", "2"))
+
 # In-memory storage
 connections = {}
-temp_storage = {}
 
 # Helper functions
-def get_datalake_service_client(credentials: ADLSCredentials):
+def get_token_credential(credentials: ADLSCredentials, use_async: bool = False):
+    """Build the AAD credential for managed identity / user authentication."""
+    identity = azure.identity.aio if use_async else azure.identity
+    
+    if credentials.useUserCredentials:
+        # Use current user identity (works in corporate environments with LDAP/AD)
+        credential = identity.DefaultAzureCredential(exclude_managed_identity_credential=True)
+    elif credentials.clientId:
+        # Use specific managed identity
+        credential = identity.ManagedIdentityCredential(client_id=credentials.clientId)
+    else:
+        # Use system-assigned managed identity
+        credential = identity.ManagedIdentityCredential()
+        
+    # If tenant ID is provided, use it
+    if credentials.tenantId:
+        # Chain credentials to try tenant-specific and default
+        tenant_credential = identity.ClientSecretCredential(
+            tenant_id=credentials.tenantId,
+            client_id=credentials.clientId or "",
+            client_secret=""  # Empty for managed identity
+        )
+        credential = identity.ChainedTokenCredential(tenant_credential, credential)
+    
+    if use_async:
+        return AsyncPooledTokenCredential(credential)
+    return PooledTokenCredential(credential)
+
+def create_datalake_client(client_class, credentials: ADLSCredentials, transport=None, use_async: bool = False):
+    client_kwargs = {"transport": transport} if transport is not None else {}
+    # Count and time every ADLS call, by the route that made it
+    client_kwargs["_additional_pipeline_policies"] = pipeline_policies()
     try:
         if credentials.useManagedIdentity:
             # Use Managed Identity
             if not credentials.accountName:
                 raise ValueError("Account name is required when using managed identity")
             
-            if credentials.useUserCredentials:
-                # Use current user identity (works in corporate environments with LDAP/AD)
-                credential = DefaultAzureCredential(exclude_managed_identity_credential=True)
-            elif credentials.clientId:
-                # Use specific managed identity
-                credential = ManagedIdentityCredential(client_id=credentials.clientId)
-            else:
-                # Use system-assigned managed identity
-                credential = ManagedIdentityCredential()
-                
-            # If tenant ID is provided, use it
-            if credentials.tenantId:
-                # Chain credentials to try tenant-specific and default
-                tenant_credential = ClientSecretCredential(
-                    tenant_id=credentials.tenantId,
-                    client_id=credentials.clientId or "",
-                    client_secret=""  # Empty for managed identity
-                )
-                credential = ChainedTokenCredential(tenant_credential, credential)
-                
-            return DataLakeServiceClient(
+            return client_class(
                 account_url=f"https://{credentials.accountName}.dfs.core.windows.net",
-                credential=credential
+                credential=get_token_credential(credentials, use_async),
+                **client_kwargs
             )
         elif credentials.connectionString:
             # Use connection string
-            return DataLakeServiceClient.from_connection_string(credentials.connectionString)
+            return client_class.from_connection_string(credentials.connectionString, **client_kwargs)
         elif credentials.accountName and credentials.accountKey:
             # Use account key
-            return DataLakeServiceClient(
+            return client_class(
                 account_url=f"https://{credentials.accountName}.dfs.core.windows.net",
-                credential=credentials.accountKey
+                credential=credentials.accountKey,
+                **client_kwargs
             )
         else:
             raise ValueError("Invalid credentials. Provide either managed identity, connection string, or account name and key.")
@@ -180,6 +319,222 @@ def get_datalake_service_client(credentials: ADLSCredentials):
         logger.error(f"Error creating DataLake client: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to create DataLake client: {str(e)}")
 
+def get_datalake_service_client(credentials: ADLSCredentials, transport=None):
+    return create_datalake_client(DataLakeServiceClient, credentials, transport)
+
+def get_async_datalake_service_client(credentials: ADLSCredentials, transport=None):
+    return create_datalake_client(AsyncDataLakeServiceClient, credentials, transport, use_async=True)
+
+# Service clients are shared by every request on the same connection. The async
+# clients serve the routes; the sync ones back blocking readers run in threads.
+client_pool = ClientPool(get_datalake_service_client)
+async_client_pool = ClientPool(get_async_datalake_service_client, transport_factory=None)
+
+def get_service_client(connection_id: str):
+    """Get the pooled DataLake client for a connection."""
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    
+    connection_info = connections[connection_id]
+    return client_pool.get(connection_id, ADLSCredentials(**connection_info["credentials"]))
+
+def get_async_service_client(connection_id: str):
+    """Get the pooled async DataLake client for a connection."""
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    
+    connection_info = connections[connection_id]
+    return async_client_pool.get(connection_id, ADLSCredentials(**connection_info["credentials"]))
+
+# Listings are shared by every connection that uses the same credentials
+metadata_cache = MetadataCache()
+# Parquet footers keyed by file URL and etag
+footer_cache = FooterCache()
+# Distinct-count sketches per file version
+column_stats_engine = ColumnStatsEngine(footer_cache)
+# Delta snapshots per (table, version)
+delta_log = DeltaLog()
+# File lists of partitioned Parquet folders, for partition-pruned reads
+partition_catalog = PartitionCatalog()
+# Sorted row positions per (dataset version, column), on disk
+sort_index = SortIndex()
+# Unsaved edits per dataset
+edit_overlays = EditOverlayStore()
+# Column validation rules per dataset, as set by the frontend
+validation_rules: Dict[str, List[Dict[str, Any]]] = {}
+# Full-dataset validation reports, for paging through violations
+validation_reports = ValidationReports()
+# CPU-heavy dataset jobs run here instead of on the API's event loop and threads
+worker_pool = WorkerPool(
+    initializer=JobContext,
+    local_context=JobContext(
+        footer_cache,
+        delta_log,
+        lambda connection: get_service_client(connection.connection_id),
+        partition_catalog,
+        sort_index,
+    )
+)
+
+def job_connection(connection_id: str) -> JobConnection:
+    """What a worker process needs to open a connection's datasets."""
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    credentials = ADLSCredentials(**connections[connection_id]["credentials"])
+    return JobConnection(connection_id, credentials, get_datalake_service_client)
+
+# Encodings of tabular responses, the default first
+TABLE_MEDIA_TYPES = [JSON_MEDIA_TYPE, ARROW_STREAM_MEDIA_TYPE]
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """Pick the response encoding from the Accept header."""
+    media_type = negotiate(accept, TABLE_MEDIA_TYPES)
+    if media_type is None:
+        raise HTTPException(status_code=406, detail=f"Supported media types: {', '.join(TABLE_MEDIA_TYPES)}")
+    return media_type
+
+def preview_response(result, page: int, page_size: int, media_type: str) -> StreamingResponse:
+    """Stream a preview page as Arrow IPC or as DatasetPreview JSON, one record batch at a time."""
+    info = {
+        "totalRows": result.total_rows,
+        "page": page,
+        "pageSize": page_size,
+        "totalPages": max(1, -(-result.total_rows // page_size))
+    }
+    headers = {
+        "X-Total-Rows": str(info["totalRows"]),
+        "X-Page": str(page),
+        "X-Page-Size": str(page_size),
+        "X-Total-Pages": str(info["totalPages"])
+    }
+    if media_type == ARROW_STREAM_MEDIA_TYPE:
+        table = with_row_ids(result.table, result.row_ids, result.modified)
+        return StreamingResponse(arrow_stream_chunks(table, info), media_type=media_type, headers=headers)
+    
+    columns = jsonable_encoder([DatasetColumn(**c) for c in schema_to_columns(result.schema)])
+    
+    def document():
+        yield f'{{"columns": {json.dumps(columns)}, "rows": ['.encode()
+        yield from json_row_chunks(result.table, result.row_ids, result.modified)
+        yield f'], {json.dumps(info)[1:]}'.encode()
+    
+    return StreamingResponse(document(), media_type=media_type, headers=headers)
+
+# Sizes of completed exports, for resuming downloads
+export_layouts = ExportLayouts()
+
+def parse_byte_range(range_header: Optional[str]):
+    """(start, end) of a single ``bytes=`` range; ``end`` is None when open-ended.
+
+    Suffix ranges and multiple ranges are not supported and give None.
+    """
+    if not range_header or not range_header.strip().lower().startswith("bytes="):
+        return None
+    spec = range_header.strip()[len("bytes="):]
+    if ',' in spec:
+        return None
+    first, _, last = spec.partition('-')
+    if not first.strip().isdigit() or (last.strip() and not last.strip().isdigit()):
+        return None
+    start = int(first)
+    end = int(last) if last.strip() else None
+    if end is not None and end < start:
+        return None
+    return start, end
+
+def overlay_key(connection_id: str, path: str) -> str:
+    """Edits belong to the storage account and dataset, not to one connection."""
+    return f"{connections[connection_id]['cacheKey']}:{path.strip('/')}"
+
+# Path and dataset index crawled in the background, shared per storage account
+lake_indexer = LakeIndexer(LakeIndex())
+# Name search over the lake index, kept up to date by its crawls
+search_index = SearchIndex()
+lake_indexer.index.listeners.append(search_index)
+
+def connection_containers(connection_id: str) -> Optional[List[str]]:
+    """The connection's container filter, or None when it sees every container."""
+    return connections[connection_id]["credentials"].get("containerFilter") or None
+
+def index_targets():
+    """One crawl per storage account, covering the containers of every connection that uses it."""
+    targets = {}
+    for connection_id, connection_info in list(connections.items()):
+        key = connection_info["cacheKey"]
+        containers = connection_containers(connection_id)
+        if key not in targets:
+            try:
+                targets[key] = (get_async_service_client(connection_id), containers, get_limiter(connection_id))
+            except Exception as e:
+                logger.error(f"Error creating client for indexing: {getattr(e, 'detail', None) or str(e)}")
+                continue
+        elif targets[key][1] is not None:
+            service_client, known, limiter = targets[key]
+            targets[key] = (service_client, None if containers is None else sorted(set(known) | set(containers)), limiter)
+    return targets
+
+async def ensure_indexed(connection_id: str, container_name: Optional[str] = None) -> Optional[List[str]]:
+    """Crawl the connection's (or one container's) containers unless already indexed.
+
+    Returns the indexed container names to restrict queries to, or None for all.
+    """
+    key = connections[connection_id]["cacheKey"]
+    containers = [container_name] if container_name else connection_containers(connection_id)
+    if not lake_indexer.is_indexed(key, containers):
+        await lake_indexer.crawl(key, get_async_service_client(connection_id), containers, get_limiter(connection_id))
+    if containers is None:
+        return None
+    wanted = [c.lower() for c in containers]
+    return [c for c in lake_indexer.index.containers(key) if c.lower() in wanted]
+
+async def indexed_datasets(connection_id: str, container_name: Optional[str] = None, folder_path: Optional[str] = None):
+    """Datasets under a connection, container or folder, from the lake index.
+
+    Containers not crawled yet are crawled first, so only the very first request waits on ADLS.
+    """
+    containers = await ensure_indexed(connection_id, container_name)
+    return lake_indexer.index.datasets(connections[connection_id]["cacheKey"], containers, folder_path)
+
+def schema_columns(cache_key: str, path: str) -> Optional[List[Dict[str, Any]]]:
+    """Columns of an indexed dataset, read through any connection to its storage account."""
+    connection_id = next((cid for cid, info in list(connections.items()) if info["cacheKey"] == cache_key), None)
+    if connection_id is None:
+        return None
+    return schema_to_columns(dataset_schema(
+        get_service_client(connection_id), path, footer_cache, delta_log, partition_catalog=partition_catalog
+    ))
+
+# The running lookup of new datasets' columns, shared by searches and crawls
+search_fill_task: Optional[asyncio.Task] = None
+
+def start_search_fill() -> asyncio.Task:
+    """The running fill of the search index's pending columns, started if none is."""
+    global search_fill_task
+    if search_fill_task is None or search_fill_task.done():
+        search_fill_task = asyncio.ensure_future(search_index.fill_columns(schema_columns))
+        search_fill_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return search_fill_task
+
+async def fill_search_columns():
+    await asyncio.shield(start_search_fill())
+
+async def list_container_tree(connection_id: str, container_client, container_name: str, prefix: str = ""):
+    """Build a container's tree from its recursive listing, served from the metadata cache when fresh."""
+    paths = await metadata_cache.get_paths(
+        connections[connection_id]["cacheKey"], container_client, container_name, prefix, get_limiter(connection_id)
+    )
+    return FolderTreeBuilder(container_name, prefix).add_paths(paths)
+
+async def list_containers_cached(connection_id: str, service_client):
+    """List the connection's containers (cached), applying its container filter."""
+    connection_info = connections[connection_id]
+    container_filter = connection_info["credentials"].get("containerFilter", [])
+    containers = await metadata_cache.get_containers(connection_info["cacheKey"], service_client, get_limiter(connection_id))
+    return [
+        container for container in containers
+        if not container_filter or container.name.lower() in [c.lower() for c in container_filter]
+    ]
+
 def detect_container_type(name: str) -> str:
     """Detect container type based on its name."""
     name_lower = name.lower()
@@ -194,76 +549,36 @@ def detect_container_type(name: str) -> str:
     else:
         return "other"
 
-def get_folders_from_paths(container_client, prefix=""):
-    """Extract folders from paths in a container."""
-    folders = set()
-    paths = container_client.get_paths(path=prefix)
-    
-    for path in paths:
-        path_name = path.name
-        if prefix:
-            # Remove the prefix from the path
-            if path_name.startswith(prefix):
-                path_name = path_name[len(prefix):]
-                
-        # Skip if this is the prefix itself
-        if not path_name:
-            continue
-            
-        # Extract the folder name (first segment after prefix)
-        parts = path_name.split('/')
-        if len(parts) > 0 and parts[0]:
-            folders.add(parts[0])
-    
-    return list(folders)
+def infer_schema_from_parquet(file_path, size: Optional[int] = None, etag: Optional[str] = None):
+    """Infer schema from a parquet file.
 
-def infer_schema_from_parquet(file_path):
-    """Infer schema from a parquet file."""
+    ``file_path`` is a local path or a DataLake file client. For a file client
+    only the footer is downloaded, and footers are cached per file version.
+    """
     try:
-        parquet_schema = pq.read_schema(file_path)
-        columns = []
-        
-        for field in parquet_schema.names:
-            field_type = parquet_schema.field(field).type
-            columns.append({
-                "name": field,
-                "type": str(field_type),
-                "nullable": not parquet_schema.field(field).nullable
-            })
-            
-        return columns
+        if isinstance(file_path, str):
+            parquet_schema = pq.read_schema(file_path)
+        else:
+            if size is None or etag is None:
+                properties = file_path.get_file_properties()
+                size, etag = properties.size, properties.etag
+            parquet_schema = footer_cache.get(file_path, file_path.url, size, etag).schema
+        return schema_to_columns(parquet_schema)
     except Exception as e:
         logger.error(f"Error inferring schema: {str(e)}")
         return []
 
-def check_for_dataset_files(container_client, folder_path):
+async def check_for_dataset_files(connection_id, container_client, container_name, folder_path):
     """Check if a folder contains delta or parquet files."""
-    formats = set()
-    has_dataset_files = False
-    
-    # Get all paths in the folder
     try:
-        paths = list(container_client.get_paths(path=folder_path, recursive=True))
-        
-        for path in paths:
-            path_name = path.name.lower()
-            
-            # Check if it's a delta or parquet file
-            if path_name.endswith('.parquet'):
-                formats.add('parquet')
-                has_dataset_files = True
-            elif '_delta_log' in path_name or (
-                path_name.endswith('.json') and any(p in path_name for p in ['_commit', '_metadata'])
-            ):
-                formats.add('delta')
-                has_dataset_files = True
-                
-        return has_dataset_files, list(formats)
+        builder = await list_container_tree(connection_id, container_client, container_name, folder_path)
+        summary = builder.summary()
+        return summary["hasDatasetFiles"], summary["formats"]
     except Exception as e:
         logger.error(f"Error checking for dataset files: {str(e)}")
         return False, []
 
-def build_folder_tree(connection_id, service_client, container_filter=None):
+async def build_folder_tree(connection_id, service_client):
     """Build the full folder tree structure."""
     tree = {
         'id': 'root',
@@ -272,149 +587,125 @@ def build_folder_tree(connection_id, service_client, container_filter=None):
         'children': []
     }
     
-    # List all containers
+    async def build_container_node(container):
+        container_name = container.name
+        metadata = {
+            'lastModified': container.last_modified.isoformat() if container.last_modified else None
+        }
+        
+        # Get the container client
+        container_client = service_client.get_file_system_client(container_name)
+        
+        # One recursive listing per container, the tree is assembled in memory
+        try:
+            builder = await list_container_tree(connection_id, container_client, container_name)
+        except Exception as e:
+            logger.error(f"Error listing container {container_name}: {str(e)}")
+            # Don't raise exception, continue building the tree
+            builder = FolderTreeBuilder(container_name)
+        
+        return builder.build(metadata=metadata)
+    
+    # List all containers, then list them concurrently
     try:
-        for container in service_client.list_file_systems():
-            container_name = container.name
-            
-            # Apply filter if specified
-            if container_filter and container_name.lower() not in [c.lower() for c in container_filter]:
-                continue
-                
-            container_id = str(uuid.uuid4())
-            container_node = {
-                'id': container_id,
-                'name': container_name,
-                'type': 'container',
-                'path': container_name,
-                'children': [],
-                'metadata': {
-                    'lastModified': container.last_modified.isoformat() if hasattr(container, 'last_modified') else None
-                }
-            }
-            
-            # Get the container client
-            container_client = service_client.get_file_system_client(container_name)
-            
-            # First level folders
-            add_folders_to_tree(container_client, container_node, container_name, '')
-            
-            tree['children'].append(container_node)
-            
+        containers = await list_containers_cached(connection_id, service_client)
+        tree['children'] = list(await asyncio.gather(*(build_container_node(c) for c in containers)))
         return tree
     except Exception as e:
         logger.error(f"Error building folder tree: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to build folder tree: {str(e)}")
 
-def add_folders_to_tree(container_client, parent_node, container_name, prefix, max_depth=10, current_depth=0):
-    """Recursively add folders to the tree."""
-    if current_depth >= max_depth:
-        return
-        
-    try:
-        # Get paths at this level
-        paths = container_client.get_paths(path=prefix, recursive=False)
-        
-        # Group paths by folder
-        folders = {}
-        for path in paths:
-            path_name = path.name
-            
-            # Skip if path is empty or this is the prefix itself
-            if not path_name or path_name == prefix:
-                continue
-                
-            # Remove prefix from path if needed
-            if prefix and path_name.startswith(prefix):
-                if prefix.endswith('/'):
-                    path_name = path_name[len(prefix):]
-                else:
-                    path_name = path_name[len(prefix) + 1:]
-                    
-            # Skip if path is empty after removing prefix
-            if not path_name:
-                continue
-                
-            # Get the folder name (first segment)
-            parts = path_name.split('/')
-            folder_name = parts[0]
-            
-            # This is a file at this level
-            if len(parts) == 1 and not path.is_directory:
-                file_type = 'unknown'
-                file_path = f"{container_name}/{prefix}/{path_name}".replace('//', '/')
-                
-                # Check if it's a dataset file
-                if path_name.endswith('.parquet'):
-                    file_type = 'parquet'
-                elif '_delta_log' in path_name:
-                    file_type = 'delta'
-                    
-                if file_type in ['parquet', 'delta']:
-                    # This is a dataset file
-                    parent_node['metadata'] = parent_node.get('metadata', {})
-                    parent_node['metadata']['hasDatasetFiles'] = True
-                    
-                    # Add dataset node to parent
-                    dataset_id = str(uuid.uuid4())
-                    dataset_name = os.path.basename(path_name)
-                    if dataset_name.endswith('.parquet'):
-                        dataset_name = dataset_name[:-8]  # Remove .parquet extension
-                        
-                    dataset_node = {
-                        'id': dataset_id,
-                        'name': dataset_name,
-                        'type': 'dataset',
-                        'format': file_type,
-                        'path': file_path,
-                        'children': []
-                    }
-                    
-                    parent_node['children'].append(dataset_node)
-            else:
-                # This is a folder
-                if folder_name not in folders:
-                    folder_id = str(uuid.uuid4())
-                    folder_path = f"{container_name}/{prefix}/{folder_name}".replace('//', '/')
-                    
-                    folder_node = {
-                        'id': folder_id,
-                        'name': folder_name,
-                        'type': 'folder',
-                        'path': folder_path,
-                        'children': []
-                    }
-                    
-                    # Check if this folder contains dataset files
-                    has_dataset_files, formats = check_for_dataset_files(
-                        container_client, 
-                        f"{prefix}/{folder_name}".replace('//', '/')
-                    )
-                    
-                    if has_dataset_files:
-                        folder_node['metadata'] = {
-                            'hasDatasetFiles': True,
-                            'formats': formats
-                        }
-                    
-                    folders[folder_name] = folder_node
+def paginate_nodes(nodes, continuation_token, page_size):
+    """Page an in-memory node list with an offset continuation token."""
+    offset = int(continuation_token[2:]) if continuation_token and continuation_token.startswith("o:") else 0
+    page = nodes[offset:offset + page_size]
+    next_offset = offset + page_size
+    return page, f"o:{next_offset}" if next_offset < len(nodes) else None
+
+async def probe_folder(container_client, folder_path, limiter=None):
+    """Item count and dataset-format hints for a folder from one bounded listing of its direct children."""
+    pages = container_client.get_paths(path=folder_path, recursive=False, max_results=TREE_PROBE_LIMIT).by_page()
+    items = []
+    async for page in pages:
+        items = await collect(page, limiter)
+        break
+    hints = listing_hints(items)
+    if pages.continuation_token:
+        hints["itemCountTruncated"] = True
+    return hints
+
+async def list_folder_children(container_client, container_name, prefix, continuation_token, page_size, limiter=None):
+    """List one page of a folder's direct children from ADLS."""
+    token = continuation_token[2:] if continuation_token and continuation_token.startswith("c:") else None
+    pages = container_client.get_paths(path=prefix or None, recursive=False, max_results=page_size).by_page(continuation_token=token)
+    items = []
+    async for page in pages:
+        items = await collect(page, limiter)
+        break
+    
+    async def probe(item):
+        try:
+            return await probe_folder(container_client, item.name, limiter)
+        except Exception as e:
+            logger.error(f"Error probing folder {container_name}/{item.name}: {str(e)}")
+            return {}
+    
+    # Probe every child folder concurrently
+    folder_items = [item for item in items if item.is_directory]
+    hints = dict(zip((item.name for item in folder_items), await asyncio.gather(*(probe(i) for i in folder_items))))
+    
+    nodes = []
+    for item in items:
+        name = item.name.rstrip('/').split('/')[-1]
+        path = f"{container_name}/{item.name}"
+        metadata = {"lastModified": item.last_modified.isoformat() if item.last_modified else None}
         
-        # Add folders to tree and process recursively
-        for folder_name, folder_node in folders.items():
-            parent_node['children'].append(folder_node)
-            
-            new_prefix = f"{prefix}/{folder_name}".replace('//', '/')
-            add_folders_to_tree(
-                container_client, 
-                folder_node, 
-                container_name, 
-                new_prefix,
-                max_depth,
-                current_depth + 1
-            )
-    except Exception as e:
-        logger.error(f"Error adding folders to tree: {str(e)}")
-        # Don't raise exception, continue building the tree
+        if item.is_directory and hints[item.name].pop("isDeltaTable", False):
+            metadata.update(hints[item.name])
+            nodes.append({
+                "id": stable_node_id(path),
+                "name": name,
+                "type": "dataset",
+                "format": "delta",
+                "path": path,
+                "children": [],
+                "metadata": metadata
+            })
+        elif item.is_directory and hints[item.name].get("partitionColumns"):
+            # A folder of key=value directories is one partitioned dataset
+            metadata.update(hints[item.name])
+            nodes.append({
+                "id": stable_node_id(path),
+                "name": name,
+                "type": "dataset",
+                "format": "parquet",
+                "path": path,
+                "children": [],
+                "metadata": metadata
+            })
+        elif item.is_directory:
+            metadata.update(hints[item.name])
+            nodes.append({
+                "id": stable_node_id(path),
+                "name": name,
+                "type": "folder",
+                "path": path,
+                "children": [],
+                "metadata": metadata
+            })
+        elif name.endswith(".parquet"):
+            metadata["size"] = item.content_length
+            nodes.append({
+                "id": stable_node_id(path),
+                "name": name[:-len(".parquet")],
+                "type": "dataset",
+                "format": "parquet",
+                "path": path,
+                "children": [],
+                "metadata": metadata
+            })
+    
+    return nodes, f"c:{pages.continuation_token}" if pages.continuation_token else None
 
 def is_azure_environment():
     """Check if the application is running in an Azure environment."""
@@ -472,19 +763,20 @@ def get_auth_methods():
 @app.post("/connect", response_model=ConnectionResponse)
 def connect(request: ConnectionRequest):
     try:
-        # Validate connection
-        service_client = get_datalake_service_client(request.credentials)
-        
-        # If we reached here, connection is valid
         connection_id = str(uuid.uuid4())
         
+        # Validate connection and keep the client for later requests
+        client_pool.get(connection_id, request.credentials)
+        
+        # If we reached here, connection is valid
         # Store connection info
         connections[connection_id] = {
             "id": connection_id,
             "name": request.name,
             "credentials": request.credentials.dict(),
-            "service_client": service_client
+            "cacheKey": connection_cache_key(request.credentials.dict())
         }
+        lake_indexer.schedule()
         
         # Return success response
         return {
@@ -499,81 +791,126 @@ def connect(request: ConnectionRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/disconnect/{connection_id}")
-def disconnect(connection_id: str):
+async def disconnect(connection_id: str):
     if connection_id in connections:
         del connections[connection_id]
+        client_pool.evict(connection_id)
+        async_client_pool.evict(connection_id)
+        drop_limiter(connection_id)
         return {"message": "Disconnected successfully"}
     raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
 
 @app.get("/folder-tree/{connection_id}")
-def get_folder_tree(connection_id: str):
+async def get_folder_tree(connection_id: str):
     if connection_id not in connections:
         raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
     
     try:
-        connection_info = connections[connection_id]
-        service_client = get_datalake_service_client(ADLSCredentials(**connection_info["credentials"]))
-        
-        # Get container filter from connection info
-        container_filter = connection_info["credentials"].get("containerFilter", [])
+        service_client = get_async_service_client(connection_id)
         
-        # Build the folder tree
-        tree = build_folder_tree(connection_id, service_client, container_filter)
+        # Build the folder tree (the container filter is applied while listing)
+        tree = await build_folder_tree(connection_id, service_client)
         
         return tree
     except Exception as e:
         logger.error(f"Error getting folder tree: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/containers/{connection_id}", response_model=List[Container])
-def list_containers(connection_id: str):
+@app.get("/folder-tree/{connection_id}/children", response_model=FolderChildrenResponse)
+async def get_folder_children(
+    connection_id: str,
+    container_name: Optional[str] = Query(None),
+    path: str = Query(""),
+    continuation_token: Optional[str] = Query(None),
+    page_size: int = Query(DEFAULT_CHILDREN_PAGE_SIZE, ge=1, le=5000)
+):
+    """Get one page of the direct children of a tree node."""
     if connection_id not in connections:
         raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
     
     try:
-        connection_info = connections[connection_id]
-        service_client = get_datalake_service_client(ADLSCredentials(**connection_info["credentials"]))
+        service_client = get_async_service_client(connection_id)
+        cache_key = connections[connection_id]["cacheKey"]
         
-        container_list = []
-        container_filter = connection_info["credentials"].get("containerFilter", [])
+        # Root node: the containers of the account
+        if not container_name:
+            nodes = []
+            for container in await list_containers_cached(connection_id, service_client):
+                nodes.append({
+                    "id": stable_node_id(container.name),
+                    "name": container.name,
+                    "type": "container",
+                    "path": container.name,
+                    "children": [],
+                    "metadata": {"lastModified": container.last_modified.isoformat() if container.last_modified else None}
+                })
+            page, token = paginate_nodes(nodes, continuation_token, page_size)
+            return {"path": "", "children": page, "continuationToken": token}
         
-        # List all containers
-        for container in service_client.list_file_systems():
+        prefix = path.strip('/')
+        node_path = f"{container_name}/{prefix}".rstrip('/')
+        
+        container_client = service_client.get_file_system_client(container_name)
+        
+        # Answer from a cached recursive listing when one is fresh. Offset tokens
+        # index that listing, so once it has expired it is listed again rather
+        # than restarting the folder from ADLS in a different order.
+        builder = None
+        if not continuation_token or continuation_token.startswith("o:"):
+            cached_paths = metadata_cache.peek_paths(cache_key, container_name, prefix)
+            if cached_paths is not None:
+                builder = FolderTreeBuilder(container_name, prefix).add_paths(cached_paths)
+            elif continuation_token:
+                builder = await list_container_tree(connection_id, container_client, container_name, prefix)
+        if builder is not None:
+            page, token = paginate_nodes(builder.child_nodes(), continuation_token, page_size)
+            return {"path": node_path, "children": page, "continuationToken": token}
+        
+        nodes, token = await list_folder_children(
+            container_client, container_name, prefix, continuation_token, page_size, get_limiter(connection_id)
+        )
+        return {"path": node_path, "children": nodes, "continuationToken": token}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting folder children: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/containers/{connection_id}", response_model=List[Container])
+async def list_containers(connection_id: str):
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    
+    try:
+        service_client = get_async_service_client(connection_id)
+        
+        async def describe_container(container):
             name = container.name
-            
-            # Apply filter if specified
-            if container_filter and name.lower() not in [c.lower() for c in container_filter]:
-                continue
-                
             container_client = service_client.get_file_system_client(name)
             
-            # Count paths (approximate count of files/folders)
-            path_count = sum(1 for _ in container_client.get_paths(recursive=False))
+            # Counts and dataset detection come from a single recursive listing
+            summary = (await list_container_tree(connection_id, container_client, name)).summary()
             
-            # Get folder count (top-level folders)
-            folders = get_folders_from_paths(container_client)
-            
-            # Check if this container has dataset files
-            has_dataset_files, _ = check_for_dataset_files(container_client, "")
-            
-            container_list.append({
+            return {
                 "id": str(uuid.uuid4()),
                 "name": name,
                 "path": name,
                 "type": detect_container_type(name),
-                "lastModified": container.last_modified.isoformat() if hasattr(container, 'last_modified') else None,
-                "folderCount": len(folders),
-                "blobCount": path_count,
-                "hasDatasetFiles": has_dataset_files
-            })
-            
-        return container_list
+                "lastModified": container.last_modified.isoformat() if container.last_modified else None,
+                "folderCount": summary["folderCount"],
+                "blobCount": summary["blobCount"],
+                "hasDatasetFiles": summary["hasDatasetFiles"]
+            }
+        
+        # List all containers, then describe them concurrently
+        containers = await list_containers_cached(connection_id, service_client)
+        return list(await asyncio.gather(*(describe_container(c) for c in containers)))
     except Exception as e:
         logger.error(f"Error listing containers: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/folders/{connection_id}/{container_id}", response_model=List[Folder])
-def list_folders(
+async def list_folders(
     connection_id: str, 
     container_id: str,
     container_name: str = Query(...)
@@ -582,36 +919,27 @@ def list_folders(
         raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
     
     try:
-        connection_info = connections[connection_id]
-        service_client = get_datalake_service_client(ADLSCredentials(**connection_info["credentials"]))
+        service_client = get_async_service_client(connection_id)
         
         container_client = service_client.get_file_system_client(container_name)
         
-        # Get top-level folders
-        folder_names = get_folders_from_paths(container_client)
+        # List the container once (top-level folders in parallel) and summarize each folder from memory
+        builder = await list_container_tree(connection_id, container_client, container_name)
         
         folders = []
-        for folder_name in folder_names:
-            # Get subfolders and file count for this folder
-            path_client = container_client.get_directory_client(folder_name)
-            
-            # Get paths in this folder
-            subfolder_names = get_folders_from_paths(container_client, folder_name)
-            path_count = sum(1 for _ in container_client.get_paths(path=folder_name, recursive=False))
-            
-            # Check if this folder contains dataset files
-            has_dataset_files, formats = check_for_dataset_files(container_client, folder_name)
+        for folder_name in builder.folder_names():
+            summary = builder.summary(folder_name)
             
             folders.append({
                 "id": str(uuid.uuid4()),
                 "name": folder_name,
                 "path": f"{container_name}/{folder_name}",
                 "containerName": container_name,
-                "lastModified": None,  # Azure doesn't provide this for folders
-                "folderCount": len(subfolder_names),
-                "blobCount": path_count,
-                "hasDatasetFiles": has_dataset_files,
-                "datasetFormats": formats if has_dataset_files else []
+                "lastModified": summary["lastModified"],
+                "folderCount": summary["folderCount"],
+                "blobCount": summary["blobCount"],
+                "hasDatasetFiles": summary["hasDatasetFiles"],
+                "datasetFormats": summary["formats"]
             })
             
         return folders
@@ -620,7 +948,7 @@ def list_folders(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/check-dataset-files/{connection_id}", response_model=FileTypeResponse)
-def check_dataset_files(
+async def check_dataset_files(
     connection_id: str,
     container_name: str = Query(...),
     folder_path: str = Query(...)
@@ -629,13 +957,12 @@ def check_dataset_files(
         raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
     
     try:
-        connection_info = connections[connection_id]
-        service_client = get_datalake_service_client(ADLSCredentials(**connection_info["credentials"]))
+        service_client = get_async_service_client(connection_id)
         
         container_client = service_client.get_file_system_client(container_name)
         
         # Check if this folder contains dataset files
-        has_dataset_files, formats = check_for_dataset_files(container_client, folder_path)
+        has_dataset_files, formats = await check_for_dataset_files(connection_id, container_client, container_name, folder_path)
         
         return {
             "hasDatasetFiles": has_dataset_files,
@@ -645,7 +972,817 @@ def check_dataset_files(
         logger.error(f"Error checking dataset files: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# ... keep existing code for the rest of the routes (datasets, preview, saving changes, etc.)
+@app.get("/datasets/{connection_id}", response_model=List[Dataset])
+async def list_datasets(connection_id: str):
+    """List every dataset of a connection from the lake index."""
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    
+    try:
+        return await indexed_datasets(connection_id)
+    except Exception as e:
+        logger.error(f"Error listing datasets: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/datasets/{connection_id}/container/{container_id}", response_model=List[Dataset])
+async def list_container_datasets(
+    connection_id: str,
+    container_id: str,
+    container_name: str = Query(...)
+):
+    """List the datasets of a container from the lake index."""
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    
+    try:
+        return await indexed_datasets(connection_id, container_name)
+    except Exception as e:
+        logger.error(f"Error listing container datasets: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/datasets/{connection_id}/folder/{folder_id}", response_model=List[Dataset])
+async def list_folder_datasets(
+    connection_id: str,
+    folder_id: str,
+    container_name: str = Query(...),
+    folder_path: str = Query(...)
+):
+    """List the datasets in a folder and its sub-folders from the lake index."""
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    
+    try:
+        return await indexed_datasets(connection_id, container_name, folder_path)
+    except Exception as e:
+        logger.error(f"Error listing folder datasets: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/search/{connection_id}", response_model=SearchResponse)
+async def search(
+    connection_id: str,
+    q: str = Query(..., min_length=1),
+    types: Optional[str] = Query(None),
+    container_name: Optional[str] = Query(None),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(DEFAULT_SEARCH_PAGE_SIZE, ge=1, le=1000)
+):
+    """Search container, folder, dataset and column names.
+
+    Every term of ``q`` must match a whole word, the start of a word or part of
+    a name; ``types`` is a comma-separated subset of container, folder, dataset
+    and column. Columns of new datasets are read from their schemas first, for
+    up to ``ADLS_SEARCH_SCHEMA_WAIT`` seconds; ``pendingSchemas`` counts the
+    datasets whose columns were still missing from the answer.
+    """
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    
+    entry_types = [t.strip() for t in types.split(',') if t.strip()] if types else None
+    unknown = [t for t in entry_types or [] if t not in ENTRY_TYPES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown result types: {', '.join(unknown)}")
+    
+    try:
+        key = connections[connection_id]["cacheKey"]
+        containers = await ensure_indexed(connection_id, container_name)
+        fill = start_search_fill()
+        if (entry_types is None or "column" in entry_types) and search_index.pending_schemas(key, containers):
+            try:
+                await asyncio.wait_for(asyncio.shield(fill), SEARCH_SCHEMA_WAIT)
+            except asyncio.TimeoutError:
+                # The fill goes on; pendingSchemas tells the client the columns are incomplete
+                pass
+        matches = search_index.search(key, q, entry_types, containers)
+        
+        total_pages = max(1, -(-len(matches) // page_size))
+        results = []
+        for entry, score, field in matches[(page - 1) * page_size:page * page_size]:
+            dataset = None
+            if entry.type in ("dataset", "column"):
+                dataset = lake_indexer.index.dataset(key, entry.container, entry.path)
+                if dataset is not None:
+                    dataset["columns"] = search_index.columns(key, entry.container, entry.path) or []
+            results.append({
+                "type": entry.type,
+                "score": round(score, 3),
+                "matchedField": field,
+                "column": entry.column,
+                "node": entry_node(entry),
+                "dataset": dataset,
+            })
+        return {
+            "query": q,
+            "results": results,
+            "totalResults": len(matches),
+            "page": page,
+            "pageSize": page_size,
+            "totalPages": total_pages,
+            "pendingSchemas": search_index.pending_schemas(key, containers),
+        }
+    except Exception as e:
+        logger.error(f"Error searching: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get(
+    "/dataset/{connection_id}/{dataset_id}",
+    response_model=Dataset,
+    responses={200: {"content": {ARROW_STREAM_MEDIA_TYPE: {}}}}
+)
+def get_dataset_info(
+    connection_id: str,
+    dataset_id: str,
+    path: Optional[str] = Query(None),
+    version: Optional[int] = Query(None, ge=0),
+    accept: Optional[str] = Header(None)
+):
+    """Get a dataset's columns, row count and size from its (cached) footers or Delta log.
+
+    As an Arrow IPC stream the dataset is an empty table with the dataset's
+    schema; the other fields are JSON values in the schema metadata.
+    """
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    media_type = negotiate_media_type(accept)
+    
+    try:
+        service_client = get_service_client(connection_id)
+        dataset = describe_dataset(
+            service_client, path or dataset_id, footer_cache, delta_log, version, partition_catalog
+        )
+        if version is None:
+            container, _, rest = dataset["path"].partition('/')
+            search_index.set_columns(connections[connection_id]["cacheKey"], container, rest, dataset["columns"])
+        overlay = edit_overlays.get(overlay_key(connection_id, path or dataset_id))
+        if overlay is not None and overlay.row_count:
+            dataset["repairedCount"] = overlay.row_count
+        rules = {c["name"]: c for c in validation_rules.get(overlay_key(connection_id, path or dataset_id), [])}
+        if rules:
+            dataset["columns"] = [
+                {**column, "validation": rules[column["name"]].get("validation"),
+                 "validationRules": rules[column["name"]].get("validationRules")}
+                if column["name"] in rules else column
+                for column in dataset["columns"]
+            ]
+        if media_type == ARROW_STREAM_MEDIA_TYPE:
+            schema = dataset_schema(
+                service_client, path or dataset_id, footer_cache, delta_log, version, partition_catalog
+            )
+            info = jsonable_encoder(Dataset(**dataset))
+            return StreamingResponse(arrow_stream_chunks(schema.empty_table(), info), media_type=media_type)
+        return dataset
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ResourceNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Dataset {path or dataset_id} not found")
+    except Exception as e:
+        logger.error(f"Error describing dataset: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/schema/{connection_id}/{dataset_id}", response_model=List[DatasetColumn])
+def get_dataset_schema(
+    connection_id: str,
+    dataset_id: str,
+    path: Optional[str] = Query(None),
+    version: Optional[int] = Query(None, ge=0)
+):
+    """Get the columns of a dataset from its (first) parquet footer or its Delta log."""
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    
+    try:
+        service_client = get_service_client(connection_id)
+        schema = dataset_schema(service_client, path or dataset_id, footer_cache, delta_log, version, partition_catalog)
+        return schema_to_columns(schema)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ResourceNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Dataset {path or dataset_id} not found")
+    except Exception as e:
+        logger.error(f"Error reading dataset schema: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/partitions/{connection_id}/{dataset_id}", response_model=PartitionsResponse)
+def get_dataset_partitions(
+    connection_id: str,
+    dataset_id: str,
+    path: Optional[str] = Query(None),
+    filters: Optional[str] = Query(None),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(DEFAULT_PREVIEW_PAGE_SIZE, ge=1, le=MAX_PREVIEW_PAGE_SIZE)
+):
+    """Get the partitions of a partitioned Parquet folder with their file counts and sizes.
+
+    ``filters`` on partition columns select partitions; with a cached catalog
+    only the matching partition directories are listed.
+    """
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    
+    try:
+        service_client = get_service_client(connection_id)
+        partitioning, partitions = list_partitions(
+            service_client, path or dataset_id, partition_catalog, parse_filters(filters)
+        )
+        start = (page - 1) * page_size
+        return {
+            "path": (path or dataset_id).strip('/'),
+            "partitionColumns": partitioning.keys,
+            "partitions": [
+                {**partition, "lastModified": partition["lastModified"].isoformat()
+                 if hasattr(partition["lastModified"], "isoformat") else partition["lastModified"]}
+                for partition in partitions[start:start + page_size]
+            ],
+            "totalPartitions": len(partitions),
+            "fileCount": sum(partition["fileCount"] for partition in partitions),
+            "size": sum(partition["size"] for partition in partitions),
+            "page": page,
+            "pageSize": page_size,
+            "totalPages": max(1, -(-len(partitions) // page_size)),
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ResourceNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Dataset {path or dataset_id} not found")
+    except Exception as e:
+        logger.error(f"Error listing partitions: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/column-stats/{connection_id}/{dataset_id}", response_model=List[DatasetColumn])
+def get_column_stats(
+    connection_id: str,
+    dataset_id: str,
+    path: Optional[str] = Query(None),
+    columns: Optional[str] = Query(None),
+    distinct: bool = Query(True),
+    version: Optional[int] = Query(None, ge=0)
+):
+    """Get columns with min/max/count/nullCount from footers and estimated distinct counts."""
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    
+    try:
+        service_client = get_service_client(connection_id)
+        
+        dataset_files = resolve_dataset_files(service_client, path or dataset_id)
+        files = dataset_files.files
+        if dataset_files.format == "delta":
+            snapshot = delta_log.snapshot(service_client, dataset_files.root, version)
+            files = delta_data_files(snapshot, snapshot.active_files())
+        if not files:
+            raise HTTPException(status_code=404, detail=f"No parquet files found under {path or dataset_id}")
+        
+        file_clients = [file_client_for(service_client, f.path) for f in files]
+        requested = [c for c in columns.split(",") if c] if columns else None
+        stats = column_stats_engine.column_stats(file_clients, files, requested, distinct)
+        
+        # Footers are cached by now, so this costs no request
+        schema = merge_schemas([
+            footer.schema for footer in footer_cache.get_many([
+                (file_client, file_client.url, f.size, f.etag) for file_client, f in zip(file_clients, files)
+            ])
+        ])
+        return [c for c in schema_to_columns(schema, stats) if c["name"] in stats]
+    except HTTPException:
+        raise
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ResourceNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Dataset {path or dataset_id} not found")
+    except Exception as e:
+        logger.error(f"Error computing column stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get(
+    "/preview/{connection_id}/{dataset_id}",
+    response_model=DatasetPreview,
+    responses={200: {"content": {ARROW_STREAM_MEDIA_TYPE: {}}}}
+)
+async def preview_dataset(
+    request: Request,
+    connection_id: str,
+    dataset_id: str,
+    path: Optional[str] = Query(None),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(DEFAULT_PREVIEW_PAGE_SIZE, ge=1, le=MAX_PREVIEW_PAGE_SIZE),
+    sort_column: Optional[str] = Query(None),
+    sort_direction: Optional[str] = Query("asc", regex="^(asc|desc)$"),
+    filters: Optional[str] = Query(None),
+    columns: Optional[str] = Query(None),
+    version: Optional[int] = Query(None, ge=0),
+    accept: Optional[str] = Header(None)
+):
+    """Get one page of a dataset, or of a Delta table at a given version.
+
+    Only the footers, the filter/sort key columns of row groups that can match,
+    and the requested columns of the row groups holding the page are read.
+    Delta files are first pruned by partition values and file statistics.
+    Unsaved edits are merged into the page. Send
+    ``Accept: application/vnd.apache.arrow.stream`` for an Arrow IPC stream.
+    The page is read on the worker pool and abandoned if the client disconnects.
+    """
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    media_type = negotiate_media_type(accept)
+    
+    try:
+        parsed_filters = parse_filters(filters)
+        overlay = edit_overlays.get(overlay_key(connection_id, path or dataset_id))
+        result = await worker_pool.run(
+            connection_id,
+            preview_job,
+            job_connection(connection_id),
+            path or dataset_id,
+            page=page,
+            page_size=page_size,
+            sort_column=sort_column,
+            sort_direction=sort_direction,
+            filters=parsed_filters,
+            columns=[c for c in columns.split(",") if c] if columns else None,
+            version=version,
+            overlay=overlay,
+            request=request
+        )
+        
+        return preview_response(result, page, page_size, media_type)
+    except HTTPException:
+        raise
+    except JobCancelledError as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ResourceNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Dataset {path or dataset_id} not found")
+    except Exception as e:
+        logger.error(f"Error previewing dataset: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/export/{connection_id}/{dataset_id}")
+def export_dataset(
+    connection_id: str,
+    dataset_id: str,
+    path: Optional[str] = Query(None),
+    format: str = Query("csv", regex="^(csv|ndjson|parquet)$"),
+    compression: Optional[str] = Query(None, regex="^(none|gzip|zstd)$"),
+    sort_column: Optional[str] = Query(None),
+    sort_direction: Optional[str] = Query("asc", regex="^(asc|desc)$"),
+    filters: Optional[str] = Query(None),
+    columns: Optional[str] = Query(None),
+    version: Optional[int] = Query(None, ge=0),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None)
+):
+    """Stream the rows of a dataset matching the filters as CSV, NDJSON or Parquet.
+
+    Takes the same filters, sort and columns as ``/preview`` and includes
+    unsaved edits. ``compression`` gzip/zstd compresses CSV and NDJSON and sets
+    the Parquet codec. Interrupted downloads resume with a ``Range`` request
+    against the returned ``ETag``; when the export never completed before, its
+    size is first learned by encoding it once without sending it.
+    """
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    
+    try:
+        service_client = get_service_client(connection_id)
+        
+        parsed_filters = parse_filters(filters)
+        projection = [c for c in columns.split(",") if c] if columns else None
+        overlay = edit_overlays.get(overlay_key(connection_id, path or dataset_id))
+        prune_filters = parsed_filters
+        if overlay is not None and overlay.touches(filter_columns(parsed_filters)):
+            prune_filters = None
+        plan = open_plan(
+            service_client, path or dataset_id, footer_cache, delta_log, prune_filters, version, partition_catalog,
+            overlay.base_version if overlay is not None else None
+        )
+        if overlay is not None and overlay.base_version != plan.version_tag:
+            overlay = None
+        schema = export_schema(plan, projection, sort_column, parsed_filters)
+    except HTTPException:
+        raise
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ResourceNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Dataset {path or dataset_id} not found")
+    except Exception as e:
+        logger.error(f"Error preparing export: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    codec = None if compression in (None, "none") else compression
+    request = {
+        "path": (path or dataset_id).strip("/"),
+        "format": format,
+        "compression": codec,
+        "sortColumn": sort_column,
+        "sortDirection": sort_direction,
+        "filters": parsed_filters,
+        "columns": schema.names,
+    }
+    etag = export_etag(plan, request, overlay)
+    layout = export_layouts.get(etag)
+    
+    media_type, extension = EXPORT_FORMATS[format]
+    if codec and format != "parquet":
+        media_type, suffix = EXPORT_COMPRESSIONS[codec]
+        extension += suffix
+    name = plan.data_files[0].path if len(plan.data_files) == 1 else (path or dataset_id)
+    name = name.rstrip("/").split("/")[-1].rsplit(".parquet", 1)[0] or "export"
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{name}.{extension}"',
+    }
+    
+    def open_batches(start_batch: int):
+        return export_batches(plan, schema, parsed_filters, sort_column, sort_direction, overlay, start_batch)
+    
+    def body(start: int = 0, end: Optional[int] = None):
+        try:
+            yield from stream_export(open_batches, schema, format, codec, etag, export_layouts, start, end)
+        except Exception as e:
+            # The status line is already sent; the client sees a truncated download
+            logger.error(f"Error streaming export: {str(e)}")
+            raise
+    
+    byte_range = parse_byte_range(range_header)
+    if byte_range is not None and (if_range is None or if_range == etag):
+        if layout is None:
+            # The first download was interrupted before the size was known
+            try:
+                layout = export_layout(open_batches, schema, format, codec, etag, export_layouts)
+            except Exception as e:
+                logger.error(f"Error measuring export: {str(e)}")
+                raise HTTPException(status_code=500, detail=str(e))
+        start, end = byte_range
+        if start >= layout.size:
+            raise HTTPException(
+                status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{layout.size}"}
+            )
+        end = layout.size - 1 if end is None else min(end, layout.size - 1)
+        headers["Content-Range"] = f"bytes {start}-{end}/{layout.size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(body(start, end), status_code=206, media_type=media_type, headers=headers)
+    
+    # The size is only known once the export has completed
+    if layout is not None:
+        headers["Content-Length"] = str(layout.size)
+    return StreamingResponse(body(), media_type=media_type, headers=headers)
+
+@app.post("/save-changes/{connection_id}/{dataset_id}")
+def save_changes(
+    connection_id: str,
+    dataset_id: str,
+    rows: List[Dict[str, Any]] = Body(...),
+    path: Optional[str] = Query(None)
+):
+    """Save modified rows (identified by ``__id``) to the dataset's edit overlay.
+
+    Only the changed rows are kept, as a columnar delta over the current version
+    of the dataset; previews show them until they are committed or discarded.
+    """
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    
+    try:
+        service_client = get_service_client(connection_id)
+        plan = open_plan(service_client, path or dataset_id, footer_cache, delta_log, partition_catalog=partition_catalog)
+        overlay = edit_overlays.save(
+            overlay_key(connection_id, path or dataset_id), plan.version_tag, rows, plan.schema, plan.total_rows
+        )
+        return {"message": "Changes saved", "savedRows": len(rows), "repairedCount": overlay.row_count}
+    except StaleOverlayError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ResourceNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Dataset {path or dataset_id} not found")
+    except Exception as e:
+        logger.error(f"Error saving changes: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/save-changes/{connection_id}/{dataset_id}")
+def discard_changes(connection_id: str, dataset_id: str, path: Optional[str] = Query(None)):
+    """Discard a dataset's unsaved edits."""
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    
+    discarded = edit_overlays.discard(overlay_key(connection_id, path or dataset_id))
+    return {"message": "Changes discarded" if discarded else "No changes to discard"}
+
+@app.put("/validation-rules/{connection_id}/{dataset_id}", response_model=List[ColumnRules])
+def set_validation_rules(
+    connection_id: str,
+    dataset_id: str,
+    columns: List[ColumnRules] = Body(...),
+    path: Optional[str] = Query(None)
+):
+    """Set the validation rules of a dataset's columns, replacing the previous ones.
+
+    The rules are checked against the dataset's schema; ``/validate`` and
+    ``/commit-changes`` use them.
+    """
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    
+    try:
+        service_client = get_service_client(connection_id)
+        schema = dataset_schema(
+            service_client, path or dataset_id, footer_cache, delta_log, partition_catalog=partition_catalog
+        )
+        rules = [c.dict() for c in columns if c.validation or c.validationRules]
+        compile_rules(rules, schema)
+        validation_rules[overlay_key(connection_id, path or dataset_id)] = rules
+        return rules
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (ResourceNotFoundError, FileNotFoundError):
+        raise HTTPException(status_code=404, detail=f"Dataset {path or dataset_id} not found")
+    except Exception as e:
+        logger.error(f"Error setting validation rules: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/validation-rules/{connection_id}/{dataset_id}", response_model=List[ColumnRules])
+def get_validation_rules(connection_id: str, dataset_id: str, path: Optional[str] = Query(None)):
+    """Get the validation rules set for a dataset's columns."""
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    
+    return validation_rules.get(overlay_key(connection_id, path or dataset_id), [])
+
+@app.post("/validate/{connection_id}/{dataset_id}", response_model=ValidationReportResponse)
+async def validate_dataset_rows(
+    request: Request,
+    connection_id: str,
+    dataset_id: str,
+    columns: Optional[List[ColumnRules]] = Body(None),
+    path: Optional[str] = Query(None),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(DEFAULT_PREVIEW_PAGE_SIZE, ge=1, le=MAX_PREVIEW_PAGE_SIZE),
+    version: Optional[int] = Query(None, ge=0)
+):
+    """Validate every row of a dataset, with unsaved edits merged in.
+
+    Uses the posted column rules, or the ones set with ``/validation-rules``.
+    Returns the violation count of every rule and one page of violations
+    (row ``__id``, column and rule) in row order. The scan runs on the worker
+    pool; reports are cached, so other pages of the same validation are served
+    without scanning again.
+    """
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    
+    key = overlay_key(connection_id, path or dataset_id)
+    rules = [c.dict() for c in columns] if columns is not None else validation_rules.get(key, [])
+    try:
+        service_client = get_service_client(connection_id)
+        # Only the footers are read here, to check the rules and find the cached report
+        plan = await asyncio.to_thread(
+            open_plan, service_client, path or dataset_id, footer_cache, delta_log, None, version, partition_catalog
+        )
+        overlay = edit_overlays.get(key)
+        if overlay is not None and overlay.base_version != plan.version_tag:
+            overlay = None
+        compile_rules(rules, plan.schema)
+        cache_key = report_key(plan, rules, overlay)
+        report = validation_reports.get(cache_key)
+        if report is None:
+            report = await worker_pool.run(
+                connection_id, validate_job, job_connection(connection_id), path or dataset_id, rules, version, overlay,
+                request=request
+            )
+            validation_reports.put(cache_key, report)
+    except HTTPException:
+        raise
+    except JobCancelledError as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ResourceNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Dataset {path or dataset_id} not found")
+    except Exception as e:
+        logger.error(f"Error validating dataset: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {
+        "isValid": report.violation_count == 0,
+        "totalRows": report.total_rows,
+        "violationCount": report.violation_count,
+        "rules": report.summary(),
+        "skippedRules": report.skipped,
+        "errors": report.violations((page - 1) * page_size, page_size),
+        "truncated": report.truncated,
+        "page": page,
+        "pageSize": page_size,
+        "totalPages": max(1, -(-report.retained // page_size)),
+    }
+
+@app.post("/commit-changes/{connection_id}/{dataset_id}")
+def commit_saved_changes(
+    connection_id: str,
+    dataset_id: str,
+    path: Optional[str] = Query(None),
+    validate: bool = Query(True)
+):
+    """Write a dataset's saved edits to ADLS.
+
+    Only the files holding edited rows are rewritten, streamed row group by row
+    group into chunked uploads. Delta tables get a new commit. Edited cells that
+    break the dataset's validation rules are rejected with ``422`` unless
+    ``validate=false``.
+    """
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    
+    key = overlay_key(connection_id, path or dataset_id)
+    overlay = edit_overlays.get(key)
+    if overlay is None or not overlay.row_count:
+        raise HTTPException(status_code=400, detail="No saved changes to commit")
+    
+    try:
+        service_client = get_service_client(connection_id)
+        rules = validation_rules.get(key)
+        if validate and rules:
+            plan = open_plan(
+                service_client, path or dataset_id, footer_cache, delta_log, partition_catalog=partition_catalog
+            )
+            if overlay.base_version == plan.version_tag:
+                # Stale edits are left to commit_changes, which rejects them
+                compiled, skipped = compile_rules(rules, plan.schema)
+                report = validate_edits(plan, overlay, compiled, skipped)
+                if report.violation_count:
+                    raise HTTPException(status_code=422, detail={
+                        "message": f"{report.violation_count} validation errors in the edited cells",
+                        "rules": report.summary(),
+                        "errors": report.violations(0, DEFAULT_PREVIEW_PAGE_SIZE),
+                    })
+        result = commit_changes(service_client, path or dataset_id, overlay, footer_cache, delta_log)
+        edit_overlays.discard(key)
+        container, _, folder = (path or dataset_id).strip('/').partition('/')
+        metadata_cache.invalidate(connections[connection_id]["cacheKey"], container, folder or None)
+        partition_catalog.invalidate(catalog_key(service_client.get_file_system_client(container), folder))
+        return {"message": "Changes committed", **result}
+    except HTTPException:
+        raise
+    except CommitConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ResourceNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Dataset {path or dataset_id} not found")
+    except Exception as e:
+        logger.error(f"Error committing changes: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/stats/client-pool")
+def get_client_pool_stats():
+    """Get hit/miss counters for the service client pools."""
+    return {**client_pool.stats(), "async": async_client_pool.stats()}
+
+@app.post("/refresh/{connection_id}")
+def refresh_metadata(
+    connection_id: str,
+    container_name: Optional[str] = Query(None),
+    folder_path: Optional[str] = Query(None)
+):
+    """Drop cached listings so the next request re-enumerates ADLS."""
+    if connection_id not in connections:
+        raise HTTPException(status_code=404, detail=f"Connection {connection_id} not found")
+    
+    invalidated = metadata_cache.invalidate(connections[connection_id]["cacheKey"], container_name, folder_path)
+    if container_name:
+        container_client = get_service_client(connection_id).get_file_system_client(container_name)
+        partition_catalog.invalidate(catalog_key(container_client, folder_path or ""))
+    else:
+        partition_catalog.invalidate()
+    lake_indexer.schedule()
+    return {"message": "Metadata cache refreshed", "invalidated": invalidated}
+
+@app.get("/stats/metadata-cache")
+def get_metadata_cache_stats():
+    """Get hit/miss counters for the listing metadata cache."""
+    return metadata_cache.stats()
+
+@app.get("/stats/range-reads")
+def get_range_read_stats():
+    """Get request and byte counters for ranged ADLS reads."""
+    return READ_STATS.stats()
+
+@app.get("/stats/disk-cache")
+def get_disk_cache_stats():
+    """Get the local disk block cache's size, hit ratio and evictions (counters are per process)."""
+    disk_cache = shared_disk_cache()
+    if disk_cache is None:
+        return {"enabled": False}
+    return disk_cache.stats()
+
+@app.get("/stats/footer-cache")
+def get_footer_cache_stats():
+    """Get hit/miss counters for the Parquet footer cache."""
+    return footer_cache.stats()
+
+@app.get("/stats/partitions")
+def get_partition_catalog_stats():
+    """Get the partition catalog's size and how many files partition pruning skipped."""
+    return partition_catalog.stats()
+
+@app.get("/stats/sort-index")
+def get_sort_index_stats():
+    """Get the sort index's size, builds and hits, and how many row groups top-k scans skipped."""
+    return sort_index.stats()
+
+@app.get("/stats/column-stats")
+def get_column_stats_cache_stats():
+    """Get hit/miss counters for the distinct-count sketch cache."""
+    return column_stats_engine.stats()
+
+@app.get("/stats/delta-log")
+def get_delta_log_stats():
+    """Get snapshot cache counters and the number of log files read."""
+    return delta_log.stats()
+
+@app.get("/stats/edit-overlay")
+def get_edit_overlay_stats():
+    """Get memory use and spill counters of the edit overlay store."""
+    return edit_overlays.stats()
+
+@app.get("/stats/lake-index")
+def get_lake_index_stats():
+    """Get path and dataset counts and crawl counters of the lake index."""
+    return lake_indexer.stats()
+
+@app.get("/stats/worker-pool")
+def get_worker_pool_stats():
+    """Get the worker pool's queue lengths per connection and job counters."""
+    return worker_pool.stats()
+
+@app.get("/stats/validation")
+def get_validation_stats():
+    """Get the number of cached validation reports and their retained violations."""
+    return validation_reports.stats()
+
+@app.get("/stats/export")
+def get_export_stats():
+    """Get the number of completed exports remembered for range requests."""
+    return export_layouts.stats()
+
+@app.get("/stats/search-index")
+def get_search_index_stats():
+    """Get entry, token and query counters of the search index."""
+    return search_index.stats()
+
+def cache_metrics():
+    return cache_families({
+        "metadata": metadata_cache.stats,
+        "footer": footer_cache.stats,
+        "delta_log": delta_log.stats,
+        "partition_catalog": partition_catalog.stats,
+        "column_stats": column_stats_engine.stats,
+        "sort_index": sort_index.stats,
+        "client_pool": client_pool.stats,
+        "async_client_pool": async_client_pool.stats,
+        "disk": lambda: shared_disk_cache().stats() if shared_disk_cache() is not None else None,
+    })
+
+REGISTRY.register_collector(cache_metrics)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus metrics: route latency, ADLS calls and bytes per route, and cache hit ratios."""
+    return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.on_event("startup")
+async def start_lake_indexer():
+    # An index persisted in ADLS_INDEX_DB is searchable before the first crawl
+    lake_indexer.index.replay(search_index)
+    lake_indexer.start(index_targets, on_round=fill_search_columns)
+    worker_pool.start()
+
+@app.on_event("shutdown")
+async def close_client_pool():
+    await worker_pool.stop()
+    await lake_indexer.stop()
+    client_pool.clear()
+    await async_client_pool.aclear()
 
 if __name__ == "__main__":
     import uvicorn
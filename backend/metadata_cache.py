@@ -0,0 +1,379 @@
+"""
+Metadata cache for container and folder listings.
+
+Listings are cached per (connection, container, prefix) with a TTL and LRU
+eviction. Entries are revalidated by comparing last-modified times against
+non-recursive listings: those of the prefix's direct children, and of every
+directory in the cached listing. Creating or deleting a path changes its parent
+directory's last-modified time, so a change at any depth is noticed while only
+directories that hold sub-directories are listed. Entries can optionally be
+persisted to SQLite so they survive a restart; database reads and writes run in
+the default executor, off the event loop.
+"""
+
+import os
+import json
+import asyncio
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+import logging
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fanout import collect
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = int(os.environ.get("ADLS_METADATA_CACHE_TTL", "300"))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("ADLS_METADATA_CACHE_SIZE", "256"))
+# Entries younger than this are served without a revalidation listing
+DEFAULT_REVALIDATE_AFTER = int(os.environ.get("ADLS_METADATA_CACHE_REVALIDATE", "30"))
+DEFAULT_DB_PATH = os.environ.get("ADLS_METADATA_CACHE_DB")
+
+CachedPath = namedtuple("CachedPath", ["name", "is_directory", "last_modified", "content_length"])
+CachedContainer = namedtuple("CachedContainer", ["name", "last_modified"])
+
+
+def connection_cache_key(credentials: Dict[str, Any]) -> str:
+    """Stable cache key for a set of credentials, shared by every connection using them."""
+    identity = {k: v for k, v in credentials.items() if k != "containerFilter"}
+    return hashlib.sha256(json.dumps(identity, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+
+def _to_iso(value) -> Optional[str]:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _from_iso(value) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _fingerprint(paths, prefix: str) -> Dict[str, Optional[str]]:
+    """Fingerprint of a listing: last-modified time of each direct child of the prefix and of every directory."""
+    depth = len(prefix.split('/')) if prefix else 0
+    return {
+        path.name: _to_iso(path.last_modified)
+        for path in paths
+        if path.is_directory or path.name.count('/') == depth
+    }
+
+
+def _parent_directories(fingerprint: Dict[str, Optional[str]], prefix: str) -> List[str]:
+    """Directories below the prefix whose listings hold the fingerprinted sub-directories."""
+    parents = {name.rpartition('/')[0] for name in fingerprint}
+    return sorted(parent for parent in parents if parent and parent != prefix)
+
+
+def _cached_path(path) -> CachedPath:
+    return CachedPath(path.name, bool(path.is_directory), path.last_modified, getattr(path, "content_length", None))
+
+
+async def list_paths_recursive(container_client, prefix: str = "", limiter=None) -> List[CachedPath]:
+    """Recursive listing of a prefix, fanned out over its top-level directories.
+
+    A single recursive listing is paged serially; listing each direct
+    sub-directory as its own concurrent stream keeps wide containers fast while
+    returning the same paths in the same depth-first order.
+    """
+    top = await collect(container_client.get_paths(path=prefix or None, recursive=False), limiter)
+    subtrees = await asyncio.gather(*(
+        collect(container_client.get_paths(path=path.name, recursive=True), limiter)
+        for path in top if path.is_directory
+    ))
+
+    paths = []
+    subtree_iter = iter(subtrees)
+    for path in top:
+        paths.append(_cached_path(path))
+        if path.is_directory:
+            paths.extend(_cached_path(p) for p in next(subtree_iter))
+    return paths
+
+
+def _overlaps(cached_prefix: str, prefix: str) -> bool:
+    """Whether a cached listing covers, or is covered by, a prefix."""
+    return (
+        not cached_prefix
+        or cached_prefix == prefix
+        or cached_prefix.startswith(prefix + '/')
+        or prefix.startswith(cached_prefix + '/')
+    )
+
+
+class _Entry:
+    __slots__ = ("value", "fingerprint", "created_at", "validated_at")
+
+    def __init__(self, value, fingerprint, created_at=None, validated_at=None):
+        self.value = value
+        self.fingerprint = fingerprint
+        self.created_at = created_at or time.time()
+        self.validated_at = self.created_at if validated_at is None else validated_at
+
+
+class MetadataCache:
+    """TTL + LRU cache of listings with optional SQLite persistence."""
+
+    def __init__(
+        self,
+        ttl: int = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        revalidate_after: int = DEFAULT_REVALIDATE_AFTER,
+        db_path: Optional[str] = DEFAULT_DB_PATH,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.revalidate_after = revalidate_after
+        self._entries: "OrderedDict[Tuple[str, str, str], _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._db = None
+        # Serializes use of the database connection from executor threads
+        self._db_lock = threading.Lock()
+        self._inflight: Dict[Tuple[str, str, str], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        if db_path:
+            try:
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS listings ("
+                    "connection TEXT, container TEXT, prefix TEXT, "
+                    "created_at REAL, fingerprint TEXT, payload BLOB, "
+                    "PRIMARY KEY (connection, container, prefix))"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error opening metadata cache database: {str(e)}")
+                self._db = None
+
+    # Low-level entry access
+    async def _get_entry(self, key) -> Optional[_Entry]:
+        entry = self._memory_entry(key)
+        if entry is None and self._db is not None:
+            entry = await self._in_executor(self._load, key)
+            if entry is not None:
+                if time.time() - entry.created_at > self.ttl:
+                    await self._in_executor(self._delete_row, key)
+                    return None
+                with self._lock:
+                    self._store_memory(key, entry)
+        return entry
+
+    def _memory_entry(self, key) -> Optional[_Entry]:
+        """An unexpired entry held in memory; expired ones are dropped from memory."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry.created_at > self.ttl:
+                # The stored row is replaced by the next save, or dropped when loaded
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    async def _put_entry(self, key, entry: _Entry):
+        with self._lock:
+            self._store_memory(key, entry)
+        if self._db is not None:
+            await self._in_executor(self._save, key, entry)
+
+    def _store_memory(self, key, entry: _Entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    async def _in_executor(fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    def _delete_row(self, key):
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "DELETE FROM listings WHERE connection = ? AND container = ? AND prefix = ?", key
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing metadata cache: {str(e)}")
+
+    def _load(self, key) -> Optional[_Entry]:
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT created_at, fingerprint, payload FROM listings "
+                    "WHERE connection = ? AND container = ? AND prefix = ?", key
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading metadata cache: {str(e)}")
+            return None
+        if row is None:
+            return None
+        created_at, fingerprint, payload = row
+        records = json.loads(zlib.decompress(payload))
+        if key[1]:
+            value = [CachedPath(r[0], r[1], _from_iso(r[2]), r[3]) for r in records]
+        else:
+            value = [CachedContainer(r[0], _from_iso(r[1])) for r in records]
+        # Loaded entries are always revalidated before first use
+        return _Entry(value, json.loads(fingerprint), created_at, validated_at=0)
+
+    def _save(self, key, entry: _Entry):
+        records = [[_to_iso(v) if isinstance(v, datetime) else v for v in item] for item in entry.value]
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?, ?)",
+                    (*key, entry.created_at, json.dumps(entry.fingerprint),
+                     zlib.compress(json.dumps(records).encode()))
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing metadata cache: {str(e)}")
+
+    # Listing helpers
+    async def get_paths(self, connection_key: str, container_client, container_name: str, prefix: str = "", limiter=None) -> List[CachedPath]:
+        """Recursive listing of a container prefix, served from cache when still valid."""
+        prefix = prefix.strip('/')
+        key = (connection_key, container_name, prefix)
+
+        entry = await self._get_entry(key)
+        if entry is not None and await self._revalidate(entry, container_client, prefix, limiter):
+            self.hits += 1
+            return entry.value
+
+        # A fresh listing of the whole container already holds this prefix
+        if prefix:
+            parent = await self._get_entry((connection_key, container_name, ""))
+            if parent is not None and time.time() - parent.validated_at < self.revalidate_after:
+                self.hits += 1
+                return [p for p in parent.value if p.name.startswith(prefix + '/')]
+
+        self.misses += 1
+        paths = await self._single_flight(key, lambda: list_paths_recursive(container_client, prefix, limiter))
+        return paths
+
+    def peek_paths(self, connection_key: str, container_name: str, prefix: str = "") -> Optional[List[CachedPath]]:
+        """Cached recursive listing of a prefix if one is fresh, without touching storage.
+
+        Only entries in memory can be fresh: loaded ones are revalidated first.
+        """
+        prefix = prefix.strip('/')
+        for cached_prefix in ([prefix, ""] if prefix else [""]):
+            entry = self._memory_entry((connection_key, container_name, cached_prefix))
+            if entry is not None and time.time() - entry.validated_at < self.revalidate_after:
+                self.hits += 1
+                if cached_prefix == prefix:
+                    return entry.value
+                return [p for p in entry.value if p.name.startswith(prefix + '/')]
+        return None
+
+    async def get_containers(self, connection_key: str, service_client, limiter=None) -> List[CachedContainer]:
+        """List file systems, served from cache within the TTL."""
+        key = (connection_key, "", "")
+        entry = await self._get_entry(key)
+        if entry is not None:
+            self.hits += 1
+            return entry.value
+
+        self.misses += 1
+
+        async def fetch():
+            return [
+                CachedContainer(c.name, getattr(c, "last_modified", None))
+                for c in await collect(service_client.list_file_systems(), limiter)
+            ]
+
+        return await self._single_flight(key, fetch, fingerprint=lambda value: {})
+
+    async def _single_flight(self, key, fetch, fingerprint=None):
+        """Run one fetch per key at a time; concurrent callers share its result.
+
+        The fetch runs as its own task, so a caller that is cancelled stops
+        waiting for it without cancelling it for the others.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, fetch, fingerprint))
+            # Mark a failure retrieved even if every caller stopped waiting
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key, fetch, fingerprint):
+        try:
+            value = await fetch()
+            prefix = key[2]
+            await self._put_entry(key, _Entry(value, fingerprint(value) if fingerprint else _fingerprint(value, prefix)))
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _revalidate(self, entry: _Entry, container_client, prefix: str, limiter=None) -> bool:
+        """Check a cached listing against the current last-modified times of its top level and directories."""
+        if time.time() - entry.validated_at < self.revalidate_after:
+            return True
+        try:
+            top, *below = await asyncio.gather(*(
+                collect(container_client.get_paths(path=directory or None, recursive=False), limiter)
+                for directory in [prefix] + _parent_directories(entry.fingerprint, prefix)
+            ))
+            current = _fingerprint(top, prefix)
+            current.update(_fingerprint([path for paths in below for path in paths if path.is_directory], prefix))
+        except Exception as e:
+            logger.error(f"Error revalidating cached listing: {str(e)}")
+            return False
+        if current != entry.fingerprint:
+            self.invalidations += 1
+            return False
+        entry.validated_at = time.time()
+        return True
+
+    def invalidate(self, connection_key: str, container_name: Optional[str] = None, prefix: Optional[str] = None) -> int:
+        """Drop cached listings for a connection, optionally scoped to a container and prefix."""
+        prefix = prefix.strip('/') if prefix else None
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if key[0] == connection_key
+                and (container_name is None or key[1] in (container_name, ""))
+                and (not prefix or _overlaps(key[2], prefix))
+            ]
+            for key in keys:
+                self._entries.pop(key, None)
+        if self._db is not None:
+            # Called from sync routes, so off the event loop; the database is written outside the entry lock
+            query = "DELETE FROM listings WHERE connection = ?"
+            params = [connection_key]
+            if container_name is not None:
+                query += " AND container IN (?, '')"
+                params.append(container_name)
+            if prefix:
+                query += " AND (prefix = '' OR prefix = ? OR prefix LIKE ? OR ? LIKE prefix || '/%')"
+                params.extend([prefix, prefix + '/%', prefix])
+            try:
+                with self._db_lock:
+                    self._db.execute(query, params)
+                    self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error writing metadata cache: {str(e)}")
+        self.invalidations += len(keys)
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hitRatio": self.hits / total if total else 0.0,
+            "ttl": self.ttl,
+            "persistent": self._db is not None,
+        }
@@ -0,0 +1,464 @@
+"""
+Request and ADLS call metrics in the Prometheus text format.
+
+``MetricsMiddleware`` times every HTTP request by route template, and
+``AdlsCallPolicy`` (added to every DataLake client's pipeline) counts and times
+each HTTP call the Azure SDK makes, with the bytes it moved, labelled by
+operation (``get_paths``, ``list_file_systems``, ``download``, ...) and by the
+route of the request that made it. Calls made outside a request are labelled
+``background``. SDK call durations run until the response headers arrive, so
+a download's body transfer is not included.
+
+The route travels in a context variable. Work handed to other threads keeps it
+when wrapped with ``carry`` or run under ``bind``; worker processes send their
+metrics back with each job's result (``drain``/``merge``).
+With ``ADLS_SERVER_TIMING`` set, responses carry a ``Server-Timing`` header with
+the count and time of each kind of SDK call the request made.
+"""
+
+import os
+import time
+import math
+import threading
+import contextvars
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from azure.core.pipeline.policies import SansIOHTTPPolicy
+
+logger = logging.getLogger(__name__)
+
+# Add a Server-Timing breakdown of SDK calls to every response
+SERVER_TIMING = os.environ.get("ADLS_SERVER_TIMING", "").lower() in ("1", "true", "yes")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+BACKGROUND_ROUTE = "background"
+UNMATCHED_ROUTE = "unmatched"
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def drain(self) -> Dict[Labels, float]:
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: Dict[Labels, float]):
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Bucketed observations per label combination."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label combination: counts per bucket (not cumulative), sum, count
+        self._values: Dict[Labels, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def drain(self) -> Dict[Labels, List[Any]]:
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: Dict[Labels, List[Any]]):
+        with self._lock:
+            for key, (counts, total, count) in values.items():
+                state = self._values.get(key)
+                if state is None:
+                    state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                state[0] = [a + b for a, b in zip(state[0], counts)]
+                state[1] += total
+                state[2] += count
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                    cumulative += bucket_count
+                    samples.append((f"{self.name}_bucket", key + (_format_value(bound),), cumulative))
+                samples.append((f"{self.name}_sum", key, total))
+                samples.append((f"{self.name}_count", key, count))
+        return samples
+
+
+# A collector returns (name, type, help, [(labels, value), ...]) families read at scrape time
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+
+class Registry:
+    """Metrics of the process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: List[Collector] = []
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def register_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def drain(self) -> Dict[str, Any]:
+        """Take the values recorded so far, leaving every metric empty."""
+        return {name: metric.drain() for name, metric in self._metrics.items()}
+
+    def merge(self, values: Dict[str, Any]):
+        """Add values taken by ``drain`` (in another process)."""
+        for name, metric_values in values.items():
+            metric = self._metrics.get(name)
+            if metric is not None and metric_values:
+                metric.merge(metric_values)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            label_names = metric.label_names
+            for sample_name, key, value in metric.samples():
+                names = label_names + ("le",) if sample_name.endswith("_bucket") else label_names
+                lines.append(f"{sample_name}{_format_labels(names, key)} {_format_value(value)}")
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.error(f"Error collecting metrics: {str(e)}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "adls_http_request_duration_seconds",
+    "Time to serve an API request, by route template, method and status.",
+    ("route", "method", "status"),
+))
+SDK_REQUESTS = REGISTRY.register(Counter(
+    "adls_sdk_requests_total",
+    "HTTP calls made by the Azure SDK, by API route, operation and response status.",
+    ("route", "operation", "status"),
+))
+SDK_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "adls_sdk_request_duration_seconds",
+    "Time until the response headers of an Azure SDK call, by API route and operation.",
+    ("route", "operation"),
+))
+SDK_BYTES_READ = REGISTRY.register(Counter(
+    "adls_sdk_bytes_read_total",
+    "Response body bytes of Azure SDK calls, by API route and operation.",
+    ("route", "operation"),
+))
+SDK_BYTES_WRITTEN = REGISTRY.register(Counter(
+    "adls_sdk_bytes_written_total",
+    "Request body bytes of Azure SDK calls, by API route and operation.",
+    ("route", "operation"),
+))
+
+
+class RequestMetrics:
+    """SDK calls made on behalf of one API request (or one worker job)."""
+
+    def __init__(self, route: str):
+        self.route = route
+        self.started = time.perf_counter()
+        # operation -> [calls, seconds]
+        self.calls: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, seconds: float, count: int = 1):
+        with self._lock:
+            call = self.calls.setdefault(operation, [0, 0.0])
+            call[0] += count
+            call[1] += seconds
+
+    def merge(self, calls: Dict[str, List[float]]):
+        for operation, (count, seconds) in calls.items():
+            self.record(operation, seconds, count)
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` value: one entry per operation, then the whole request so far."""
+        with self._lock:
+            calls = sorted(self.calls.items())
+        entries = [
+            f'adls-{operation};desc="{int(count)} calls";dur={seconds * 1000:.1f}'
+            for operation, (count, seconds) in calls
+        ]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar("adls_request_metrics", default=None)
+
+
+def current_request() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+def current_route() -> str:
+    request = _current.get()
+    return request.route if request is not None else BACKGROUND_ROUTE
+
+
+@contextmanager
+def bind(request: Optional[RequestMetrics]):
+    """Attribute SDK calls made in this block (on any thread) to ``request``."""
+    token = _current.set(request)
+    try:
+        yield request
+    finally:
+        _current.reset(token)
+
+
+def carry(fn: Callable) -> Callable:
+    """Wrap ``fn`` so SDK calls it makes on another thread count for the caller's request."""
+    request = _current.get()
+
+    def run(*args, **kwargs):
+        with bind(request):
+            return fn(*args, **kwargs)
+
+    return run
+
+
+# SDK calls
+def _operation(method: str, url: str, headers) -> str:
+    """Name of the DataLake/Blob operation an SDK request performs."""
+    parts = urlsplit(url)
+    query = {key.lower(): values[-1] for key, values in parse_qs(parts.query).items()}
+    path = parts.path.strip('/')
+    resource = query.get("resource", "").lower()
+    restype = query.get("restype", "").lower()
+    comp = query.get("comp", "").lower()
+    action = query.get("action", "")
+
+    if method == "GET":
+        if comp == "list":
+            return "list_file_systems" if not path else "list_blobs"
+        if resource == "filesystem":
+            return "get_paths"
+        if restype == "container":
+            return "get_file_system_properties"
+        return "download"
+    if method == "HEAD":
+        if action:
+            return _snake(action)
+        return "get_file_system_properties" if resource == "filesystem" or restype == "container" else "get_properties"
+    if method == "PATCH":
+        if action in ("append", "flush"):
+            return f"{action}_data"
+        return _snake(action) if action else "update_path"
+    if method == "PUT":
+        if headers.get("x-ms-rename-source"):
+            return "rename"
+        if resource in ("file", "directory"):
+            return f"create_{resource}"
+        if resource == "filesystem" or restype == "container":
+            return "create_file_system"
+        return f"set_{comp}" if comp else "upload"
+    if method == "DELETE":
+        return "delete_file_system" if resource == "filesystem" or restype == "container" else "delete"
+    return method.lower()
+
+
+def _snake(name: str) -> str:
+    return "".join(f"_{c.lower()}" if c.isupper() else c for c in name).lstrip('_')
+
+
+class AdlsCallPolicy(SansIOHTTPPolicy):
+    """Pipeline policy that counts, times and sizes every HTTP call of a DataLake client."""
+
+    _START = "adls_metrics_start"
+
+    def on_request(self, request):
+        request.context[self._START] = time.perf_counter()
+
+    def on_response(self, request, response):
+        self._record(request, response.http_response.status_code, response.http_response.headers)
+
+    def on_exception(self, request):
+        self._record(request, "error", {})
+
+    def _record(self, request, status, response_headers):
+        started = request.context.get(self._START)
+        if started is None:
+            return
+        seconds = time.perf_counter() - started
+        http_request = request.http_request
+        operation = _operation(http_request.method.upper(), http_request.url, http_request.headers)
+        metrics = _current.get()
+        route = metrics.route if metrics is not None else BACKGROUND_ROUTE
+        SDK_REQUESTS.inc(route=route, operation=operation, status=status)
+        SDK_REQUEST_DURATION.observe(seconds, route=route, operation=operation)
+        written = _content_length(http_request.headers)
+        if written:
+            SDK_BYTES_WRITTEN.inc(written, route=route, operation=operation)
+        if http_request.method.upper() != "HEAD":
+            read = _content_length(response_headers)
+            if read:
+                SDK_BYTES_READ.inc(read, route=route, operation=operation)
+        if metrics is not None:
+            metrics.record(operation, seconds)
+
+
+def _content_length(headers) -> int:
+    try:
+        return int(headers.get("Content-Length") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def pipeline_policies() -> List[SansIOHTTPPolicy]:
+    """Extra policies for DataLake clients (``_additional_pipeline_policies``)."""
+    return [AdlsCallPolicy()]
+
+
+# API requests
+def route_template(scope) -> str:
+    """Path template of the route an ASGI request goes to (``/preview/{connection_id}/...``)."""
+    from starlette.routing import Match
+
+    app = scope.get("app")
+    routes = getattr(getattr(app, "router", None), "routes", None) or []
+    partial = None
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", UNMATCHED_ROUTE)
+        if match == Match.PARTIAL and partial is None:
+            partial = getattr(route, "path", None)
+    return partial or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """ASGI middleware that times requests by route and attributes their SDK calls to it.
+
+    The latency covers the whole response, streamed bodies included. The
+    ``Server-Timing`` header is written with the response headers, so for a
+    streamed response it only covers the calls made before the first byte.
+    """
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = RequestMetrics(route_template(scope))
+        status = "500"
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", request.server_timing().encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current.set(request)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - request.started, route=request.route, method=scope["method"], status=status
+            )
+
+
+def cache_families(caches: Dict[str, Callable[[], Optional[Dict[str, Any]]]]):
+    """Collector families for caches whose ``stats()`` report ``hits`` and ``misses``."""
+    hits, misses, ratios = [], [], []
+    for name, stats in caches.items():
+        values = stats()
+        if not values or "hits" not in values:
+            continue
+        labels = {"cache": name}
+        total = values["hits"] + values["misses"]
+        hits.append((labels, values["hits"]))
+        misses.append((labels, values["misses"]))
+        ratios.append((labels, values["hits"] / total if total else 0.0))
+    return [
+        ("adls_cache_hits_total", "counter", "Cache hits, by cache.", hits),
+        ("adls_cache_misses_total", "counter", "Cache misses, by cache.", misses),
+        ("adls_cache_hit_ratio", "gauge", "Hits over lookups since start, by cache.", ratios),
+    ]
@@ -0,0 +1,120 @@
+"""
+Summary metadata files of Parquet folders.
+
+Spark, Dask and pyarrow can write a ``_metadata`` file next to a folder's data
+files that holds the footers of all of them (every row group, tagged with its
+data file's relative path), and a ``_common_metadata`` file with only the
+schema. When a folder's ``_metadata`` lists exactly its current data files and
+is newer than all of them, the schema, row counts and statistics come from that
+one file instead of one footer per data file. The data files' own footers are
+then only fetched for the files a read opens.
+
+With ``ADLS_WRITE_SUMMARY_METADATA=1``, a folder of at least
+``ADLS_SUMMARY_MIN_FILES`` data files that had to be opened footer by footer
+gets both files written, provided its files share one schema.
+"""
+
+import os
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from footer_cache import FooterInfo, row_group_stats
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FILE = "_metadata"
+COMMON_METADATA_FILE = "_common_metadata"
+WRITE_SUMMARY_METADATA = os.environ.get("ADLS_WRITE_SUMMARY_METADATA", "0") == "1"
+# Folders with fewer data files are not worth a summary
+SUMMARY_MIN_FILES = int(os.environ.get("ADLS_SUMMARY_MIN_FILES", "8"))
+
+
+class SummaryFooter:
+    """One data file's part of a summary; used like its FooterInfo, but without the tail bytes."""
+
+    def __init__(self, summary: FooterInfo, indexes: List[int]):
+        self._summary = summary
+        self._indexes = indexes
+        self._row_groups = None
+        self.schema = summary.schema
+        self.num_rows = sum(summary.metadata.row_group(i).num_rows for i in indexes)
+        self.num_row_groups = len(indexes)
+        self.tail = None
+
+    @property
+    def row_groups(self) -> List[Dict[str, Any]]:
+        if self._row_groups is None:
+            self._row_groups = row_group_stats(self._summary.metadata, set(self.schema.names), self._indexes)
+        return self._row_groups
+
+
+def _relative(root: str, files: Sequence[Any]) -> List[str]:
+    prefix = root.strip('/') + '/'
+    return [f.path[len(prefix):] if f.path.startswith(prefix) else f.path for f in files]
+
+
+def summary_footers(summary: FooterInfo, root: str, files: Sequence[Any], modified) -> Optional[List[SummaryFooter]]:
+    """Footers of ``files`` (DataFile entries under ``root``) from a summary last modified at ``modified``.
+
+    Returns None when the summary does not list exactly these files, or is
+    older than one of them.
+    """
+    metadata = summary.metadata
+    indexes: Dict[str, List[int]] = {}
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        if row_group.num_columns == 0 or not row_group.column(0).file_path:
+            return None
+        indexes.setdefault(row_group.column(0).file_path, []).append(i)
+    relative = _relative(root, files)
+    if set(relative) != set(indexes):
+        return None
+    times = [f.last_modified for f in files]
+    if modified is None or any(t is None or t > modified for t in times):
+        return None
+    return [SummaryFooter(summary, indexes[path]) for path in relative]
+
+
+def build_summary(root: str, files: Sequence[Any], footers: Sequence[FooterInfo]) -> Optional[Tuple[bytes, bytes]]:
+    """``_metadata`` and ``_common_metadata`` contents for files, or None if their schemas differ."""
+    if not footers or any(not footer.schema.equals(footers[0].schema) for footer in footers):
+        return None
+    summary = None
+    try:
+        for path, footer in zip(_relative(root, files), footers):
+            # A private copy: set_file_path changes the metadata in place
+            metadata = pq.read_metadata(pa.BufferReader(footer.tail[-footer.footer_length:]))
+            metadata.set_file_path(path)
+            if summary is None:
+                summary = metadata
+            else:
+                summary.append_row_groups(metadata)
+        sink = pa.BufferOutputStream()
+        summary.write_metadata_file(sink)
+        common = pa.BufferOutputStream()
+        pq.write_metadata(footers[0].schema, common)
+    except (pa.ArrowException, RuntimeError) as e:
+        logger.error(f"Error building summary metadata for {root}: {str(e)}")
+        return None
+    return sink.getvalue().to_pybytes(), common.getvalue().to_pybytes()
+
+
+def write_summary(container_client, rest: str, root: str, files: Sequence[Any], footers: Sequence[FooterInfo]) -> bool:
+    """Write the summary files of a folder; failures (e.g. read-only credentials) are logged and ignored."""
+    contents = build_summary(root, files, footers)
+    if contents is None:
+        return False
+    summary, common = contents
+    prefix = f"{rest.strip('/')}/" if rest.strip('/') else ""
+    try:
+        container_client.get_file_client(f"{prefix}{COMMON_METADATA_FILE}").upload_data(common, overwrite=True)
+        # Written last, so it is newer than everything it describes
+        container_client.get_file_client(f"{prefix}{SUMMARY_FILE}").upload_data(summary, overwrite=True)
+    except Exception as e:
+        logger.error(f"Error writing summary metadata for {root}: {str(e)}")
+        return False
+    logger.info(f"Wrote summary metadata for {len(files)} files of {root}")
+    return True
@@ -0,0 +1,259 @@
+"""
+Hive-style partitions of Parquet folders.
+
+A folder whose data files sit under ``key=value`` directories is one dataset
+partitioned by those keys. ``HivePartitioning`` turns the directory names into
+typed partition columns (integers where every value is one, otherwise strings;
+``__HIVE_DEFAULT_PARTITION__`` is null) and into per-file partition
+expressions, so pyarrow can skip files by filter before opening them.
+
+``PartitionCatalog`` keeps the full file list of recently read partitioned
+datasets with per-file row counts, for ``ADLS_PARTITION_CATALOG_TTL`` seconds.
+A filtered read lists only the partition directories its filters can match and
+takes the row positions of the skipped partitions from the catalog, so ``__id``
+stays the same as in an unfiltered read.
+"""
+
+import os
+import re
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import unquote
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+logger = logging.getLogger(__name__)
+
+PARTITION_CATALOG_SIZE = int(os.environ.get("ADLS_PARTITION_CATALOG_SIZE", "64"))
+PARTITION_CATALOG_TTL = int(os.environ.get("ADLS_PARTITION_CATALOG_TTL", "300"))
+# Partition directories listed at the same time while pruning
+PARTITION_LIST_CONCURRENCY = int(os.environ.get("ADLS_PARTITION_LIST_CONCURRENCY", "16"))
+HIVE_NULL_VALUE = "__HIVE_DEFAULT_PARTITION__"
+
+_INTEGER = re.compile(r"-?\d{1,18}")
+
+
+def parse_partition_segment(segment: str) -> Optional[Tuple[str, Optional[str]]]:
+    """``(key, value)`` of a ``key=value`` directory name, or None for other names."""
+    key, separator, value = segment.partition('=')
+    if not separator or not key or key.startswith(('_', '.')):
+        return None
+    value = unquote(value)
+    return unquote(key), None if value == HIVE_NULL_VALUE else value
+
+
+def path_partition_values(rel_path: str) -> Dict[str, Optional[str]]:
+    """Partition values of the ``key=value`` directories of a path relative to the dataset root."""
+    values = {}
+    for segment in rel_path.strip('/').split('/')[:-1]:
+        parsed = parse_partition_segment(segment)
+        if parsed is not None:
+            values[parsed[0]] = parsed[1]
+    return values
+
+
+def _value_type(values) -> pa.DataType:
+    present = [value for value in values if value is not None]
+    if present and all(_INTEGER.fullmatch(value) for value in present):
+        return pa.int64()
+    return pa.string()
+
+
+class HivePartitioning:
+    """Partition keys of a dataset under ``root`` and the types of their values."""
+
+    def __init__(self, root: str, schema: pa.Schema):
+        self.root = root.strip('/')
+        self.schema = schema
+
+    @classmethod
+    def from_paths(cls, root: str, paths: Sequence[str]) -> Optional['HivePartitioning']:
+        """Partitioning shared by the data files at ``paths``, or None when they are not partitioned."""
+        root = root.strip('/')
+        keys = None
+        values: Dict[str, List[Optional[str]]] = {}
+        for path in paths:
+            path_values = path_partition_values(path[len(root):])
+            keys = list(path_values) if keys is None else [key for key in keys if key in path_values]
+            for key, value in path_values.items():
+                values.setdefault(key, []).append(value)
+        if not keys:
+            return None
+        return cls(root, pa.schema([pa.field(key, _value_type(values[key])) for key in keys]))
+
+    @property
+    def keys(self) -> List[str]:
+        return self.schema.names
+
+    def values(self, path: str) -> Dict[str, Any]:
+        """Typed partition values of a data file (missing keys are null)."""
+        return self.typed(path_partition_values(path.strip('/')[len(self.root):]))
+
+    def typed(self, values: Dict[str, Optional[str]]) -> Dict[str, Any]:
+        typed = {}
+        for field in self.schema:
+            value = values.get(field.name)
+            if value is not None and pa.types.is_integer(field.type):
+                value = int(value) if _INTEGER.fullmatch(value) else None
+            typed[field.name] = value
+        return typed
+
+    def expression(self, path: str) -> ds.Expression:
+        """Dataset expression that holds for every row of a data file."""
+        expression = ds.scalar(True)
+        for key, value in self.values(path).items():
+            condition = ds.field(key).is_null() if value is None else ds.field(key) == pa.scalar(
+                value, self.schema.field(key).type
+            )
+            expression = expression & condition
+        return expression
+
+    def matches(self, values: Sequence[Dict[str, Optional[str]]], expression: ds.Expression) -> np.ndarray:
+        """Which partitions (raw ``key: value`` dicts) may hold rows matching ``expression``."""
+        if not values:
+            return np.zeros(0, dtype=bool)
+        typed = [self.typed(v) for v in values]
+        table = pa.table({
+            **{field.name: pa.array([v[field.name] for v in typed], field.type) for field in self.schema},
+            "__index": pa.array(np.arange(len(values))),
+        })
+        selected = ds.dataset(table).to_table(filter=expression, columns=["__index"]).column("__index")
+        mask = np.zeros(len(values), dtype=bool)
+        mask[selected.to_numpy()] = True
+        return mask
+
+    def with_data_schema(self, schema: pa.Schema) -> pa.Schema:
+        """Data file schema with the partition columns appended (unless the files store them too)."""
+        for field in self.schema:
+            if field.name not in schema.names:
+                schema = schema.append(field)
+        return schema
+
+
+class CatalogFile(NamedTuple):
+    path: str
+    size: int
+    etag: Optional[str]
+    last_modified: Any
+
+
+class CatalogEntry:
+    """All data files of one partitioned dataset at the time it was listed."""
+
+    def __init__(self, root: str, files: Sequence[Any], partitioning: HivePartitioning):
+        self.root = root
+        self.files = [CatalogFile(f.path, f.size, f.etag, f.last_modified) for f in files]
+        self.partitioning = partitioning
+        self.listed_at = time.monotonic()
+        # Set once the files' footers have been read: rows per file and the table schema
+        self.row_counts: Optional[List[int]] = None
+        self.schema: Optional[pa.Schema] = None
+        self._index = {f.path: i for i, f in enumerate(self.files)}
+
+    def index(self, data_file) -> Optional[int]:
+        """Position of a data file in the catalog, or None if it is unknown or has changed."""
+        i = self._index.get(data_file.path)
+        if i is None or self.files[i].etag != data_file.etag or self.files[i].size != data_file.size:
+            return None
+        return i
+
+
+class PartitionCatalog:
+    """LRU of CatalogEntry by dataset URL, each valid for ``ttl`` seconds."""
+
+    def __init__(self, max_entries: int = PARTITION_CATALOG_SIZE, ttl: int = PARTITION_CATALOG_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CatalogEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.pruned_reads = 0
+        self.files_skipped = 0
+        self.fallbacks = 0
+
+    def get(self, key: str) -> Optional[CatalogEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.listed_at > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: CatalogEntry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_pruned(self, files_skipped: int):
+        with self._lock:
+            self.pruned_reads += 1
+            self.files_skipped += files_skipped
+
+    def record_fallback(self):
+        with self._lock:
+            self.fallbacks += 1
+
+    def invalidate(self, prefix: Optional[str] = None) -> int:
+        """Drop catalogs, optionally only those of datasets under a URL prefix."""
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if not prefix or key == prefix or key.startswith(prefix.rstrip('/') + '/')
+            ]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "datasets": len(self._entries),
+                "files": sum(len(entry.files) for entry in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "prunedReads": self.pruned_reads,
+                "filesSkipped": self.files_skipped,
+                "fallbacks": self.fallbacks,
+            }
+
+
+def summarize_partitions(root: str, files: Sequence[Any]) -> List[Dict[str, Any]]:
+    """File count, size and last modification of every partition directory holding some of ``files``."""
+    root = root.strip('/')
+    partitions: Dict[str, Dict[str, Any]] = {}
+    for f in files:
+        directory = f.path.rpartition('/')[0]
+        partition = partitions.get(directory)
+        if partition is None:
+            partition = partitions[directory] = {
+                "path": directory,
+                "values": path_partition_values(f.path[len(root):]),
+                "fileCount": 0,
+                "size": 0,
+                "lastModified": None,
+            }
+        partition["fileCount"] += 1
+        partition["size"] += f.size or 0
+        if f.last_modified is not None and (
+            partition["lastModified"] is None or f.last_modified > partition["lastModified"]
+        ):
+            partition["lastModified"] = f.last_modified
+    return sorted(partitions.values(), key=lambda partition: partition["path"])
+
+
+def catalog_key(container_client, rest: str) -> str:
+    """Catalog key of a dataset: its URL, so equal paths in different accounts do not collide."""
+    return f"{container_client.url.rstrip('/')}/{rest.strip('/')}".rstrip('/')
@@ -0,0 +1,237 @@
+"""
+Response encodings for tabular results.
+
+Clients pick an encoding with the ``Accept`` header: JSON (the default) or the
+Arrow IPC stream format. Both are produced straight from Arrow record batches
+and streamed one batch at a time. JSON rows are assembled with Arrow compute
+kernels: every column is turned into an array of JSON literals and the literals
+are joined element-wise into row objects, so no per-row Python dicts are built.
+Columns without a vectorised encoding (nested, binary, ...) fall back to
+encoding their values one by one.
+"""
+
+import os
+import json
+import base64
+import logging
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+logger = logging.getLogger(__name__)
+
+JSON_MEDIA_TYPE = "application/json"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+# Rows encoded and sent per chunk of a streamed response
+STREAM_BATCH_ROWS = int(os.environ.get("ADLS_STREAM_BATCH_ROWS", "10000"))
+
+# Control characters other than these become \\u00XX escapes
+_SHORT_ESCAPES = {"\b": "\\b", "\f": "\\f", "\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+def negotiate(accept: Optional[str], offered: Sequence[str]) -> Optional[str]:
+    """Best of the ``offered`` media types for an Accept header, or None if none is acceptable.
+
+    A missing header accepts anything, and ties go to the first offered type.
+    """
+    if not accept or not accept.strip():
+        return offered[0]
+    ranges = []
+    for part in accept.split(','):
+        media_range, *params = [p.strip() for p in part.split(';')]
+        if not media_range:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ranges.append((media_range.lower(), quality))
+
+    best, best_quality = None, 0.0
+    for media_type in offered:
+        main_type = media_type.split('/')[0]
+        # The most specific matching range decides the quality
+        matched = None
+        for media_range, quality in ranges:
+            specificity = 2 if media_range == media_type else 1 if media_range == f"{main_type}/*" else 0 if media_range == "*/*" else -1
+            if specificity >= 0 and (matched is None or specificity > matched[0]):
+                matched = (specificity, quality)
+        if matched is not None and matched[1] > best_quality:
+            best, best_quality = media_type, matched[1]
+    return best
+
+
+# Arrow IPC
+class ChunkSink:
+    """Write-only file collecting what a writer emits until the next drain."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def with_row_ids(table: pa.Table, row_ids: Sequence[int], modified: Sequence[int] = ()) -> pa.Table:
+    """Append the ``__id`` and ``__modified`` columns of the JSON rows to a page."""
+    ids = np.asarray(row_ids, dtype=np.int64)
+    flags = np.isin(ids, np.asarray(list(modified), dtype=np.int64))
+    return table.append_column("__id", pa.array(ids)).append_column("__modified", pa.array(flags))
+
+
+def arrow_stream_chunks(
+    table: pa.Table,
+    metadata: Optional[Dict[str, Any]] = None,
+    batch_rows: int = STREAM_BATCH_ROWS,
+) -> Iterator[bytes]:
+    """Arrow IPC stream of a table, one record batch per chunk.
+
+    ``metadata`` values are stored JSON-encoded in the schema metadata.
+    """
+    schema = table.schema
+    if metadata:
+        schema = schema.with_metadata({
+            **(schema.metadata or {}),
+            **{key: json.dumps(value, default=str) for key, value in metadata.items()},
+        })
+    sink = ChunkSink()
+    writer = pa.ipc.new_stream(sink, schema)
+    for batch in table.cast(schema).to_batches(max_chunksize=max(1, batch_rows)):
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    tail = sink.drain()
+    if tail:
+        yield tail
+
+
+# JSON
+def _json_default(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray)):
+        try:
+            return value.decode("utf-8")
+        except UnicodeDecodeError:
+            return base64.b64encode(value).decode("ascii")
+    if isinstance(value, float) and value != value:
+        return None
+    return str(value)
+
+
+def _escape_strings(array: pa.Array) -> pa.Array:
+    array = pc.replace_substring(array, "\\", "\\\\")
+    array = pc.replace_substring(array, '"', '\\"')
+    if pc.any(pc.match_substring_regex(array, "[\\x00-\\x1f]")).as_py():
+        for code in range(0x20):
+            char = chr(code)
+            array = pc.replace_substring(array, char, _SHORT_ESCAPES.get(char, f"\\u{code:04x}"))
+    return pc.binary_join_element_wise('"', array, '"', "")
+
+
+def _python_literals(array: pa.Array) -> pa.Array:
+    def encode(value):
+        if isinstance(value, float) and (value != value or value in (float("inf"), float("-inf"))):
+            return "null"
+        return json.dumps(value, default=_json_default, ensure_ascii=False)
+    return pa.array([encode(value) for value in array.to_pylist()], pa.string())
+
+
+def json_literals(array: pa.Array) -> pa.Array:
+    """JSON literal of every value of an array (``null`` for nulls), as a string array."""
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    if pa.types.is_dictionary(array.type):
+        array = array.dictionary_decode()
+    value_type = array.type
+
+    if pa.types.is_null(value_type):
+        return pa.array(["null"] * len(array), pa.string())
+    if pa.types.is_string(value_type) or pa.types.is_large_string(value_type):
+        literals = _escape_strings(array.cast(pa.string()))
+    elif pa.types.is_boolean(value_type) or pa.types.is_integer(value_type) or pa.types.is_decimal(value_type):
+        literals = array.cast(pa.string())
+    elif pa.types.is_floating(value_type):
+        literals = array.cast(pa.string())
+        # NaN and infinities are not valid JSON
+        finite = pc.is_finite(array)
+        literals = pc.if_else(finite, literals, pa.scalar(None, pa.string()))
+    elif pa.types.is_timestamp(value_type) or pa.types.is_date(value_type) or pa.types.is_time(value_type):
+        literals = pc.replace_substring(array.cast(pa.string()), " ", "T")
+        literals = pc.binary_join_element_wise('"', literals, '"', "")
+    else:
+        return _python_literals(array)
+    return pc.fill_null(literals, "null")
+
+
+def json_row_chunks(
+    table: pa.Table,
+    row_ids: Optional[Sequence[int]] = None,
+    modified: Sequence[int] = (),
+    batch_rows: int = STREAM_BATCH_ROWS,
+    separator: str = ",",
+) -> Iterator[bytes]:
+    """JSON row objects of a table joined by ``separator``, one chunk per batch.
+
+    With ``row_ids`` each row gets ``__id`` (as a string) and rows in
+    ``modified`` get ``"__modified": true``, like ``table_to_rows``.
+    """
+    ids = np.asarray(row_ids, dtype=np.int64) if row_ids is not None else None
+    modified_ids = np.asarray(list(modified), dtype=np.int64)
+    keys = [json.dumps(name, ensure_ascii=False) for name in table.column_names]
+    first = True
+    for offset in range(0, table.num_rows, max(1, batch_rows)):
+        batch = table.slice(offset, batch_rows)
+        parts: List[Any] = []
+        for index, (key, column) in enumerate(zip(keys, batch.columns)):
+            parts.append(("{" if index == 0 else ",") + key + ":")
+            parts.append(json_literals(column))
+        if not parts:
+            parts.append("{")
+        if ids is not None:
+            batch_ids = ids[offset:offset + batch.num_rows]
+            parts.append(("," if keys else "") + '"__id":"')
+            parts.append(pa.array(batch_ids).cast(pa.string()))
+            parts.append('"')
+            if len(modified_ids):
+                flags = pa.array(np.isin(batch_ids, modified_ids))
+                parts.append(pc.if_else(flags, ',"__modified":true', ""))
+        parts.append("}")
+        # Every row object is prefixed by its separator; the first one of the response has none
+        rows = pc.binary_join_element_wise(separator, *parts, "")
+        data = _string_data(rows)
+        if first:
+            data = data[len(separator.encode()):]
+            first = False
+        yield data
+
+
+def _string_data(array: pa.Array) -> bytes:
+    """The concatenated values of a string array without nulls, straight from its data buffer."""
+    offsets = np.frombuffer(array.buffers()[1], dtype=np.int32)[array.offset:array.offset + len(array) + 1]
+    if not len(array):
+        return b""
+    return array.buffers()[2].to_pybytes()[offsets[0]:offsets[-1]]
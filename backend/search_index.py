@@ -0,0 +1,378 @@
+"""
+In-process search over container, folder, dataset and column names.
+
+Every entry is tokenized (on separators and camelCase) into an inverted index,
+and the trigrams of its lower-cased name go into a second index, so a query
+term can match a whole token, the start of a token or any substring of a name.
+Sorted tokens make prefix lookups a bisect. Entries are added and removed as
+the lake index reports changed paths, and column entries are filled in from
+dataset schemas in the background, so the index never needs a full rebuild.
+"""
+
+import os
+import re
+import asyncio
+import bisect
+import threading
+import logging
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from dataset_reader import is_hidden_path
+from folder_tree import stable_node_id
+
+logger = logging.getLogger(__name__)
+
+# Dataset schemas read at the same time when filling in column entries
+SCHEMA_CONCURRENCY = int(os.environ.get("ADLS_SEARCH_SCHEMA_CONCURRENCY", "4"))
+
+ENTRY_TYPES = ("container", "folder", "dataset", "column")
+# Ties between equally good matches go to the entry users are most likely after
+_TYPE_WEIGHT = {"dataset": 1.0, "column": 0.9, "folder": 0.8, "container": 0.8}
+# Names count more than the folders leading up to them
+_NAME_FIELD = 2
+_PATH_FIELD = 1
+
+_SPLIT = re.compile(r"[^0-9a-zA-Z]+")
+_CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case tokens of a name: ``customerOrders_2024`` gives ``customer``, ``orders``, ``2024``."""
+    tokens = []
+    for part in _SPLIT.split(text):
+        if not part:
+            continue
+        words = _CAMEL.findall(part)
+        tokens.extend(word.lower() for word in words)
+        if len(words) > 1:
+            tokens.append(part.lower())
+    return tokens
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchEntry(NamedTuple):
+    connection: str
+    type: str
+    container: str
+    # Path inside the container ('' for the container itself)
+    path: str
+    name: str
+    format: Optional[str] = None
+    # Column entries belong to the dataset at ``path``
+    column: Optional[str] = None
+    dataset_name: Optional[str] = None
+
+    @property
+    def full_path(self) -> str:
+        return f"{self.container}/{self.path}" if self.path else self.container
+
+
+class SearchIndex:
+    """Inverted + trigram index of entries, updated incrementally."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries: Dict[int, SearchEntry] = {}
+        self._ids: Dict[Tuple[str, str, str, str, Optional[str]], int] = {}
+        self._next_id = 0
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._sorted_tokens: List[str] = []
+        self._trigrams: Dict[str, Set[int]] = {}
+        # DatasetColumn dicts per (connection, container, dataset path)
+        self._columns: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+        # Datasets whose columns are unknown or out of date
+        self._pending_columns: Dict[Tuple[str, str, str], None] = {}
+        self._filling = False
+        self.queries = 0
+        self.schema_errors = 0
+
+    # Entries
+    def _add(self, entry: SearchEntry) -> None:
+        key = (entry.connection, entry.type, entry.container, entry.path, entry.column)
+        entry_id = self._ids.get(key)
+        if entry_id is not None:
+            if self._entries[entry_id] == entry:
+                return
+            self._remove_id(entry_id)
+        entry_id = self._next_id
+        self._next_id += 1
+        self._ids[key] = entry_id
+        self._entries[entry_id] = entry
+
+        fields: Dict[str, int] = {}
+        for token in tokenize(entry.name):
+            fields[token] = _NAME_FIELD
+        folders = entry.path.split('/')[:-1] if entry.type != "column" else entry.path.split('/')
+        for part in [entry.container] + folders:
+            for token in tokenize(part):
+                fields.setdefault(token, _PATH_FIELD)
+        for token, field in fields.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                bisect.insort(self._sorted_tokens, token)
+            postings[entry_id] = field
+        for gram in trigrams(entry.name.lower()):
+            self._trigrams.setdefault(gram, set()).add(entry_id)
+
+    def _remove_id(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        del self._ids[(entry.connection, entry.type, entry.container, entry.path, entry.column)]
+        for token in set(tokenize(entry.name)) | {
+            t for part in [entry.container] + entry.path.split('/') for t in tokenize(part)
+        }:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(entry_id, None)
+            if not postings:
+                del self._postings[token]
+                index = bisect.bisect_left(self._sorted_tokens, token)
+                if index < len(self._sorted_tokens) and self._sorted_tokens[index] == token:
+                    del self._sorted_tokens[index]
+        for gram in trigrams(entry.name.lower()):
+            ids = self._trigrams.get(gram)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._trigrams[gram]
+
+    def _remove(self, connection: str, entry_type: str, container: str, path: str, column: Optional[str] = None) -> None:
+        entry_id = self._ids.get((connection, entry_type, container, path, column))
+        if entry_id is not None:
+            self._remove_id(entry_id)
+
+    def _remove_dataset(self, connection: str, container: str, path: str) -> None:
+        self._remove(connection, "dataset", container, path)
+        for column in self._columns.pop((connection, container, path), []):
+            self._remove(connection, "column", container, path, column["name"])
+        self._pending_columns.pop((connection, container, path), None)
+
+    def apply_changes(
+        self,
+        connection: str,
+        container: str,
+        changed_paths: Iterable[Tuple[str, bool]],
+        removed_paths: Iterable[str],
+        changed_datasets: Dict[str, Dict[str, Any]],
+        removed_datasets: Iterable[str],
+    ) -> None:
+        """Apply one container's crawl diff, as reported by LakeIndex."""
+        with self._lock:
+            self._add(SearchEntry(connection, "container", container, "", container))
+            for path, is_directory in changed_paths:
+                if is_directory and not is_hidden_path(path):
+                    self._add(SearchEntry(connection, "folder", container, path, path.rpartition('/')[2]))
+            for path in removed_paths:
+                self._remove(connection, "folder", container, path)
+            for path in removed_datasets:
+                self._remove_dataset(connection, container, path)
+            for path, dataset in changed_datasets.items():
+                self._add(SearchEntry(
+                    connection, "dataset", container, path, dataset["name"] or container, dataset["format"]
+                ))
+                # The dataset changed, so its schema may have too
+                self._pending_columns[(connection, container, path)] = None
+
+    def drop_container(self, connection: str, container: str) -> None:
+        with self._lock:
+            for entry_id, entry in list(self._entries.items()):
+                if entry.connection == connection and entry.container == container:
+                    self._remove_id(entry_id)
+            for key in [k for k in self._columns if k[:2] == (connection, container)]:
+                del self._columns[key]
+            for key in [k for k in self._pending_columns if k[:2] == (connection, container)]:
+                del self._pending_columns[key]
+
+    def set_columns(self, connection: str, container: str, path: str, columns: List[Dict[str, Any]]) -> None:
+        """Replace the column entries of an indexed dataset with DatasetColumn dicts."""
+        with self._lock:
+            dataset_id = self._ids.get((connection, "dataset", container, path, None))
+            self._pending_columns.pop((connection, container, path), None)
+            if dataset_id is None:
+                return
+            dataset = self._entries[dataset_id]
+            names = [column["name"] for column in columns]
+            old = [column["name"] for column in self._columns.get((connection, container, path), [])]
+            for name in set(old) - set(names):
+                self._remove(connection, "column", container, path, name)
+            for name in names:
+                self._add(SearchEntry(
+                    connection, "column", container, path, name, dataset.format, name, dataset.name
+                ))
+            self._columns[(connection, container, path)] = list(columns)
+
+    def pending_schemas(self, connection: str, containers: Optional[Iterable[str]] = None) -> int:
+        """Datasets of a connection (in some containers) whose columns are not indexed yet."""
+        containers = set(containers) if containers is not None else None
+        with self._lock:
+            return sum(
+                1 for key in self._pending_columns
+                if key[0] == connection and (containers is None or key[1] in containers)
+            )
+
+    def columns(self, connection: str, container: str, path: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            return self._columns.get((connection, container, path))
+
+    async def fill_columns(
+        self,
+        schema_columns: Callable[[str, str], Optional[List[Dict[str, Any]]]],
+        concurrency: int = SCHEMA_CONCURRENCY,
+    ) -> int:
+        """Look up the columns of datasets added or changed since the last fill.
+
+        ``schema_columns(connection, full_path)`` runs in a worker thread and
+        returns DatasetColumn dicts, or None when the connection is gone.
+        """
+        with self._lock:
+            if self._filling:
+                return 0
+            self._filling = True
+        loop = asyncio.get_running_loop()
+        gate = asyncio.Semaphore(max(1, concurrency))
+        filled = 0
+
+        async def fill(connection: str, container: str, path: str):
+            nonlocal filled
+            full_path = f"{container}/{path}" if path else container
+            async with gate:
+                try:
+                    columns = await loop.run_in_executor(None, schema_columns, connection, full_path)
+                except Exception as e:
+                    self.schema_errors += 1
+                    logger.error(f"Error reading schema for search index: {str(e)}")
+                    columns = None
+            if columns is None:
+                with self._lock:
+                    self._pending_columns.pop((connection, container, path), None)
+                return
+            self.set_columns(connection, container, path, columns)
+            filled += 1
+
+        try:
+            while True:
+                with self._lock:
+                    pending = list(self._pending_columns)
+                if not pending:
+                    return filled
+                await asyncio.gather(*(fill(*key) for key in pending))
+        finally:
+            self._filling = False
+
+    # Queries
+    def _term_matches(self, term: str) -> Dict[int, float]:
+        """Best score per entry for one query term: whole token, token prefix, then name substring."""
+        scores: Dict[int, float] = {}
+        for entry_id, field in self._postings.get(term, {}).items():
+            scores[entry_id] = 3.0 * field
+        start = bisect.bisect_left(self._sorted_tokens, term)
+        for token in self._sorted_tokens[start:]:
+            if not token.startswith(term):
+                break
+            if token == term:
+                continue
+            for entry_id, field in self._postings[token].items():
+                scores[entry_id] = max(scores.get(entry_id, 0.0), 2.0 * field)
+        if len(term) >= 3:
+            grams = sorted(trigrams(term), key=lambda g: len(self._trigrams.get(g, ())))
+            candidates = set(self._trigrams.get(grams[0], ()))
+            for gram in grams[1:]:
+                if not candidates:
+                    break
+                candidates &= self._trigrams.get(gram, set())
+            for entry_id in candidates:
+                if entry_id not in scores and term in self._entries[entry_id].name.lower():
+                    scores[entry_id] = 1.0 * _NAME_FIELD
+        return scores
+
+    def search(
+        self,
+        connection: str,
+        query: str,
+        types: Optional[Iterable[str]] = None,
+        containers: Optional[Iterable[str]] = None,
+    ) -> List[Tuple[SearchEntry, float, str]]:
+        """(entry, score, matched field) of the entries matching every query term, best first.
+
+        The matched field is ``column`` for column entries, ``name`` when every
+        term occurs in the entry's name and ``path`` otherwise.
+        """
+        terms = [term for term in _SPLIT.split(query.lower()) if term]
+        if not terms:
+            return []
+        types = set(types) if types else None
+        containers = {c.lower() for c in containers} if containers is not None else None
+        with self._lock:
+            self.queries += 1
+            scores: Optional[Dict[int, float]] = None
+            for term in terms:
+                matches = self._term_matches(term)
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {i: s + matches[i] for i, s in scores.items() if i in matches}
+                if not scores:
+                    return []
+            needle = query.strip().lower()
+            results = []
+            for entry_id, score in scores.items():
+                entry = self._entries[entry_id]
+                if entry.connection != connection:
+                    continue
+                if types is not None and entry.type not in types:
+                    continue
+                if containers is not None and entry.container.lower() not in containers:
+                    continue
+                if entry.type == "folder" and (connection, "dataset", entry.container, entry.path, None) in self._ids:
+                    # The folder is a dataset and is listed as one
+                    continue
+                name = entry.name.lower()
+                if name == needle:
+                    score += 10.0
+                elif name.startswith(needle):
+                    score += 4.0
+                if entry.type == "column":
+                    field = "column"
+                else:
+                    field = "name" if all(term in name for term in terms) else "path"
+                results.append((entry, score * _TYPE_WEIGHT[entry.type], field))
+        results.sort(key=lambda r: (-r[1], len(r[0].full_path), r[0].full_path, r[0].column or ""))
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {entry_type: 0 for entry_type in ENTRY_TYPES}
+            for entry in self._entries.values():
+                counts[entry.type] += 1
+            return {
+                "entries": len(self._entries),
+                **{f"{entry_type}s": count for entry_type, count in counts.items()},
+                "tokens": len(self._postings),
+                "trigrams": len(self._trigrams),
+                "pendingSchemas": len(self._pending_columns),
+                "queries": self.queries,
+                "schemaErrors": self.schema_errors,
+            }
+
+
+def entry_node(entry: SearchEntry) -> Dict[str, Any]:
+    """FolderTreeNode dict for a search entry (a column's node is its dataset)."""
+    node_type = "dataset" if entry.type == "column" else entry.type
+    metadata = {"containerName": entry.container}
+    if entry.type != "container":
+        metadata["folderPath"] = entry.path.rpartition('/')[0]
+    node = {
+        "id": stable_node_id(entry.full_path),
+        "name": entry.dataset_name if entry.type == "column" else entry.name,
+        "type": node_type,
+        "path": entry.full_path,
+        "children": [],
+        "metadata": metadata,
+    }
+    if node_type == "dataset":
+        node["format"] = entry.format
+    return node
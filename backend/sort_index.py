@@ -0,0 +1,333 @@
+"""
+Sorted previews without sorting the whole dataset on every page.
+
+Pages near the top of a sort order (ending within ``ADLS_SORT_TOP_ROWS`` rows)
+are selected by ``top_k_positions``. It reads the sort column one batch of row
+groups at a time and keeps only the best rows seen so far. Row groups are
+visited in order of their min (or max) statistic. Once enough rows are kept,
+the scan stops at the first row group whose statistics show it cannot improve
+on them.
+
+Deeper pages use a ``SortIndex``: the row positions of a dataset version in
+the order of one column, built by the first deep sort on that column. Both
+directions are stored as ``.npy`` files under ``ADLS_SORT_INDEX_DIR``, named
+by a hash of (dataset URL, version tag, column). Later pages in either
+direction are memory-mapped slices of those files, so only the page's rows are
+read from storage. A new dataset version gets a new key, so a stale index is
+never read. Files are written to a temporary name and renamed into place, so
+several processes (uvicorn workers, worker pool processes) can share the
+directory. The least recently used files are deleted when the total exceeds
+``ADLS_SORT_INDEX_BYTES``; set it to 0 to turn the index off.
+
+Both paths order rows exactly like a full sort: nulls (and NaN) last, and
+equal values by row position.
+"""
+
+import os
+import time
+import uuid
+import hashlib
+import tempfile
+import threading
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+logger = logging.getLogger(__name__)
+
+SORT_INDEX_DIR = os.environ.get("ADLS_SORT_INDEX_DIR") or os.path.join(tempfile.gettempdir(), "adls-sort-index")
+SORT_INDEX_BYTES = int(os.environ.get("ADLS_SORT_INDEX_BYTES", str(4 * 1024 ** 3)))
+# Pages ending within this many rows of the top of a sort order are selected without an index
+SORT_TOP_ROWS = int(os.environ.get("ADLS_SORT_TOP_ROWS", "10000"))
+# Row groups read per step of a top-k scan
+TOP_K_BATCH = 8
+# Rows of an index scanned per step when collecting a filtered page
+FILTER_CHUNK = 1 << 20
+# Last-access times are only rewritten when older than this
+ACCESS_RESOLUTION = 60
+# Evictions free space down to this fraction of the budget
+EVICT_TARGET = 0.9
+
+# Name of the synthetic row-position column; matches dataset_reader.POSITION_COLUMN
+POSITION_COLUMN = "__position"
+
+
+def _order(descending: bool) -> str:
+    return "descending" if descending else "ascending"
+
+
+def _is_nan(value) -> bool:
+    return isinstance(value, float) and value != value
+
+
+def _row_group_bounds(plan, column: str, descending: bool) -> List[Tuple[Any, Any]]:
+    """(ref, best value) of every row group, best being its min (or max) statistic, None if unknown."""
+    bounds = []
+    for fragment_index, fragment in enumerate(plan.fragments):
+        refs = plan.fragment_refs(fragment_index)
+        statistics = {row_group.id: row_group.statistics for row_group in fragment.row_groups}
+        for ref in refs:
+            column_stats = (statistics.get(ref.row_group) or {}).get(column) or {}
+            bound = column_stats.get("max" if descending else "min")
+            bounds.append((ref, None if _is_nan(bound) else bound))
+    return bounds
+
+
+def top_k_positions(plan, column: str, descending: bool, k: int, stats: Optional['SortIndex'] = None) -> np.ndarray:
+    """Positions of the first ``k`` rows of a dataset in the order of ``column``.
+
+    Row groups without usable statistics are read first, then the others from
+    the most promising one on. Every step sorts the kept rows and the new ones
+    together and keeps the first ``k``.
+    """
+    bounds = _row_group_bounds(plan, column, descending)
+    unknown = [ref for ref, bound in bounds if bound is None]
+    known = [(ref, bound) for ref, bound in bounds if bound is not None]
+    try:
+        known.sort(key=lambda item: item[1], reverse=descending)
+    except TypeError:
+        # Statistics of mixed physical types cannot be ordered; read everything
+        unknown, known = [ref for ref, _ in bounds], []
+    ordered = [(ref, None) for ref in unknown] + known
+
+    sort_keys = [(column, _order(descending)), (POSITION_COLUMN, "ascending")]
+    best: Optional[pa.Table] = None
+    threshold = None
+    skipped = 0
+    i = 0
+    while i < len(ordered):
+        if threshold is not None and ordered[i][1] is not None:
+            bound = ordered[i][1]
+            try:
+                worse = bound < threshold if descending else bound > threshold
+            except TypeError:
+                worse = False
+            if worse:
+                # Every later row group's bound is at least as bad
+                skipped = len(ordered) - i
+                break
+        batch = sorted((ref for ref, _ in ordered[i:i + TOP_K_BATCH]), key=lambda ref: ref.start)
+        i += TOP_K_BATCH
+        table = plan.read(batch, [column])
+        table = table.append_column(POSITION_COLUMN, pa.array(plan.positions(batch)))
+        if best is not None:
+            table = pa.concat_tables([best, table])
+        indices = pc.sort_indices(table, sort_keys=sort_keys, null_placement="at_end")
+        best = table.take(indices.slice(0, k))
+        if best.num_rows == k:
+            value = best.column(column)[k - 1].as_py()
+            threshold = None if value is None or _is_nan(value) else value
+
+    if stats is not None:
+        stats.record_top_k(skipped)
+    if best is None:
+        return np.empty(0, dtype=np.int64)
+    return best.column(POSITION_COLUMN).to_numpy()
+
+
+def filtered_page(order: np.ndarray, matching: np.ndarray, total_rows: int, start: int, count: int) -> np.ndarray:
+    """Positions ``start`` to ``start + count`` of ``order`` among the rows at ``matching`` positions."""
+    mask = np.zeros(total_rows, dtype=bool)
+    mask[matching] = True
+    collected = []
+    seen = 0
+    end = start + count
+    for chunk_start in range(0, len(order), FILTER_CHUNK):
+        chunk = np.asarray(order[chunk_start:chunk_start + FILTER_CHUNK])
+        chunk = chunk[mask[chunk]]
+        if seen + len(chunk) > start:
+            collected.append(chunk[max(0, start - seen):end - seen])
+        seen += len(chunk)
+        if seen >= end:
+            break
+    if not collected:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate(collected).astype(np.int64)
+
+
+class SortIndex:
+    """Sort orders of dataset columns, persisted as .npy files and shared between processes."""
+
+    def __init__(self, directory: str = SORT_INDEX_DIR, max_bytes: int = SORT_INDEX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._building: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.build_seconds = 0.0
+        self.evictions = 0
+        self.top_k_reads = 0
+        self.row_groups_skipped = 0
+        if self.enabled:
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError as e:
+                logger.error(f"Error creating sort index directory {directory}: {str(e)}")
+                self.max_bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(plan, column: str) -> Optional[str]:
+        """Index key of a column of a dataset version, or None if the plan does not identify its version."""
+        if not plan.source or not plan.version_tag:
+            return None
+        return hashlib.sha1(f"{plan.source}\0{plan.version_tag}\0{column}".encode()).hexdigest()
+
+    def _path(self, key: str, descending: bool) -> str:
+        return os.path.join(self.directory, f"{key}.{'desc' if descending else 'asc'}.npy")
+
+    def get(self, plan, column: str, descending: bool) -> Optional[np.ndarray]:
+        """The memory-mapped sort order of a column, or None if it has not been built."""
+        key = self.key(plan, column) if self.enabled else None
+        if key is None:
+            return None
+        path = self._path(key, descending)
+        try:
+            order = np.load(path, mmap_mode="r")
+            if order.ndim != 1 or len(order) != plan.total_rows:
+                raise ValueError(f"{len(order)} positions for {plan.total_rows} rows")
+            if time.time() - os.stat(path).st_mtime > ACCESS_RESOLUTION:
+                os.utime(path)
+        except FileNotFoundError:
+            order = None
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading sort index {path}: {str(e)}")
+            order = None
+        with self._lock:
+            if order is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return order
+
+    def build(self, plan, column: str, descending: bool) -> np.ndarray:
+        """Sort a column of the whole dataset, store both directions and return the requested one."""
+        key = self.key(plan, column)
+        with self._lock:
+            building = self._building.setdefault(key, threading.Lock())
+        try:
+            with building:
+                return self._build(plan, key, column, descending)
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+
+    def _build(self, plan, key: str, column: str, descending: bool) -> np.ndarray:
+        # Another request may have built it meanwhile
+        existing = self.get(plan, column, descending)
+        if existing is not None:
+            return existing
+        started = time.monotonic()
+        refs = plan.refs
+        table = plan.read(refs, [column])
+        positions = plan.positions(refs)
+        dtype = np.uint32 if plan.total_rows < 2 ** 32 else np.int64
+        orders = {}
+        for direction in (False, True):
+            indices = pc.sort_indices(table, sort_keys=[(column, _order(direction))], null_placement="at_end")
+            orders[direction] = positions[indices.to_numpy()].astype(dtype)
+        del table
+        for direction, order in orders.items():
+            self._save(self._path(key, direction), order)
+        with self._lock:
+            self.builds += 1
+            self.build_seconds += time.monotonic() - started
+        self._evict(keep={self._path(key, False), self._path(key, True)})
+        return orders[descending]
+
+    def _save(self, path: str, order: np.ndarray):
+        if order.nbytes * 2 > self.max_bytes:
+            # Would flush the rest of the index; used for this request only
+            return
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                np.save(f, order)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.error(f"Error writing sort index {path}: {str(e)}")
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+
+    def _files(self) -> List[Tuple[float, int, str]]:
+        files = []
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".npy"):
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError as e:
+            logger.error(f"Error listing sort index directory {self.directory}: {str(e)}")
+        return files
+
+    def _evict(self, keep=()):
+        """Delete the least recently used index files while the directory is over budget."""
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * EVICT_TARGET)
+        evicted = 0
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            if path in keep:
+                continue
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        with self._lock:
+            self.evictions += evicted
+
+    def record_top_k(self, row_groups_skipped: int):
+        with self._lock:
+            self.top_k_reads += 1
+            self.row_groups_skipped += row_groups_skipped
+
+    def invalidate(self) -> int:
+        """Delete every stored sort order (of every process sharing the directory)."""
+        removed = 0
+        for _, _, path in self._files():
+            try:
+                os.unlink(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        files = self._files() if self.enabled else []
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "directory": self.directory,
+                "files": len(files),
+                "bytes": sum(size for _, size, _ in files),
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRatio": self.hits / lookups if lookups else 0.0,
+                "builds": self.builds,
+                "buildSeconds": round(self.build_seconds, 3),
+                "evictions": self.evictions,
+                "topKReads": self.top_k_reads,
+                "rowGroupsSkipped": self.row_groups_skipped,
+            }
@@ -0,0 +1,179 @@
+"""
+Shared fixtures: an in-memory FakeLake, writers for Parquet files and Delta
+tables in it, and the API app wired to it. Run from ``backend/`` with
+``python -m pytest``.
+"""
+
+import io
+import os
+import sys
+import json
+import uuid
+from typing import Any, Dict, List, Optional
+
+# Nothing may persist between tests
+for _name in ("ADLS_DISK_CACHE_DIR", "ADLS_FOOTER_CACHE_DB", "ADLS_INDEX_DB", "ADLS_METADATA_CACHE_DB"):
+    os.environ.pop(_name, None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from benchmarks.fake_lake import FakeLake
+from benchmarks.run import Bench
+from delta_log import DELTA_LOG_DIR, DeltaLog
+from footer_cache import FooterCache
+
+CONTAINER = "lake"
+
+DELTA_TYPES = {pa.int64(): "long", pa.float64(): "double", pa.string(): "string"}
+
+# Checkpoint columns, as written by Delta writers (maps as key/value pairs)
+CHECKPOINT_SCHEMA = pa.schema([
+    ("protocol", pa.struct([("minReaderVersion", pa.int32()), ("minWriterVersion", pa.int32())])),
+    ("metaData", pa.struct([
+        ("id", pa.string()),
+        ("schemaString", pa.string()),
+        ("partitionColumns", pa.list_(pa.string())),
+        ("configuration", pa.map_(pa.string(), pa.string())),
+    ])),
+    ("add", pa.struct([
+        ("path", pa.string()),
+        ("partitionValues", pa.map_(pa.string(), pa.string())),
+        ("size", pa.int64()),
+        ("modificationTime", pa.int64()),
+        ("dataChange", pa.bool_()),
+        ("stats", pa.string()),
+    ])),
+])
+
+
+def parquet_bytes(table: pa.Table, row_group_size: Optional[int] = None) -> bytes:
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, row_group_size=row_group_size)
+    return buffer.getvalue()
+
+
+def read_parquet(lake: FakeLake, path: str) -> pa.Table:
+    container, _, rest = path.partition('/')
+    data = lake.service_client().get_file_system_client(container).get_file_client(rest).download_file().readall()
+    return pq.read_table(io.BytesIO(data))
+
+
+def lake_paths(lake: FakeLake, container: str = CONTAINER) -> List[str]:
+    return [p.name for p in lake.service_client().get_file_system_client(container).get_paths(recursive=True)]
+
+
+class DeltaTable:
+    """Writes a Delta table into a FakeLake one commit at a time, tracking its active files."""
+
+    def __init__(self, lake: FakeLake, path: str, schema: pa.Schema, partition_columns: List[str] = ()):
+        self.lake = lake
+        self.path = path
+        self.container, _, self.rest = path.partition('/')
+        self.schema = schema
+        self.partition_columns = list(partition_columns)
+        self.version = -1
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self._time = 1700000000000
+
+    @property
+    def protocol(self) -> Dict[str, Any]:
+        return {"minReaderVersion": 1, "minWriterVersion": 2}
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        fields = [
+            {"name": f.name, "type": DELTA_TYPES[f.type], "nullable": True, "metadata": {}} for f in self.schema
+        ]
+        return {
+            "id": "test-table",
+            "schemaString": json.dumps({"type": "struct", "fields": fields}),
+            "partitionColumns": self.partition_columns,
+            "configuration": {},
+        }
+
+    def add(self, table: pa.Table, partition_values: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Write a data file (without its partition columns) and return its add action."""
+        partition_values = partition_values or {}
+        directory = "/".join(f"{key}={value}" for key, value in partition_values.items())
+        name = f"part-{uuid.uuid4().hex}.parquet"
+        rel_path = f"{directory}/{name}" if directory else name
+        data = parquet_bytes(table.drop(list(partition_values)))
+        self.lake.put(self.container, f"{self.rest}/{rel_path}", data)
+        self._time += 1000
+        return {"add": {
+            "path": rel_path,
+            "partitionValues": partition_values,
+            "size": len(data),
+            "modificationTime": self._time,
+            "dataChange": True,
+            "stats": json.dumps({"numRecords": table.num_rows}),
+        }}
+
+    def remove(self, rel_path: str) -> Dict[str, Any]:
+        return {"remove": {"path": rel_path, "deletionTimestamp": self._time, "dataChange": True}}
+
+    def commit(self, *actions: Dict[str, Any]) -> int:
+        """Write the next JSON commit; the first one also carries the protocol and metadata."""
+        actions = list(actions)
+        if self.version < 0:
+            actions = [{"protocol": self.protocol}, {"metaData": self.metadata}] + actions
+        self.version += 1
+        for action in actions:
+            if "add" in action:
+                self.files[action["add"]["path"]] = action["add"]
+            elif "remove" in action:
+                self.files.pop(action["remove"]["path"], None)
+        payload = "\n".join(json.dumps(action) for action in actions) + "\n"
+        self.lake.put(self.container, self.log_path(f"{self.version:020d}.json"), payload.encode("utf-8"))
+        return self.version
+
+    def checkpoint(self) -> str:
+        """Write a single-part checkpoint of the current version."""
+        metadata = dict(self.metadata, configuration=[])
+        rows = [{"protocol": self.protocol}, {"metaData": metadata}] + [
+            {"add": dict(add, partitionValues=list(add["partitionValues"].items()))} for add in self.files.values()
+        ]
+        columns = {
+            name: pa.array([row.get(name) for row in rows], type=CHECKPOINT_SCHEMA.field(name).type)
+            for name in CHECKPOINT_SCHEMA.names
+        }
+        name = self.log_path(f"{self.version:020d}.checkpoint.parquet")
+        self.lake.put(self.container, name, parquet_bytes(pa.table(columns)))
+        return name
+
+    def log_path(self, name: str) -> str:
+        return f"{self.rest}/{DELTA_LOG_DIR}/{name}"
+
+
+@pytest.fixture
+def lake() -> FakeLake:
+    # Its own account, so nothing the API caches per account or URL is shared between tests
+    lake = FakeLake(account=f"test{uuid.uuid4().hex[:12]}")
+    lake.create_container(CONTAINER)
+    return lake
+
+
+@pytest.fixture
+def service_client(lake):
+    return lake.service_client()
+
+
+@pytest.fixture
+def footer_cache() -> FooterCache:
+    return FooterCache(db_path=None)
+
+
+@pytest.fixture
+def delta_log() -> DeltaLog:
+    return DeltaLog()
+
+
+@pytest.fixture
+def bench(lake) -> Bench:
+    """The API app on the fake lake, with the caches it shares between connections emptied."""
+    bench = Bench(lake)
+    bench.clear_caches()
+    return bench
@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+from adls_fs import ADLSRangeFile
+from block_cache import DiskBlockCache
+from conftest import CONTAINER
+
+DATA = bytes(range(256)) * 4
+
+
+class Source:
+    """Ranged reads of ``DATA``, recording each (offset, length)."""
+
+    def __init__(self, data=DATA):
+        self.data = data
+        self.fetches = []
+
+    def __call__(self, offset, length):
+        self.fetches.append((offset, length))
+        return self.data[offset:offset + length]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DiskBlockCache(str(tmp_path), max_bytes=1000, block_size=100)
+
+
+def test_missing_blocks_are_fetched_in_one_run_then_served_from_disk(cache):
+    source = Source()
+
+    assert cache.read("f#1", 150, 100, len(DATA), source) == DATA[150:250]
+    assert cache.read("f#1", 120, 210, len(DATA), source) == DATA[120:330]
+
+    # Blocks 1-2, then only block 3
+    assert source.fetches == [(100, 200), (300, 100)]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["blocks"], stats["bytes"]) == (2, 3, 3, 300)
+
+
+def test_last_block_of_a_file_is_short(cache):
+    source = Source()
+
+    assert cache.read("f#1", 990, 34, len(DATA), source) == DATA[990:]
+    assert cache.read("f#1", 1000, 24, len(DATA), source) == DATA[1000:]
+
+    assert source.fetches == [(900, 124)]
+
+
+def test_another_process_reads_the_same_directory(cache, tmp_path):
+    cache.read("f#1", 0, 200, len(DATA), Source())
+    other = DiskBlockCache(str(tmp_path), max_bytes=1000, block_size=100)
+    source = Source()
+
+    assert other.read("f#1", 50, 100, len(DATA), source) == DATA[50:150]
+
+    assert source.fetches == []
+
+
+def test_least_recently_used_blocks_are_evicted_under_the_budget(cache):
+    for name in "abcdef":
+        cache.read(f"{name}#1", 0, 200, len(DATA), Source())
+
+    stats = cache.stats()
+    assert stats["bytes"] <= cache.max_bytes and stats["evictions"] == 2
+    source = Source()
+    cache.read("a#1", 0, 200, len(DATA), source)
+    cache.read("f#1", 0, 200, len(DATA), source)
+    assert source.fetches == [(0, 200)]
+
+
+def test_large_reads_bypass_the_cache(cache):
+    source = Source()
+
+    cache.read("f#1", 0, 400, len(DATA), source)
+
+    assert source.fetches == [(0, 400)] and cache.stats()["blocks"] == 0
+
+
+def test_deleted_block_file_is_a_miss(cache, tmp_path):
+    cache.read("f#1", 0, 100, len(DATA), Source())
+    os.unlink(cache._path("f#1", 0))
+    source = Source()
+
+    assert cache.read("f#1", 0, 100, len(DATA), source) == DATA[:100]
+
+    assert source.fetches == [(0, 100)]
+    assert cache.stats()["bytes"] == 100
+
+
+def test_range_files_share_blocks_per_file_version(lake, tmp_path):
+    cache = DiskBlockCache(str(tmp_path), block_size=64 * 1024)
+    lake.put(CONTAINER, "blob.bin", DATA)
+    file_client = lake.service_client().get_file_system_client(CONTAINER).get_file_client("blob.bin")
+
+    def read_all():
+        properties = file_client.get_file_properties()
+        return ADLSRangeFile(file_client, properties.size, disk_cache=cache, etag=properties.etag).read()
+
+    assert read_all() == DATA
+    lake.reset_counters()
+    assert read_all() == DATA
+    assert lake.calls["download"] == 0
+
+    lake.put(CONTAINER, "blob.bin", DATA[::-1])
+    assert read_all() == DATA[::-1]
+    assert lake.calls["download"] == 1
@@ -0,0 +1,56 @@
+import pyarrow as pa
+import pytest
+
+from column_stats import ColumnStatsEngine, HyperLogLog
+from conftest import CONTAINER, parquet_bytes
+from dataset_reader import file_client_for, resolve_dataset_files
+
+ROWS = 40000
+
+
+@pytest.fixture
+def stats_folder(lake):
+    for i in range(2):
+        ids = range(i * ROWS // 2, (i + 1) * ROWS // 2)
+        table = pa.table({
+            "id": pa.array(ids, pa.int64()),
+            "bucket": pa.array([n % 10 if n % 4 else None for n in ids], pa.int64()),
+        })
+        lake.put(CONTAINER, f"stats/part-{i}.parquet", parquet_bytes(table, row_group_size=5000))
+    return f"{CONTAINER}/stats"
+
+
+def _column_stats(engine, service_client, path, **kwargs):
+    files = resolve_dataset_files(service_client, path).files
+    return engine.column_stats([file_client_for(service_client, f.path) for f in files], files, **kwargs)
+
+
+def test_distinct_count_never_exceeds_non_null_values(service_client, footer_cache, stats_folder):
+    stats = _column_stats(ColumnStatsEngine(footer_cache), service_client, stats_folder)
+
+    assert stats["id"]["count"] == ROWS and stats["id"]["nullCount"] == 0
+    assert ROWS * 0.97 <= stats["id"]["distinctCount"] <= ROWS
+    assert stats["bucket"]["nullCount"] == ROWS // 4
+    assert stats["bucket"]["distinctCount"] == 10
+    assert (stats["bucket"]["min"], stats["bucket"]["max"]) == (0, 9)
+
+
+def test_distinct_count_is_clamped_when_the_sketch_overestimates(service_client, footer_cache, stats_folder, monkeypatch):
+    monkeypatch.setattr(HyperLogLog, "count", lambda self: ROWS + 174)
+
+    stats = _column_stats(ColumnStatsEngine(footer_cache), service_client, stats_folder, columns=["id", "bucket"])
+
+    assert stats["id"]["distinctCount"] == ROWS
+    assert stats["bucket"]["distinctCount"] == ROWS - ROWS // 4
+
+
+def test_sketches_are_reused_per_file_version(lake, service_client, footer_cache, stats_folder):
+    engine = ColumnStatsEngine(footer_cache)
+    _column_stats(engine, service_client, stats_folder, columns=["id"])
+    lake.put(CONTAINER, "stats/part-1.parquet", parquet_bytes(pa.table({"id": pa.array([1, 2, 3], pa.int64())})))
+
+    stats = _column_stats(engine, service_client, stats_folder, columns=["id"])
+
+    # Only the rewritten file is scanned again
+    assert (engine.hits, engine.misses) == (1, 3)
+    assert stats["id"]["count"] == ROWS // 2 + 3
@@ -0,0 +1,75 @@
+import gzip
+
+import pyarrow as pa
+import pytest
+
+import main
+from conftest import CONTAINER, parquet_bytes
+from dataset_export import ExportLayouts
+
+ROWS = 300
+
+
+@pytest.fixture
+def parquet_folder(lake):
+    for i in range(3):
+        ids = range(i * ROWS // 3, (i + 1) * ROWS // 3)
+        table = pa.table({"id": pa.array(ids, pa.int64()), "name": [f"name {n}" for n in ids]})
+        lake.put(CONTAINER, f"sales/part-{i}.parquet", parquet_bytes(table, row_group_size=20))
+    return f"{CONTAINER}/sales"
+
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+@pytest.mark.parametrize("sort_column", [None, "id"])
+def test_interrupted_export_resumes_with_range(bench, parquet_folder, compression, sort_column, monkeypatch):
+    connection_id = bench.connect()
+    url = f"/export/{connection_id}/sales"
+    params = {"path": parquet_folder, "format": "csv", "sort_column": sort_column, "sort_direction": "desc",
+              "compression": compression}
+    params = {k: v for k, v in params.items() if v is not None}
+    first = bench.client.get(url, params=params)
+    assert first.status_code == 200
+    full = first.content
+    # The first download broke off halfway, so the export never completed on the server
+    monkeypatch.setattr(main, "export_layouts", ExportLayouts())
+    received = full[:len(full) // 2]
+
+    resumed = bench.client.get(url, params=params, headers={
+        "Range": f"bytes={len(received)}-", "If-Range": first.headers["etag"],
+    })
+
+    assert resumed.status_code == 206
+    assert resumed.headers["content-range"] == f"bytes {len(received)}-{len(full) - 1}/{len(full)}"
+    assert int(resumed.headers["content-length"]) == len(full) - len(received)
+    assert received + resumed.content == full
+    text = (gzip.decompress(full) if compression else full).decode()
+    assert text.splitlines()[0] == '"id","name"'
+    assert len(text.splitlines()) == ROWS + 1
+    # The measured size is kept, so the next download announces it
+    again = bench.client.get(url, params=params)
+    assert again.headers["content-length"] == str(len(full))
+
+
+def test_range_against_another_version_sends_whole_export(bench, parquet_folder):
+    connection_id = bench.connect()
+    url = f"/export/{connection_id}/sales"
+    full = bench.client.get(url, params={"path": parquet_folder}).content
+
+    response = bench.client.get(url, params={"path": parquet_folder}, headers={
+        "Range": "bytes=10-", "If-Range": '"stale"',
+    })
+
+    assert response.status_code == 200
+    assert response.content == full
+
+
+def test_range_past_the_end_is_not_satisfiable(bench, parquet_folder):
+    connection_id = bench.connect()
+    url = f"/export/{connection_id}/sales"
+    full = bench.client.get(url, params={"path": parquet_folder, "format": "ndjson"}).content
+
+    response = bench.client.get(url, params={"path": parquet_folder, "format": "ndjson"},
+                                headers={"Range": f"bytes={len(full)}-"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(full)}"
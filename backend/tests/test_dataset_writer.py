@@ -0,0 +1,227 @@
+import pyarrow as pa
+import pytest
+
+import dataset_writer
+from conftest import CONTAINER, DeltaTable, lake_paths, parquet_bytes, read_parquet
+from dataset_reader import open_plan
+from dataset_writer import CommitConflictError, commit_changes
+from edit_overlay import DatasetOverlay
+
+SCHEMA = pa.schema([("id", pa.int64()), ("name", pa.string()), ("amount", pa.float64())])
+ROWS_PER_FILE = 100
+
+
+def _rows(first_id: int) -> pa.Table:
+    ids = range(first_id, first_id + ROWS_PER_FILE)
+    return pa.table({
+        "id": pa.array(ids, pa.int64()),
+        "name": pa.array([f"n{i}" for i in ids]),
+        "amount": pa.array([float(i) for i in ids]),
+    }, schema=SCHEMA)
+
+
+def _overlay(service_client, path, footer_cache, delta_log, rows) -> DatasetOverlay:
+    plan = open_plan(service_client, path, footer_cache, delta_log)
+    overlay = DatasetOverlay(path, plan.version_tag)
+    overlay.update(rows, plan.schema, plan.total_rows)
+    return overlay
+
+
+def _staged(lake):
+    return [name for name in lake_paths(lake) if name.rpartition('/')[2].startswith("_")
+            and "_delta_log" not in name]
+
+
+@pytest.fixture
+def parquet_folder(lake):
+    for i in range(3):
+        lake.put(CONTAINER, f"sales/part-{i}.parquet", parquet_bytes(_rows(i * ROWS_PER_FILE), row_group_size=25))
+    return f"{CONTAINER}/sales"
+
+
+@pytest.fixture
+def delta_table(lake):
+    table = DeltaTable(lake, f"{CONTAINER}/orders", SCHEMA)
+    table.commit(table.add(_rows(0)), table.add(_rows(ROWS_PER_FILE)))
+    return table
+
+
+def test_parquet_commit_rewrites_only_edited_file(lake, service_client, footer_cache, delta_log, parquet_folder):
+    overlay = _overlay(service_client, parquet_folder, footer_cache, delta_log,
+                       [{"__id": "105", "name": "fixed"}, {"__id": "150", "amount": None}])
+    untouched = read_parquet(lake, f"{parquet_folder}/part-0.parquet")
+
+    result = commit_changes(service_client, parquet_folder, overlay, footer_cache, delta_log)
+
+    assert result["filesRewritten"] == 1
+    assert read_parquet(lake, f"{parquet_folder}/part-0.parquet").equals(untouched)
+    rewritten = read_parquet(lake, f"{parquet_folder}/part-1.parquet")
+    assert rewritten.num_rows == ROWS_PER_FILE
+    assert rewritten.column("name")[5].as_py() == "fixed"
+    assert rewritten.column("amount")[50].as_py() is None
+    assert rewritten.column("amount")[51].as_py() == 151.0
+    assert _staged(lake) == []
+
+
+def test_parquet_commit_conflicts_when_dataset_changed(lake, service_client, footer_cache, delta_log, parquet_folder):
+    overlay = _overlay(service_client, parquet_folder, footer_cache, delta_log, [{"__id": "5", "name": "x"}])
+    lake.put(CONTAINER, "sales/part-0.parquet", parquet_bytes(_rows(1000)))
+
+    with pytest.raises(CommitConflictError):
+        commit_changes(service_client, parquet_folder, overlay, footer_cache, delta_log)
+    assert read_parquet(lake, f"{parquet_folder}/part-0.parquet").column("id")[0].as_py() == 1000
+
+
+def test_parquet_commit_conflict_on_rename_keeps_other_write(
+    lake, service_client, footer_cache, delta_log, parquet_folder, monkeypatch
+):
+    overlay = _overlay(service_client, parquet_folder, footer_cache, delta_log, [{"__id": "5", "name": "x"}])
+    rewrite_file = dataset_writer.rewrite_file
+
+    def rewrite_then_race(*args, **kwargs):
+        sink = rewrite_file(*args, **kwargs)
+        # Another writer replaces the file between our rewrite and the rename
+        lake.put(CONTAINER, "sales/part-0.parquet", parquet_bytes(_rows(1000)))
+        return sink
+
+    monkeypatch.setattr(dataset_writer, "rewrite_file", rewrite_then_race)
+
+    with pytest.raises(CommitConflictError):
+        commit_changes(service_client, parquet_folder, overlay, footer_cache, delta_log)
+    assert read_parquet(lake, f"{parquet_folder}/part-0.parquet").column("id")[0].as_py() == 1000
+    assert _staged(lake) == []
+
+
+def test_parquet_commit_failure_removes_temporary_file(
+    lake, service_client, footer_cache, delta_log, parquet_folder, monkeypatch
+):
+    overlay = _overlay(service_client, parquet_folder, footer_cache, delta_log, [{"__id": "5", "name": "x"}])
+    original = read_parquet(lake, f"{parquet_folder}/part-0.parquet")
+
+    def fail(service_client, data_file, footer_cache, target_client, start, overlay, partition_values=None):
+        # The temporary file was written, then the connection dropped
+        target_client.upload_data(b"PAR1", overwrite=True)
+        raise IOError("connection reset")
+
+    monkeypatch.setattr(dataset_writer, "rewrite_file", fail)
+
+    with pytest.raises(IOError):
+        commit_changes(service_client, parquet_folder, overlay, footer_cache, delta_log)
+    assert read_parquet(lake, f"{parquet_folder}/part-0.parquet").equals(original)
+    assert _staged(lake) == []
+
+
+def test_delta_commit_writes_next_version(lake, service_client, footer_cache, delta_log, delta_table):
+    position = ROWS_PER_FILE + 7
+    overlay = _overlay(service_client, delta_table.path, footer_cache, delta_log,
+                       [{"__id": str(position), "amount": -1.0}])
+    # Row positions follow the snapshot's file order
+    plan = open_plan(service_client, delta_table.path, footer_cache, delta_log)
+    edited_id = plan.read(plan.refs, ["id"]).column("id")[position].as_py()
+
+    result = commit_changes(service_client, delta_table.path, overlay, footer_cache, delta_log)
+
+    assert result["version"] == 1
+    assert result["filesRewritten"] == 1
+    delta_log.invalidate()
+    plan = open_plan(service_client, delta_table.path, footer_cache, delta_log)
+    assert plan.version_tag == "delta:1"
+    table = plan.read(plan.refs, None)
+    assert table.num_rows == 2 * ROWS_PER_FILE
+    edited = table.filter(pa.compute.equal(table.column("amount"), -1.0))
+    assert edited.column("id").to_pylist() == [edited_id]
+
+
+def test_delta_commit_conflicts_with_concurrent_commit(
+    lake, service_client, footer_cache, delta_log, delta_table, monkeypatch
+):
+    overlay = _overlay(service_client, delta_table.path, footer_cache, delta_log, [{"__id": "3", "amount": -1.0}])
+    rewrite_file = dataset_writer.rewrite_file
+
+    def rewrite_then_race(*args, **kwargs):
+        sink = rewrite_file(*args, **kwargs)
+        # Another writer commits the version this commit was going to take
+        delta_table.commit(delta_table.add(_rows(5000)))
+        return sink
+
+    monkeypatch.setattr(dataset_writer, "rewrite_file", rewrite_then_race)
+    files_before = set(lake_paths(lake))
+
+    with pytest.raises(CommitConflictError):
+        commit_changes(service_client, delta_table.path, overlay, footer_cache, delta_log)
+
+    # Only the other writer's data file and commit were added; ours were removed
+    added = set(lake_paths(lake)) - files_before
+    assert added == {
+        f"orders/{path}" for path in delta_table.files if f"orders/{path}" not in files_before
+    } | {delta_table.log_path(f"{1:020d}.json")}
+
+
+def test_delta_commit_conflicts_when_table_advanced(lake, service_client, footer_cache, delta_log, delta_table):
+    overlay = _overlay(service_client, delta_table.path, footer_cache, delta_log, [{"__id": "3", "amount": -1.0}])
+    delta_table.commit(delta_table.add(_rows(5000)))
+
+    with pytest.raises(CommitConflictError):
+        commit_changes(service_client, delta_table.path, overlay, footer_cache, delta_log)
+
+
+def _save_full_row(bench, path, position, **changes):
+    """Post one whole preview row, as the frontend does, with some cells changed."""
+    connection_id = bench.connect()
+    preview = bench.client.get(f"/preview/{connection_id}/ds", params={"path": path, "page_size": 500})
+    assert preview.status_code == 200, preview.text
+    row = next(row for row in preview.json()["rows"] if row["__id"] == str(position))
+    response = bench.client.post(f"/save-changes/{connection_id}/ds", params={"path": path}, json=[dict(row, **changes)])
+    assert response.status_code == 200, response.text
+    return connection_id, row
+
+
+@pytest.fixture
+def partitioned_folder(lake):
+    for year in (2023, 2024):
+        table = _rows(year * 10)
+        lake.put(CONTAINER, f"sales/year={year}/part-0.parquet", parquet_bytes(table))
+    return f"{CONTAINER}/sales"
+
+
+@pytest.fixture
+def partitioned_delta_table(lake):
+    schema = SCHEMA.append(pa.field("region", pa.string()))
+    table = DeltaTable(lake, f"{CONTAINER}/orders", schema, partition_columns=["region"])
+    table.commit(*[
+        table.add(_rows(first).append_column("region", pa.array([region] * ROWS_PER_FILE)), {"region": region})
+        for first, region in ((0, "eu"), (ROWS_PER_FILE, "us"))
+    ])
+    return table
+
+
+@pytest.mark.parametrize("dataset", ["partitioned_folder", "partitioned_delta_table"])
+def test_commit_accepts_full_rows_of_partitioned_datasets(bench, dataset, request):
+    path = request.getfixturevalue(dataset)
+    path = path if isinstance(path, str) else path.path
+    connection_id, row = _save_full_row(bench, path, 7, name="renamed")
+
+    response = bench.client.post(f"/commit-changes/{connection_id}/ds", params={"path": path})
+
+    assert response.status_code == 200, response.text
+    assert response.json()["filesRewritten"] == 1
+    preview = bench.client.get(f"/preview/{bench.connect()}/ds", params={"path": path, "page_size": 500}).json()
+    committed = next(r for r in preview["rows"] if r["id"] == row["id"])
+    assert committed["name"] == "renamed"
+    assert {k: v for k, v in committed.items() if k not in ("name", "__modified")} == \
+        {k: v for k, v in row.items() if k not in ("name", "__modified")}
+
+
+@pytest.mark.parametrize("dataset, column, value", [
+    ("partitioned_folder", "year", 1999),
+    ("partitioned_delta_table", "region", "apac"),
+])
+def test_commit_rejects_changed_partition_values(bench, dataset, column, value, request):
+    path = request.getfixturevalue(dataset)
+    path = path if isinstance(path, str) else path.path
+    connection_id, _ = _save_full_row(bench, path, 7, **{column: value})
+
+    response = bench.client.post(f"/commit-changes/{connection_id}/ds", params={"path": path})
+
+    assert response.status_code == 400
+    assert column in response.json()["detail"]
@@ -0,0 +1,73 @@
+import pyarrow as pa
+
+from conftest import CONTAINER, DeltaTable
+
+SCHEMA = pa.schema([("id", pa.int64()), ("region", pa.string()), ("amount", pa.float64())])
+
+
+def _rows(first_id: int, region: str, count: int = 3) -> pa.Table:
+    return pa.table({
+        "id": pa.array(range(first_id, first_id + count), pa.int64()),
+        "region": pa.array([region] * count),
+        "amount": pa.array([float(i) for i in range(count)]),
+    }, schema=SCHEMA)
+
+
+def _table_with_checkpoint(lake):
+    """Versions 0-2 folded into a checkpoint at 2, then two JSON commits after it."""
+    table = DeltaTable(lake, f"{CONTAINER}/events", SCHEMA, partition_columns=["region"])
+    a = table.add(_rows(0, "eu"), {"region": "eu"})
+    table.commit(a)
+    b = table.add(_rows(10, "us"), {"region": "us"})
+    table.commit(b)
+    c = table.add(_rows(20, "eu"), {"region": "eu"})
+    table.commit(table.remove(a["add"]["path"]), c)
+    table.checkpoint()
+    d = table.add(_rows(30, "us"), {"region": "us"})
+    table.commit(d)
+    table.commit(table.remove(b["add"]["path"]))
+    return table, {name: action["add"]["path"] for name, action in zip("abcd", (a, b, c, d))}
+
+
+def test_snapshot_replays_commits_after_checkpoint(lake, service_client, delta_log):
+    table, paths = _table_with_checkpoint(lake)
+    # Log cleanup removed the commits the checkpoint covers
+    for version in range(2):
+        lake.service_client().get_file_system_client(CONTAINER).get_file_client(
+            table.log_path(f"{version:020d}.json")
+        ).delete_file()
+
+    snapshot = delta_log.snapshot(service_client, table.path)
+
+    assert snapshot.version == 4
+    assert sorted(snapshot.files) == sorted([paths["c"], paths["d"]])
+    assert snapshot.files[paths["c"]].partition_values == {"region": "eu"}
+    assert snapshot.partition_columns == ["region"]
+    assert snapshot.schema.names == SCHEMA.names
+    assert delta_log.checkpoints_read == 1
+    assert delta_log.commits_read == 2
+
+
+def test_snapshot_before_checkpoint_replays_json_only(lake, service_client, delta_log):
+    table, paths = _table_with_checkpoint(lake)
+
+    snapshot = delta_log.snapshot(service_client, table.path, version=1)
+
+    assert snapshot.version == 1
+    assert sorted(snapshot.files) == sorted([paths["a"], paths["b"]])
+    assert delta_log.checkpoints_read == 0
+
+
+def test_later_snapshot_builds_on_cached_one(lake, service_client, delta_log):
+    table, paths = _table_with_checkpoint(lake)
+    delta_log.snapshot(service_client, table.path)
+    e = table.add(_rows(40, "eu"), {"region": "eu"})
+    table.commit(e)
+
+    snapshot = delta_log.snapshot(service_client, table.path)
+
+    assert snapshot.version == 5
+    assert sorted(snapshot.files) == sorted([paths["c"], paths["d"], e["add"]["path"]])
+    # Only the new commit is read; the checkpoint is not read again
+    assert delta_log.checkpoints_read == 1
+    assert delta_log.commits_read == 3
@@ -0,0 +1,84 @@
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from edit_overlay import DatasetOverlay, EditOverlayStore, StaleOverlayError
+
+SCHEMA = pa.schema([("id", pa.int64()), ("name", pa.string()), ("amount", pa.float64())])
+TOTAL_ROWS = 8
+
+
+def _base() -> pa.Table:
+    return pa.table({
+        "id": pa.array(range(TOTAL_ROWS), pa.int64()),
+        "name": pa.array([f"n{i}" for i in range(TOTAL_ROWS)]),
+        "amount": pa.array([float(i) for i in range(TOTAL_ROWS)]),
+    }, schema=SCHEMA)
+
+
+def test_later_edits_merge_into_earlier_ones():
+    overlay = DatasetOverlay("ds", "v1")
+    overlay.update([{"__id": "5", "name": "five"}, {"__id": "1", "amount": 10.0}], SCHEMA, TOTAL_ROWS)
+    # A new row between the edited ones, an overwrite, and a new column on an edited row
+    overlay.update([{"__id": "3", "name": "three"}, {"__id": "5", "name": "FIVE", "amount": 50.0}], SCHEMA, TOTAL_ROWS)
+
+    assert overlay.positions.tolist() == [1, 3, 5]
+    assert overlay.masks["name"].tolist() == [False, True, True]
+    assert overlay.masks["amount"].tolist() == [True, False, True]
+    merged = overlay.apply(_base(), np.arange(TOTAL_ROWS))
+    assert merged.column("name").to_pylist() == ["n0", "n1", "n2", "three", "n4", "FIVE", "n6", "n7"]
+    assert merged.column("amount").to_pylist() == [0.0, 10.0, 2.0, 3.0, 4.0, 50.0, 6.0, 7.0]
+
+
+def test_edit_to_null_differs_from_unedited_cell():
+    overlay = DatasetOverlay("ds", "v1")
+    overlay.update([{"__id": "2", "name": None}, {"__id": "4", "amount": 1.5}], SCHEMA, TOTAL_ROWS)
+
+    merged = overlay.apply(_base(), np.arange(TOTAL_ROWS))
+
+    assert merged.column("name").to_pylist()[2] is None
+    # Row 4 only edited amount, so its name is untouched
+    assert merged.column("name").to_pylist()[4] == "n4"
+    assert overlay.is_modified([2, 3, 4]).tolist() == [True, False, True]
+
+
+def test_apply_to_a_slice_uses_global_positions():
+    overlay = DatasetOverlay("ds", "v1")
+    overlay.update([{"__id": "6", "amount": -6.0}, {"__id": "0", "amount": -1.0}], SCHEMA, TOTAL_ROWS)
+
+    merged = overlay.apply(_base().slice(5, 3), [5, 6, 7])
+
+    assert merged.column("amount").to_pylist() == [5.0, -6.0, 7.0]
+
+
+def test_update_rejects_unknown_rows_and_columns():
+    overlay = DatasetOverlay("ds", "v1")
+    with pytest.raises(ValueError):
+        overlay.update([{"__id": str(TOTAL_ROWS), "name": "x"}], SCHEMA, TOTAL_ROWS)
+    with pytest.raises(ValueError):
+        overlay.update([{"__id": "1", "missing": "x"}], SCHEMA, TOTAL_ROWS)
+    assert overlay.row_count == 0
+
+
+def test_store_merges_saves_and_survives_spilling(tmp_path):
+    store = EditOverlayStore(max_bytes=0, spill_dir=str(tmp_path))
+    store.save("ds", "v1", [{"__id": "1", "name": "one"}], SCHEMA, TOTAL_ROWS)
+    # Saving another dataset's edits spills the first overlay to disk
+    store.save("other", "v1", [{"__id": "7", "name": "seven"}], SCHEMA, TOTAL_ROWS)
+    store.save("ds", "v1", [{"__id": "2", "amount": 2.5}], SCHEMA, TOTAL_ROWS)
+
+    overlay = store.get("ds")
+
+    assert store.stats()["spills"] >= 1 and store.stats()["loads"] >= 1
+    assert overlay.positions.tolist() == [1, 2]
+    merged = overlay.apply(_base(), np.arange(TOTAL_ROWS))
+    assert merged.column("name").to_pylist()[1] == "one"
+    assert merged.column("amount").to_pylist()[2] == 2.5
+
+
+def test_store_rejects_edits_against_another_version(tmp_path):
+    store = EditOverlayStore(spill_dir=str(tmp_path))
+    store.save("ds", "v1", [{"__id": "1", "name": "one"}], SCHEMA, TOTAL_ROWS)
+
+    with pytest.raises(StaleOverlayError):
+        store.save("ds", "v2", [{"__id": "2", "name": "two"}], SCHEMA, TOTAL_ROWS)
@@ -0,0 +1,87 @@
+import pytest
+
+import main
+from conftest import CONTAINER
+
+FOLDERS = [f"f{i}" for i in range(5)]
+CHILDREN = sorted(FOLDERS + ["a", "b"])
+
+
+@pytest.fixture
+def folder(lake):
+    for name in FOLDERS:
+        lake.put(CONTAINER, f"big/{name}/part-0.parquet", b"x")
+    lake.put(CONTAINER, "big/a.parquet", b"x")
+    lake.put(CONTAINER, "big/b.parquet", b"x")
+    return "big"
+
+
+def _pages(bench, connection_id, params, token=None):
+    """Every page of a node's children from ``token`` on, as (names, token) pairs."""
+    pages = []
+    while True:
+        response = bench.client.get(f"/folder-tree/{connection_id}/children", params={
+            **params, **({"continuation_token": token} if token else {}),
+        })
+        assert response.status_code == 200, response.text
+        body = response.json()
+        token = body["continuationToken"]
+        pages.append(([child["name"] for child in body["children"]], token))
+        if token is None:
+            return pages
+
+
+def _names(pages):
+    return [name for names, _ in pages for name in names]
+
+
+def test_uncached_folder_is_paged_with_adls_tokens(lake, bench, folder):
+    connection_id = bench.connect()
+
+    pages = _pages(bench, connection_id, {"container_name": CONTAINER, "path": folder, "page_size": 3})
+
+    assert [len(names) for names, _ in pages] == [3, 3, 1]
+    assert all(token.startswith("c:") for _, token in pages[:-1])
+    assert sorted(_names(pages)) == CHILDREN
+    first = bench.client.get(f"/folder-tree/{connection_id}/children",
+                             params={"container_name": CONTAINER, "path": folder, "page_size": 3}).json()
+    assert first["path"] == f"{CONTAINER}/{folder}"
+    assert {child["name"]: child["metadata"].get("itemCount") for child in first["children"]} == {
+        "a": None, "b": None, "f0": 1,
+    }
+
+
+def test_cached_listing_is_paged_with_offsets_without_listing(lake, bench, folder):
+    connection_id = bench.connect()
+    bench.client.get(f"/folder-tree/{connection_id}")
+    lake.reset_counters()
+
+    pages = _pages(bench, connection_id, {"container_name": CONTAINER, "path": folder, "page_size": 3})
+
+    assert [token for _, token in pages] == ["o:3", "o:6", None]
+    assert sorted(_names(pages)) == CHILDREN
+    assert lake.calls["get_paths"] == 0
+
+
+def test_offset_tokens_stay_valid_after_the_cached_listing_expires(lake, bench, folder, monkeypatch):
+    connection_id = bench.connect()
+    bench.client.get(f"/folder-tree/{connection_id}")
+    params = {"container_name": CONTAINER, "path": folder, "page_size": 3}
+    first = _pages(bench, connection_id, params)[0]
+    monkeypatch.setattr(main.metadata_cache, "revalidate_after", 0)
+
+    rest = _pages(bench, connection_id, params, first[1])
+
+    # The folder is listed again and the offset picks up where the first page ended
+    assert lake.calls["get_paths"] > 0
+    assert sorted(first[0] + _names(rest)) == CHILDREN
+
+
+def test_root_pages_through_containers(lake, bench):
+    for name in ["b-data", "c-data", "d-data"]:
+        lake.create_container(name)
+    connection_id = bench.connect()
+
+    pages = _pages(bench, connection_id, {"page_size": 2})
+
+    assert pages == [(["b-data", "c-data"], "o:2"), (["d-data", CONTAINER], None)]
@@ -0,0 +1,93 @@
+import pytest
+
+from conftest import CONTAINER
+from folder_tree import FolderTreeBuilder
+
+LAYOUT = {
+    "raw/2024/events.csv": b"a,b",
+    "raw/2024/sales.parquet": b"x" * 10,
+    "orders/_delta_log/00000000000000000000.json": b"{}",
+    "orders/part-0.parquet": b"x",
+    "trips/city=paris/year=2023/part-0.parquet": b"x" * 3,
+    "trips/city=paris/year=2024/part-0.parquet": b"x" * 4,
+    "trips/city=rome/year=2024/part-0.parquet": b"x" * 5,
+    "trips/_SUCCESS": b"",
+    "root.parquet": b"x",
+    "docs/readme.txt": b"",
+}
+
+
+@pytest.fixture
+def builder(lake):
+    for path, data in LAYOUT.items():
+        lake.put(CONTAINER, path, data)
+    paths = lake.service_client().get_file_system_client(CONTAINER).get_paths(recursive=True)
+    return FolderTreeBuilder(CONTAINER).add_paths(paths)
+
+
+def _children(node):
+    return {child["name"]: child for child in node["children"]}
+
+
+def test_tree_renders_datasets_from_one_listing(builder):
+    tree = builder.build()
+
+    children = _children(tree)
+    assert sorted(children) == ["docs", "orders", "raw", "root", "trips"]
+    assert tree["metadata"]["formats"] == ["delta", "parquet"]
+    # Delta tables and partitioned folders are datasets whose files are not browsed
+    assert (children["orders"]["type"], children["orders"]["format"], children["orders"]["children"]) == (
+        "dataset", "delta", [],
+    )
+    trips = children["trips"]
+    assert (trips["type"], trips["format"]) == ("dataset", "parquet")
+    assert trips["metadata"]["partitionColumns"] == ["city", "year"]
+    assert (trips["metadata"]["partitionCount"], trips["metadata"]["fileCount"], trips["metadata"]["size"]) == (3, 3, 12)
+    assert children["root"]["path"] == f"{CONTAINER}/root.parquet"
+    # Formats roll up from the leaves to every ancestor
+    assert children["raw"]["metadata"]["formats"] == ["parquet"]
+    assert list(_children(children["raw"]["children"][0])) == ["sales"]
+    assert "metadata" not in children["docs"]
+
+
+def test_summary_and_child_nodes_of_a_folder(builder):
+    summary = builder.summary("raw")
+    assert (summary["folderCount"], summary["blobCount"], summary["formats"]) == (1, 1, ["parquet"])
+    assert builder.summary("missing")["hasDatasetFiles"] is False
+
+    nodes = builder.child_nodes()
+    assert [(n["name"], n["type"]) for n in nodes] == [
+        ("root", "dataset"), ("docs", "folder"), ("orders", "dataset"), ("raw", "folder"), ("trips", "dataset"),
+    ]
+    # Ids are stable across builds, so lazily loaded nodes keep them
+    assert [n["id"] for n in nodes] == [n["id"] for n in builder.child_nodes()]
+
+
+def test_prefix_and_depth_limit(lake, builder):
+    paths = list(lake.service_client().get_file_system_client(CONTAINER).get_paths(recursive=True))
+
+    raw = FolderTreeBuilder(CONTAINER, "raw").add_paths(paths).build()
+    shallow = FolderTreeBuilder(CONTAINER, max_depth=1).add_paths(paths).build()
+
+    assert raw["path"] == f"{CONTAINER}/raw"
+    assert [child["name"] for child in raw["children"]] == ["2024"]
+    assert _children(_children(shallow)["raw"]) == {}
+    # Datasets below the limit are still detected
+    assert _children(shallow)["raw"]["metadata"]["formats"] == ["parquet"]
+
+
+def test_folder_tree_lists_each_container_once_and_caches_it(lake, bench, builder):
+    lake.create_container("archive")
+    lake.put("archive", "old/2019.parquet", b"x")
+    connection_id = bench.connect()
+    lake.reset_counters()
+
+    tree = bench.client.get(f"/folder-tree/{connection_id}").json()
+
+    assert sorted(child["name"] for child in tree["children"]) == ["archive", CONTAINER]
+    # Each container's root, then each of its top-level folders recursively
+    assert lake.calls["get_paths"] == (1 + 4) + (1 + 1)
+    lake.reset_counters()
+    # The listings are cached, so a second tree lists nothing
+    bench.client.get(f"/folder-tree/{connection_id}")
+    assert lake.calls["get_paths"] == 0
@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from conftest import CONTAINER
+from metadata_cache import MetadataCache
+
+CREATED = datetime(2020, 1, 1, tzinfo=timezone.utc)
+LAYOUT = ["a/b/one.parquet", "a/b/two.parquet", "a/c/three.parquet", "a/top.csv", "z.txt"]
+
+
+@pytest.fixture
+def container_client(lake):
+    for path in LAYOUT:
+        lake.put(CONTAINER, path, b"x", last_modified=CREATED)
+    return lake.async_service_client().get_file_system_client(CONTAINER)
+
+
+def _list(cache, container_client, prefix=""):
+    paths = asyncio.run(cache.get_paths("conn", container_client, CONTAINER, prefix))
+    return sorted(p.name for p in paths if not p.is_directory)
+
+
+def test_unchanged_listing_is_revalidated_without_recursive_listing(lake, container_client):
+    cache = MetadataCache(revalidate_after=0, db_path=None)
+    _list(cache, container_client, "a")
+    lake.reset_counters()
+
+    assert _list(cache, container_client, "a") == ["a/b/one.parquet", "a/b/two.parquet", "a/c/three.parquet", "a/top.csv"]
+    assert cache.stats()["hits"] == 1
+    # The prefix itself and "a/b", "a/c" are leaves, so one non-recursive listing
+    assert lake.calls["get_paths"] == 1
+
+
+@pytest.mark.parametrize("change", ["add", "delete"])
+def test_change_two_levels_down_invalidates_listing(lake, container_client, change):
+    cache = MetadataCache(revalidate_after=0, db_path=None)
+    before = _list(cache, container_client)
+    if change == "add":
+        lake.put(CONTAINER, "a/b/new.parquet", b"x")
+    else:
+        lake.service_client().get_file_system_client(CONTAINER).get_file_client("a/b/two.parquet").delete_file()
+
+    after = _list(cache, container_client)
+
+    assert cache.stats()["invalidations"] == 1
+    assert after == sorted(set(before) ^ {"a/b/new.parquet" if change == "add" else "a/b/two.parquet"})
+
+
+def test_fresh_entry_is_trusted_within_the_revalidation_window(lake, container_client):
+    cache = MetadataCache(revalidate_after=60, db_path=None)
+    _list(cache, container_client)
+    lake.reset_counters()
+
+    _list(cache, container_client)
+    assert cache.peek_paths("conn", CONTAINER, "a/b") is not None
+
+    assert lake.calls["get_paths"] == 0
+
+
+def test_expired_entry_is_listed_again(lake, container_client):
+    cache = MetadataCache(ttl=0, db_path=None)
+    _list(cache, container_client)
+
+    _list(cache, container_client)
+
+    assert cache.stats()["misses"] == 2
+    assert cache.peek_paths("conn", CONTAINER) is None
+
+
+def test_persisted_listing_survives_a_restart(lake, container_client, tmp_path):
+    db_path = str(tmp_path / "listings.db")
+    _list(MetadataCache(db_path=db_path), container_client, "a")
+    lake.put(CONTAINER, "a/c/four.parquet", b"x")
+
+    restarted = MetadataCache(db_path=db_path)
+    # Loaded entries are never fresh before they are revalidated
+    assert restarted.peek_paths("conn", CONTAINER, "a") is None
+    assert "a/c/four.parquet" in _list(restarted, container_client, "a")
+    assert restarted.stats()["invalidations"] == 1
+
+
+def test_invalidate_drops_overlapping_listings(lake, container_client, tmp_path):
+    # Without a revalidation window, sub-prefixes get their own listings instead of the container's
+    cache = MetadataCache(revalidate_after=0, db_path=str(tmp_path / "listings.db"))
+    _list(cache, container_client)
+    _list(cache, container_client, "a/b")
+    _list(cache, container_client, "a/c")
+
+    assert cache.invalidate("conn", CONTAINER, "a/b") == 2
+
+    assert [key[2] for key in cache._entries] == ["a/c"]
+    stored = MetadataCache(db_path=str(tmp_path / "listings.db"))
+    assert asyncio.run(stored._get_entry(("conn", CONTAINER, "a/b"))) is None
+    assert asyncio.run(stored._get_entry(("conn", CONTAINER, "a/c"))) is not None
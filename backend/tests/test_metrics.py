@@ -0,0 +1,110 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from azure.core.pipeline import PipelineContext, PipelineRequest
+from azure.core.pipeline.transport import HttpRequest
+
+import metrics
+from metrics import AdlsCallPolicy, Counter, Histogram, Registry, RequestMetrics, bind, carry
+
+ACCOUNT = "https://acct.dfs.core.windows.net"
+
+
+@pytest.mark.parametrize("method, url, headers, operation", [
+    ("GET", "https://acct.blob.core.windows.net/?comp=list", {}, "list_file_systems"),
+    ("GET", f"{ACCOUNT}/lake?resource=filesystem&recursive=true", {}, "get_paths"),
+    ("GET", f"{ACCOUNT}/lake/a/part-0.parquet", {}, "download"),
+    ("HEAD", f"{ACCOUNT}/lake/a/part-0.parquet", {}, "get_properties"),
+    ("HEAD", f"{ACCOUNT}/lake/a?action=getAccessControl", {}, "get_access_control"),
+    ("PUT", f"{ACCOUNT}/lake/a/new.parquet?resource=file", {}, "create_file"),
+    ("PUT", f"{ACCOUNT}/lake/a/b.parquet", {"x-ms-rename-source": "/lake/a/new.parquet"}, "rename"),
+    ("PATCH", f"{ACCOUNT}/lake/a/new.parquet?action=append&position=0", {}, "append_data"),
+    ("PATCH", f"{ACCOUNT}/lake/a/new.parquet?action=flush&position=10", {}, "flush_data"),
+    ("DELETE", f"{ACCOUNT}/lake/a/b.parquet", {}, "delete"),
+])
+def test_sdk_calls_are_named_by_operation(method, url, headers, operation):
+    assert metrics._operation(method, url, headers) == operation
+
+
+def _value(counter, **labels):
+    key = tuple(labels[name] for name in counter.label_names)
+    return next((value for _, sample_key, value in counter.samples() if sample_key == key), 0)
+
+
+def _call(method, url, status=200, request_headers=None, response_headers=None):
+    """Run one SDK call through the policy."""
+    policy = AdlsCallPolicy()
+    request = PipelineRequest(HttpRequest(method, url, headers=request_headers or {}), PipelineContext(None))
+    policy.on_request(request)
+    policy.on_response(request, SimpleNamespace(
+        http_response=SimpleNamespace(status_code=status, headers=response_headers or {}),
+    ))
+
+
+def test_calls_count_for_the_request_that_made_them_on_any_thread():
+    route = "/preview/{connection_id}/{dataset_id}"
+    request = RequestMetrics(route)
+    before = _value(metrics.SDK_BYTES_READ, route=route, operation="download")
+
+    with bind(request):
+        _call("GET", f"{ACCOUNT}/lake/a.parquet", 206, response_headers={"Content-Length": "42"})
+        with ThreadPoolExecutor(1) as pool:
+            pool.submit(carry(_call), "GET", f"{ACCOUNT}/lake?resource=filesystem").result()
+    _call("PATCH", f"{ACCOUNT}/lake/a.parquet?action=append", request_headers={"Content-Length": "7"})
+
+    assert {operation: count for operation, (count, _) in request.calls.items()} == {"download": 1, "get_paths": 1}
+    assert _value(metrics.SDK_BYTES_READ, route=route, operation="download") - before == 42
+    assert _value(metrics.SDK_REQUESTS, route=route, operation="download", status="206") >= 1
+    # Calls outside a request are background work
+    assert _value(metrics.SDK_BYTES_WRITTEN, route="background", operation="append_data") >= 7
+    assert re.fullmatch(r'adls-download;desc="1 calls";dur=[\d.]+, adls-get_paths;desc="1 calls";dur=[\d.]+, '
+                        r'total;dur=[\d.]+', request.server_timing())
+
+
+def test_values_drained_in_a_worker_merge_into_the_api_process():
+    def registry():
+        registry = Registry()
+        registry.register(Counter("jobs_total", "Jobs.", ("route",)))
+        registry.register(Histogram("job_seconds", "Job time.", ("route",), buckets=(0.1, 1.0)))
+        return registry
+
+    worker, api = registry(), registry()
+    worker._metrics["jobs_total"].inc(route="/export")
+    worker._metrics["job_seconds"].observe(0.5, route="/export")
+    worker._metrics["job_seconds"].observe(2, route="/export")
+
+    api.merge(worker.drain())
+
+    assert "/export" not in worker.render()
+    assert api.render().splitlines() == [
+        "# HELP jobs_total Jobs.",
+        "# TYPE jobs_total counter",
+        'jobs_total{route="/export"} 1',
+        "# HELP job_seconds Job time.",
+        "# TYPE job_seconds histogram",
+        'job_seconds_bucket{route="/export",le="0.1"} 0',
+        'job_seconds_bucket{route="/export",le="1"} 1',
+        'job_seconds_bucket{route="/export",le="+Inf"} 2',
+        'job_seconds_sum{route="/export"} 2.5',
+        'job_seconds_count{route="/export"} 2',
+    ]
+
+
+def _sample(text, line_start):
+    return sum(float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.startswith(line_start))
+
+
+def test_metrics_endpoint_reports_route_latency_and_cache_ratios(bench):
+    connection_id = bench.connect()
+    sample = 'adls_http_request_duration_seconds_count{route="/containers/{connection_id}",method="GET",status="200"}'
+    before = _sample(bench.client.get("/metrics").text, sample)
+
+    bench.client.get(f"/containers/{connection_id}")
+    bench.client.get(f"/containers/{connection_id}")
+    response = bench.client.get("/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert _sample(response.text, sample) - before == 2
+    assert 'adls_cache_hit_ratio{cache="metadata"}' in response.text
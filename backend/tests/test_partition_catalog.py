@@ -0,0 +1,116 @@
+import pyarrow as pa
+import pytest
+
+from conftest import CONTAINER, parquet_bytes
+from dataset_reader import list_partitions, open_plan, read_preview
+from partition_catalog import HivePartitioning, PartitionCatalog
+
+YEARS = [2022, 2023, 2024]
+REGIONS = ["eu", "us"]
+ROWS = 5
+
+
+def test_partition_columns_are_typed_from_directory_names():
+    partitioning = HivePartitioning.from_paths("lake/t", [
+        "lake/t/year=2023/region=eu/a.parquet",
+        "lake/t/year=__HIVE_DEFAULT_PARTITION__/region=01/b.parquet",
+    ])
+
+    assert partitioning.keys == ["year", "region"]
+    assert partitioning.schema.field("year").type == pa.int64()
+    # "01" would lose its leading zero as a number
+    assert partitioning.schema.field("region").type == pa.string()
+    assert partitioning.values("lake/t/year=__HIVE_DEFAULT_PARTITION__/region=01/b.parquet") == {
+        "year": None, "region": "01",
+    }
+
+
+@pytest.fixture
+def partitioned_folder(lake):
+    n = 0
+    for year in YEARS:
+        for region in REGIONS:
+            table = pa.table({"id": pa.array(range(n, n + ROWS), pa.int64()), "amount": [1.5] * ROWS})
+            lake.put(CONTAINER, f"events/year={year}/region={region}/part-0.parquet", parquet_bytes(table))
+            n += ROWS
+    return f"{CONTAINER}/events"
+
+
+@pytest.fixture
+def catalog(service_client, footer_cache, delta_log, partitioned_folder):
+    catalog = PartitionCatalog()
+    # The first read lists the whole folder and fills the catalog
+    plan = open_plan(service_client, partitioned_folder, footer_cache, delta_log, partition_catalog=catalog)
+    assert plan.complete and catalog.stats()["datasets"] == 1
+    return catalog
+
+
+def _open(service_client, footer_cache, delta_log, path, catalog, filters):
+    return open_plan(service_client, path, footer_cache, delta_log, filters=filters, partition_catalog=catalog)
+
+
+def _rows(plan, filters):
+    result = read_preview(plan, 1, 100, filters=filters)
+    return result.row_ids, result.table.column("id").to_pylist()
+
+
+@pytest.mark.parametrize("filters, files, listings", [
+    # The root's listing, then "year=2023" recursively
+    ([{"column": "year", "operator": "equals", "value": "2023"}], 2, 2),
+    # The root's listing, each year's and then the three "region=us" directories
+    ([{"column": "region", "operator": "equals", "value": "us"}], 3, 7),
+    ([{"column": "year", "operator": "gte", "value": "2023"}, {"column": "region", "value": "eu"}], 2, 5),
+])
+def test_filtered_read_lists_only_matching_partitions(
+    lake, service_client, footer_cache, delta_log, partitioned_folder, catalog, filters, files, listings,
+):
+    full = _open(service_client, footer_cache, delta_log, partitioned_folder, None, None)
+    lake.reset_counters()
+
+    pruned = _open(service_client, footer_cache, delta_log, partitioned_folder, catalog, filters)
+
+    assert lake.calls["get_paths"] == listings
+    assert len(pruned.fragments) == files and not pruned.complete
+    assert pruned.total_rows == full.total_rows
+    assert catalog.stats()["prunedReads"] == 1
+    assert catalog.stats()["filesSkipped"] == len(YEARS) * len(REGIONS) - files
+    # Row positions are those of the unfiltered dataset
+    assert _rows(pruned, filters) == _rows(full, filters)
+    assert len(_rows(pruned, filters)[0]) == files * ROWS
+
+
+def test_filters_on_data_columns_list_the_whole_folder(lake, service_client, footer_cache, delta_log, partitioned_folder, catalog):
+    lake.reset_counters()
+
+    plan = _open(service_client, footer_cache, delta_log, partitioned_folder, catalog,
+                 [{"column": "id", "operator": "lt", "value": "3"}])
+
+    assert plan.complete
+    assert lake.calls["get_paths"] == 2
+    assert catalog.stats()["prunedReads"] == 0
+
+
+def test_stale_catalog_falls_back_to_a_full_listing(lake, service_client, footer_cache, delta_log, partitioned_folder, catalog):
+    table = pa.table({"id": pa.array([100, 101], pa.int64()), "amount": [2.5, 2.5]})
+    lake.put(CONTAINER, "events/year=2023/region=eu/part-0.parquet", parquet_bytes(table))
+    filters = [{"column": "year", "value": "2023"}]
+
+    plan = _open(service_client, footer_cache, delta_log, partitioned_folder, catalog, filters)
+
+    assert plan.complete and catalog.stats()["fallbacks"] == 1
+    assert sorted(_rows(plan, filters)[1]) == list(range(15, 20)) + [100, 101]
+    # The listing refreshed the catalog, so the next filtered read is pruned again
+    _open(service_client, footer_cache, delta_log, partitioned_folder, catalog, filters)
+    assert catalog.stats()["prunedReads"] == 1
+
+
+def test_list_partitions_summarizes_matching_partitions(service_client, partitioned_folder, catalog):
+    partitioning, partitions = list_partitions(
+        service_client, partitioned_folder, catalog, [{"column": "region", "value": "eu"}]
+    )
+
+    assert partitioning.keys == ["year", "region"]
+    assert [p["values"] for p in partitions] == [{"year": str(year), "region": "eu"} for year in YEARS]
+    assert all(p["fileCount"] == 1 for p in partitions)
+    with pytest.raises(ValueError):
+        list_partitions(service_client, partitioned_folder, catalog, [{"column": "id", "value": "1"}])
@@ -0,0 +1,81 @@
+import asyncio
+
+import pyarrow as pa
+import pytest
+
+import main
+from conftest import CONTAINER, parquet_bytes
+from search_index import SearchIndex, tokenize
+
+
+def test_tokenize_splits_separators_and_camel_case():
+    assert tokenize("customerOrders_2024") == ["customer", "orders", "customerorders", "2024"]
+    assert tokenize("HTTPServerLogs") == ["http", "server", "logs", "httpserverlogs"]
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    datasets = ["sales/customer_orders", "sales/orders_archive", "sales/orders"]
+    index.apply_changes(
+        "conn", "lake",
+        [("sales", True), ("hr", True)] + [(path, True) for path in datasets],
+        [],
+        {path: {"name": path.rsplit("/", 1)[1], "format": "parquet"} for path in datasets},
+        [],
+    )
+    return index
+
+
+def _names(index, query, **kwargs):
+    return [(entry.type, entry.name) for entry, _, _ in index.search("conn", query, **kwargs)]
+
+
+def test_exact_names_rank_before_prefix_and_substring_matches(index):
+    assert _names(index, "orders") == [
+        ("dataset", "orders"), ("dataset", "orders_archive"), ("dataset", "customer_orders"),
+    ]
+    # Only a substring of a token, found through trigrams
+    assert _names(index, "tomer") == [("dataset", "customer_orders")]
+    assert _names(index, "sales", types=["folder"]) == [("folder", "sales")]
+
+
+def test_columns_are_searchable_once_filled_and_removed_with_their_dataset(index):
+    assert index.pending_schemas("conn") == 3
+    index.set_columns("conn", "lake", "sales/customer_orders", [{"name": "customerEmail", "type": "string"}])
+
+    assert index.pending_schemas("conn") == 2
+    assert index.pending_schemas("conn", ["other"]) == 0
+    assert _names(index, "email") == [("column", "customerEmail")]
+
+    index.apply_changes("conn", "lake", [], ["sales/customer_orders"], {}, ["sales/customer_orders"])
+    assert _names(index, "email") == []
+    assert _names(index, "tomer") == []
+
+
+@pytest.fixture
+def orders_folder(lake):
+    table = pa.table({"order_id": pa.array([1, 2], pa.int64()), "customerEmail": ["a@x", "b@x"]})
+    lake.put(CONTAINER, "sales/orders/part-0.parquet", parquet_bytes(table))
+    return f"{CONTAINER}/sales/orders"
+
+
+def test_first_column_search_on_a_new_connection_finds_columns(bench, orders_folder):
+    connection_id = bench.connect()
+
+    response = bench.client.get(f"/search/{connection_id}", params={"q": "email"})
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert [(hit["type"], hit["column"]) for hit in body["results"]] == [("column", "customerEmail")]
+    assert body["pendingSchemas"] == 0
+
+
+def test_search_reports_schemas_it_did_not_wait_for(bench, orders_folder, monkeypatch):
+    monkeypatch.setattr(main, "SEARCH_SCHEMA_WAIT", 0)
+    connection_id = bench.connect()
+
+    body = bench.client.get(f"/search/{connection_id}", params={"q": "email"}).json()
+
+    assert body["results"] == []
+    assert body["pendingSchemas"] == 1
@@ -0,0 +1,115 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pytest
+
+import dataset_reader
+from conftest import CONTAINER, parquet_bytes
+from dataset_reader import build_filter_expression, open_plan, read_preview
+from sort_index import SortIndex, top_k_positions
+
+FILES = 3
+ROWS = 200
+
+
+@pytest.fixture
+def plan(lake, service_client, footer_cache, delta_log):
+    rng = np.random.default_rng(7)
+    for i in range(FILES):
+        score = rng.integers(0, 40, ROWS)
+        value = rng.normal(size=ROWS)
+        value[rng.integers(0, ROWS, 5)] = np.nan
+        table = pa.table({
+            "id": pa.array(range(i * ROWS, (i + 1) * ROWS), pa.int64()),
+            # Many ties, so the order among equal values matters
+            "score": pa.array(score, pa.int64(), mask=rng.random(ROWS) < 0.1),
+            "value": pa.array(value, pa.float64(), mask=rng.random(ROWS) < 0.1),
+            "name": pa.array([f"n{n:03d}" for n in rng.integers(0, 500, ROWS)]),
+        })
+        lake.put(CONTAINER, f"sorted/part-{i}.parquet", parquet_bytes(table, row_group_size=50))
+    return open_plan(service_client, f"{CONTAINER}/sorted", footer_cache, delta_log)
+
+
+def _full_sort(plan, column, descending, filters=None):
+    """Positions of the (matching) rows in the order of a sort of all of them."""
+    table = plan.read(plan.refs, None).append_column("__position", pa.array(plan.positions(plan.refs)))
+    expression = build_filter_expression(filters, plan.schema)
+    if expression is not None:
+        table = table.filter(expression)
+    order = "descending" if descending else "ascending"
+    indices = pc.sort_indices(table, sort_keys=[(column, order)], null_placement="at_end")
+    return table.column("__position").to_numpy()[indices.to_numpy()]
+
+
+@pytest.mark.parametrize("column", ["score", "value", "name"])
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("k", [1, 37, FILES * ROWS])
+def test_top_k_matches_a_full_sort(plan, column, descending, k):
+    expected = _full_sort(plan, column, descending)[:k]
+
+    assert top_k_positions(plan, column, descending, k).tolist() == expected.tolist()
+
+
+def test_top_k_stops_at_row_groups_that_cannot_improve(plan, tmp_path):
+    stats = SortIndex(str(tmp_path))
+
+    positions = top_k_positions(plan, "id", True, 10, stats)
+
+    assert positions.tolist() == list(range(FILES * ROWS - 1, FILES * ROWS - 11, -1))
+    # The first batch of eight row groups holds the ten largest ids
+    assert stats.stats()["rowGroupsSkipped"] == FILES * ROWS // 50 - 8
+
+
+@pytest.fixture
+def sort_index(tmp_path, monkeypatch):
+    # Every page below is deeper than a top-k scan goes
+    monkeypatch.setattr(dataset_reader, "SORT_TOP_ROWS", 0)
+    return SortIndex(str(tmp_path))
+
+
+def test_deep_pages_in_either_direction_come_from_one_build(plan, sort_index):
+    descending = read_preview(plan, 5, 40, "score", "desc", sort_index=sort_index)
+    ascending = read_preview(plan, 3, 40, "score", "asc", sort_index=sort_index)
+
+    assert descending.row_ids == _full_sort(plan, "score", True)[160:200].tolist()
+    assert ascending.row_ids == _full_sort(plan, "score", False)[80:120].tolist()
+    assert descending.total_rows == FILES * ROWS
+    stats = sort_index.stats()
+    assert (stats["builds"], stats["hits"], stats["files"]) == (1, 1, 2)
+
+
+def test_filtered_pages_follow_the_index(plan, sort_index):
+    filters = [{"column": "score", "operator": "greaterThan", "value": "20"}]
+    expected = _full_sort(plan, "value", False, filters)
+
+    result = read_preview(plan, 2, 30, "value", "asc", filters=filters, sort_index=sort_index)
+
+    assert result.row_ids == expected[30:60].tolist()
+    assert result.total_rows == len(expected)
+
+
+def test_a_new_dataset_version_is_not_served_from_the_old_index(
+    lake, service_client, footer_cache, delta_log, plan, sort_index,
+):
+    read_preview(plan, 2, 10, "name", "asc", sort_index=sort_index)
+    lake.put(CONTAINER, "sorted/part-1.parquet", parquet_bytes(pa.table({
+        "id": pa.array([-1], pa.int64()), "score": pa.array([1], pa.int64()),
+        "value": pa.array([0.5]), "name": pa.array(["a"]),
+    })))
+    changed = open_plan(service_client, f"{CONTAINER}/sorted", footer_cache, delta_log)
+
+    assert sort_index.get(changed, "name", False) is None
+    result = read_preview(changed, 1, 5, "name", "asc", sort_index=sort_index)
+    assert result.row_ids == _full_sort(changed, "name", False)[:5].tolist()
+    assert sort_index.stats()["builds"] == 2
+
+
+def test_least_recently_built_orders_are_evicted(plan, sort_index):
+    sort_index.max_bytes = 6000  # room for the two directions of one column
+
+    sort_index.build(plan, "score", False)
+    sort_index.build(plan, "value", False)
+
+    assert sort_index.get(plan, "score", False) is None
+    assert sort_index.get(plan, "value", True) is not None
+    assert sort_index.stats()["evictions"] == 2
@@ -0,0 +1,127 @@
+import json
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+import validation
+from conftest import CONTAINER, parquet_bytes
+from dataset_reader import open_plan
+from validation import compile_rules, evaluate_rules, validate_dataset
+
+SCHEMA = pa.schema([("id", pa.int64()), ("code", pa.string()), ("score", pa.int64())])
+TABLE = pa.table({
+    "id": pa.array(range(6), pa.int64()),
+    "code": pa.array(["AB-1", "", None, "ab-2", "AB-12345", "XY-3"]),
+    "score": pa.array([5, -1, None, 3, 100, 7], pa.int64()),
+}, schema=SCHEMA)
+
+
+def _violations(validation_rules, extra=None, name="code"):
+    rules, skipped = compile_rules([{"name": name, "validation": validation_rules, "validationRules": extra}], SCHEMA)
+    found = evaluate_rules(TABLE, rules, np.arange(TABLE.num_rows))
+    return {rule.rule: positions.tolist() for rule, positions in zip(rules, found)}, skipped
+
+
+def test_text_rules_ignore_empty_values_except_required():
+    found, skipped = _violations({
+        "required": True, "minLength": 4, "maxLength": 5, "pattern": "^[A-Z]{2}-[0-9]+$", "enum": ["AB-1", "XY-3"],
+    })
+
+    assert skipped == []
+    assert found == {
+        "required": [1, 2],
+        "minLength": [],
+        "maxLength": [4],
+        "pattern": [3],
+        "enum": [3, 4],
+    }
+
+
+def test_numeric_limits_round_inwards_on_integer_columns():
+    found, _ = _violations({"minValue": 2.5, "maxValue": 7}, [{"type": "range", "value": "0..50"}], name="score")
+
+    # minValue 2.5 on integers is 3; null scores are not checked
+    assert found == {"minValue": [1], "maxValue": [4], "range": [1, 4]}
+
+
+def test_rules_for_another_type_and_custom_rules_are_skipped():
+    rules, skipped = compile_rules([
+        {"name": "score", "validation": {"pattern": "x", "minLength": 1}},
+        {"name": "code", "validation": {"minValue": 1}, "validationRules": [{"type": "custom", "value": "fn"}]},
+    ], SCHEMA)
+
+    assert rules == []
+    assert [(s["column"], s["rule"]) for s in skipped] == [
+        ("score", "minLength"), ("score", "pattern"), ("code", "minValue"), ("code", "custom"),
+    ]
+
+
+@pytest.mark.parametrize("columns", [
+    [{"name": "missing", "validation": {"required": True}}],
+    [{"name": "code", "validation": {"pattern": "(?=lookahead)"}}],
+    [{"name": "score", "validationRules": [{"type": "range", "value": "10"}]}],
+    [{"name": "code", "validationRules": [{"type": "unknown", "value": ""}]}],
+])
+def test_invalid_rules_are_rejected(columns):
+    with pytest.raises(ValueError):
+        compile_rules(columns, SCHEMA)
+
+
+@pytest.fixture
+def scores_plan(lake, service_client, footer_cache, delta_log):
+    # Four row groups of 50; only the last one holds scores above 150
+    table = pa.table({"id": pa.array(range(200), pa.int64()), "score": pa.array(range(200), pa.int64())})
+    lake.put(CONTAINER, "scores/part-0.parquet", parquet_bytes(table, row_group_size=50))
+    return open_plan(service_client, f"{CONTAINER}/scores", footer_cache, delta_log)
+
+
+def test_report_pages_through_violations_in_row_order(scores_plan):
+    rules, skipped = compile_rules([{"name": "score", "validation": {"minValue": 20, "maxValue": 180}}], scores_plan.schema)
+
+    report = validate_dataset(scores_plan, rules, skipped)
+
+    assert [rule["count"] for rule in report.summary()] == [20, 19]
+    pages = [report.violations(offset, 7) for offset in range(0, report.retained, 7)]
+    assert [len(page) for page in pages] == [7] * 5 + [4]
+    assert [int(v["rowId"]) for page in pages for v in page] == list(range(20)) + list(range(181, 200))
+    assert report.violations(report.retained, 7) == []
+
+
+def test_row_groups_that_cannot_violate_are_not_read(scores_plan, monkeypatch):
+    rules, _ = compile_rules([{"name": "score", "validation": {"maxValue": 150}}], scores_plan.schema)
+    read = []
+    original = scores_plan.read
+    monkeypatch.setattr(scores_plan, "read", lambda refs, columns: read.extend(refs) or original(refs, columns))
+
+    report = validate_dataset(scores_plan, rules)
+
+    assert report.violation_count == 49
+    assert [ref.start for ref in read] == [150]
+
+
+def test_counts_stay_exact_when_positions_are_truncated(scores_plan, monkeypatch):
+    monkeypatch.setattr(validation, "VALIDATION_MAX_VIOLATIONS", 10)
+    rules, _ = compile_rules([{"name": "score", "validation": {"maxValue": 100}}], scores_plan.schema)
+
+    report = validate_dataset(scores_plan, rules)
+
+    assert report.violation_count == 99
+    assert report.truncated and report.retained == 10
+    assert [int(v["rowId"]) for v in report.violations(0, 100)] == list(range(101, 111))
+
+
+def test_empty_results_still_have_one_page(bench, scores_plan):
+    connection_id = bench.connect()
+    path = f"{CONTAINER}/scores"
+    rules = [{"name": "score", "type": "number", "validation": {"minValue": 0}}]
+
+    report = bench.client.post(f"/validate/{connection_id}/scores", params={"path": path}, json=rules)
+    preview = bench.client.get(f"/preview/{connection_id}/scores", params={
+        "path": path, "filters": json.dumps([{"column": "score", "operator": "greaterThan", "value": 1000}]),
+    })
+
+    assert report.status_code == 200, report.text
+    assert report.json()["isValid"] and report.json()["totalPages"] == 1
+    assert preview.json()["totalRows"] == 0 and preview.json()["totalPages"] == 1
+    assert preview.headers["x-total-pages"] == "1"
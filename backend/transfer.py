@@ -0,0 +1,222 @@
+"""
+Parallel transfers of whole files between ADLS and local files or streams.
+
+Downloads split a file into ``chunk_size`` ranges fetched by ``concurrency``
+workers; each range is read into a buffer from a fixed BufferPool and written
+at its offset in the destination, so memory stays at ``concurrency`` chunks
+whatever the file size. Uploads feed ADLSAppendFile, which sends chunks as
+parallel appends at explicit offsets and commits them with one flush.
+Progress callbacks receive ``(bytes_done, total_bytes)``.
+"""
+
+import io
+import os
+import queue
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Optional, Union
+
+from adls_fs import READ_STATS, ADLSAppendFile
+from metrics import carry
+
+logger = logging.getLogger(__name__)
+
+TRANSFER_CHUNK_SIZE = int(os.environ.get("ADLS_TRANSFER_CHUNK_SIZE", str(8 * 1024 * 1024)))
+TRANSFER_CONCURRENCY = int(os.environ.get("ADLS_TRANSFER_CONCURRENCY", "8"))
+
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+
+class BufferPool:
+    """Fixed set of reusable buffers; ``acquire`` blocks while all are in use."""
+
+    def __init__(self, buffer_size: int, count: int):
+        self.buffer_size = buffer_size
+        self._free: "queue.Queue[bytearray]" = queue.Queue()
+        for _ in range(max(1, count)):
+            self._free.put(bytearray(buffer_size))
+
+    def acquire(self) -> bytearray:
+        return self._free.get()
+
+    def release(self, buffer: bytearray):
+        self._free.put(buffer)
+
+
+class _Progress:
+    """Thread-safe byte counter feeding a progress callback."""
+
+    def __init__(self, total: Optional[int], callback: Optional[ProgressCallback]):
+        self.total = total
+        self.done = 0
+        self._callback = callback
+        self._lock = threading.Lock()
+
+    def add(self, size: int):
+        with self._lock:
+            self.done += size
+            done = self.done
+        if self._callback is not None:
+            self._callback(done, self.total)
+
+    def set(self, done: int):
+        with self._lock:
+            self.done = done
+        if self._callback is not None:
+            self._callback(done, self.total)
+
+
+class _ViewWriter(io.RawIOBase):
+    """Writable stream over a memoryview, so downloads land in a pooled buffer without a copy."""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self.written = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data) -> int:
+        size = len(data)
+        self._view[self.written:self.written + size] = data
+        self.written += size
+        return size
+
+
+def download_to(
+    file_client,
+    destination: Union[str, os.PathLike, BinaryIO],
+    size: Optional[int] = None,
+    chunk_size: int = TRANSFER_CHUNK_SIZE,
+    concurrency: int = TRANSFER_CONCURRENCY,
+    progress: Optional[ProgressCallback] = None,
+) -> int:
+    """Download a whole file with parallel ranged requests into a local path or seekable binary file.
+
+    Returns the number of bytes written.
+    """
+    if size is None:
+        size = file_client.get_file_properties().size
+    owns_file = isinstance(destination, (str, os.PathLike))
+    output = open(destination, "wb") if owns_file else destination
+    if not owns_file and not output.seekable():
+        raise ValueError("Download destination must be seekable")
+
+    pool = BufferPool(chunk_size, concurrency)
+    tracker = _Progress(size, progress)
+    write_lock = threading.Lock()
+    failed = threading.Event()
+    base = output.tell()
+
+    def fetch(offset: int, length: int):
+        if failed.is_set():
+            return
+        buffer = pool.acquire()
+        try:
+            view = memoryview(buffer)[:length]
+            writer = _ViewWriter(view)
+            file_client.download_file(offset=offset, length=length).readinto(writer)
+            if writer.written != length:
+                raise IOError(f"Expected {length} bytes at offset {offset}, got {writer.written}")
+            READ_STATS.record(length)
+            with write_lock:
+                output.seek(base + offset)
+                output.write(view)
+            tracker.add(length)
+        except Exception:
+            failed.set()
+            raise
+        finally:
+            pool.release(buffer)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = [
+                executor.submit(carry(fetch), offset, min(chunk_size, size - offset))
+                for offset in range(0, size, chunk_size)
+            ]
+            for future in futures:
+                future.result()
+        output.seek(base + size)
+    finally:
+        if owns_file:
+            output.close()
+    return size
+
+
+def upload_from(
+    file_client,
+    source: Union[str, os.PathLike, BinaryIO, bytes],
+    size: Optional[int] = None,
+    chunk_size: int = TRANSFER_CHUNK_SIZE,
+    concurrency: int = TRANSFER_CONCURRENCY,
+    progress: Optional[ProgressCallback] = None,
+    commit_to: Optional[str] = None,
+) -> int:
+    """Upload a local path, binary stream or bytes with parallel appends, replacing the file.
+
+    The source is read one chunk at a time, so it may be a pipe of unknown size.
+    With ``commit_to``, ``file_client`` is a staging path renamed over the
+    target once the upload is complete (see ``ADLSAppendFile``). Returns the
+    number of bytes uploaded.
+    """
+    owns_file = isinstance(source, (str, os.PathLike))
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    stream = open(source, "rb") if owns_file else source
+    if size is None:
+        try:
+            size = os.fstat(stream.fileno()).st_size - stream.tell()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            size = len(stream.getbuffer()) - stream.tell() if isinstance(stream, io.BytesIO) else None
+
+    tracker = _Progress(size, progress)
+    sink = open_upload(
+        file_client, chunk_size=chunk_size, concurrency=concurrency, progress=tracker.set, commit_to=commit_to
+    )
+    try:
+        while True:
+            data = stream.read(chunk_size)
+            if not data:
+                break
+            sink.write(data)
+        sink.close()
+    except Exception:
+        sink.abort()
+        raise
+    finally:
+        if owns_file:
+            stream.close()
+    return sink.size
+
+
+def open_upload(
+    file_client,
+    chunk_size: int = TRANSFER_CHUNK_SIZE,
+    concurrency: int = TRANSFER_CONCURRENCY,
+    progress: Optional[Callable[[int], None]] = None,
+    commit_to: Optional[str] = None,
+) -> ADLSAppendFile:
+    """Writable stream for large uploads (e.g. a ParquetWriter sink) with transfer-sized chunks."""
+    return ADLSAppendFile(
+        file_client, chunk_size=chunk_size, keep_tail=0, concurrency=concurrency, progress=progress,
+        commit_to=commit_to,
+    )
+
+
+def log_progress(name: str, step: float = 0.1) -> ProgressCallback:
+    """Progress callback that logs every ``step`` fraction of a transfer."""
+    state = {"next": step}
+    lock = threading.Lock()
+
+    def report(done: int, total: Optional[int]):
+        if not total:
+            return
+        with lock:
+            if done / total < state["next"] and done < total:
+                return
+            state["next"] = done / total + step
+        logger.info(f"{name}: {done}/{total} bytes ({100 * done / total:.0f}%)")
+
+    return report
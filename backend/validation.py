@@ -0,0 +1,414 @@
+"""
+Server-side validation of whole datasets against column rules.
+
+The frontend's ``ColumnValidation`` rules (required, minLength, maxLength,
+minValue, maxValue, pattern, enum) and its ``regex`` and ``range``
+``ValidationRule`` entries are compiled into dataset expressions that are true
+for the rows violating them. The OR of all of them prunes the row groups whose
+statistics rule out any violation. The remaining row groups are then validated
+one at a time, in parallel: the ruled columns are read, unsaved edits are
+merged, and every rule is evaluated in one projection. Only counts and the
+positions of violating rows are kept, so memory does not grow with the
+dataset. Reports are cached per dataset version, rules and edits, so paging
+through the violations does not scan the dataset again.
+"""
+
+import os
+import json
+import math
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from dataset_reader import DatasetPlan, RowGroupRef, candidate_refs
+from metrics import carry
+
+logger = logging.getLogger(__name__)
+
+# Row groups validated at the same time
+VALIDATION_CONCURRENCY = int(os.environ.get("ADLS_VALIDATION_CONCURRENCY", "4"))
+# Violating rows whose positions are kept per report; counts are always exact
+VALIDATION_MAX_VIOLATIONS = int(os.environ.get("ADLS_VALIDATION_MAX_VIOLATIONS", "1000000"))
+# Reports kept for paging
+VALIDATION_REPORT_CACHE_SIZE = int(os.environ.get("ADLS_VALIDATION_REPORT_CACHE_SIZE", "32"))
+
+
+class CompiledRule(NamedTuple):
+    column: str
+    rule: str
+    message: str
+    # True for the rows violating the rule
+    expression: ds.Expression
+
+
+def _is_text(field_type: pa.DataType) -> bool:
+    return pa.types.is_string(field_type) or pa.types.is_large_string(field_type)
+
+
+def _is_number(field_type: pa.DataType) -> bool:
+    return pa.types.is_integer(field_type) or pa.types.is_floating(field_type) or pa.types.is_decimal(field_type)
+
+
+def _number(value, name: str) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name}: {value}")
+
+
+def _out_of_bounds(field: ds.Expression, field_type: pa.DataType, limit: float, lower: bool) -> ds.Expression:
+    """Rows below (``lower``) or above a numeric limit.
+
+    The limit is cast to the column type where it fits, so row-group
+    statistics can prune; integer columns round it inwards.
+    """
+    bound = limit
+    if pa.types.is_integer(field_type) and math.isfinite(limit):
+        bound = math.ceil(limit) if lower else math.floor(limit)
+    try:
+        value = pa.scalar(bound).cast(field_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        field, value = field.cast(pa.float64()), pa.scalar(float(limit))
+    return field < value if lower else field > value
+
+
+def _check_pattern(pattern: str):
+    # RE2 rejects what it cannot run (lookarounds, backreferences) when compiling
+    try:
+        pc.match_substring_regex(pa.array([""], pa.string()), pattern)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        raise ValueError(f"Invalid pattern {pattern!r}: {str(e)}")
+
+
+def _parse_range(value: str) -> Tuple[Optional[float], Optional[float]]:
+    """``min,max`` or ``min..max``; either bound may be left empty."""
+    text = str(value).strip()
+    low, separator, high = text.partition("..") if ".." in text else text.partition(",")
+    if not separator:
+        raise ValueError(f"Invalid range: {value}")
+    return (
+        _number(low, "range") if low.strip() else None,
+        _number(high, "range") if high.strip() else None,
+    )
+
+
+def compile_rules(
+    columns: Sequence[Dict[str, Any]],
+    schema: pa.Schema,
+) -> Tuple[List[CompiledRule], List[Dict[str, Any]]]:
+    """Compile the rules of DatasetColumn dicts against a dataset schema.
+
+    Returns the compiled rules and the rules that were skipped, with the reason:
+    ``custom`` rules, and length, pattern or value rules on columns of another type.
+    """
+    rules: List[CompiledRule] = []
+    skipped: List[Dict[str, Any]] = []
+
+    for column in columns:
+        name = column.get("name")
+        validation = column.get("validation") or {}
+        extra_rules = column.get("validationRules") or []
+        if not validation and not extra_rules:
+            continue
+        if name not in schema.names:
+            raise ValueError(f"Unknown column: {name}")
+
+        field = ds.field(name)
+        field_type = schema.field(name).type
+        text = _is_text(field_type)
+        number = _is_number(field_type)
+        # Like the browser, rules other than required ignore empty values
+        present = (field.is_valid() & (field != "")) if text else field.is_valid()
+
+        def add(rule: str, message: str, violation: ds.Expression):
+            rules.append(CompiledRule(name, rule, message, violation))
+
+        def skip(rule: str, reason: str):
+            skipped.append({"column": name, "rule": rule, "reason": reason})
+
+        if validation.get("required"):
+            add("required", "Required field cannot be empty", (field.is_null() | (field == "")) if text else field.is_null())
+
+        for rule, compare in (("minLength", "less"), ("maxLength", "greater")):
+            limit = validation.get(rule)
+            if limit is None:
+                continue
+            if not text:
+                skip(rule, f"{name} is not a text column")
+                continue
+            limit = int(_number(limit, rule))
+            length = pc.utf8_length(field)
+            if compare == "less":
+                add(rule, f"Text length is less than minimum length ({limit})", present & (length < limit))
+            else:
+                add(rule, f"Text length exceeds maximum length ({limit})", present & (length > limit))
+
+        for rule, compare in (("minValue", "less"), ("maxValue", "greater")):
+            limit = validation.get(rule)
+            if limit is None:
+                continue
+            if not number:
+                skip(rule, f"{name} is not a numeric column")
+                continue
+            bound = _number(limit, rule)
+            if compare == "less":
+                add(rule, f"Value is less than minimum ({limit})", present & _out_of_bounds(field, field_type, bound, True))
+            else:
+                add(rule, f"Value exceeds maximum ({limit})", present & _out_of_bounds(field, field_type, bound, False))
+
+        pattern = validation.get("pattern")
+        if pattern:
+            if text:
+                _check_pattern(pattern)
+                add("pattern", "Value does not match required format pattern",
+                    present & ~pc.match_substring_regex(field, pattern))
+            else:
+                skip("pattern", f"{name} is not a text column")
+
+        allowed = validation.get("enum")
+        if allowed:
+            values = pa.array([str(v) for v in allowed], pa.string())
+            add("enum", f"Value is not in the list of allowed values ({', '.join(str(v) for v in allowed)})",
+                present & ~(field if text else field.cast(pa.string())).isin(values))
+
+        for extra in extra_rules:
+            rule_type = extra.get("type")
+            message = extra.get("errorMessage")
+            if rule_type == "regex":
+                if not text:
+                    skip("regex", f"{name} is not a text column")
+                    continue
+                _check_pattern(extra.get("value") or "")
+                add("regex", message or "Value does not match required format pattern",
+                    present & ~pc.match_substring_regex(field, extra.get("value") or ""))
+            elif rule_type == "range":
+                if not number:
+                    skip("range", f"{name} is not a numeric column")
+                    continue
+                low, high = _parse_range(extra.get("value"))
+                violation = None
+                if low is not None:
+                    violation = _out_of_bounds(field, field_type, low, True)
+                if high is not None:
+                    above = _out_of_bounds(field, field_type, high, False)
+                    violation = above if violation is None else violation | above
+                if violation is not None:
+                    add("range", message or f"Value is outside the range {extra.get('value')}", present & violation)
+            elif rule_type == "custom":
+                skip("custom", "Custom rules are only checked in the browser")
+            else:
+                raise ValueError(f"Unsupported validation rule: {rule_type}")
+
+    return rules, skipped
+
+
+def rules_key(columns: Sequence[Dict[str, Any]]) -> str:
+    """Canonical JSON of the rules of DatasetColumn dicts."""
+    return json.dumps(
+        [{"name": c.get("name"), "validation": c.get("validation"), "validationRules": c.get("validationRules")}
+         for c in columns],
+        sort_keys=True, default=str,
+    )
+
+
+def evaluate_rules(table: pa.Table, rules: Sequence[CompiledRule], positions: np.ndarray) -> List[np.ndarray]:
+    """Positions of the rows of a table violating each rule."""
+    if not rules or table.num_rows == 0:
+        return [np.empty(0, dtype=np.int64) for _ in rules]
+    masks = ds.dataset(table).to_table(columns={str(i): rule.expression for i, rule in enumerate(rules)})
+    violations = []
+    for mask in masks.columns:
+        flags = pc.fill_null(mask, False).to_numpy()
+        violations.append(positions[np.flatnonzero(flags)])
+    return violations
+
+
+class ValidationReport:
+    """Violation counts per rule and the positions of the first violating rows, in row order."""
+
+    def __init__(self, rules: Sequence[CompiledRule], skipped: List[Dict[str, Any]], total_rows: int):
+        self.rules = list(rules)
+        self.skipped = skipped
+        self.total_rows = total_rows
+        self.counts = [0] * len(rules)
+        self.truncated = False
+        self._positions: List[np.ndarray] = []
+        self._rule_indexes: List[np.ndarray] = []
+        self._retained = 0
+
+    def add(self, violations: Sequence[np.ndarray]):
+        """Record the violations of one batch; batches must come in row order."""
+        for index, positions in enumerate(violations):
+            self.counts[index] += len(positions)
+        if self.truncated:
+            return
+        positions = np.concatenate(violations) if violations else np.empty(0, dtype=np.int64)
+        if not len(positions):
+            return
+        rule_indexes = np.concatenate([np.full(len(p), i, dtype=np.int32) for i, p in enumerate(violations)])
+        order = np.lexsort((rule_indexes, positions))
+        room = VALIDATION_MAX_VIOLATIONS - self._retained
+        if len(order) > room:
+            order = order[:room]
+            self.truncated = True
+        self._positions.append(positions[order])
+        self._rule_indexes.append(rule_indexes[order])
+        self._retained += len(order)
+
+    @property
+    def violation_count(self) -> int:
+        return sum(self.counts)
+
+    @property
+    def retained(self) -> int:
+        return self._retained
+
+    def violations(self, offset: int, limit: int) -> List[Dict[str, Any]]:
+        """ValidationError dicts of the retained violations ``offset`` to ``offset + limit``."""
+        results = []
+        skip = offset
+        for positions, rule_indexes in zip(self._positions, self._rule_indexes):
+            if skip >= len(positions):
+                skip -= len(positions)
+                continue
+            for position, rule_index in zip(positions[skip:skip + limit - len(results)], rule_indexes[skip:]):
+                rule = self.rules[int(rule_index)]
+                results.append({
+                    "rowId": str(int(position)),
+                    "columnName": rule.column,
+                    "rule": rule.rule,
+                    "message": rule.message,
+                    "severity": "error",
+                })
+            skip = 0
+            if len(results) >= limit:
+                break
+        return results
+
+    def summary(self) -> List[Dict[str, Any]]:
+        return [
+            {"column": rule.column, "rule": rule.rule, "message": rule.message, "count": count}
+            for rule, count in zip(self.rules, self.counts)
+        ]
+
+
+def validate_dataset(
+    plan: DatasetPlan,
+    rules: Sequence[CompiledRule],
+    skipped: Optional[List[Dict[str, Any]]] = None,
+    overlay=None,
+    executor: Optional[Executor] = None,
+    concurrency: int = VALIDATION_CONCURRENCY,
+) -> ValidationReport:
+    """Validate every row of a dataset, with unsaved edits merged in.
+
+    Row groups are validated on ``executor`` (a thread pool of ``concurrency``
+    workers by default): Arrow decodes and evaluates with the GIL released.
+    """
+    report = ValidationReport(rules, skipped or [], plan.total_rows)
+    if not rules:
+        return report
+    columns = list(dict.fromkeys(rule.column for rule in rules))
+    any_violation = None
+    for rule in rules:
+        any_violation = rule.expression if any_violation is None else any_violation | rule.expression
+    refs = candidate_refs(plan, any_violation, columns, overlay)
+
+    def validate_ref(ref: RowGroupRef) -> List[np.ndarray]:
+        table = plan.read([ref], columns)
+        positions = plan.positions([ref])
+        if overlay is not None:
+            table = overlay.apply(table, positions)
+        return evaluate_rules(table, rules, positions)
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    try:
+        # map keeps row order, so the report's positions stay sorted
+        for violations in executor.map(carry(validate_ref), refs):
+            report.add(violations)
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+    return report
+
+
+def validate_edits(
+    plan: DatasetPlan,
+    overlay,
+    rules: Sequence[CompiledRule],
+    skipped: Optional[List[Dict[str, Any]]] = None,
+) -> ValidationReport:
+    """Validate the edited cells of an overlay, e.g. before a commit.
+
+    Only the edited rows are read, and a rule only reports the rows whose cell
+    in its column was edited, so values nobody touched do not block a commit.
+    """
+    positions = overlay.edited_positions()
+    positions = positions[[plan.covers(int(p)) for p in positions]] if len(positions) else positions
+    report = ValidationReport(rules, skipped or [], len(positions))
+    if not rules or not len(positions):
+        return report
+    columns = list(dict.fromkeys(rule.column for rule in rules))
+    table = overlay.apply(plan.take(positions, columns), positions)
+    violations = evaluate_rules(table, rules, positions)
+    report.add([
+        found[np.isin(found, overlay.edited_positions([rule.column]))]
+        for rule, found in zip(rules, violations)
+    ])
+    return report
+
+
+def report_key(plan: DatasetPlan, columns: Sequence[Dict[str, Any]], overlay=None) -> str:
+    identity = {
+        "version": plan.version_tag,
+        "rules": rules_key(columns),
+        "edits": overlay.fingerprint() if overlay is not None else None,
+    }
+    return hashlib.sha1(json.dumps(identity, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ValidationReports:
+    """LRU of validation reports, by dataset version, rules and edits."""
+
+    def __init__(self, max_entries: int = VALIDATION_REPORT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, ValidationReport]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[ValidationReport]:
+        with self._lock:
+            report = self._entries.get(key)
+            if report is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return report
+
+    def put(self, key: str, report: ValidationReport) -> None:
+        with self._lock:
+            self._entries[key] = report
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "reports": len(self._entries),
+                "retainedViolations": sum(report.retained for report in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
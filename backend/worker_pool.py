@@ -0,0 +1,370 @@
+"""
+Process pool for CPU-heavy dataset jobs.
+
+Decoding, sorting and validating large datasets hold the GIL for long
+stretches, so running them in the API process stalls every other request.
+Jobs run in ``ADLS_WORKER_PROCESSES`` worker processes instead. Queued jobs are
+dispatched round-robin across connections, so one connection's burst of jobs
+cannot starve the others. A job whose caller goes away (the client
+disconnects or the request is cancelled) is dropped from the queue, or, if it
+is already running, its worker is terminated and replaced.
+
+Arrow tables in a job's result are handed back as Arrow IPC files in shared
+memory (``ADLS_WORKER_SHM_DIR``, ``/dev/shm`` where available): the worker
+writes each table once and the API process memory-maps it, so the data is not
+copied through a pipe or unpickled. With ``ADLS_WORKER_PROCESSES=0`` jobs run
+on a thread of the API process.
+
+A job's ADLS calls count for the route that submitted it: the worker records
+them under that route and sends its metrics back with the result.
+"""
+
+import os
+import glob
+import pickle
+import asyncio
+import tempfile
+import itertools
+import logging
+import multiprocessing
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional
+
+import pyarrow as pa
+
+from client_pool import client_leases
+from metrics import REGISTRY, RequestMetrics, bind, carry, current_request, current_route
+
+logger = logging.getLogger(__name__)
+
+# Worker processes; 0 runs jobs on a thread of the API process
+WORKER_PROCESSES = int(os.environ.get("ADLS_WORKER_PROCESSES", str(min(4, os.cpu_count() or 1))))
+# Where result tables are handed over
+WORKER_SHM_DIR = os.environ.get("ADLS_WORKER_SHM_DIR") or (
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+)
+# Seconds between checks whether a waiting client is still connected
+DISCONNECT_POLL_INTERVAL = 0.5
+
+
+class JobCancelledError(Exception):
+    """The job was cancelled before it finished."""
+
+
+class WorkerError(Exception):
+    """A job failed in a way that could not be passed back as its own exception."""
+
+
+class _SharedTable(NamedTuple):
+    path: str
+
+
+# Result handoff
+def _pack(value: Any, prefix: str, counter) -> Any:
+    """Replace the Arrow tables in a result (possibly inside tuples) by shared-memory IPC files."""
+    if isinstance(value, pa.Table):
+        path = f"{prefix}-{next(counter)}.arrow"
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, value.schema) as writer:
+                writer.write_table(value)
+        return _SharedTable(path)
+    if isinstance(value, tuple) and hasattr(value, "_fields"):
+        return type(value)(*(_pack(item, prefix, counter) for item in value))
+    if isinstance(value, (list, tuple)) and any(isinstance(item, pa.Table) for item in value):
+        return type(value)(_pack(item, prefix, counter) for item in value)
+    return value
+
+
+def _unpack(value: Any) -> Any:
+    """Map shared-memory tables back in; the files are unlinked once mapped."""
+    if isinstance(value, _SharedTable):
+        try:
+            source = pa.memory_map(value.path, "r")
+            return pa.ipc.open_file(source).read_all()
+        finally:
+            _unlink(value.path)
+    if isinstance(value, tuple) and hasattr(value, "_fields"):
+        return type(value)(*(_unpack(item) for item in value))
+    if isinstance(value, (list, tuple)) and any(isinstance(item, _SharedTable) for item in value):
+        return type(value)(_unpack(item) for item in value)
+    return value
+
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _portable_error(error: BaseException) -> BaseException:
+    try:
+        pickle.loads(pickle.dumps(error))
+        return error
+    except Exception:
+        return WorkerError(f"{type(error).__name__}: {error}")
+
+
+def _run_leased(fn: Callable, context: Any, *args, **kwargs) -> Any:
+    """Run an in-process job with the pooled clients it takes kept from idle eviction."""
+    with client_leases():
+        return fn(context, *args, **kwargs)
+
+
+def _worker_main(connection, initializer: Optional[Callable[[], Any]]):
+    """Loop of a worker process: run jobs until the pipe is closed."""
+    context = initializer() if initializer is not None else None
+    while True:
+        try:
+            message = connection.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        job_id, prefix, route, fn, args, kwargs = message
+        request_metrics = RequestMetrics(route)
+        try:
+            with bind(request_metrics):
+                result = _pack(fn(context, *args, **kwargs), prefix, itertools.count())
+            reply = (job_id, True, result)
+        except BaseException as e:
+            reply = (job_id, False, _portable_error(e))
+        reply += ((REGISTRY.drain(), request_metrics.calls),)
+        try:
+            connection.send(reply)
+        except (EOFError, OSError):
+            return
+
+
+class _Job:
+    def __init__(self, job_id: int, connection_id: str, fn: Callable, args: tuple, kwargs: dict, future: asyncio.Future):
+        self.id = job_id
+        self.connection_id = connection_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.worker: Optional["_Worker"] = None
+        self.route = current_route()
+        # SDK calls the worker made for the job, as RequestMetrics.calls
+        self.calls: Dict[str, List[float]] = {}
+
+
+class _Worker:
+    def __init__(self, mp_context, initializer: Optional[Callable[[], Any]]):
+        self.connection, child = mp_context.Pipe()
+        self.process = mp_context.Process(target=_worker_main, args=(child, initializer), daemon=True)
+        self.process.start()
+        child.close()
+        self.job: Optional[_Job] = None
+
+    def terminate(self):
+        self.process.terminate()
+        self.connection.close()
+
+
+class WorkerPool:
+    """Fair, cancellable pool of worker processes for ``fn(context, *args)`` jobs.
+
+    ``initializer`` builds the per-process ``context`` handed to every job
+    (caches, clients); ``local_context`` is used when jobs run in-process.
+    """
+
+    def __init__(
+        self,
+        size: int = WORKER_PROCESSES,
+        initializer: Optional[Callable[[], Any]] = None,
+        local_context: Any = None,
+        shm_dir: str = WORKER_SHM_DIR,
+    ):
+        self.size = max(0, size)
+        self.initializer = initializer
+        self.local_context = local_context
+        self.shm_dir = shm_dir
+        self._mp_context = multiprocessing.get_context("spawn")
+        self._workers: List[_Worker] = []
+        # Queued jobs per connection; the order of the keys is the round-robin order
+        self._queues: "OrderedDict[str, Deque[_Job]]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._prefix = f"adls-job-{os.getpid()}"
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.restarts = 0
+
+    def start(self):
+        """Start the worker processes."""
+        while len(self._workers) < self.size:
+            self._workers.append(_Worker(self._mp_context, self.initializer))
+
+    async def stop(self):
+        """Cancel every job and stop the workers."""
+        for queue in self._queues.values():
+            for job in queue:
+                if not job.future.done():
+                    job.future.set_exception(JobCancelledError("Worker pool stopped"))
+        self._queues.clear()
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            if worker.job is not None:
+                worker.terminate()
+                continue
+            try:
+                worker.connection.send(None)
+            except (EOFError, OSError):
+                pass
+        await asyncio.get_running_loop().run_in_executor(None, self._join, workers)
+        for path in glob.glob(os.path.join(self.shm_dir, f"{self._prefix}-*")):
+            _unlink(path)
+
+    @staticmethod
+    def _join(workers: List[_Worker]):
+        for worker in workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.kill()
+
+    async def run(self, connection_id: str, fn: Callable, *args, request=None, **kwargs) -> Any:
+        """Run ``fn(context, *args, **kwargs)`` on a worker and return its result.
+
+        ``fn`` and its arguments must be picklable. With a Starlette ``request``
+        the job is cancelled when the client disconnects.
+        """
+        if self.size == 0:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, carry(lambda: _run_leased(fn, self.local_context, *args, **kwargs))
+            )
+        if not self._workers:
+            self.start()
+
+        loop = asyncio.get_running_loop()
+        job = _Job(next(self._ids), connection_id, fn, args, kwargs, loop.create_future())
+        self._queues.setdefault(connection_id, deque()).append(job)
+        self.submitted += 1
+        self._dispatch()
+
+        try:
+            while True:
+                done, _ = await asyncio.wait({job.future}, timeout=DISCONNECT_POLL_INTERVAL if request else None)
+                if done:
+                    request_metrics = current_request()
+                    if request_metrics is not None:
+                        request_metrics.merge(job.calls)
+                    return _unpack(job.future.result())
+                if await request.is_disconnected():
+                    raise JobCancelledError(f"Client disconnected from job {job.id}")
+        except (asyncio.CancelledError, JobCancelledError):
+            self._cancel(job)
+            raise
+
+    def _dispatch(self):
+        """Hand queued jobs to idle workers, taking connections in turn."""
+        idle = [worker for worker in self._workers if worker.job is None]
+        while idle and self._queues:
+            connection_id, queue = next(iter(self._queues.items()))
+            job = queue.popleft()
+            if queue:
+                self._queues.move_to_end(connection_id)
+            else:
+                del self._queues[connection_id]
+            worker = idle.pop()
+            try:
+                worker.connection.send((job.id, self._job_prefix(job), job.route, job.fn, job.args, job.kwargs))
+            except Exception as e:
+                # Unpicklable arguments, or a worker that died while idle
+                self.failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+                if worker.process.is_alive():
+                    idle.append(worker)
+                else:
+                    self._replace(worker)
+                    idle = [w for w in self._workers if w.job is None]
+                continue
+            worker.job = job
+            job.worker = worker
+            asyncio.get_running_loop().run_in_executor(None, self._await_result, worker, job, asyncio.get_running_loop())
+
+    def _await_result(self, worker: _Worker, job: _Job, loop: asyncio.AbstractEventLoop):
+        """Wait (on a thread) for a worker's reply and complete the job on the event loop."""
+        try:
+            reply = worker.connection.recv()
+        except (EOFError, OSError):
+            reply = None
+        loop.call_soon_threadsafe(self._finish, worker, job, reply)
+
+    def _finish(self, worker: _Worker, job: _Job, reply):
+        if worker.job is not job:
+            # The job was cancelled and its worker replaced
+            return
+        worker.job = None
+        job.worker = None
+        if reply is None:
+            self.failed += 1
+            if not job.future.done():
+                job.future.set_exception(WorkerError(f"Worker process exited while running job {job.id}"))
+            self._replace(worker)
+        else:
+            _, ok, value, (metrics, calls) = reply
+            REGISTRY.merge(metrics)
+            job.calls = calls
+            if job.future.done():
+                # Nobody is waiting any more
+                self._discard(job)
+            elif ok:
+                self.completed += 1
+                job.future.set_result(value)
+            else:
+                self.failed += 1
+                job.future.set_exception(value)
+        self._dispatch()
+
+    def _job_prefix(self, job: _Job) -> str:
+        return f"{os.path.join(self.shm_dir, self._prefix)}-{job.id}"
+
+    def _discard(self, job: _Job):
+        """Remove the shared-memory files of a result nobody will read."""
+        for path in glob.glob(f"{self._job_prefix(job)}-*"):
+            _unlink(path)
+
+    def _cancel(self, job: _Job):
+        self.cancelled += 1
+        if job.future.done():
+            self._discard(job)
+            return
+        queue = self._queues.get(job.connection_id)
+        if queue is not None and job in queue:
+            queue.remove(job)
+            if not queue:
+                del self._queues[job.connection_id]
+            return
+        worker = job.worker
+        if worker is not None and worker.job is job:
+            # A running job cannot be interrupted, so its worker is replaced
+            logger.info(f"Terminating worker running cancelled job {job.id}")
+            worker.job = None
+            job.worker = None
+            self._replace(worker)
+            self._discard(job)
+            self._dispatch()
+
+    def _replace(self, worker: _Worker):
+        worker.terminate()
+        self.restarts += 1
+        index = self._workers.index(worker) if worker in self._workers else None
+        if index is not None:
+            self._workers[index] = _Worker(self._mp_context, self.initializer)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.size,
+            "alive": sum(1 for worker in self._workers if worker.process.is_alive()),
+            "running": sum(1 for worker in self._workers if worker.job is not None),
+            "queued": {connection_id: len(queue) for connection_id, queue in self._queues.items()},
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "restarts": self.restarts,
+        }
@@ -30,6 +30,7 @@ const ADLSManager: React.FC = () => {
     folderTree,
     authMethods,
     getAvailableAuthMethods,
+    loadTreeChildren,
     connect,
     disconnect,
     loadDataset,
@@ -415,6 +416,7 @@ const ADLSManager: React.FC = () => {
             onBackToContainers={backToContainers}
             onBackToFolders={backToFolders}
             folderTree={folderTree}
+            onLoadChildren={loadTreeChildren}
           />
           
           {selectedFolder && datasets.length > 0 && (
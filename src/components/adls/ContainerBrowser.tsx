@@ -23,6 +23,7 @@ interface ContainerBrowserProps {
   onSelectFolder: (folderId: string) => void;
   onBackToContainers: () => void;
   onBackToFolders: () => void;
+  onLoadChildren?: (node: FolderTree) => Promise<void>;
 }
 
 const ContainerBrowser: React.FC<ContainerBrowserProps> = ({
@@ -35,11 +36,13 @@ const ContainerBrowser: React.FC<ContainerBrowserProps> = ({
   onSelectContainer,
   onSelectFolder,
   onBackToContainers,
-  onBackToFolders
+  onBackToFolders,
+  onLoadChildren
 }) => {
   const [searchTerm, setSearchTerm] = useState('');
   const [viewMode, setViewMode] = useState<'list' | 'tree'>(folderTree ? 'tree' : 'list');
   const [expandedNodes, setExpandedNodes] = useState<Set<string>>(new Set());
+  const [loadingNodes, setLoadingNodes] = useState<Set<string>>(new Set());
   const { toast } = useToast();
   
   // Automatically expand all nodes on initial load for better discoverability
@@ -48,17 +51,20 @@ const ContainerBrowser: React.FC<ContainerBrowserProps> = ({
       const initialExpandedNodes = new Set<string>();
       const expandFirstLevel = (node: FolderTree) => {
         initialExpandedNodes.add(node.id);
-        // Only auto-expand the first level
+        // Only auto-expand the first level, and only nodes whose children are already loaded
         if (node.id === folderTree.id) {
           node.children.forEach(child => {
-            initialExpandedNodes.add(child.id);
+            if (child.children.length > 0) {
+              initialExpandedNodes.add(child.id);
+            }
           });
         }
       };
       expandFirstLevel(folderTree);
       setExpandedNodes(initialExpandedNodes);
     }
-  }, [folderTree]);
+    // Lazily loaded children replace the tree object; only a new tree resets the expansion
+  }, [folderTree?.id]);
   
   const filteredContainers = containers.filter(c => 
     c.name.toLowerCase().includes(searchTerm.toLowerCase())
@@ -68,16 +74,42 @@ const ContainerBrowser: React.FC<ContainerBrowserProps> = ({
     f.name.toLowerCase().includes(searchTerm.toLowerCase())
   );
   
-  const toggleNode = (nodeId: string) => {
+  const loadChildren = async (node: FolderTree) => {
+    if (!onLoadChildren || loadingNodes.has(node.id)) return;
+    
+    setLoadingNodes(prev => new Set(prev).add(node.id));
+    try {
+      await onLoadChildren(node);
+    } finally {
+      setLoadingNodes(prev => {
+        const newSet = new Set(prev);
+        newSet.delete(node.id);
+        return newSet;
+      });
+    }
+  };
+  
+  const canExpand = (node: FolderTree): boolean => {
+    if (node.children.length > 0) return true;
+    return !!onLoadChildren && node.type !== 'dataset' && !node.childrenLoaded && node.metadata?.itemCount !== 0;
+  };
+  
+  const toggleNode = (node: FolderTree) => {
+    const expanding = !expandedNodes.has(node.id);
     setExpandedNodes(prev => {
       const newSet = new Set(prev);
-      if (newSet.has(nodeId)) {
-        newSet.delete(nodeId);
+      if (newSet.has(node.id)) {
+        newSet.delete(node.id);
       } else {
-        newSet.add(nodeId);
+        newSet.add(node.id);
       }
       return newSet;
     });
+    
+    // Children are fetched one level at a time, on first expansion
+    if (expanding && canExpand(node) && node.children.length === 0) {
+      loadChildren(node);
+    }
   };
   
   const handleFolderSelect = (folderId: string) => {
@@ -282,7 +314,7 @@ const ContainerBrowser: React.FC<ContainerBrowserProps> = ({
       }
     }
     
-    toggleNode(node.id);
+    toggleNode(node);
   };
   
   const renderFolderTree = (node: FolderTree, level = 0) => {
@@ -297,6 +329,7 @@ const ContainerBrowser: React.FC<ContainerBrowserProps> = ({
     }
     
     const isExpanded = expandedNodes.has(node.id);
+    const isLoadingChildren = loadingNodes.has(node.id);
     const isSelected = selectedContainer?.name === node.name || selectedFolder?.name === node.name;
     
     return (
@@ -313,10 +346,10 @@ const ContainerBrowser: React.FC<ContainerBrowserProps> = ({
             className="h-5 w-5 p-0 mr-1"
             onClick={(e) => {
               e.stopPropagation();
-              toggleNode(node.id);
+              toggleNode(node);
             }}
           >
-            {node.children.length > 0 ? (
+            {canExpand(node) ? (
               isExpanded ? <ChevronDown className="h-4 w-4" /> : <ChevronRight className="h-4 w-4" />
             ) : (
               <div className="w-4" />
@@ -345,9 +378,22 @@ const ContainerBrowser: React.FC<ContainerBrowserProps> = ({
           )}
         </div>
         
-        {isExpanded && node.children.length > 0 && (
+        {isExpanded && (node.children.length > 0 || isLoadingChildren) && (
           <div className="border-l border-gray-200 dark:border-gray-700 ml-2 pl-2">
             {node.children.map(child => renderFolderTree(child, level + 1))}
+            
+            {isLoadingChildren ? (
+              <div className="pl-4 py-1 text-xs text-gray-500">Loading...</div>
+            ) : node.continuationToken && (
+              <Button
+                variant="ghost"
+                size="sm"
+                className="h-6 ml-4 px-2 text-xs text-blue-600 dark:text-blue-400"
+                onClick={() => loadChildren(node)}
+              >
+                Load more
+              </Button>
+            )}
           </div>
         )}
       </div>
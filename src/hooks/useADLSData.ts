@@ -19,6 +19,21 @@ import {
 import { toast } from '@/hooks/use-toast';
 import { validateData } from '@/utils/schemaValidation';
 
+const replaceTreeNode = (
+  node: FolderTree,
+  id: string,
+  update: (node: FolderTree) => FolderTree
+): FolderTree => {
+  if (node.id === id) return update(node);
+  let changed = false;
+  const children = node.children.map(child => {
+    const replaced = replaceTreeNode(child, id, update);
+    if (replaced !== child) changed = true;
+    return replaced;
+  });
+  return changed ? { ...node, children } : node;
+};
+
 export function useADLSData() {
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
@@ -82,8 +97,16 @@ export function useADLSData() {
       setContainers(availableContainers);
       
       try {
-        const tree = await adlsService.getFolderTree(newConnection.id);
-        setFolderTree(tree);
+        // Only the containers are listed up front; folders load as they are expanded
+        const page = await adlsService.getFolderChildren(newConnection.id);
+        setFolderTree({
+          id: 'root',
+          name: 'Root',
+          type: 'root',
+          children: page.children,
+          childrenLoaded: true,
+          continuationToken: page.continuationToken ?? null
+        });
       } catch (err) {
         console.error("Error fetching folder tree:", err);
       }
@@ -110,6 +133,37 @@ export function useADLSData() {
     }
   }, []);
 
+  const loadTreeChildren = useCallback(async (node: FolderTree) => {
+    if (!connection) return;
+    
+    const [containerName, ...pathParts] = node.type === 'root' ? [] : (node.path || node.name).split('/');
+    
+    try {
+      const page = await adlsService.getFolderChildren(
+        connection.id,
+        containerName,
+        pathParts.join('/'),
+        node.childrenLoaded ? node.continuationToken : null
+      );
+      
+      setFolderTree(prev => prev && replaceTreeNode(prev, node.id, current => ({
+        ...current,
+        children: current.childrenLoaded ? [...current.children, ...page.children] : page.children,
+        childrenLoaded: true,
+        continuationToken: page.continuationToken ?? null
+      })));
+    } catch (err) {
+      const errorMessage = err instanceof Error ? err.message : 'Failed to load folder';
+      console.error("Error loading folder children:", err);
+      
+      toast({
+        variant: "destructive",
+        title: "Failed to load folder",
+        description: errorMessage,
+      });
+    }
+  }, [connection]);
+
   const disconnect = useCallback(async () => {
     if (!connection) return;
     
@@ -812,6 +866,7 @@ export function useADLSData() {
     folderTree,
     authMethods,
     getAvailableAuthMethods,
+    loadTreeChildren,
     selectContainer,
     selectFolder,
     checkFolderContainsDatasetFiles,
@@ -11,7 +11,8 @@ import {
   Comment,
   TempStorage,
   DatasetColumn,
-  FolderTree
+  FolderTree,
+  FolderChildrenPage
 } from '@/types/adls';
 import { v4 as uuidv4 } from 'uuid';
 import { toast } from '@/hooks/use-toast';
@@ -499,6 +500,51 @@ class ADLSService {
     }
   }
   
+  async getFolderChildren(
+    connectionId: string,
+    containerName?: string,
+    path: string = '',
+    continuationToken?: string | null
+  ): Promise<FolderChildrenPage> {
+    if (this.useMockBackend) {
+      const tree = await this.getFolderTree(connectionId);
+      const nodePath = [containerName, path].filter(Boolean).join('/');
+      const findNode = (node: FolderTree): FolderTree | undefined => {
+        if ((node.path || '') === nodePath) return node;
+        for (const child of node.children) {
+          const found = findNode(child);
+          if (found) return found;
+        }
+        return undefined;
+      };
+      const node = nodePath ? findNode(tree) : tree;
+      return {
+        path: nodePath,
+        children: (node?.children || []).map(child => ({ ...child, children: [] })),
+        continuationToken: null
+      };
+    }
+    
+    try {
+      const params = new URLSearchParams();
+      if (containerName) params.set('container_name', containerName);
+      if (path) params.set('path', path);
+      if (continuationToken) params.set('continuation_token', continuationToken);
+      
+      const response = await fetch(`${API_BASE_URL}/folder-tree/${connectionId}/children?${params.toString()}`);
+      
+      if (!response.ok) {
+        const errorData = await response.json();
+        throw new Error(errorData.detail || 'Failed to get folder children');
+      }
+      
+      return await response.json();
+    } catch (error) {
+      console.error('Error getting folder children:', error);
+      throw error;
+    }
+  }
+  
   async listContainers(connectionId: string, containerFilter?: string[]): Promise<Container[]> {
     if (this.useMockBackend) {
       return generateMockContainers(containerFilter);
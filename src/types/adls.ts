@@ -51,14 +51,25 @@ export interface FolderTree {
   path?: string;
   format?: string;
   children: FolderTree[];
+  // Set once children have been fetched from the lazy children endpoint
+  childrenLoaded?: boolean;
+  continuationToken?: string | null;
   metadata?: {
     lastModified?: Date;
     size?: number;
     itemCount?: number;
+    itemCountTruncated?: boolean;
     hasDatasetFiles?: boolean;
+    formats?: string[];
   };
 }
 
+export interface FolderChildrenPage {
+  path: string;
+  children: FolderTree[];
+  continuationToken?: string | null;
+}
+
 export interface Dataset {
   id: string;
   name: string;